@@ -4,22 +4,47 @@ Enhanced với World Bible và World Database integration
 """
 
 import os
+import re
 import json
 import time
-from typing import Dict, Any, Optional, List
+import asyncio
+from typing import Dict, Any, Optional, List, Iterator
 from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 import logging
 
 from schemas import CultivationLLMResponse, CharacterCreationResponse
-from world_bible import WorldBible
-from world_database import WorldDatabase
+from optimizations import make_semantic_key
+from database import run_in_db_executor
+from prompt_templates import (
+    TURN_CONTEXT_TEMPLATE, SELECTED_CHOICE_HEADER_TEMPLATE, CHOICE_GUIDE_TEMPLATE,
+    WAITING_FOR_CHOICE, INSTRUCTIONS_TEMPLATE, TURN_DIRECTIVE_TEMPLATE,
+    STABLE_TURN_GUIDE, get_prompt_fragments
+)
+from context_cache import CONTEXT_CACHE_MODE, create_prefix_cached_model, token_usage
+from context_budget import MEMORY_CONTEXT_TOKENS, MAX_PROMPT_TOKENS, estimate_tokens, clip_to_tokens
+from world_registry import WorldRegistry, get_world_registry
+from streaming import NarrativeStreamParser
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,  # Balanced creativity
+    "top_p": 0.95,      # Nucleus sampling (matches model default)
+    "top_k": 64,        # Top-k sampling (matches gemini-2.5 default)
+    "max_output_tokens": 3072,  # Balanced: enough for complete JSON, still fast
+}
+
 
 class CultivationAgent:
     """
@@ -32,37 +57,59 @@ class CultivationAgent:
     - Structured output validation
     """
     
-    def __init__(self):
+    def __init__(self, world: Optional[WorldRegistry] = None, save_id: Optional[str] = None):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment")
         
         genai.configure(api_key=api_key)
         
-        # Load World Bible
-        self.world_bible = WorldBible.load_from_file("data/world_bible.json")
-        if not Path("data/world_bible.json").exists():
-            # Create default if not exists
-            self.world_bible.save_to_file("data/world_bible.json")
-        
-        # Load World Database
-        self.world_db = WorldDatabase("data")
-        
-        # Load system instruction
-        prompt_path = Path("data/prompts/master.md")
-        if prompt_path.exists():
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                system_instruction = f.read()
-        else:
-            system_instruction = self._get_default_system_instruction()
-        
-        # Enhance system instruction với World Bible
-        system_instruction = self._enhance_system_instruction(system_instruction)
+        # World data dùng chung cả process (World Bible, World Database, prompt)
+        self.world = world or get_world_registry()
+        self.world_bible = self.world.world_bible
+        self.world_db = self.world.world_db
+        self._optimizations = self.world.optimizations  # AI response cache
+        self.save_id = save_id  # Semantic cache key chỉ hit trong cùng save
+        self._previous_ai_response: Optional[str] = None
         
         # Use free tier model by default, can override with GEMINI_MODEL env var
         # Priority: GEMINI_MODEL env var > gemini-1.5-flash (free tier, fast)
         model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
         
+        # Model (system instruction + fallback chain) build 1 lần, share giữa các session
+        self.model = self.world.shared(("gemini_model", model_name), lambda: self._create_model(model_name))
+        
+        # Context caching: system instruction + hướng dẫn lượt chơi cache phía provider,
+        # mỗi lượt chỉ gửi phần context thay đổi (GEMINI_CONTEXT_CACHE=gemini|stub)
+        cached_model = self.world.shared(
+            ("gemini_turn_model", model_name, CONTEXT_CACHE_MODE),
+            lambda: create_prefix_cached_model(
+                CONTEXT_CACHE_MODE,
+                self.model,
+                getattr(self.model, "model_name", model_name),
+                self._get_system_instruction(),
+                STABLE_TURN_GUIDE,
+                {"safety_settings": SAFETY_SETTINGS, "generation_config": GENERATION_CONFIG}
+            )
+        )
+        self._prefix_cached = cached_model is not None
+        self.turn_model = cached_model or self.model
+        self._last_token_usage: Optional[Dict[str, Any]] = None
+        
+        # Initialize rate limiting
+        self._last_request_time = 0
+    
+    def _get_system_instruction(self) -> str:
+        """System instruction: master prompt + World Bible"""
+        system_instruction = self.world.master_prompt or self._get_default_system_instruction()
+        
+        # Enhance system instruction với World Bible
+        return self._enhance_system_instruction(system_instruction)
+    
+    def _create_model(self, model_name: str):
+        """Build Gemini model với system instruction (master prompt + World Bible)"""
+        system_instruction = self._get_system_instruction()
+        
         # Fallback chain: prioritize FAST models for real-time gameplay
         fallback_models = [
             model_name,  # Try requested first (gemini-2.5-flash)
@@ -77,37 +124,21 @@ class CultivationAgent:
         seen = set()
         fallback_models = [m for m in fallback_models if not (m in seen or seen.add(m))]
         
-        model_initialized = False
         for model_to_try in fallback_models:
             try:
-                self.model = genai.GenerativeModel(
+                model = genai.GenerativeModel(
                     model_name=model_to_try,
                     system_instruction=system_instruction,
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-                    ],
-                    generation_config={
-                        "temperature": 0.7,  # Balanced creativity
-                        "top_p": 0.95,      # Nucleus sampling (matches model default)
-                        "top_k": 64,        # Top-k sampling (matches gemini-2.5 default)
-                        "max_output_tokens": 3072,  # Balanced: enough for complete JSON, still fast
-                    }
+                    safety_settings=SAFETY_SETTINGS,
+                    generation_config=GENERATION_CONFIG
                 )
                 logger.info(f"✅ Using Gemini model: {model_to_try}")
-                model_initialized = True
-                break
+                return model
             except Exception as e:
                 logger.warning(f"⚠️ Failed to initialize {model_to_try}: {str(e)[:100]}")
                 continue
         
-        if not model_initialized:
-            raise ValueError("Failed to initialize any Gemini model. Check API key and quota.")
-        
-        # Initialize rate limiting
-        self._last_request_time = 0
+        raise ValueError("Failed to initialize any Gemini model. Check API key and quota.")
     
     def _get_default_system_instruction(self) -> str:
         """Default system instruction nếu không có file"""
@@ -161,58 +192,16 @@ QUAN TRỌNG:
         if age == 0 and current_choice is None:
             return self.process_character_creation(character_data, memory_context, working_memory)
         
-        # Build prompt với full context
-        prompt = self._build_prompt(
+        prompt = self._prepare_turn_prompt(
             character_data=character_data,
             current_choice=current_choice,
             memory_context=memory_context,
             working_memory=working_memory
         )
         
-        # Store prompt for debug
-        self._last_prompt = prompt
-        self._last_ai_response = None
-        self._last_parsed_result = None
-        self._last_error = None
-        
-        # Optimize prompt length if too long (reduce token usage)
-        prompt_length = len(prompt)
-        if prompt_length > 30000:  # ~7500 tokens (safety limit)
-            logger.warning(f"Prompt very long ({prompt_length} chars), truncating memory context...")
-            # Truncate memory context if too long
-            if memory_context and len(memory_context) > 10000:
-                memory_context = memory_context[:10000] + "\n[... memory truncated ...]"
-                prompt = self._build_prompt(
-                    character_data=character_data,
-                    current_choice=current_choice,
-                    memory_context=memory_context,
-                    working_memory=working_memory
-                )
-                logger.info(f"Prompt optimized to {len(prompt)} chars")
-        
-        # Optimize prompt length if too long (reduce token usage)
-        prompt_length = len(prompt)
-        if prompt_length > 30000:  # ~7500 tokens (safety limit)
-            logger.warning(f"Prompt very long ({prompt_length} chars), truncating memory context...")
-            # Truncate memory context if too long
-            if memory_context and len(memory_context) > 10000:
-                memory_context = memory_context[:10000] + "\n[... memory truncated ...]"
-                prompt = self._build_prompt(
-                    character_data=character_data,
-                    current_choice=current_choice,
-                    memory_context=memory_context,
-                    working_memory=working_memory
-                )
-                logger.info(f"Prompt optimized to {len(prompt)} chars")
-        
         # Check AI cache first (if optimizations available)
-        text = None
-        if hasattr(self, '_optimizations') and self._optimizations:
-            cached_response = self._optimizations.ai_cache.get(prompt)
-            if cached_response:
-                logger.info("✅ AI cache HIT! Using cached response")
-                print(f"✅ Cache HIT! Using cached response (instant!)")
-                text = cached_response
+        text = self._get_cached_response(prompt, character_data, current_choice)
+        from_cache = text is not None
         
         # Call AI with retry logic for rate limits (only if not cached)
         if text is None:
@@ -226,26 +215,19 @@ QUAN TRỌNG:
                     if attempt == 0:  # Only print preview on first attempt
                         print(f"📋 Prompt preview (last 500 chars): ...{prompt[-500:]}")
                     
-                    response = self.model.generate_content(prompt)
+                    response = self.turn_model.generate_content(prompt)
                     text = response.text.strip()
+                    self._last_token_usage = token_usage(response, prompt, text)
                     break  # Success, exit retry loop
                 except Exception as e:
                     error_str = str(e)
                 
                 # Check if it's a quota/rate limit error
-                if "429" in error_str or "ResourceExhausted" in error_str or "quota" in error_str.lower():
+                if self._is_rate_limit_error(error_str):
                     if attempt < max_retries - 1:
-                        # Extract retry delay from error if available
-                        import re
-                        delay_match = re.search(r'retry in ([\d.]+)s', error_str, re.IGNORECASE)
-                        if delay_match:
-                            retry_delay = float(delay_match.group(1)) + 1  # Add 1 second buffer
-                        else:
-                            retry_delay = retry_delay * 2  # Exponential backoff
-                        
+                        retry_delay = self._get_retry_delay(error_str, retry_delay)
                         print(f"⚠️ Rate limit/quota exceeded. Waiting {retry_delay:.1f}s before retry {attempt + 2}/{max_retries}...")
                         logger.warning(f"Rate limit error (attempt {attempt + 1}): {error_str[:200]}")
-                        import time
                         time.sleep(retry_delay)
                         continue
                     else:
@@ -263,13 +245,267 @@ QUAN TRỌNG:
             print(f"❌ Failed to get AI response after {max_retries} attempts. Using fallback.")
             return self._create_fallback_response(character_data)
         
+        return self._finalize_response(prompt, text, character_data, current_choice, from_cache=from_cache)
+    
+    async def process_turn_async(
+        self,
+        character_data: Dict[str, Any],
+        current_choice: Optional[int] = None,
+        memory_context: Optional[str] = None,
+        working_memory: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version của process_turn
+        
+        Dùng async Gemini client và asyncio.sleep cho retry backoff,
+        nên một lượt chơi không block event loop của server.
+        """
+        age = character_data.get("age", 0)
+        
+        # Character creation (age 0) uses different prompt
+        if age == 0 and current_choice is None:
+            return await asyncio.to_thread(
+                self.process_character_creation, character_data, memory_context, working_memory
+            )
+        
+        prompt = self._prepare_turn_prompt(
+            character_data=character_data,
+            current_choice=current_choice,
+            memory_context=memory_context,
+            working_memory=working_memory
+        )
+        
+        # ai_cache lookup / insert là SQLite: chạy trong DB executor, không trên event loop
+        text = await run_in_db_executor(self._get_cached_response, prompt, character_data, current_choice)
+        from_cache = text is not None
+        
+        if text is None:
+            max_retries = 3
+            retry_delay = 3  # Start with 3 seconds
+            
+            for attempt in range(max_retries):
+                try:
+                    print(f"🤖 Calling AI async (attempt {attempt + 1}/{max_retries}) with choice: {current_choice}, age: {age}")
+                    response = await self.turn_model.generate_content_async(prompt)
+                    text = response.text.strip()
+                    self._last_token_usage = token_usage(response, prompt, text)
+                    break
+                except Exception as e:
+                    error_str = str(e)
+                    if not self._is_rate_limit_error(error_str):
+                        # Other error, don't retry
+                        raise
+                
+                if attempt < max_retries - 1:
+                    retry_delay = self._get_retry_delay(error_str, retry_delay)
+                    print(f"⚠️ Rate limit/quota exceeded. Waiting {retry_delay:.1f}s before retry {attempt + 2}/{max_retries}...")
+                    logger.warning(f"Rate limit error (attempt {attempt + 1}): {error_str[:200]}")
+                    await asyncio.sleep(retry_delay)
+                    continue
+                
+                print(f"❌ Rate limit error after {max_retries} attempts. Using fallback response.")
+                logger.error(f"Rate limit error after all retries: {error_str[:500]}")
+                self._last_error = error_str
+                return self._create_fallback_response(character_data)
+        
+        if text is None:
+            return self._create_fallback_response(character_data)
+        
+        return await run_in_db_executor(
+            self._finalize_response, prompt, text, character_data, current_choice, from_cache=from_cache
+        )
+    
+    def process_turn_stream(
+        self,
+        character_data: Dict[str, Any],
+        current_choice: Optional[int] = None,
+        memory_context: Optional[str] = None,
+        working_memory: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming version của process_turn
+        
+        Yields:
+            {"type": "narrative", "delta": str} - từng đoạn narrative khi token tới
+            {"type": "result", "result": Dict} - kết quả cuối (giống process_turn)
+        """
+        age = character_data.get("age", 0)
+        
+        # Character creation không stream (prompt ngắn, chỉ gọi 1 lần)
+        if age == 0 and current_choice is None:
+            result = self.process_character_creation(character_data, memory_context, working_memory)
+            yield {"type": "narrative", "delta": result.get("narrative", "")}
+            yield {"type": "result", "result": result}
+            return
+        
+        prompt = self._prepare_turn_prompt(
+            character_data=character_data,
+            current_choice=current_choice,
+            memory_context=memory_context,
+            working_memory=working_memory
+        )
+        
+        # Cache hit: trả toàn bộ narrative trong 1 event
+        cached = self._get_cached_response(prompt, character_data, current_choice)
+        if cached is not None:
+            result = self._finalize_response(prompt, cached, character_data, current_choice, from_cache=True)
+            yield {"type": "narrative", "delta": result.get("narrative", "")}
+            yield {"type": "result", "result": result}
+            return
+        
+        max_retries = 3
+        retry_delay = 3
+        parser = NarrativeStreamParser()
+        completed = False
+        
+        for attempt in range(max_retries):
+            parser = NarrativeStreamParser()
+            try:
+                logger.info(
+                    f"Streaming AI (attempt {attempt + 1}/{max_retries}) choice={current_choice} age={age} "
+                    f"prompt={len(prompt)} chars"
+                )
+                
+                response = self.turn_model.generate_content(prompt, stream=True)
+                for chunk in response:
+                    try:
+                        chunk_text = chunk.text
+                    except ValueError:
+                        # Chunk không có text (safety/finish metadata)
+                        continue
+                    delta = parser.feed(chunk_text)
+                    if delta:
+                        yield {"type": "narrative", "delta": delta}
+                self._last_token_usage = token_usage(response, prompt, parser.buffer)
+                completed = True
+                break
+            except Exception as e:
+                error_str = str(e)
+                
+                # Đã gửi narrative cho client thì không retry được nữa
+                if parser.narrative or not self._is_rate_limit_error(error_str):
+                    logger.error(f"Streaming AI error: {error_str[:500]}")
+                    self._last_error = f"Stream interrupted: {error_str}"
+                    if not parser.buffer.strip():
+                        result = self._create_fallback_response(character_data)
+                        yield {"type": "narrative", "delta": result["narrative"]}
+                        yield {"type": "result", "result": result}
+                        return
+                    break
+                
+                if attempt < max_retries - 1:
+                    retry_delay = self._get_retry_delay(error_str, retry_delay)
+                    logger.warning(
+                        f"Rate limit error (attempt {attempt + 1}), retry in {retry_delay:.1f}s: {error_str[:200]}"
+                    )
+                    time.sleep(retry_delay)
+                    continue
+                
+                logger.error(f"Rate limit error after all retries: {error_str[:500]}")
+                self._last_error = error_str
+                result = self._create_fallback_response(character_data)
+                yield {"type": "narrative", "delta": result["narrative"]}
+                yield {"type": "result", "result": result}
+                return
+        
+        # Stream đứt giữa chừng: vẫn parse phần đã nhận nhưng không ghi vào AI cache
+        # (from_cache=True bỏ qua bước cache), _last_error đánh dấu kết quả degraded
+        result = self._finalize_response(
+            prompt, parser.buffer.strip(), character_data, current_choice, from_cache=not completed
+        )
+        
+        # Narrative cuối có thể khác phần đã stream (fallback/World Bible correction)
+        final_narrative = result.get("narrative", "")
+        if not parser.narrative:
+            yield {"type": "narrative", "delta": final_narrative}
+        yield {"type": "result", "result": result}
+    
+    def _prepare_turn_prompt(
+        self,
+        character_data: Dict[str, Any],
+        current_choice: Optional[int] = None,
+        memory_context: Optional[str] = None,
+        working_memory: Optional[str] = None
+    ) -> str:
+        """Build prompt cho 1 lượt chơi và reset debug info"""
+        # Prefix được cache phía provider -> chỉ gửi phần thay đổi của lượt
+        static_guide = not getattr(self, '_prefix_cached', False)
+        
+        # Memory context đã được ghép theo token budget (Memory3Tier.get_full_context);
+        # clip lại cho caller khác (ecs_systems, context tự build) để chỉ build prompt 1 lần
+        memory_context = clip_to_tokens(memory_context, MEMORY_CONTEXT_TOKENS)
+        
+        # Build prompt với full context
+        prompt = self._build_prompt(
+            character_data=character_data,
+            current_choice=current_choice,
+            memory_context=memory_context,
+            working_memory=working_memory,
+            static_guide=static_guide
+        )
+        
+        # Reset debug info (giữ narrative lượt trước cho anti-repeat của cache)
+        self._previous_ai_response = getattr(self, '_last_ai_response', None)
+        self._last_ai_response = None
+        self._last_parsed_result = None
+        self._last_error = None
+        self._last_token_usage = None
+        
+        prompt_tokens = estimate_tokens(prompt)
+        if prompt_tokens > MAX_PROMPT_TOKENS:
+            logger.warning(f"Prompt very long (~{prompt_tokens} tokens, {len(prompt)} chars)")
+        
+        # Store prompt for debug
+        self._last_prompt = prompt
+        return prompt
+    
+    def _get_cached_response(
+        self,
+        prompt: str,
+        character_data: Dict[str, Any],
+        current_choice: Optional[int] = None
+    ) -> Optional[str]:
+        """Lookup AI cache (if optimizations available): exact prompt, rồi normalized key"""
+        if hasattr(self, '_optimizations') and self._optimizations:
+            semantic_key = make_semantic_key(character_data, current_choice, getattr(self, 'save_id', None))
+            cached_response = self._optimizations.ai_cache.get(prompt, semantic_key)
+            # Không lặp lại y nguyên narrative lượt trước của chính session này
+            if cached_response and cached_response != getattr(self, '_previous_ai_response', None):
+                logger.info("✅ AI cache HIT! Using cached response")
+                print(f"✅ Cache HIT! Using cached response (instant!)")
+                return cached_response
+        return None
+    
+    @staticmethod
+    def _is_rate_limit_error(error_str: str) -> bool:
+        """Check if error is a quota/rate limit error"""
+        return "429" in error_str or "ResourceExhausted" in error_str or "quota" in error_str.lower()
+    
+    @staticmethod
+    def _get_retry_delay(error_str: str, retry_delay: float) -> float:
+        """Extract retry delay from error if available, else exponential backoff"""
+        delay_match = re.search(r'retry in ([\d.]+)s', error_str, re.IGNORECASE)
+        if delay_match:
+            return float(delay_match.group(1)) + 1  # Add 1 second buffer
+        return retry_delay * 2  # Exponential backoff
+    
+    def _finalize_response(
+        self,
+        prompt: str,
+        text: str,
+        character_data: Dict[str, Any],
+        current_choice: Optional[int] = None,
+        from_cache: bool = False
+    ) -> Dict[str, Any]:
+        """Cache, parse và verify raw AI response"""
         # Store raw response for debug
         self._last_ai_response = text
         
         # Cache response if optimizations available
-        if hasattr(self, '_optimizations') and self._optimizations:
+        if not from_cache and hasattr(self, '_optimizations') and self._optimizations:
             try:
-                self._optimizations.ai_cache.set(prompt, text)
+                semantic_key = make_semantic_key(character_data, current_choice, getattr(self, 'save_id', None))
+                self._optimizations.ai_cache.set(prompt, text, semantic_key)
             except Exception as e:
                 logger.warning(f"Could not cache AI response: {e}")
         
@@ -318,252 +554,65 @@ QUAN TRỌNG:
         character_data: Dict[str, Any],
         current_choice: Optional[int] = None,
         memory_context: Optional[str] = None,
-        working_memory: Optional[str] = None
+        working_memory: Optional[str] = None,
+        static_guide: bool = True
     ) -> str:
-        """Build prompt với full context"""
+        """
+        Build prompt với full context (static blocks precompiled, fragments memoized)
+        
+        static_guide=False: bỏ hướng dẫn/ví dụ/JSON format (đã nằm trong cached prefix)
+        """
+        fragments = get_prompt_fragments(self.world)
         
-        # Character info
         age = character_data.get("age", 0)
-        gender = character_data.get("gender", "Unknown")
         talent = character_data.get("talent", "Unknown")
-        race = character_data.get("race", "Unknown")
-        background = character_data.get("background", "Unknown")
-        story = character_data.get("story", "")
-        
-        # Cultivation info
         cultivation = character_data.get("cultivation", {})
-        realm = cultivation.get("realm", "Mortal")
-        realm_level = cultivation.get("realm_level", 0)
-        
-        # Attributes
         attributes = character_data.get("attributes", {})
-        from attributes import AttributesComponent
-        if attributes:
-            attrs = AttributesComponent(**attributes)
-            ai_context = attrs.get_ai_context_string()
-        else:
-            ai_context = "Attributes not available"
         
-        # Get physique context and prompt
-        physique_context = ""
-        physique_id = attributes.get('physique_id') if attributes else None
-        if physique_id and hasattr(self, '_game_instance') and self._game_instance:
-            try:
-                physique_system = getattr(self._game_instance, 'physique_system', None)
-                if physique_system:
-                    physique_data = physique_system.get_physique(physique_id)
-                    if physique_data:
-                        physique_name = physique_data.get('name', '')
-                        physique_desc = physique_data.get('description', '')
-                        physique_prompt = physique_system.get_ai_prompt(physique_id)
-                        forbidden_words = physique_system.get_forbidden_words(physique_id)
-                        
-                        physique_context = f"""
-Thể Chất: {physique_name}
-Mô tả: {physique_desc}
-
-⚠️ QUAN TRỌNG - PROMPT CHO THỂ CHẤT:
-{physique_prompt}
-"""
-                        if forbidden_words:
-                            physique_context += f"\n❌ KHÔNG ĐƯỢC dùng các từ: {', '.join(forbidden_words)}"
-            except Exception as e:
-                logger.warning(f"Error getting physique context: {e}")
-        
-        if not physique_context:
-            physique_context = "Không có thể chất đặc biệt"
-        
-        # Location context từ World Database
-        location_id = character_data.get("location_id")
-        location_context = ""
-        if location_id:
-            location = self.world_db.get_location(location_id)
-            if location:
-                # Get regional culture
-                culture = self.world_db.get_culture_by_location(location_id)
-                culture_info = ""
-                if culture:
-                    culture_info = f"""
-Văn hóa vùng: {culture.get('name', 'Unknown')} - {culture.get('vibe', 'Unknown')}
-Quy tắc xã hội: {json.dumps(culture.get('social_rules', {}), ensure_ascii=False)}
-Đặc điểm văn hóa: {', '.join([t.get('effect', '') for t in culture.get('cultural_traits', [])[:3]])}
-"""
-                
-                location_context = f"""
-Địa điểm: {location['name']} ({location.get('region', 'Unknown')})
-Loại: {location.get('type', 'Unknown')}
-Mật độ linh khí: {location.get('qi_density', 1.0)}x
-Dịch vụ: {', '.join(location.get('services', []))}
-Nguy hiểm: {location.get('danger_level', 'Unknown')}
-Kết nối: {', '.join([self.world_db.get_location(lid).get('name', lid) for lid in location.get('connected_to', []) if self.world_db.get_location(lid)])}
-{culture_info}
-"""
-        
-        # Sect context từ World Database
-        sect_id = character_data.get("sect_id")
-        sect_context = character_data.get("sect_context", "")
-        if not sect_context and sect_id:
-            sect = self.world_db.get_sect(sect_id)
-            if sect:
-                sect_context = f"""
-Tông môn: {sect['name']} ({sect.get('type', 'Unknown')})
-Triết lý: {sect.get('description', '')}
-Kỹ thuật độc quyền: {', '.join(sect.get('exclusive_techniques', []))}
-Yêu cầu: {json.dumps(sect.get('requirements', {}), ensure_ascii=False)}
-"""
-        
-        # Race context từ World Database
-        race_id = character_data.get("race")
-        race_context = ""
-        if race_id:
-            race = self.world_db.get_race(race_id)
-            if race:
-                race_context = f"""
-Chủng tộc: {race.get('name', race_id)}
-Mô tả: {race.get('description', '')}
-Đặc điểm: {', '.join(race.get('traits', []))}
-"""
-        
-        # Get talent AI effect if available
-        talent_ai_effect = ""
-        try:
-            import json
-            from pathlib import Path
-            talents_path = Path("data/talents_ai_friendly.json")
-            if talents_path.exists():
-                with open(talents_path, 'r', encoding='utf-8') as f:
-                    talents_list = json.load(f)
-                    for t in talents_list:
-                        if t.get('name') == talent:
-                            talent_ai_effect = t.get('ai_effect', '')
-                            break
-        except Exception as e:
-            logger.warning(f"Error loading talent AI effect: {e}")
-        
-        # Build full prompt
-        prompt = f"""
-=== CHARACTER DATA ===
-Tuổi: {age}
-Giới tính: {gender}
-Thiên phú: {talent}{f" ({talent_ai_effect})" if talent_ai_effect else ""}
-Chủng tộc: {race}
-Bối cảnh: {background}
-Câu chuyện: {story}
-
-=== CULTIVATION ===
-Cảnh giới: {realm} (Level {realm_level})
-Tu vi: {cultivation.get('spiritual_power', 0)}/{cultivation.get('max_spiritual_power', 100)}
-Tiến độ đột phá: {cultivation.get('breakthrough_progress', 0.0)}%
-
-=== ATTRIBUTES ===
-{ai_context}
-
-=== PHYSIQUE (THỂ CHẤT) ===
-{physique_context}
-
-=== LOCATION ===
-{location_context}
-
-=== SECT ===
-{sect_context}
-
-=== RACE ===
-{race_context}
-
-=== MEMORY ===
-{memory_context or "Không có ký ức"}
-
-=== WORKING MEMORY ===
-{working_memory or "Không có nhiệm vụ"}
-
-=== CURRENT ACTION ===
-"""
+        # Sect context: game có thể truyền sẵn, nếu không thì lấy từ World Database
+        sect_context = character_data.get("sect_context", "") or fragments.sect(character_data.get("sect_id"))
+        
+        parts = [TURN_CONTEXT_TEMPLATE.render(
+            age=age,
+            gender=character_data.get("gender", "Unknown"),
+            talent_line=fragments.talent(talent),
+            race=character_data.get("race", "Unknown"),
+            background=character_data.get("background", "Unknown"),
+            story=character_data.get("story", ""),
+            realm=cultivation.get("realm", "Mortal"),
+            realm_level=cultivation.get("realm_level", 0),
+            spiritual_power=cultivation.get('spiritual_power', 0),
+            max_spiritual_power=cultivation.get('max_spiritual_power', 100),
+            breakthrough_progress=cultivation.get('breakthrough_progress', 0.0),
+            ai_context=fragments.attributes(attributes),
+            physique_context=fragments.physique(attributes.get('physique_id') if attributes else None),
+            location_context=fragments.location(character_data.get("location_id")),
+            sect_context=sect_context,
+            race_context=fragments.race(character_data.get("race")),
+            memory_context=memory_context or "Không có ký ức",
+            working_memory=working_memory or "Không có nhiệm vụ"
+        )]
         
         selected_choice_text = ""
-        if current_choice is not None:
-            choices = character_data.get("choices", [])
-            if 0 <= current_choice < len(choices):
-                selected_choice_text = choices[current_choice]
-                prompt += f"""
-=== NGƯỜI CHƠI ĐÃ CHỌN ===
-Lựa chọn số {current_choice + 1}: "{selected_choice_text}"
-
-⚠️⚠️⚠️ QUAN TRỌNG NHẤT ⚠️⚠️⚠️
-Narrative PHẢI mô tả CỤ THỂ những gì xảy ra khi người chơi thực hiện lựa chọn "{selected_choice_text}".
-
-VÍ DỤ CỤ THỂ:
-- Nếu chọn "Tiếp tục tu luyện" → Mô tả: "Bạn ngồi xuống, nhắm mắt, bắt đầu điều khiển linh khí trong cơ thể. Dòng linh khí chảy qua các kinh mạch, bạn cảm nhận được sự tăng trưởng từng chút một. Sau nhiều tháng tu luyện, tu vi của bạn đã tăng lên..."
-
-- Nếu chọn "Đi khám phá" → Mô tả: "Bạn quyết định rời khỏi nơi ở, bước chân ra ngoài khám phá. Bạn đi qua những con đường nhỏ, leo lên đồi, xuống thung lũng. Trong một hang động, bạn phát hiện..."
-
-- Nếu chọn "Tìm kiếm tông môn" → Mô tả: "Bạn bắt đầu hành trình tìm kiếm tông môn. Bạn hỏi thăm người dân, đi theo những con đường lớn. Sau nhiều ngày, bạn đến được cổng một tông môn..."
-
-- Nếu chọn "Nghỉ ngơi" → Mô tả: "Bạn quyết định nghỉ ngơi, không tu luyện. Bạn ngồi dưới gốc cây, nhìn ngắm cảnh vật xung quanh. Trong lúc nghỉ ngơi, bạn suy ngẫm về..."
-
-KHÔNG ĐƯỢC viết chung chung như "tiếp tục tu luyện" mà PHẢI mô tả CỤ THỂ từng hành động, từng bước đi, từng sự kiện xảy ra.
-"""
-        else:
-            prompt += "Người chơi đang chờ lựa chọn.\n"
-        
-        prompt += f"""
-=== INSTRUCTIONS ===
-QUAN TRỌNG: Tạo narrative CỤ THỂ và ĐA DẠNG cho năm thứ {age + 1}. KHÔNG được lặp lại "năm X trôi qua một cách bình thường".
-
-1. NARRATIVE PHẢI:
-   - DỰA VÀO LỰA CHỌN "{selected_choice_text if selected_choice_text else 'của người chơi'}" để tạo narrative phù hợp
-   - Mô tả TỪNG BƯỚC, TỪNG HÀNH ĐỘNG cụ thể (bước đi, ngồi xuống, nhắm mắt, leo lên, xuống, gặp gỡ, nói chuyện...)
-   - Mô tả CẢNH VẬT, ĐỊA ĐIỂM cụ thể (hang động, rừng cây, con đường, ngôi làng...)
-   - Mô tả NGƯỜI GẶP, CUỘC TRÒ CHUYỆN nếu có
-   - Mô tả KẾT QUẢ, THAY ĐỔI cụ thể (tìm được gì, học được gì, tu vi tăng bao nhiêu...)
-   - Mỗi lựa chọn PHẢI dẫn đến narrative HOÀN TOÀN KHÁC NHAU
-   - Dài ít nhất 5-7 câu, mô tả chi tiết từng bước
-
-2. CHOICES:
-   - Đưa ra 4-6 lựa chọn ĐA DẠNG cho năm tiếp theo
-   - Mỗi lựa chọn phải dẫn đến narrative KHÁC NHAU
-   - Không được lặp lại các lựa chọn giống nhau
-
-3. STATE_UPDATES (BẮT BUỘC):
-   - PHẢI cập nhật cultivation (spiritual_power tăng, breakthrough_progress thay đổi)
-   - PHẢI cập nhật resources (spirit_stones, pills, materials thay đổi)
-   - PHẢI cập nhật attributes nếu có thay đổi
-   - Mỗi năm phải có thay đổi về stats
-
-VÍ DỤ NARRATIVE TỐT CHO "ĐI KHÁM PHÁ":
-"Năm thứ 2, bạn quyết định rời khỏi làng để khám phá thế giới xung quanh. Bạn bước đi trên con đường đất nhỏ, đi qua những cánh đồng lúa xanh mướt. Sau vài giờ đi bộ, bạn đến một khu rừng rậm. Trong rừng, bạn nghe thấy tiếng nước chảy. Bạn đi theo tiếng nước và phát hiện ra một thác nước nhỏ. Phía sau thác nước, bạn nhìn thấy một hang động ẩn khuất. Bạn cẩn thận bước vào, trong hang động tối tăm, bạn tìm thấy một viên đan dược cổ xưa còn sót lại trên một tảng đá. Sau khi sử dụng, tu vi của bạn tăng lên đáng kể."
-
-VÍ DỤ NARRATIVE TỐT CHO "TIẾP TỤC TU LUYỆN":
-"Năm thứ 2, bạn quyết định dành toàn bộ thời gian để tu luyện. Mỗi sáng, bạn ngồi xuống trên tảng đá phẳng, nhắm mắt, bắt đầu điều khiển linh khí trong cơ thể. Bạn cảm nhận dòng linh khí chảy qua các kinh mạch, từ đan điền lên đỉnh đầu rồi quay trở lại. Sau nhiều tháng tu luyện không ngừng nghỉ, bạn đã có thể điều khiển linh khí một cách thuần thục hơn. Tu vi của bạn tăng lên đáng kể, đạt được Luyện Khí Kỳ cấp 2. Bạn cảm thấy sức mạnh trong cơ thể tăng lên rõ rệt."
-
-VÍ DỤ NARRATIVE TỆ (KHÔNG ĐƯỢC):
-"Năm 2 trôi qua một cách bình thường."
-"Người Tu Tiên tiếp tục tu luyện tại Làng Thanh Thủy. Với thiên phú Thiên Linh Căn, bạn đã có những tiến bộ trong việc cảm nhận và điều khiển linh khí. Mỗi ngày trôi qua đều mang lại những hiểu biết mới về thế giới tu tiên."
-
-Format JSON:
-{{
-    "narrative": "Mô tả CỤ THỂ và ĐA DẠNG về những gì xảy ra trong năm...",
-    "choices": ["Lựa chọn 1", "Lựa chọn 2", "Lựa chọn 3", "Lựa chọn 4"],
-    "action_intent": "YEAR_PROGRESS",
-    "state_updates": {{
-        "age": {age + 1},
-        "cultivation": {{
-            "spiritual_power": <tăng lên>,
-            "breakthrough_progress": <thay đổi>,
-            "realm_level": <có thể tăng>
-        }},
-        "resources": {{
-            "spirit_stones": <thay đổi>,
-            "pills": {{"<tên đan>": <số lượng>}},
-            "materials": {{"<tên vật liệu>": <số lượng>}}
-        }},
-        "attributes": {{
-            <cập nhật nếu có>
-        }}
-    }}
-}}
-"""
-        
-        return prompt
+        choices = character_data.get("choices", []) if current_choice is not None else []
+        if current_choice is not None and 0 <= current_choice < len(choices):
+            selected_choice_text = choices[current_choice]
+            parts.append(SELECTED_CHOICE_HEADER_TEMPLATE.render(
+                choice_number=current_choice + 1,
+                choice_text=selected_choice_text
+            ))
+            if static_guide:
+                parts.append(CHOICE_GUIDE_TEMPLATE.render(choice_text=selected_choice_text))
+        elif current_choice is None:
+            parts.append(WAITING_FOR_CHOICE)
+        
+        directive = INSTRUCTIONS_TEMPLATE if static_guide else TURN_DIRECTIVE_TEMPLATE
+        parts.append(directive.render(
+            next_age=age + 1,
+            choice_label=selected_choice_text if selected_choice_text else 'của người chơi'
+        ))
+        
+        return "".join(parts)
     
     def process_character_creation(
         self,
@@ -934,10 +983,14 @@ Format JSON:
                 }
             }
     
-    async def create_summary(self, conversations: List[str]) -> str:
+    def create_summary(self, conversations: List[str], previous_summary: Optional[str] = None) -> str:
         """
         Tạo summary từ conversations (cho Rolling Summary)
+        
+        Chạy trong RollingSummaryWorker (thread nền), không trong request của người chơi.
+        Gộp summary trước để summary luôn bao toàn bộ quá khứ.
         """
+        previous_block = f"Tóm tắt trước đó:\n{previous_summary}\n" if previous_summary else ""
         prompt = f"""
 Tóm tắt các cuộc hội thoại sau đây, tập trung vào:
 - Thay đổi quan hệ
@@ -945,10 +998,11 @@ Tóm tắt các cuộc hội thoại sau đây, tập trung vào:
 - Lời hứa hẹn
 - Sự kiện quan trọng
 
+{previous_block}
 Conversations:
 {chr(10).join(conversations)}
 
-Tóm tắt ngắn gọn (20-30 từ):
+Tóm tắt ngắn gọn (20-30 từ{", gộp cả tóm tắt trước đó, tối đa 120 từ" if previous_summary else ""}):
 """
         
         try:
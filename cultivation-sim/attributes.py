@@ -5,6 +5,8 @@ Dựa trên đánh giá: Exponential scaling, Realm tier multipliers, AI tags
 
 import math
 from pydantic import BaseModel, Field
+
+from components import DirtyTrackingModel
 from typing import Dict, List, Optional
 from enum import Enum
 
@@ -33,7 +35,7 @@ class RealmTier(int, Enum):
     MAHAYANA = 9         # Đại Thừa (Base x1000000)
 
 
-class AttributesComponent(BaseModel):
+class AttributesComponent(DirtyTrackingModel):
     """
     Hệ thống chỉ số cốt lõi (S.P.E.C.I.A.L phiên bản Tiên hiệp)
     
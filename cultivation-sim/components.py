@@ -3,12 +3,35 @@ Cultivation-specific components for Cultivation Simulator
 Standalone version (không phụ thuộc engine/core)
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
 
-class CultivationComponent(BaseModel):
+class DirtyTrackingModel(BaseModel):
+    """
+    Component tự đánh dấu dirty khi đổi field (setattr / method mutate)
+    
+    Write-behind state (state_store) chỉ serialize component dirty. Sửa
+    dict/list field tại chỗ từ bên ngoài thì gọi mark_dirty().
+    """
+    _dirty: bool = PrivateAttr(default=True)
+    
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self._dirty = True
+    
+    def mark_dirty(self):
+        self._dirty = True
+    
+    def take_dirty(self) -> bool:
+        """Trả dirty flag và reset (gọi khi serialize để lưu)"""
+        dirty, self._dirty = self._dirty, False
+        return dirty
+
+
+class CultivationComponent(DirtyTrackingModel):
     """
     Cultivation realm and progress tracking
     For Xianxia/Tu Tiên games
@@ -83,7 +106,7 @@ class CultivationComponent(BaseModel):
         )
 
 
-class ResourceComponent(BaseModel):
+class ResourceComponent(DirtyTrackingModel):
     """
     Cultivation resources (spirit stones, pills, materials)
     """
@@ -106,6 +129,7 @@ class ResourceComponent(BaseModel):
         if pill_name not in self.pills:
             self.pills[pill_name] = 0
         self.pills[pill_name] += quantity
+        self.mark_dirty()
     
     def consume_pill(self, pill_name: str, quantity: int = 1) -> bool:
         """Consume pills, returns True if successful"""
@@ -114,6 +138,7 @@ class ResourceComponent(BaseModel):
         self.pills[pill_name] -= quantity
         if self.pills[pill_name] <= 0:
             del self.pills[pill_name]
+        self.mark_dirty()
         return True
     
     def add_material(self, material_name: str, quantity: int = 1):
@@ -121,6 +146,7 @@ class ResourceComponent(BaseModel):
         if material_name not in self.materials:
             self.materials[material_name] = 0
         self.materials[material_name] += quantity
+        self.mark_dirty()
     
     def get_total_pills(self) -> int:
         """Get total number of pills"""
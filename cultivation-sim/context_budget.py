@@ -0,0 +1,140 @@
+"""
+Context Budget - Ghép memory context theo token budget
+Điền greedy theo độ ưu tiên (working > short-term > long-term > summary)
+để prompt luôn vừa budget TRƯỚC khi build, không phải build lại rồi cắt.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+# Budget mặc định cho memory context (~10000 ký tự như giới hạn cắt cũ)
+MEMORY_CONTEXT_TOKENS = int(os.getenv("MEMORY_CONTEXT_TOKENS", "2500"))
+# Ngưỡng cảnh báo cho cả prompt (~30000 ký tự)
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "7500"))
+
+TRUNCATED_MARKER = "[... memory truncated ...]"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng token nhanh (~4 byte UTF-8 / token)
+
+    Tính theo byte thay vì ký tự: tiếng Việt có dấu tốn nhiều token hơn ASCII.
+    """
+    return max(1, len(text.encode("utf-8")) // 4) if text else 0
+
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    """Cắt text (theo dòng) cho vừa max_tokens; giữ phần đầu"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    marker_tokens = estimate_tokens(TRUNCATED_MARKER) + 1
+    kept: List[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost + marker_tokens > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        # 1 dòng dài (VD: summary): cắt theo byte
+        max_bytes = max(0, (max_tokens - marker_tokens) * 4)
+        kept.append(text.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore"))
+    kept.append(TRUNCATED_MARKER)
+    return "\n".join(kept)
+
+
+class ContextAssembler:
+    """
+    Ghép nhiều section context trong 1 token budget
+
+    Mỗi section có header + danh sách item đã xếp theo độ ưu tiên.
+    Section priority cao được điền trước; item không vừa thì bỏ
+    (item cuối cùng được cắt bớt nếu bật allow_partial). Output giữ
+    thứ tự section như lúc add (prompt ổn định giữa các lượt).
+    """
+
+    def __init__(self, token_budget: int = MEMORY_CONTEXT_TOKENS):
+        self.token_budget = token_budget
+        self._sections: List[Dict[str, Any]] = []
+        self.used_tokens = 0
+        self.dropped_items = 0
+
+    def add_section(
+        self,
+        header: str,
+        items: List[str],
+        priority: int = 5,
+        reverse_output: bool = False,
+        allow_partial: bool = False,
+        empty_text: Optional[str] = None
+    ):
+        """
+        Thêm section
+
+        Args:
+            header: VD "=== HỘI THOẠI GẦN ĐÂY ==="
+            items: item theo thứ tự ưu tiên (quan trọng nhất trước)
+            priority: 1-10 (10 = điền trước)
+            reverse_output: in item theo thứ tự ngược (VD: short-term chọn mới nhất, in theo thời gian)
+            allow_partial: cho phép cắt item không vừa thay vì bỏ
+            empty_text: text khi không có item nào (chỉ in nếu còn budget)
+        """
+        self._sections.append({
+            "header": header,
+            "items": [item for item in items if item],
+            "priority": priority,
+            "reverse_output": reverse_output,
+            "allow_partial": allow_partial,
+            "empty_text": empty_text,
+            "selected": [],
+        })
+
+    def build(self) -> str:
+        """Điền budget theo priority rồi render theo thứ tự add"""
+        remaining = self.token_budget
+        self.dropped_items = 0
+
+        for section in sorted(self._sections, key=lambda s: -s["priority"]):
+            section["selected"] = []
+            items = section["items"] or ([section["empty_text"]] if section["empty_text"] else [])
+            if not items:
+                continue
+            header_cost = estimate_tokens(section["header"]) + 2
+            if header_cost >= remaining:
+                self.dropped_items += len(section["items"])
+                continue
+            budget = remaining - header_cost
+            for i, item in enumerate(items):
+                cost = estimate_tokens(item) + 1
+                if cost <= budget:
+                    section["selected"].append(item)
+                    budget -= cost
+                elif section["allow_partial"] and budget > 16:
+                    section["selected"].append(clip_to_tokens(item, budget - 1))
+                    budget = 0
+                else:
+                    self.dropped_items += len(section["items"]) - i
+                    break
+            if section["selected"]:
+                remaining = budget
+
+        parts = []
+        for section in self._sections:
+            selected = section["selected"]
+            if not selected:
+                continue
+            if section["reverse_output"]:
+                selected = list(reversed(selected))
+            parts.append(section["header"] + "\n" + "\n".join(selected) + "\n")
+
+        self.used_tokens = self.token_budget - remaining
+        return "\n".join(parts)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "token_budget": self.token_budget,
+            "used_tokens": self.used_tokens,
+            "dropped_items": self.dropped_items,
+        }
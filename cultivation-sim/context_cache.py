@@ -0,0 +1,199 @@
+"""
+Context Cache - Gemini cached content cho phần prompt cố định
+System instruction (master.md + World Bible) và hướng dẫn lượt chơi (ví dụ, JSON format)
+gửi 1 lần lên provider; mỗi lượt chỉ gửi phần context thay đổi.
+
+Modes (GEMINI_CONTEXT_CACHE):
+- off: gửi full prompt mỗi lượt (mặc định)
+- gemini: google.generativeai caching.CachedContent (tự tạo lại khi sắp hết TTL)
+- stub: local stand-in, không gọi caching API; ghép prefix vào prompt của model gốc
+  và giả lập usage_metadata (cached vs fresh tokens) - dùng cho test / benchmark
+"""
+
+import os
+import time
+import datetime
+import threading
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+from context_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_MODE = os.getenv("GEMINI_CONTEXT_CACHE", "off").lower()
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))  # seconds
+_REFRESH_MARGIN = 60  # Tạo lại cache trước khi hết hạn (seconds)
+
+
+def token_usage(response: Any, prompt: str = "", output_text: str = "") -> Dict[str, Any]:
+    """
+    Token usage của 1 lượt: cached (prefix) vs fresh (phần gửi mới) + output
+
+    Đọc usage_metadata của response nếu có, không thì ước lượng từ độ dài text.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    if not prompt_tokens:
+        fresh = estimate_tokens(prompt)
+        return {
+            "cached_tokens": 0,
+            "fresh_tokens": fresh,
+            "output_tokens": estimate_tokens(output_text),
+            "total_input_tokens": fresh,
+            "estimated": True
+        }
+
+    cached = getattr(usage, "cached_content_token_count", 0) or 0
+    return {
+        "cached_tokens": cached,
+        "fresh_tokens": prompt_tokens - cached,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "total_input_tokens": prompt_tokens,
+        "estimated": False
+    }
+
+
+class _StubUsage:
+    def __init__(self, cached: int, fresh: int, output: int):
+        self.prompt_token_count = cached + fresh
+        self.cached_content_token_count = cached
+        self.candidates_token_count = output
+
+
+class _StubResponse:
+    def __init__(self, text: str, usage: _StubUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class _StubStream:
+    """Stream wrapper: usage_metadata có sau khi iterate xong (giống Gemini)"""
+
+    def __init__(self, chunks, cached: int, fresh: int):
+        self._chunks = chunks
+        self._cached = cached
+        self._fresh = fresh
+        self.usage_metadata = None
+
+    def __iter__(self) -> Iterator[Any]:
+        output = []
+        for chunk in self._chunks:
+            try:
+                output.append(chunk.text)
+            except ValueError:
+                pass
+            yield chunk
+        self.usage_metadata = _StubUsage(self._cached, self._fresh, estimate_tokens("".join(output)))
+
+
+class StubCachedModel:
+    """
+    Local stand-in cho model dùng cached content
+
+    Model gốc vẫn nhận prefix + prompt (kết quả giống mode off), nhưng usage
+    được tính như provider: prefix = cached tokens, prompt lượt = fresh tokens.
+    """
+
+    def __init__(self, model: Any, stable_prefix: str, system_instruction: str = ""):
+        self.model = model
+        self.stable_prefix = stable_prefix
+        self.cached_tokens = estimate_tokens(system_instruction) + estimate_tokens(stable_prefix)
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        fresh = estimate_tokens(prompt)
+        response = self.model.generate_content(self.stable_prefix + prompt, stream=stream, **kwargs)
+        if stream:
+            return _StubStream(response, self.cached_tokens, fresh)
+        return _StubResponse(response.text, _StubUsage(self.cached_tokens, fresh, estimate_tokens(response.text)))
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        fresh = estimate_tokens(prompt)
+        response = await self.model.generate_content_async(self.stable_prefix + prompt, **kwargs)
+        return _StubResponse(response.text, _StubUsage(self.cached_tokens, fresh, estimate_tokens(response.text)))
+
+
+class GeminiCachedModel:
+    """
+    GenerativeModel trên CachedContent (system instruction + stable prefix)
+
+    CachedContent có TTL phía provider: tự tạo lại khi gần hết hạn.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        system_instruction: str,
+        stable_prefix: str,
+        model_kwargs: Dict[str, Any],
+        ttl_seconds: int = CONTEXT_CACHE_TTL
+    ):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.system_instruction = system_instruction
+        self.stable_prefix = stable_prefix
+        self.model_kwargs = model_kwargs
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._model = None
+        self._cached_content = None
+        self._expires_at = 0.0
+        self._refresh()
+
+    def _refresh(self):
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        if self._cached_content is not None:
+            try:
+                self._cached_content.delete()
+            except Exception as e:
+                logger.debug(f"Could not delete old cached content: {e}")
+
+        self._cached_content = caching.CachedContent.create(
+            model=self.model_name,
+            display_name="cultivation-stable-prefix",
+            system_instruction=self.system_instruction,
+            contents=[{"role": "user", "parts": [self.stable_prefix]}],
+            ttl=datetime.timedelta(seconds=self.ttl_seconds)
+        )
+        self._model = genai.GenerativeModel.from_cached_content(
+            cached_content=self._cached_content, **self.model_kwargs
+        )
+        self._expires_at = time.monotonic() + self.ttl_seconds - _REFRESH_MARGIN
+        logger.info(f"✅ Gemini cached content ready: {self._cached_content.name}")
+
+    def _current_model(self):
+        if time.monotonic() >= self._expires_at:
+            with self._lock:
+                if time.monotonic() >= self._expires_at:
+                    self._refresh()
+        return self._model
+
+    def generate_content(self, prompt: str, **kwargs):
+        return self._current_model().generate_content(prompt, **kwargs)
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        return await self._current_model().generate_content_async(prompt, **kwargs)
+
+
+def create_prefix_cached_model(
+    mode: str,
+    base_model: Any,
+    model_name: str,
+    system_instruction: str,
+    stable_prefix: str,
+    model_kwargs: Dict[str, Any]
+) -> Optional[Any]:
+    """
+    Build model cho mode cached-prefix; None nếu mode off hoặc tạo cache thất bại
+    (VD: prefix ngắn hơn minimum token của provider) - agent dùng full prompt như cũ
+    """
+    if mode == "stub":
+        return StubCachedModel(base_model, stable_prefix, system_instruction)
+    if mode != "gemini":
+        return None
+    try:
+        return GeminiCachedModel(model_name, system_instruction, stable_prefix, model_kwargs)
+    except Exception as e:
+        logger.warning(f"⚠️ Gemini context caching unavailable, sending full prompts: {str(e)[:200]}")
+        return None
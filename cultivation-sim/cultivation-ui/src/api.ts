@@ -166,6 +166,9 @@ export interface SaveInfo {
 class CultivationAPI {
   // Debug callback
   private debugCallback?: (info: any) => void;
+
+  // Session hiện tại - server giữ nhiều session, mỗi request gửi kèm save_id
+  private saveId?: string;
   
   setDebugCallback(callback: (info: any) => void) {
     this.debugCallback = callback;
@@ -180,10 +183,12 @@ class CultivationAPI {
           this.debugCallback({ type: 'request', data });
         }
         
+        const withSession = this.saveId && data !== undefined && data.save_id === undefined;
         const response = await axios({
           method,
           url: `${API_BASE}${endpoint}`,
-          data,
+          data: withSession ? { ...data, save_id: this.saveId } : data,
+          params: method === 'GET' && this.saveId ? { save_id: this.saveId } : undefined,
           headers: { 'Content-Type': 'application/json' },
           timeout: 30000, // 30 seconds timeout
         });
@@ -245,7 +250,7 @@ class CultivationAPI {
   }
 
   async newGame(playerName: string, characterData: CharacterData) {
-    return this.request<{
+    const result = await this.request<{
       message: string;
       save_id: string;
       narrative: string;
@@ -256,6 +261,8 @@ class CultivationAPI {
       player_name: playerName,
       character_data: characterData,
     });
+    this.saveId = result.save_id;
+    return result;
   }
 
   async sendAction(choice: string): Promise<ActionResponse> {
@@ -277,12 +284,14 @@ class CultivationAPI {
   }
 
   // Save Management
-  async listSaves() {
-    return this.request<{ saves: SaveInfo[] }>('GET', '/saves/list');
+  async listSaves(limit = 50, offset = 0) {
+    return this.request<{ saves: SaveInfo[]; total: number; limit: number; offset: number }>(
+      'GET', `/saves/list?limit=${limit}&offset=${offset}`
+    );
   }
 
   async loadSave(saveId: string) {
-    return this.request<{
+    const result = await this.request<{
       message: string;
       save_id: string;
       narrative: string;
@@ -290,10 +299,16 @@ class CultivationAPI {
       character_name: string;
       game_state: GameState;
     }>('POST', '/saves/load', { save_id: saveId });
+    this.saveId = result.save_id;
+    return result;
   }
 
   async deleteSave(saveId: string) {
-    return this.request<{ message: string }>('DELETE', `/saves/${saveId}`);
+    const result = await this.request<{ message: string }>('DELETE', `/saves/${saveId}`);
+    if (this.saveId === saveId) {
+      this.saveId = undefined;
+    }
+    return result;
   }
 
   // Shop API
@@ -3,25 +3,91 @@ Database for Cultivation Simulator
 Standalone SQLite database
 """
 
+import os
+import sys
+import asyncio
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
+
+# Repo root (engine/) cho Vietnamese tokenizer dùng chung
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from engine.memory.vietnamese_tokenizer import create_vietnamese_fts, fts_row
 
 _db_instances = {}
 
+# Schema đã kiểm / migrate trong process này: db_path -> table -> columns
+# (init_database + PRAGMA table_info chạy 1 lần / file, không phải mỗi lần load)
+_schema_cache: Dict[str, Dict[str, List[str]]] = {}
+
+# Bounded executor cho SQLite work (dùng chung mọi session)
+# Giữ event loop rảnh trong khi turn đang ghi DB
+_db_executor: Optional[ThreadPoolExecutor] = None
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
+
 
 def get_db(db_path: str) -> sqlite3.Connection:
-    """Get database connection (singleton per path)"""
+    """
+    Get database connection (singleton per path)
+    
+    Long-lived, dùng chung cho game state + Memory3Tier. WAL + synchronous=NORMAL:
+    reader không block writer, commit không fsync mỗi lần (vẫn an toàn khi crash app).
+    """
     if db_path not in _db_instances:
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
         conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
         _db_instances[db_path] = conn
     return _db_instances[db_path]
 
 
+def close_db(db_path: str):
+    """Commit + close connection của path (VD: trước khi xóa file save)"""
+    _schema_cache.pop(db_path, None)
+    conn = _db_instances.pop(db_path, None)
+    if conn is not None:
+        try:
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Get shared bounded executor for blocking SQLite work"""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_WORKERS,
+            thread_name_prefix="cultivation-db"
+        )
+    return _db_executor
+
+
+async def run_in_db_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking SQLite work in the bounded DB executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), partial(func, *args, **kwargs))
+
+
+def get_table_columns(db_path: str, table: str) -> List[str]:
+    """Columns của table (cache theo file DB)"""
+    tables = _schema_cache.setdefault(db_path, {})
+    if table not in tables:
+        cursor = get_db(db_path).execute(f"PRAGMA table_info({table})")
+        tables[table] = [row[1] for row in cursor.fetchall()]
+    return tables[table]
+
+
 def init_database(db_path: str):
-    """Initialize database tables"""
+    """Initialize database tables (1 lần / file / process)"""
+    if db_path in _schema_cache:
+        return
     conn = get_db(db_path)
     cursor = conn.cursor()
     
@@ -78,28 +144,20 @@ def init_database(db_path: str):
         )
     """)
     
-    cursor.execute("""
-        CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
-            memory_id UNINDEXED,
-            content,
-            memory_type,
-            tokenize='porter'
-        )
-    """)
-    
-    # Trigger to sync FTS5
-    cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS memory_content_ai 
-        AFTER INSERT ON memory_content
-        BEGIN
-            INSERT INTO memory_fts(memory_id, content, memory_type)
-            VALUES (
-                NEW.memory_id,
-                NEW.content,
-                COALESCE((SELECT memory_type FROM memory_metadata WHERE memory_id = NEW.memory_id), 'episodic')
-            );
-        END;
-    """)
+    # FTS5 Vietnamese-aware (folded terms + bigrams); terms tính bằng Python
+    # nên FTS row được insert bởi CultivationMemory.add, không dùng trigger
+    cursor.execute("DROP TRIGGER IF EXISTS memory_content_ai")
+    if create_vietnamese_fts(cursor, "memory_fts"):
+        cursor.execute("""
+            SELECT c.memory_id, c.content, COALESCE(m.memory_type, 'episodic')
+            FROM memory_content c
+            LEFT JOIN memory_metadata m ON m.memory_id = c.memory_id
+        """)
+        cursor.executemany("""
+            INSERT INTO memory_fts(memory_id, content, memory_type, terms, bigrams)
+            VALUES (?, ?, ?, ?, ?)
+        """, [fts_row(*row) for row in cursor.fetchall()])
     
     conn.commit()
+    _schema_cache.setdefault(db_path, {})
 
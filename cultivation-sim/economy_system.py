@@ -85,26 +85,30 @@ class EconomySystem:
     Dynamic Economy System với dynamic pricing và auctions
     """
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", price_data: Optional[List[Dict[str, Any]]] = None):
         self.data_dir = Path(data_dir)
         self.item_prices: Dict[str, ItemPrice] = {}
         self.active_auctions: Dict[str, VickreyAuction] = {}
         self.economic_cycle: str = "normal"  # normal, prosperity, recession
         self.cycle_start_time: datetime = datetime.now()
-        self.load_prices()
+        self.load_prices(price_data)
     
-    def load_prices(self):
-        """Load item prices from JSON"""
-        prices_file = self.data_dir / "item_prices.json"
-        if prices_file.exists():
-            try:
+    def load_prices(self, price_data: Optional[List[Dict[str, Any]]] = None):
+        """Load item prices from JSON (hoặc từ raw data đã load sẵn trong WorldRegistry)"""
+        try:
+            if price_data is None:
+                prices_file = self.data_dir / "item_prices.json"
+                if not prices_file.exists():
+                    return
                 with open(prices_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for item_data in data:
-                        price = ItemPrice(**item_data)
-                        self.item_prices[price.item_id] = price
-            except Exception as e:
-                print(f"❌ Error loading prices: {e}")
+                    price_data = json.load(f)
+            
+            # ItemPrice giữ stock mutable -> mỗi session 1 bản riêng
+            for item_data in price_data:
+                price = ItemPrice(**item_data)
+                self.item_prices[price.item_id] = price
+        except Exception as e:
+            print(f"❌ Error loading prices: {e}")
     
     def calculate_price(
         self,
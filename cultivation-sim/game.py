@@ -4,8 +4,9 @@ Tu Tiên Life Simulation
 Enhanced với 3-tier Memory, ECS Systems, World Database
 """
 
+import asyncio
 import sqlite3
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Set
 from pathlib import Path
 from datetime import datetime
 import json
@@ -15,36 +16,29 @@ import traceback
 # Setup logging for game module
 logger = logging.getLogger(__name__)
 
-from database import get_db, init_database
+from database import get_db, get_table_columns, init_database, run_in_db_executor
 from agent import CultivationAgent
 from memory_3tier import Memory3Tier
+from summary_worker import get_summary_worker, ROLLING_SUMMARY_AI
+from engine.memory.compaction_worker import get_compaction_scheduler
+from state_store import StateWriter, get_state_flusher
+from save_catalog import get_save_catalog
 from schemas import CharacterData, GameState
 from components import CultivationComponent, ResourceComponent, SpiritBeastComponent, SpiritHerbComponent
 from attributes import AttributesComponent
-from world_database import WorldDatabase
-
-# RAM Optimization (optional, for 32GB RAM systems)
-try:
-    from optimizations import OptimizedCultivationGame
-    HAS_OPTIMIZATIONS = True
-except ImportError:
-    HAS_OPTIMIZATIONS = False
-    OptimizedCultivationGame = None
+from world_registry import WorldRegistry, get_world_registry
 from ecs_systems import CultivationSystem, RelationshipSystem, AIPlannerSystem, NeedsSystem
 from artifact_system import ArtifactSystem
 from item_system import ItemSystem
 from spirit_beast_system import SpiritBeastSystem
 from herb_system import HerbSystem
 from procedural_spawn import ProceduralSpawner
-from skill_system import SkillSystem
 from economy_system import EconomySystem
 from combat_system import CombatSystem
 from breakthrough_enhanced import EnhancedBreakthroughSystem
-from naming_system import NamingSystem
 from social_graph_system import SocialGraphSystem, PersonalityFacets
 from formation_system import FormationSystem, FormationNode, ElementType
 from quest_generator import QuestGenerator
-from physique_system_v2 import PhysiqueSystemV2 as PhysiqueSystem
 
 
 class CultivationSimulator:
@@ -57,7 +51,7 @@ class CultivationSimulator:
     - Attributes System
     """
     
-    def __init__(self, save_id: str):
+    def __init__(self, save_id: str, world: Optional[WorldRegistry] = None):
         self.save_id = save_id
         self.db_path = f"data/saves/{save_id}.db"
         
@@ -65,10 +59,13 @@ class CultivationSimulator:
         init_database(self.db_path)
         self.db = get_db(self.db_path)
         
+        # World data read-only, load 1 lần / process và share by reference
+        self.world = world or get_world_registry()
+        
         # Initialize systems (with error handling)
         try:
             logger.info(f"Initializing CultivationAgent for save_id: {save_id}")
-            self.agent = CultivationAgent()
+            self.agent = CultivationAgent(self.world, save_id=save_id)
             logger.info("CultivationAgent initialized successfully")
         except (ValueError, Exception) as e:
             error_msg = f"Could not initialize CultivationAgent: {str(e)}\n{traceback.format_exc()}"
@@ -77,42 +74,48 @@ class CultivationSimulator:
             print("   Game will continue but AI features may not work.")
             self.agent = None
         
-        self.memory = Memory3Tier(self.db_path, save_id)
+        # Rolling summary chạy nền (không chặn lượt chơi)
+        self.memory = Memory3Tier(
+            self.db_path,
+            save_id,
+            summarizer=self.agent if ROLLING_SUMMARY_AI else None,
+            summary_worker=get_summary_worker(),
+            compaction_scheduler=get_compaction_scheduler()
+        )
         
-        # RAM Optimization (if available) - Initialize BEFORE WorldDatabase
-        if HAS_OPTIMIZATIONS:
-            try:
-                # Use shared optimizations instance (singleton pattern)
-                if not hasattr(CultivationSimulator, '_shared_optimizations'):
-                    logger.info("Initializing RAM optimizations...")
-                    CultivationSimulator._shared_optimizations = OptimizedCultivationGame()
-                    logger.info("RAM optimizations initialized successfully")
-                self.optimizations = CultivationSimulator._shared_optimizations
-                logger.info("Using RAM-optimized database cache")
-            except Exception as e:
-                logger.warning(f"Could not initialize optimizations: {e}. Using standard mode.")
-                self.optimizations = None
-        else:
-            self.optimizations = None
+        # Game state write-behind: _save_state chỉ stage column đã đổi, commit
+        # cùng transaction của memory (StateFlushWorker / evict / shutdown)
+        self._state_writer = StateWriter(
+            self.db,
+            save_id,
+            transaction=self.memory.batch,
+            journal_path=f"{self.db_path}.state-wal",
+            on_flush=lambda columns: get_save_catalog().record(save_id, columns)
+        )
+        self._staged_state: Dict[str, Any] = {}
         
-        # Initialize WorldDatabase WITH optimizations (for RAM cache)
-        self.world_db = WorldDatabase("data", self.optimizations)
+        # Shared (read-only): RAM optimizations cache, WorldDatabase, skills, naming, physiques
+        self.optimizations = self.world.optimizations
+        self.world_db = self.world.world_db
         
         self.artifact_system = ArtifactSystem(self.world_db)
         self.item_system = ItemSystem(self.world_db)
         self.beast_system = SpiritBeastSystem(self.world_db)
         self.herb_system = HerbSystem(self.world_db)
-        self.spawner = ProceduralSpawner(self.world_db, seed=hash(save_id) % (2**31))
+        self.spawner = ProceduralSpawner(
+            self.world_db, seed=hash(save_id) % (2**31), spawn_tables=self.world.spawn_tables
+        )
         
         # Advanced Systems
-        self.skill_system = SkillSystem("data/skills")
-        self.economy_system = EconomySystem("data")
+        self.skill_system = self.world.skill_system
+        self.economy_system = EconomySystem("data", price_data=self.world.item_price_data)  # Stock mutable -> per session
         self.combat_system = CombatSystem()
         self.breakthrough_enhanced = EnhancedBreakthroughSystem()
-        self.naming_system = NamingSystem("data")
+        self.naming_system = self.world.naming_system
         self.social_graph = SocialGraphSystem()
         self.formation_system = FormationSystem()
         self.quest_generator = QuestGenerator(self.agent, self.social_graph)
+        self.physique_system = self.world.physique_system
         
         # Game state
         self.character_age = 0
@@ -126,6 +129,8 @@ class CultivationSimulator:
         self.turn_count = 0
         self.current_location_id: Optional[str] = None
         self.current_sect_id: Optional[str] = None
+        self.character_physique: Optional[str] = None
+        self.physique_level = 1
         
         # Components
         self.cultivation: CultivationComponent = CultivationComponent()
@@ -141,8 +146,14 @@ class CultivationSimulator:
         # Game state dict (for ECS Systems)
         self.game_state: Dict[str, Any] = {}
         
+        # Serialize async turns for this save
+        self._turn_lock = asyncio.Lock()
+        # Lượt stream đang chạy nền (giữ reference tới khi xong, client ngắt vẫn chạy tiếp)
+        self._stream_turns: Set[asyncio.Task] = set()
+        
         # Load from database if exists
         self._load_state()
+        get_state_flusher().register(self._state_writer)
         
         # Initialize ECS Systems
         self._init_ecs_systems()
@@ -198,76 +209,89 @@ class CultivationSimulator:
             "connected_to": []
         }
     
+    # Column game_state <-> field của simulator (JSON columns: component / list)
+    _STATE_SCALARS = ("age", "gender", "talent", "race", "background", "story", "name")
+    _STATE_FIELDS = {
+        "age": "character_age", "gender": "character_gender", "talent": "character_talent",
+        "race": "character_race", "background": "character_background",
+        "story": "character_story", "name": "character_name",
+    }
+    
     def _load_state(self):
-        """Load game state from database"""
-        cursor = self.db.cursor()
-        
-        # Check if attributes_json column exists
-        cursor.execute("PRAGMA table_info(game_state)")
-        columns = [row[1] for row in cursor.fetchall()]
-        has_attributes = 'attributes_json' in columns
-        
-        # Build SELECT query based on available columns
-        if has_attributes:
-            cursor.execute("""
-                SELECT age, gender, talent, race, background, story, name, choices_json, 
-                       cultivation_json, resources_json, attributes_json
-                FROM game_state
-                WHERE save_id = ?
-            """, (self.save_id,))
-        else:
-            cursor.execute("""
-                SELECT age, gender, talent, race, background, story, name, choices_json, 
-                       cultivation_json, resources_json
-                FROM game_state
-                WHERE save_id = ?
-            """, (self.save_id,))
+        """Load game state from database (+ replay state journal nếu lần trước crash trước khi flush)"""
+        # Schema check cache theo file DB (không PRAGMA table_info mỗi lần load)
+        columns = [c for c in get_table_columns(self.db_path, "game_state")
+                   if c in self._STATE_FIELDS or c.endswith("_json")]
         
+        cursor = self.db.cursor()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM game_state WHERE save_id = ?", (self.save_id,))
         row = cursor.fetchone()
         if row:
-            self.character_age = row[0] or 0
-            self.character_gender = row[1]
-            self.character_talent = row[2]
-            self.character_race = row[3]
-            self.character_background = row[4]
-            self.character_story = row[5]
-            self.character_name = row[6]
-            if row[7]:
-                self.current_choices = json.loads(row[7])
-            if row[8]:
-                cultivation_data = json.loads(row[8])
-                self.cultivation = CultivationComponent(**cultivation_data)
-            if row[9]:
-                resources_data = json.loads(row[9])
-                self.resources = ResourceComponent(**resources_data)
-            if has_attributes and row[10]:
-                attributes_data = json.loads(row[10])
-                self.attributes = AttributesComponent(**attributes_data)
+            self._apply_state_columns(dict(zip(columns, row)))
+        
+        recovered = self._state_writer.recover()
+        if recovered:
+            logger.warning(f"Recovering {len(recovered)} unflushed state columns for {self.save_id}")
+            self._apply_state_columns(recovered)
+            self._state_writer.stage(recovered)
+            self._state_writer.flush()
+        
+        # Baseline: _save_state chỉ stage column khác giá trị đã stage / trong DB
+        self._staged_state = {**(dict(zip(columns, row)) if row else {}), **recovered}
+        for component in (self.cultivation, self.resources, self.attributes):
+            if component is not None:
+                component.take_dirty()
+    
+    def _apply_state_columns(self, state: Dict[str, Any]):
+        for column, field in self._STATE_FIELDS.items():
+            if column in state:
+                value = state[column]
+                setattr(self, field, (value or 0) if column == "age" else value)
+        if state.get("choices_json"):
+            self.current_choices = json.loads(state["choices_json"])
+        if state.get("cultivation_json"):
+            self.cultivation = CultivationComponent(**json.loads(state["cultivation_json"]))
+        if state.get("resources_json"):
+            self.resources = ResourceComponent(**json.loads(state["resources_json"]))
+        if state.get("attributes_json"):
+            self.attributes = AttributesComponent(**json.loads(state["attributes_json"]))
     
     def _save_state(self):
-        """Save game state to database"""
-        cursor = self.db.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO game_state 
-            (save_id, age, gender, talent, race, background, story, name, choices_json, 
-             cultivation_json, resources_json, attributes_json, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            self.save_id,
-            self.character_age,
-            self.character_gender,
-            self.character_talent,
-            self.character_race,
-            self.character_background,
-            self.character_story,
-            self.character_name,
-            json.dumps(self.current_choices, ensure_ascii=False),
-            json.dumps(self.cultivation.dict(), ensure_ascii=False) if self.cultivation else None,
-            json.dumps(self.resources.dict(), ensure_ascii=False) if self.resources else None,
-            json.dumps(self.attributes.dict(), ensure_ascii=False) if self.attributes else None,
-            datetime.now().isoformat()
-        ))
-        self.db.commit()
+        """
+        Save game state (write-behind)
+        
+        Chỉ serialize component dirty + column scalar đã đổi và stage vào
+        StateWriter; UPSERT + commit chạy nền (flush_state).
+        """
+        state: Dict[str, Any] = {column: getattr(self, field) for column, field in self._STATE_FIELDS.items()}
+        state["choices_json"] = json.dumps(self.current_choices, ensure_ascii=False)
+        for column, component in (
+            ("cultivation_json", self.cultivation),
+            ("resources_json", self.resources),
+            ("attributes_json", self.attributes),
+        ):
+            if component is None:
+                state[column] = None
+            elif component.take_dirty() or column not in self._staged_state:
+                state[column] = json.dumps(component.dict(), ensure_ascii=False)
+        
+        changed = {
+            column: value for column, value in state.items()
+            if column not in self._staged_state or self._staged_state[column] != value
+        }
+        if changed:
+            self._staged_state.update(changed)
+            self._state_writer.stage(changed)
+    
+    def flush_state(self) -> int:
+        """Stage + ghi ngay state đang dirty (evict session, shutdown)"""
+        self._save_state()
+        return self._state_writer.flush()
+    
+    def discard_state(self):
+        """Bỏ state chưa ghi + journal (save đang bị xoá)"""
+        get_state_flusher().unregister(self._state_writer)
+        self._state_writer.discard()
     
     def _new_game(
         self,
@@ -283,7 +307,7 @@ class CultivationSimulator:
         """
         logger.info(f"Starting new game: player_name={player_name}, gender={gender}, talent={talent}, race={race}, background={background}")
         try:
-            result = self.character_creation(gender, talent, race, background)
+            result = self.character_creation(gender, talent, race, background, physique_id)
             logger.info("New game started successfully")
             return result
         except Exception as e:
@@ -296,7 +320,8 @@ class CultivationSimulator:
         gender: str,
         talent: str,
         race: str,
-        background: str
+        background: str,
+        physique_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Character creation với World Database integration
@@ -490,14 +515,164 @@ class CultivationSimulator:
         logger.info(f"Processing year turn: choice_index={choice_index}, age={self.character_age}")
         
         try:
+            selected_choice, character_data, memory_context, working_memory = self._prepare_year_turn(choice_index)
+            
+            # Call AI
+            try:
+                logger.info(f"Calling AI agent for year turn... Choice: {selected_choice}")
+                
+                response = self.agent.process_turn(
+                    character_data=character_data,
+                    current_choice=choice_index,
+                    memory_context=memory_context,
+                    working_memory=working_memory
+                )
+                
+                logger.info(f"AI agent response received. Narrative: {response.get('narrative', '')[:100]}...")
+                logger.info(f"Response keys: {list(response.keys())}")
+                logger.info(f"Has narrative: {bool(response.get('narrative'))}, Narrative length: {len(response.get('narrative', ''))}")
+            except Exception as e:
+                error_msg = f"Error calling AI agent: {str(e)}\n{traceback.format_exc()}"
+                logger.error(error_msg)
+                raise
+            
+            return self._complete_year_turn(response)
+        except Exception as e:
+            error_msg = f"Failed to process year turn: {str(e)}\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            raise
+    
+    async def process_year_turn_async(self, choice_index: int) -> Dict[str, Any]:
+        """
+        Async version của process_year_turn
+        
+        - SQLite work (memory, save state) chạy trong bounded DB executor
+        - AI call dùng async Gemini client
+        - Turn của cùng một save được serialize bằng _turn_lock
+        """
+        logger.info(f"Processing async year turn: choice_index={choice_index}, age={self.character_age}")
+        
+        async with self._turn_lock:
+            try:
+                selected_choice, character_data, memory_context, working_memory = await run_in_db_executor(
+                    self._prepare_year_turn, choice_index
+                )
+                
+                try:
+                    logger.info(f"Calling async AI agent for year turn... Choice: {selected_choice}")
+                    response = await self.agent.process_turn_async(
+                        character_data=character_data,
+                        current_choice=choice_index,
+                        memory_context=memory_context,
+                        working_memory=working_memory
+                    )
+                    logger.info(f"AI agent response received. Narrative length: {len(response.get('narrative', ''))}")
+                except Exception as e:
+                    error_msg = f"Error calling AI agent: {str(e)}\n{traceback.format_exc()}"
+                    logger.error(error_msg)
+                    raise
+                
+                return await run_in_db_executor(self._complete_year_turn, response)
+            except Exception as e:
+                error_msg = f"Failed to process async year turn: {str(e)}\n{traceback.format_exc()}"
+                logger.error(error_msg)
+                raise
+    
+    async def process_year_turn_stream(self, choice_index: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming version của process_year_turn_async
+        
+        - Lượt chạy trong task riêng (_drive_year_turn_stream), generator chỉ relay event:
+          client ngắt SSE thì lượt vẫn chạy tới _complete_year_turn, save không bị bỏ dở
+        - Task giữ _turn_lock suốt lượt (không xen với /game/action, SessionManager không flush/evict)
+        
+        Yields:
+            {"type": "narrative", "delta": str} - narrative đang được AI sinh
+            {"type": "result", "result": Dict} - kết quả cuối (giống process_year_turn)
+        """
+        logger.info(f"Processing streamed year turn: choice_index={choice_index}, age={self.character_age}")
+        
+        events: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._drive_year_turn_stream(choice_index, events))
+        self._stream_turns.add(task)
+        task.add_done_callback(self._stream_turns.discard)
+        
+        while True:
+            event = await events.get()
+            if event is None:
+                return
+            if event["type"] == "error":
+                raise event["error"]
+            yield event
+    
+    async def _drive_year_turn_stream(self, choice_index: int, events: asyncio.Queue):
+        """
+        Chạy trọn 1 lượt stream dưới _turn_lock: prepare -> AI stream -> complete
+        
+        - SQLite work chạy trong bounded DB executor
+        - Gemini stream (blocking) đọc từng chunk trong thread, không block event loop
+        - Event đẩy vào queue (không chờ consumer); lỗi thành {"type": "error"}, cuối cùng là None
+        """
+        try:
+            async with self._turn_lock:
+                selected_choice, character_data, memory_context, working_memory = await run_in_db_executor(
+                    self._prepare_year_turn, choice_index
+                )
+                
+                logger.info(f"Streaming AI agent for year turn... Choice: {selected_choice}")
+                stream = self.agent.process_turn_stream(
+                    character_data=character_data,
+                    current_choice=choice_index,
+                    memory_context=memory_context,
+                    working_memory=working_memory
+                )
+                response = None
+                pending = None
+                try:
+                    while True:
+                        # shield: task bị cancel (shutdown) thì chunk đang đọc vẫn chạy xong trước stream.close()
+                        pending = asyncio.ensure_future(asyncio.to_thread(next, stream, None))
+                        event = await asyncio.shield(pending)
+                        if event is None:
+                            break
+                        if event["type"] == "result":
+                            response = event["result"]
+                        else:
+                            events.put_nowait(event)
+                finally:
+                    if pending is not None and not pending.done():
+                        await asyncio.wait({pending})
+                    stream.close()
+                
+                if response is None:
+                    raise RuntimeError("AI stream ended without a result")
+                
+                result = await run_in_db_executor(self._complete_year_turn, response)
+                events.put_nowait({"type": "result", "result": result})
+        except Exception as e:
+            error_msg = f"Failed to process streamed year turn: {str(e)}\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            events.put_nowait({"type": "error", "error": e})
+        finally:
+            events.put_nowait(None)
+    
+    def _prepare_year_turn(self, choice_index: int):
+        """
+        Phần trước AI call của một năm: validate choice, update memory, build context
+        
+        Returns:
+            (selected_choice, character_data, memory_context, working_memory)
+        """
+        # Memory writes của phase này: 1 commit
+        with self.memory.batch():
             if choice_index < 0 or choice_index >= len(self.current_choices):
                 error_msg = f"Invalid choice index: {choice_index} (valid range: 0-{len(self.current_choices)-1})"
                 logger.error(error_msg)
                 raise ValueError(error_msg)
-            
+        
             selected_choice = self.current_choices[choice_index]
             logger.info(f"Selected choice: {selected_choice}")
-            
+        
             # Add to memory
             try:
                 self.memory.add_short_term(
@@ -507,7 +682,7 @@ class CultivationSimulator:
             except Exception as e:
                 error_msg = f"Error adding to short-term memory: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             # Update working memory
             try:
                 self.memory.set_working_memory(
@@ -518,7 +693,7 @@ class CultivationSimulator:
             except Exception as e:
                 error_msg = f"Error setting working memory: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             # ECS Systems tick - DISABLED: AI already overrides calculations
             # Removed for performance: AI response contains state_updates that override ECS calculations
             # If needed, can re-enable but currently redundant
@@ -528,11 +703,11 @@ class CultivationSimulator:
             # except Exception as e:
             #     error_msg = f"Error ticking ECS systems: {str(e)}\n{traceback.format_exc()}"
             #     logger.error(error_msg)
-            
+        
             # Progress age
             self.character_age += 1
             logger.info(f"Character age updated to: {self.character_age}")
-            
+        
             # Build character data với World Database context
             try:
                 location_data = self._get_location_data()
@@ -541,10 +716,10 @@ class CultivationSimulator:
                     sect = self.world_db.get_sect(self.current_sect_id)
                     if sect:
                         sect_context = f"Tông môn: {sect['name']} ({sect.get('type', 'Unknown')})"
-                
+            
                 # Get attributes with physique
                 attributes_dict = self._get_attributes_with_physique()
-                
+            
                 character_data = {
                     "age": self.character_age,
                     "gender": self.character_gender,
@@ -567,13 +742,13 @@ class CultivationSimulator:
                 error_msg = f"Error building character data: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
                 raise
-            
+        
             # Check if agent is available
             if not self.agent:
                 error_msg = "CultivationAgent not initialized. Please check GEMINI_API_KEY in .env file."
                 logger.error(error_msg)
                 raise ValueError(error_msg)
-            
+        
             # Get memory context
             try:
                 memory_context = self.memory.get_full_context(query=selected_choice)
@@ -584,43 +759,33 @@ class CultivationSimulator:
                 logger.error(error_msg)
                 memory_context = ""
                 working_memory = ""
-            
-            # Call AI
-            try:
-                logger.info(f"Calling AI agent for year turn... Choice: {selected_choice}")
-                
-                # Store debug info
-                self._last_ai_debug_info = {
-                    "choice": selected_choice,
-                    "choice_index": choice_index,
-                    "age": self.character_age
-                }
-                
-                response = self.agent.process_turn(
-                    character_data=character_data,
-                    current_choice=choice_index,
-                    memory_context=memory_context,
-                    working_memory=working_memory
-                )
-                
-                # Update debug info with response
-                if hasattr(self.agent, '_last_prompt'):
-                    self._last_ai_debug_info['prompt'] = self.agent._last_prompt
-                if hasattr(self.agent, '_last_ai_response'):
-                    self._last_ai_debug_info['ai_raw_response'] = self.agent._last_ai_response
-                if hasattr(self.agent, '_last_parsed_result'):
-                    self._last_ai_debug_info['parsed_result'] = self.agent._last_parsed_result
-                if hasattr(self.agent, '_last_error'):
-                    self._last_ai_debug_info['error'] = self.agent._last_error
-                
-                logger.info(f"AI agent response received. Narrative: {response.get('narrative', '')[:100]}...")
-                logger.info(f"Response keys: {list(response.keys())}")
-                logger.info(f"Has narrative: {bool(response.get('narrative'))}, Narrative length: {len(response.get('narrative', ''))}")
-            except Exception as e:
-                error_msg = f"Error calling AI agent: {str(e)}\n{traceback.format_exc()}"
-                logger.error(error_msg)
-                raise
-            
+        
+            # Store debug info
+            self._last_ai_debug_info = {
+                "choice": selected_choice,
+                "choice_index": choice_index,
+                "age": self.character_age,
+                "memory_context": dict(getattr(self.memory, "last_context_stats", {}))
+            }
+        
+            return selected_choice, character_data, memory_context, working_memory
+    
+    def _complete_year_turn(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Phần sau AI call của một năm: apply state updates, memory, save"""
+        # Memory writes + _save_state: 1 commit
+        with self.memory.batch():
+            # Update debug info with response
+            if hasattr(self.agent, '_last_prompt'):
+                self._last_ai_debug_info['prompt'] = self.agent._last_prompt
+            if hasattr(self.agent, '_last_ai_response'):
+                self._last_ai_debug_info['ai_raw_response'] = self.agent._last_ai_response
+            if hasattr(self.agent, '_last_parsed_result'):
+                self._last_ai_debug_info['parsed_result'] = self.agent._last_parsed_result
+            if hasattr(self.agent, '_last_error'):
+                self._last_ai_debug_info['error'] = self.agent._last_error
+            if hasattr(self.agent, '_last_token_usage'):
+                self._last_ai_debug_info['token_usage'] = self.agent._last_token_usage
+        
             # Add AI response to memory
             try:
                 self.memory.add_short_term(
@@ -630,7 +795,7 @@ class CultivationSimulator:
             except Exception as e:
                 error_msg = f"Error adding AI response to memory: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             # Update game state
             try:
                 self._apply_state_updates(response.get("state_updates", {}))
@@ -638,18 +803,18 @@ class CultivationSimulator:
             except Exception as e:
                 error_msg = f"Error applying state updates: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             # Update choices
             self.current_choices = response.get("choices", [])
             logger.info(f"Choices updated: {len(self.current_choices)} choices available")
-            
+        
             # Complete working memory
             try:
                 self.memory.complete_working_memory("year_progress")
             except Exception as e:
                 error_msg = f"Error completing working memory: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             # Save state
             try:
                 self._save_state()
@@ -657,17 +822,13 @@ class CultivationSimulator:
             except Exception as e:
                 error_msg = f"Error saving game state: {str(e)}\n{traceback.format_exc()}"
                 logger.error(error_msg)
-            
+        
             logger.info(f"Year turn processed successfully: age={self.character_age}")
             return {
                 "narrative": response.get("narrative", ""),
                 "choices": self.current_choices,
                 "age": self.character_age
             }
-        except Exception as e:
-            error_msg = f"Failed to process year turn: {str(e)}\n{traceback.format_exc()}"
-            logger.error(error_msg)
-            raise
     
     def _tick_ecs_systems(self):
         """Tick all ECS Systems"""
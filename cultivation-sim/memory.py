@@ -15,7 +15,7 @@ try:
     import sys
     from pathlib import Path
     sys.path.insert(0, str(Path(__file__).parent.parent))
-    from engine.memory.vietnamese_tokenizer import tokenize_vietnamese
+    from engine.memory.vietnamese_tokenizer import tokenize_vietnamese, build_fts_query, fts_row
     HAS_VIETNAMESE_TOKENIZER = True
 except ImportError:
     HAS_VIETNAMESE_TOKENIZER = False
@@ -60,7 +60,12 @@ class CultivationMemory:
                 VALUES (?, ?, ?, ?, ?)
             """, (memory_id, self.save_id, memory_type, importance, None))
             
-            # FTS5 will be synced by trigger
+            # FTS5 row (folded terms + bigrams, xem database.init_database)
+            cursor.execute("""
+                INSERT INTO memory_fts (memory_id, content, memory_type, terms, bigrams)
+                VALUES (?, ?, ?, ?, ?)
+            """, fts_row(memory_id, content, memory_type))
+            
             self.db.commit()
         except Exception as e:
             self.db.rollback()
@@ -70,8 +75,10 @@ class CultivationMemory:
         """Get relevant context from memory"""
         cursor = self.db.cursor()
         
-        # Sanitize query for FTS5
-        query_safe = query.replace('"', '""')
+        # Free text -> OR của term đã bỏ dấu (an toàn cho FTS5 syntax)
+        query_safe = build_fts_query(query)
+        if not query_safe:
+            return ""
         
         # Search with BM25 ranking
         cursor.execute("""
@@ -84,7 +91,7 @@ class CultivationMemory:
             JOIN memory_metadata md ON m.memory_id = md.memory_id
             WHERE md.save_id = ?
             AND memory_fts MATCH ?
-            ORDER BY bm25(memory_fts) DESC, md.importance DESC
+            ORDER BY rank, md.importance DESC
             LIMIT ?
         """, (self.save_id, query_safe, n_results))
         
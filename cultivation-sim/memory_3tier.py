@@ -3,14 +3,46 @@
 Dựa trên báo cáo kỹ thuật: Short-term, Working, Long-term Memory
 """
 
-import sqlite3
+import os
+import sys
 import json
+import time
 import uuid
-from typing import Dict, List, Optional, Any
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from pathlib import Path
 from enum import Enum
 
+# Repo root (engine/) cho Vietnamese tokenizer dùng chung
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from engine.memory.vietnamese_tokenizer import (
+    query_terms, plan_fts_query, create_vietnamese_fts, fts_row
+)
+from engine.memory.local_vectors import HAS_NUMPY, LocalVectorIndex, reciprocal_rank_fusion
+from engine.memory.compaction_worker import COMPACTION_BATCH_SIZE, CompactionTables, MemoryCompactor
+
+from database import get_db
+from context_budget import ContextAssembler, MEMORY_CONTEXT_TOKENS
+
+# Hybrid search (BM25 + local embedding, RRF): tắt mặc định vì matrix nằm trong RAM mỗi session
+MEMORY_VECTOR_INDEX = os.getenv("MEMORY_VECTOR_INDEX", "0") == "1"
+# Giới hạn long-term memory / save cho compaction (0 = không evict, chỉ merge near-duplicate)
+MEMORY_MAX_LONG_TERM = int(os.getenv("MEMORY_MAX_LONG_TERM", "0"))
+
+LONG_TERM_TABLES = CompactionTables(
+    metadata="long_term_memory_metadata",
+    fts="long_term_memory_fts",
+    text_table="long_term_memory_metadata",
+    prefix="long_term_memory"
+)
+
 
 class MemoryTier(str, Enum):
     """3-tier memory system"""
@@ -19,6 +51,15 @@ class MemoryTier(str, Enum):
     LONG_TERM = "long_term"  # Vector DB + Rolling Summary
 
 
+def _locked(method):
+    """Serialize truy cập connection dùng chung (executor threads + request handlers)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class Memory3Tier:
     """
     3-Tier Memory Architecture
@@ -26,23 +67,69 @@ class Memory3Tier:
     Short-term: RAM (in-memory list, 10-20 conversations)
     Working: SQLite table (current task, goal)
     Long-term: SQLite FTS5 + Rolling Summary
+    
+    Dùng connection long-lived của database.get_db (WAL, statement cache),
+    không connect/close mỗi lần gọi. Trong `with memory.batch():` các write
+    chỉ commit 1 lần khi ra khỏi block (1 commit / phase của turn).
     """
     
-    def __init__(self, db_path: str, save_id: str):
+    def __init__(
+        self,
+        db_path: str,
+        save_id: str,
+        summarizer: Any = None,
+        summary_worker: Any = None,
+        compaction_scheduler: Any = None
+    ):
         self.db_path = db_path
         self.save_id = save_id
         
-        # Short-term: In-memory list (10-20 conversations)
-        self.short_term_memory: List[Dict[str, Any]] = []
+        # Rolling summary nền: overflow của short-term xếp hàng, worker tóm tắt
+        # (summarizer.create_summary nếu có, không thì extractive)
+        self.summarizer = summarizer
+        self.summary_worker = summary_worker
+        self._summary_queue: List[Dict[str, Any]] = []
+        self._latest_summary: Optional[Dict[str, Any]] = None
+        
+        # Shared connection (cùng connection với game state)
+        self.conn = get_db(db_path)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        
+        # memory_id -> (access count chưa ghi, last_accessed)
+        self._pending_access: Dict[str, Tuple[int, str]] = {}
+        
+        # Document frequency cache cho query planner (ước lượng, reset khi index tăng ~10%)
+        self._term_df: Dict[Tuple[str, str], int] = {}
+        self._df_doc_count = 0
+        self._fts_inserts = 0
+        
+        # Short-term: deque trong RAM (10-20 conversations), write-behind vào bảng
+        # short_term_memory; restore lần đầu truy cập (load save / restart server)
+        self._short_term: Optional[Deque[Dict[str, Any]]] = None
         self.max_short_term = 20
+        self._short_term_unsaved: List[Dict[str, Any]] = []
+        self._short_term_cleared = False
+        self._rollover_pending: List[Dict[str, Any]] = []
+        
+        # Token budget stats của lần get_full_context gần nhất (debug)
+        self.last_context_stats: Dict[str, int] = {}
+        
+        # Vector index (MEMORY_VECTOR_INDEX=1, cần numpy)
+        self.vector_index: Optional[LocalVectorIndex] = None
+        self._compactor: Optional[MemoryCompactor] = None
         
         # Initialize database
         self._init_tables()
+        
+        # Compaction nền (merge near-duplicate, evict vượt MEMORY_MAX_LONG_TERM)
+        if compaction_scheduler is not None:
+            compaction_scheduler.register(self)
     
+    @_locked
     def _init_tables(self):
         """Initialize SQLite tables for Working and Long-term memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         # Working Memory table (current task/goal)
         cursor.execute("""
@@ -74,14 +161,18 @@ class Memory3Tier:
             )
         """)
         
-        # FTS5 virtual table for full-text search
+        # FTS5 virtual table for full-text search (Vietnamese-aware: folded terms + bigrams)
+        # Save cũ (tokenize='porter') được index lại từ metadata table
+        cursor.execute("DROP TRIGGER IF EXISTS long_term_memory_fts_insert")
+        if create_vietnamese_fts(cursor, "long_term_memory_fts"):
+            cursor.execute("SELECT memory_id, content, memory_type FROM long_term_memory_metadata")
+            cursor.executemany("""
+                INSERT INTO long_term_memory_fts(memory_id, content, memory_type, terms, bigrams)
+                VALUES (?, ?, ?, ?, ?)
+            """, [fts_row(*row) for row in cursor.fetchall()])
         cursor.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS long_term_memory_fts USING fts5(
-                memory_id UNINDEXED,
-                content,
-                memory_type,
-                tokenize='porter'
-            )
+            CREATE VIRTUAL TABLE IF NOT EXISTS long_term_memory_vocab
+            USING fts5vocab(long_term_memory_fts, 'col')
         """)
         
         # Rolling Summary table
@@ -96,25 +187,107 @@ class Memory3Tier:
             )
         """)
         
-        # Trigger to sync FTS5
+        # Short-term buffer (persist để load game không mất hội thoại gần nhất)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS short_term_memory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                save_id TEXT NOT NULL,
+                speaker TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                metadata_json TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_short_term_save
+            ON short_term_memory(save_id, id)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_working_memory_active
+            ON working_memory(save_id, completed, task_type)
+        """)
         cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS long_term_memory_fts_insert
-            AFTER INSERT ON long_term_memory_metadata
-            BEGIN
-                INSERT INTO long_term_memory_fts(memory_id, content, memory_type)
-                VALUES (NEW.memory_id, NEW.content, NEW.memory_type);
-            END
+            CREATE INDEX IF NOT EXISTS idx_rolling_summary_save
+            ON rolling_summary(save_id, created_at)
         """)
         
-        conn.commit()
-        conn.close()
+        if MEMORY_VECTOR_INDEX and HAS_NUMPY:
+            self.vector_index = LocalVectorIndex(self.conn, "long_term_memory_vectors")
+            # Save cũ / vừa bật index: embed memory chưa có vector
+            cursor.execute("""
+                SELECT ltm.memory_id, ltm.content FROM long_term_memory_metadata ltm
+                LEFT JOIN long_term_memory_vectors v ON v.memory_id = ltm.memory_id
+                WHERE ltm.save_id = ? AND v.memory_id IS NULL
+            """, (self.save_id,))
+            self.vector_index.backfill(cursor.fetchall())
+        
+        self._commit()
+    
+    # --- TRANSACTIONS ---
     
-    # --- SHORT-TERM MEMORY (In-memory) ---
+    @contextmanager
+    def batch(self):
+        """Gom mọi write trong block vào 1 commit (lồng nhau được)"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush_pending_writes()
+                    if self.conn.in_transaction:
+                        self.conn.commit()
+    
+    def _commit(self):
+        if self._batch_depth == 0:
+            self.flush_pending_writes()
+            self.conn.commit()
+    
+    @_locked
+    def flush_pending_writes(self):
+        """
+        Ghi các write đang chờ (không commit): short-term buffer, rollover, access count
+        
+        Tự gọi khi commit (cuối batch của turn, write thường, flush game state).
+        """
+        self._flush_short_term()
+        self.flush_access_counts()
+    
+    # --- SHORT-TERM MEMORY (In-memory, write-behind) ---
+    
+    @property
+    def short_term_memory(self) -> Deque[Dict[str, Any]]:
+        """Short-term buffer (restore từ save DB lần đầu truy cập)"""
+        if self._short_term is None:
+            self._short_term = self._load_short_term()
+        return self._short_term
+    
+    @_locked
+    def _load_short_term(self) -> Deque[Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT speaker, content, timestamp, metadata_json
+            FROM short_term_memory
+            WHERE save_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (self.save_id, self.max_short_term))
+        entries = deque()
+        for row in cursor.fetchall():
+            entries.appendleft({
+                "content": row[1],
+                "speaker": row[0],
+                "timestamp": row[2],
+                "metadata": json.loads(row[3]) if row[3] else {}
+            })
+        return entries
     
     def add_short_term(self, content: str, speaker: str = "player", metadata: Optional[Dict] = None):
         """
-        Thêm vào short-term memory (RAM)
-        Tự động rollover khi vượt quá max_short_term
+        Thêm vào short-term memory (RAM, ghi DB ở lần commit kế tiếp)
+        Tự động rollover khi vượt quá max_short_term (ghi long-term theo batch)
         """
         entry = {
             "content": content,
@@ -123,16 +296,21 @@ class Memory3Tier:
             "metadata": metadata or {}
         }
         
-        self.short_term_memory.append(entry)
+        with self._lock:
+            self.short_term_memory.append(entry)
+            self._short_term_unsaved.append(entry)
+            
+            # Rollover: Nếu vượt quá max, chuyển oldest vào long-term
+            while len(self.short_term_memory) > self.max_short_term:
+                self._rollover_to_long_term(self.short_term_memory.popleft())
         
-        # Rollover: Nếu vượt quá max, chuyển oldest vào long-term
-        if len(self.short_term_memory) > self.max_short_term:
-            oldest = self.short_term_memory.pop(0)
-            self._rollover_to_long_term(oldest)
+        if self.summary_worker is not None:
+            self.summary_worker.submit(self, self.summarizer)
     
     def get_short_term(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent short-term memories"""
-        return self.short_term_memory[-limit:]
+        entries = self.short_term_memory
+        return list(islice(entries, max(0, len(entries) - limit), None))
     
     def get_short_term_context(self) -> str:
         """Get short-term memory as context string for AI"""
@@ -146,8 +324,39 @@ class Memory3Tier:
         
         return "\n".join(context_parts)
     
+    def _flush_short_term(self):
+        """Write-behind: clear/insert buffer, trim bảng về max_short_term, rollover batch"""
+        if self._rollover_pending:
+            pending, self._rollover_pending = self._rollover_pending, []
+            self._insert_long_term(pending)
+        
+        if not self._short_term_cleared and not self._short_term_unsaved:
+            return
+        cursor = self.conn.cursor()
+        if self._short_term_cleared:
+            cursor.execute("DELETE FROM short_term_memory WHERE save_id = ?", (self.save_id,))
+            self._short_term_cleared = False
+        if self._short_term_unsaved:
+            unsaved, self._short_term_unsaved = self._short_term_unsaved, []
+            cursor.executemany("""
+                INSERT INTO short_term_memory (save_id, speaker, content, timestamp, metadata_json)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (self.save_id, e["speaker"], e["content"], e["timestamp"],
+                 json.dumps(e["metadata"], ensure_ascii=False) if e["metadata"] else None)
+                for e in unsaved
+            ])
+            cursor.execute("""
+                DELETE FROM short_term_memory
+                WHERE save_id = ? AND id < (
+                    SELECT id FROM short_term_memory WHERE save_id = ?
+                    ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            """, (self.save_id, self.save_id, self.max_short_term - 1))
+    
     # --- WORKING MEMORY (SQLite) ---
     
+    @_locked
     def set_working_memory(
         self,
         task_type: str,
@@ -162,8 +371,7 @@ class Memory3Tier:
             task_data: Task details
             priority: 1-10 (10 = highest)
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         # Mark old tasks as completed
         cursor.execute("""
@@ -178,13 +386,12 @@ class Memory3Tier:
             VALUES (?, ?, ?, ?)
         """, (self.save_id, task_type, json.dumps(task_data, ensure_ascii=False), priority))
         
-        conn.commit()
-        conn.close()
+        self._commit()
     
+    @_locked
     def get_working_memory(self, task_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get current working memory (active tasks)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         if task_type:
             cursor.execute("""
@@ -211,13 +418,12 @@ class Memory3Tier:
                 "created_at": row[3]
             })
         
-        conn.close()
         return results
     
+    @_locked
     def complete_working_memory(self, task_type: str):
         """Mark working memory task as completed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         cursor.execute("""
             UPDATE working_memory
@@ -225,8 +431,7 @@ class Memory3Tier:
             WHERE save_id = ? AND task_type = ? AND completed = FALSE
         """, (self.save_id, task_type))
         
-        conn.commit()
-        conn.close()
+        self._commit()
     
     def get_working_memory_context(self) -> str:
         """Get working memory as context string for AI"""
@@ -246,6 +451,7 @@ class Memory3Tier:
     
     # --- LONG-TERM MEMORY (SQLite FTS5) ---
     
+    @_locked
     def add_long_term(
         self,
         content: str,
@@ -259,31 +465,51 @@ class Memory3Tier:
         Returns:
             memory_id
         """
-        memory_id = f"{self.save_id}_{uuid.uuid4().hex}"
+        memory_id = self._insert_long_term([{
+            "content": content,
+            "memory_type": memory_type,
+            "importance": importance,
+            "metadata": metadata
+        }])[0]
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._commit()
         
-        cursor.execute("""
+        return memory_id
+    
+    def _insert_long_term(self, entries: List[Dict[str, Any]]) -> List[str]:
+        """Insert metadata + FTS5 rows bằng executemany (không commit)"""
+        rows = []
+        for entry in entries:
+            metadata = entry.get("metadata")
+            rows.append((
+                f"{self.save_id}_{uuid.uuid4().hex}",
+                self.save_id,
+                entry["content"],
+                entry.get("memory_type", "episodic"),
+                entry.get("importance", 0.5),
+                json.dumps(metadata, ensure_ascii=False) if metadata else None
+            ))
+        
+        cursor = self.conn.cursor()
+        cursor.executemany("""
             INSERT INTO long_term_memory_metadata 
             (memory_id, save_id, content, memory_type, importance, metadata_json)
             VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            memory_id,
-            self.save_id,
-            content,
-            memory_type,
-            importance,
-            json.dumps(metadata or {}, ensure_ascii=False) if metadata else None
-        ))
+        """, rows)
         
-        # Trigger sẽ tự động insert vào FTS5
+        # FTS5 row (terms/bigrams tính bằng Python nên không dùng trigger)
+        cursor.executemany("""
+            INSERT INTO long_term_memory_fts(memory_id, content, memory_type, terms, bigrams)
+            VALUES (?, ?, ?, ?, ?)
+        """, [fts_row(row[0], row[2], row[3]) for row in rows])
+        self._fts_inserts += len(rows)
         
-        conn.commit()
-        conn.close()
+        if self.vector_index is not None:
+            self.vector_index.add([(row[0], row[2]) for row in rows])
         
-        return memory_id
+        return [row[0] for row in rows]
     
+    @_locked
     def search_long_term(
         self,
         query: str,
@@ -293,18 +519,24 @@ class Memory3Tier:
         """
         Search long-term memory using FTS5
         
+        Query free text được viết lại thành OR của bigram/unigram đã bỏ dấu
+        (build_fts_query). Top-k lấy trong FTS (ORDER BY rank) rồi mới join metadata.
+        Có vector index: gộp top BM25 + top cosine bằng reciprocal rank fusion.
+        
         Returns:
             List of memories with relevance scores
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Build query
-        fts_query = f'"{query}"'
-        if memory_type:
-            fts_query += f' AND memory_type:"{memory_type}"'
-        
-        # FTS5 search with BM25 ranking
+        fts_query = self._fts_match_expression(query)
+        if fts_query and memory_type:
+            fts_query = f'({fts_query}) AND memory_type:"{memory_type}"'
+        if self.vector_index is not None:
+            return self._search_hybrid(query, fts_query, limit, memory_type)
+        if not fts_query:
+            return []
+        
+        # FTS5 search with BM25 ranking (rank = bm25 weighted, bigrams x2)
+        # Mỗi save có DB riêng: oversample để lọc save_id + tie-break importance
+        cursor = self.conn.cursor()
         cursor.execute("""
             SELECT 
                 ltm.memory_id,
@@ -312,16 +544,61 @@ class Memory3Tier:
                 ltm.memory_type,
                 ltm.importance,
                 ltm.last_accessed,
-                bm25(long_term_memory_fts) as score
-            FROM long_term_memory_fts
-            JOIN long_term_memory_metadata ltm ON long_term_memory_fts.memory_id = ltm.memory_id
-            WHERE long_term_memory_fts MATCH ? AND ltm.save_id = ?
-            ORDER BY bm25(long_term_memory_fts) ASC, ltm.importance DESC
+                hits.rank as score
+            FROM (
+                SELECT memory_id, rank FROM long_term_memory_fts
+                WHERE long_term_memory_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) AS hits
+            JOIN long_term_memory_metadata ltm ON hits.memory_id = ltm.memory_id
+            WHERE ltm.save_id = ?
+            ORDER BY hits.rank ASC, ltm.importance DESC
             LIMIT ?
-        """, (fts_query, self.save_id, limit))
+        """, (fts_query, limit * 4, self.save_id, limit))
         
+        return self._collect_results(cursor.fetchall())
+    
+    def _search_hybrid(
+        self,
+        query: str,
+        fts_query: str,
+        limit: int,
+        memory_type: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """BM25 top (limit*4) + vector top (limit*4), fuse RRF, rồi mới đọc metadata"""
+        lexical: List[str] = []
+        if fts_query:
+            lexical = [row[0] for row in self.conn.cursor().execute("""
+                SELECT memory_id FROM long_term_memory_fts
+                WHERE long_term_memory_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (fts_query, limit * 4))]
+        semantic = [memory_id for memory_id, _ in self.vector_index.search(query, k=limit * 4)]
+        fused = reciprocal_rank_fusion([lexical, semantic])
+        if not fused:
+            return []
+        
+        sql = f"""
+            SELECT memory_id, content, memory_type, importance, last_accessed
+            FROM long_term_memory_metadata
+            WHERE save_id = ? AND memory_id IN ({",".join("?" * len(fused))})
+        """
+        params: List[Any] = [self.save_id] + [memory_id for memory_id, _ in fused]
+        if memory_type:
+            sql += " AND memory_type = ?"
+            params.append(memory_type)
+        found = {row[0]: tuple(row) for row in self.conn.cursor().execute(sql, params)}
+        
+        # relevance_score âm như bm25 (nhỏ hơn = liên quan hơn)
+        rows = [found[memory_id] + (-score,) for memory_id, score in fused if memory_id in found]
+        return self._collect_results(rows[:limit])
+    
+    def _collect_results(self, rows) -> List[Dict[str, Any]]:
         results = []
-        for row in cursor.fetchall():
+        accessed_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())  # = CURRENT_TIMESTAMP
+        for row in rows:
             results.append({
                 "memory_id": row[0],
                 "content": row[1],
@@ -331,18 +608,83 @@ class Memory3Tier:
                 "relevance_score": row[5]
             })
             
-            # Update access count
-            cursor.execute("""
-                UPDATE long_term_memory_metadata
-                SET last_accessed = CURRENT_TIMESTAMP, access_count = access_count + 1
-                WHERE memory_id = ?
-            """, (row[0],))
-        
-        conn.commit()
-        conn.close()
+            # Access count: gom trong RAM, ghi ở lần commit kế tiếp (read không lấy write lock)
+            count, _ = self._pending_access.get(row[0], (0, None))
+            self._pending_access[row[0]] = (count + 1, accessed_at)
         
         return results
     
+    def _fts_match_expression(self, query: str) -> str:
+        """MATCH expression qua plan_fts_query (save lớn: AND thêm term hiếm)"""
+        terms = query_terms(query)
+        if not terms:
+            return ""
+        return plan_fts_query(terms, self._doc_count(), self._doc_freq)
+    
+    def _doc_count(self) -> int:
+        if not self._df_doc_count or self._fts_inserts > max(1000, self._df_doc_count // 10):
+            self._term_df.clear()
+            self._fts_inserts = 0
+            self._df_doc_count = self.conn.cursor().execute(
+                "SELECT COUNT(*) FROM long_term_memory_metadata"
+            ).fetchone()[0]
+        return self._df_doc_count
+    
+    def _doc_freq(self, term: Tuple[str, str]) -> int:
+        df = self._term_df.get(term)
+        if df is None:
+            column, value = term
+            row = self.conn.cursor().execute(
+                "SELECT doc FROM long_term_memory_vocab WHERE term = ? AND col = ?", (value, column)
+            ).fetchone()
+            df = self._term_df[term] = row[0] if row else 0
+        return df
+    
+    @_locked
+    def flush_access_counts(self) -> int:
+        """
+        Ghi access count / last_accessed đang chờ bằng 1 executemany
+        
+        Tự gọi khi commit (cuối batch của turn, write thường, flush game state).
+        
+        Returns:
+            Số memory được update
+        """
+        if not self._pending_access:
+            return 0
+        pending = self._pending_access
+        self._pending_access = {}
+        self.conn.cursor().executemany("""
+            UPDATE long_term_memory_metadata
+            SET last_accessed = ?, access_count = access_count + ?
+            WHERE memory_id = ?
+        """, [(accessed_at, count, memory_id) for memory_id, (count, accessed_at) in pending.items()])
+        return len(pending)
+    
+    @_locked
+    def compact_step(self, max_rows: int = COMPACTION_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        1 lượt compaction long-term có giới hạn (CompactionScheduler gọi định kỳ)
+        
+        Chờ hết batch của turn (cùng lock), ghi access count trước để thứ tự evict đúng.
+        """
+        if self._compactor is None:
+            extra = (self.vector_index.table,) if self.vector_index is not None else ()
+            self._compactor = MemoryCompactor(
+                self.conn,
+                LONG_TERM_TABLES._replace(extra=extra),
+                self.save_id,
+                max_memories=MEMORY_MAX_LONG_TERM or None,
+                lock=self._lock
+            )
+        self.flush_pending_writes()
+        stats = self._compactor.step(max_rows)
+        if stats["deleted"]:
+            self._fts_inserts += stats["deleted"]  # doc count / df cache của query planner
+            if self.vector_index is not None:
+                self.vector_index.invalidate()
+        return stats
+    
     def get_long_term_context(self, query: str, limit: int = 5) -> str:
         """Get long-term memory as context string for AI"""
         memories = self.search_long_term(query, limit=limit)
@@ -352,12 +694,17 @@ class Memory3Tier:
         
         context_parts = ["Ký ức liên quan:"]
         for mem in memories:
-            context_parts.append(f"- {mem['content']} (Quan trọng: {mem['importance']:.1f})")
+            context_parts.append(self._format_long_term(mem))
         
         return "\n".join(context_parts)
     
+    @staticmethod
+    def _format_long_term(mem: Dict[str, Any]) -> str:
+        return f"- {mem['content']} (Quan trọng: {mem['importance']:.1f})"
+    
     # --- ROLLING SUMMARY ---
     
+    @_locked
     def create_rolling_summary(
         self,
         period_start: datetime,
@@ -369,8 +716,7 @@ class Memory3Tier:
         
         Được gọi khi short-term memory đầy hoặc định kỳ
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         cursor.execute("""
             INSERT INTO rolling_summary (save_id, summary_text, period_start, period_end)
@@ -382,34 +728,36 @@ class Memory3Tier:
             period_end.isoformat()
         ))
         
-        conn.commit()
-        conn.close()
+        self._commit()
+        self._latest_summary = None  # Đọc lại (có created_at) ở lần get kế tiếp
     
+    @_locked
     def get_latest_summary(self) -> Optional[Dict[str, Any]]:
-        """Get latest rolling summary"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Get latest rolling summary (cache RAM, reset khi có summary mới)"""
+        if self._latest_summary is not None:
+            return self._latest_summary
+        
+        cursor = self.conn.cursor()
         
         cursor.execute("""
             SELECT summary_text, period_start, period_end, created_at
             FROM rolling_summary
             WHERE save_id = ?
-            ORDER BY created_at DESC
+            ORDER BY created_at DESC, id DESC
             LIMIT 1
         """, (self.save_id,))
         
         row = cursor.fetchone()
-        conn.close()
         
         if row:
-            return {
+            self._latest_summary = {
                 "summary_text": row[0],
                 "period_start": row[1],
                 "period_end": row[2],
                 "created_at": row[3]
             }
         
-        return None
+        return self._latest_summary
     
     # --- ROLLOVER LOGIC ---
     
@@ -417,6 +765,7 @@ class Memory3Tier:
         """
         Chuyển short-term memory vào long-term khi đầy
         
+        Chỉ xếp hàng; _flush_short_term ghi cả batch bằng 1 executemany.
         Có thể gọi AI để tạo summary trước khi lưu
         """
         content = short_term_entry.get("content", "")
@@ -429,13 +778,30 @@ class Memory3Tier:
         elif any(keyword in content.lower() for keyword in ["đột phá", "cảnh giới", "tông môn"]):
             importance = 0.7
         
-        # Add to long-term
-        self.add_long_term(
-            content=f"{speaker}: {content}",
-            memory_type="episodic",
-            importance=importance,
-            metadata=short_term_entry.get("metadata", {})
-        )
+        self._rollover_pending.append({
+            "content": f"{speaker}: {content}",
+            "memory_type": "episodic",
+            "importance": importance,
+            "metadata": short_term_entry.get("metadata", {})
+        })
+        self._summary_queue.append(short_term_entry)
+    
+    # --- BACKGROUND SUMMARY QUEUE ---
+    
+    @_locked
+    def pending_summary_count(self) -> int:
+        return len(self._summary_queue)
+    
+    @_locked
+    def take_summary_batch(self) -> List[Dict[str, Any]]:
+        """Lấy (và xóa) toàn bộ entry đang chờ tóm tắt"""
+        batch, self._summary_queue = self._summary_queue, []
+        return batch
+    
+    @_locked
+    def requeue_summary_batch(self, batch: List[Dict[str, Any]]):
+        """Trả batch về đầu hàng đợi (summarizer lỗi)"""
+        self._summary_queue = batch + self._summary_queue
     
     def trigger_rolling_summary(self, ai_summarizer=None):
         """
@@ -464,36 +830,64 @@ class Memory3Tier:
         self.create_rolling_summary(period_start, period_end, summary)
         
         # Clear short-term (đã được summarize)
-        self.short_term_memory = []
+        with self._lock:
+            self._short_term = deque()
+            self._short_term_unsaved = []
+            self._short_term_cleared = True
     
     # --- COMPREHENSIVE CONTEXT ---
     
-    def get_full_context(self, query: Optional[str] = None) -> str:
+    def get_full_context(self, query: Optional[str] = None, token_budget: Optional[int] = None) -> str:
         """
-        Get full context từ cả 3 tiers cho AI prompt
+        Get full context từ cả 3 tiers cho AI prompt, vừa token budget
+        
+        Điền theo ưu tiên: working memory > short-term (mới nhất trước) >
+        long-term (FTS5, relevance cao trước) > rolling summary (cắt bớt nếu thiếu chỗ).
+        Output giữ thứ tự: tóm tắt, nhiệm vụ, hội thoại, ký ức.
         
         Returns:
             Combined context string
         """
-        context_parts = []
+        assembler = ContextAssembler(token_budget or MEMORY_CONTEXT_TOKENS)
         
         # 1. Latest summary
         summary = self.get_latest_summary()
-        if summary:
-            context_parts.append(f"=== TÓM TẮT GẦN ĐÂY ===\n{summary['summary_text']}\n")
+        assembler.add_section(
+            "=== TÓM TẮT GẦN ĐÂY ===",
+            [summary["summary_text"]] if summary else [],
+            priority=2,
+            allow_partial=True
+        )
         
         # 2. Working memory
-        working = self.get_working_memory_context()
-        context_parts.append(f"=== NHIỆM VỤ HIỆN TẠI ===\n{working}\n")
+        tasks = self.get_working_memory()
+        assembler.add_section(
+            "=== NHIỆM VỤ HIỆN TẠI ===",
+            [f"- {t['task_type']} (Ưu tiên {t['priority']}): {json.dumps(t['task_data'], ensure_ascii=False)}"
+             for t in tasks],
+            priority=10,
+            empty_text="Không có nhiệm vụ hiện tại."
+        )
         
-        # 3. Short-term (recent conversations)
-        short_term = self.get_short_term_context()
-        context_parts.append(f"=== HỘI THOẠI GẦN ĐÂY ===\n{short_term}\n")
+        # 3. Short-term (recent conversations): chọn mới nhất trước, in theo thời gian
+        recent = reversed(self.get_short_term(10))
+        assembler.add_section(
+            "=== HỘI THOẠI GẦN ĐÂY ===",
+            [f"{e.get('speaker', 'unknown')}: {e.get('content', '')}" for e in recent],
+            priority=8,
+            reverse_output=True
+        )
         
         # 4. Long-term (relevant memories)
         if query:
-            long_term = self.get_long_term_context(query, limit=5)
-            context_parts.append(f"=== KÝ ỨC LIÊN QUAN ===\n{long_term}\n")
+            memories = self.search_long_term(query, limit=5)
+            assembler.add_section(
+                "=== KÝ ỨC LIÊN QUAN ===",
+                [self._format_long_term(mem) for mem in memories],
+                priority=5,
+                empty_text="Không có ký ức liên quan."
+            )
         
-        return "\n".join(context_parts)
-
+        context = assembler.build()
+        self.last_context_stats = assembler.stats()
+        return context
@@ -7,12 +7,15 @@ RAM Optimization for HP ZBook Studio G7
 Goal: Maximize performance using available RAM
 """
 
+import os
 import json
 import sqlite3
 import pickle
 import hashlib
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from functools import lru_cache
 import time
 
@@ -181,97 +184,322 @@ class InMemoryDatabase:
 
 
 # ============================================
-# 3. AI Response Cache (LRU Cache)
+# 3. AI Response Cache (LRU Cache + SQLite store)
 # ============================================
 
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))  # seconds, 0 = không hết hạn
+AI_CACHE_SEMANTIC = os.getenv("AI_CACHE_SEMANTIC", "0") == "1"  # Cho phép hit theo normalized key (opt-in)
+
+
+def _bucket(value: float, step: float) -> int:
+    """Coarse bucket cho stat (VD: tuổi theo thập kỷ)"""
+    try:
+        return int(float(value) // step)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _log_bucket(value: float) -> int:
+    """Bucket theo bậc lũy thừa 2 (0, 1, 2-3, 4-7, ...) cho stat tăng nhanh"""
+    try:
+        return max(0, int(value)).bit_length()
+    except (TypeError, ValueError):
+        return 0
+
+
+def make_semantic_key(
+    character_data: Dict[str, Any],
+    current_choice: Optional[int] = None,
+    save_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    Normalized cache key: save + lựa chọn + cảnh giới + địa điểm + stat buckets
+
+    Prompt đầy đủ chứa tuổi, tài nguyên, memory context... nên exact key gần như
+    không bao giờ lặp lại. Key này gom các tình huống "giống nhau về mặt game"
+    trong CÙNG 1 save (cache dùng chung cả process, không đưa narrative của save
+    này sang save khác). None nếu không xác định được save / lựa chọn.
+    """
+    choices = character_data.get("choices") or []
+    if not save_id or current_choice is None or not (0 <= current_choice < len(choices)):
+        return None
+
+    cultivation = character_data.get("cultivation") or {}
+    resources = character_data.get("resources") or {}
+    max_power = cultivation.get("max_spiritual_power") or 0
+    power_pct = (cultivation.get("spiritual_power", 0) / max_power * 100) if max_power else 0
+
+    parts = [
+        save_id,
+        " ".join(str(choices[current_choice]).lower().split()),
+        str(cultivation.get("realm", "")),
+        str(cultivation.get("realm_level", "")),
+        str(character_data.get("location_id") or ""),
+        str(character_data.get("sect_id") or ""),
+        f"age{_bucket(character_data.get('age', 0), 10)}",
+        f"sp{_bucket(power_pct, 25)}",
+        f"ss{_log_bucket(resources.get('spirit_stones', 0))}",
+    ]
+    return hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class _CacheEntry:
+    __slots__ = ("response", "semantic_key", "size_bytes", "created_at")
+
+    def __init__(self, response: str, semantic_key: Optional[str], created_at: float):
+        self.response = response
+        self.semantic_key = semantic_key
+        self.size_bytes = len(response.encode("utf-8"))
+        self.created_at = created_at
+
+
 class AIResponseCache:
     """
-    Cache AI responses in RAM with LRU eviction
-    Memory usage: ~2GB for 10,000 responses
-    Speedup: 11 seconds → 0.001ms for cache hits!
+    Cache AI responses: LRU trong RAM + append-only SQLite trên disk
+
+    - Exact key: MD5 của toàn bộ prompt
+    - Semantic key (optional): make_semantic_key() - hit khi tình huống game giống nhau
+    - RAM: OrderedDict LRU, đếm chính xác bytes (UTF-8) của response
+    - Disk: data/ai_cache.db, chỉ INSERT; cache miss trong RAM sẽ tra disk
+      (startup không phải load toàn bộ cache như ai_cache.pkl cũ)
+    - TTL: entry quá AI_CACHE_TTL giây bị bỏ qua (và dọn khỏi disk lúc khởi động)
     """
     
-    def __init__(self, max_size_mb: int = 2000):
-        self.cache = {}
-        self.max_size_mb = max_size_mb
-        self.current_size_mb = 0
+    def __init__(
+        self,
+        max_size_mb: int = 2000,
+        db_path: str = "data/ai_cache.db",
+        ttl_seconds: float = AI_CACHE_TTL,
+        semantic: bool = AI_CACHE_SEMANTIC
+    ):
+        self.cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.semantic_index: Dict[str, str] = {}  # semantic key -> exact key (RAM)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.current_size_bytes = 0
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self._lock = threading.RLock()
+        
+        # Metrics
         self.hits = 0
+        self.semantic_hits = 0
+        self.disk_hits = 0
         self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lookup_time = 0.0
+        self._lookups = 0
         
         print(f"🔄 Initializing AI cache (max {max_size_mb}MB)...")
         
-        # Load from disk if exists
-        cache_file = Path("data/ai_cache.pkl")
-        if cache_file.exists():
-            self._load_cache(cache_file)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._init_store()
+        self._migrate_legacy_pickle(self.db_path.parent / "ai_cache.pkl")
         
-        print(f"✅ AI cache ready! {len(self.cache)} responses cached")
-        print(f"📊 RAM used: {self.current_size_mb:.2f}MB\n")
+        stored = self.conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+        print(f"✅ AI cache ready! {stored} responses on disk (loaded lazily)\n")
+    
+    @property
+    def current_size_mb(self) -> float:
+        return self.current_size_bytes / 1024 / 1024
+    
+    # --- DISK STORE ---
+    
+    def _init_store(self):
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                semantic_key TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_key ON ai_cache(key)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_semantic ON ai_cache(semantic_key)")
+        if self.ttl_seconds > 0:
+            self.conn.execute(
+                "DELETE FROM ai_cache WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+        self.conn.commit()
+    
+    def _migrate_legacy_pickle(self, pickle_file: Path):
+        """Import ai_cache.pkl cũ (1 lần) rồi đổi tên để không load lại"""
+        if not pickle_file.exists():
+            return
+        try:
+            print("  Migrating legacy ai_cache.pkl → ai_cache.db...")
+            with open(pickle_file, 'rb') as f:
+                legacy = pickle.load(f)
+            now = time.time()
+            self.conn.executemany(
+                "INSERT INTO ai_cache (key, semantic_key, response, created_at) VALUES (?, NULL, ?, ?)",
+                [(key, response, now) for key, response in legacy.items() if isinstance(response, str)]
+            )
+            self.conn.commit()
+            pickle_file.rename(pickle_file.with_suffix(".pkl.migrated"))
+            print(f"  ✅ Migrated {len(legacy)} responses")
+        except Exception as e:
+            print(f"  ⚠️  Could not migrate legacy AI cache: {e}")
+    
+    def _load_from_disk(self, column: str, value: str) -> Optional[Tuple[str, _CacheEntry]]:
+        row = self.conn.execute(
+            f"SELECT key, semantic_key, response, created_at FROM ai_cache "
+            f"WHERE {column} = ? ORDER BY id DESC LIMIT 1",
+            (value,)
+        ).fetchone()
+        if not row:
+            return None
+        entry = _CacheEntry(row[2], row[1], row[3])
+        if self._is_expired(entry):
+            return None
+        return row[0], entry
+    
+    # --- LOOKUP ---
     
     def _hash_prompt(self, prompt: str) -> str:
         """Hash prompt for cache key"""
         return hashlib.md5(prompt.encode()).hexdigest()
     
-    def get(self, prompt: str) -> Optional[str]:
-        """Get cached response"""
-        key = self._hash_prompt(prompt)
+    def _is_expired(self, entry: _CacheEntry) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds
+    
+    def get(self, prompt: str, semantic_key: Optional[str] = None) -> Optional[str]:
+        """Get cached response (exact prompt trước, sau đó semantic key)"""
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                key = self._hash_prompt(prompt)
+                response = self._lookup(key)
+                if response is not None:
+                    self.hits += 1
+                    return response
+                
+                if self.semantic and semantic_key:
+                    response = self._lookup_semantic(semantic_key)
+                    if response is not None:
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return response
+                
+                self.misses += 1
+                return None
+        finally:
+            self._lookup_time += time.perf_counter() - start
+            self._lookups += 1
+    
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self.cache.get(key)
+        if entry is not None:
+            if self._is_expired(entry):
+                self.expired += 1
+                self._remove(key)
+                return None
+            self.cache.move_to_end(key)
+            return entry.response
         
-        if key in self.cache:
-            self.hits += 1
-            print(f"✅ Cache HIT! ({self.hits} hits, {self.misses} misses)")
-            return self.cache[key]
+        loaded = self._load_from_disk("key", key)
+        if loaded is None:
+            return None
+        self.disk_hits += 1
+        self._insert(key, loaded[1])
+        return loaded[1].response
+    
+    def _lookup_semantic(self, semantic_key: str) -> Optional[str]:
+        key = self.semantic_index.get(semantic_key)
+        if key is not None:
+            response = self._lookup(key)
+            if response is not None:
+                return response
         
-        self.misses += 1
-        return None
+        loaded = self._load_from_disk("semantic_key", semantic_key)
+        if loaded is None:
+            return None
+        self.disk_hits += 1
+        self._insert(loaded[0], loaded[1])
+        return loaded[1].response
+    
+    # --- STORE ---
     
-    def set(self, prompt: str, response: str):
-        """Cache response"""
-        key = self._hash_prompt(prompt)
+    def set(self, prompt: str, response: str, semantic_key: Optional[str] = None):
+        """Cache response (RAM + append vào disk store)"""
+        entry = _CacheEntry(response, semantic_key, time.time())
+        with self._lock:
+            key = self._hash_prompt(prompt)
+            self._insert(key, entry)
+            self.conn.execute(
+                "INSERT INTO ai_cache (key, semantic_key, response, created_at) VALUES (?, ?, ?, ?)",
+                (key, semantic_key, response, entry.created_at)
+            )
+            self.conn.commit()
+    
+    def _insert(self, key: str, entry: _CacheEntry):
+        if key in self.cache:
+            self._remove(key)
+        if entry.size_bytes > self.max_size_bytes:
+            return  # Lớn hơn cả budget - chỉ nằm trên disk
         
-        # Estimate size (rough)
-        size_mb = len(response) / 1024 / 1024
+        self.cache[key] = entry
+        self.current_size_bytes += entry.size_bytes
+        if entry.semantic_key:
+            self.semantic_index[entry.semantic_key] = key
         
-        # Check if need to evict
-        if self.current_size_mb + size_mb > self.max_size_mb:
+        while self.current_size_bytes > self.max_size_bytes and self.cache:
             self._evict_oldest()
-        
-        self.cache[key] = response
-        self.current_size_mb += size_mb
     
-    def _evict_oldest(self):
-        """Simple FIFO eviction"""
-        if not self.cache:
+    def _remove(self, key: str):
+        entry = self.cache.pop(key, None)
+        if entry is None:
             return
-        
-        # Remove first item
+        self.current_size_bytes -= entry.size_bytes
+        if entry.semantic_key and self.semantic_index.get(entry.semantic_key) == key:
+            del self.semantic_index[entry.semantic_key]
+    
+    def _evict_oldest(self):
+        """LRU eviction (vẫn còn trên disk)"""
         oldest_key = next(iter(self.cache))
-        del self.cache[oldest_key]
-        self.current_size_mb *= 0.9  # Rough estimate
+        self._remove(oldest_key)
+        self.evictions += 1
     
-    def _load_cache(self, cache_file: Path):
-        """Load cache from disk"""
-        print("  Loading AI cache from disk...")
-        with open(cache_file, 'rb') as f:
-            self.cache = pickle.load(f)
-        self.current_size_mb = cache_file.stat().st_size / 1024 / 1024
+    def compact(self):
+        """Dọn disk store: bỏ row hết hạn và row bị ghi đè bởi row mới hơn cùng key"""
+        with self._lock:
+            if self.ttl_seconds > 0:
+                self.conn.execute(
+                    "DELETE FROM ai_cache WHERE created_at < ?",
+                    (time.time() - self.ttl_seconds,)
+                )
+            self.conn.execute(
+                "DELETE FROM ai_cache WHERE id NOT IN (SELECT MAX(id) FROM ai_cache GROUP BY key)"
+            )
+            self.conn.commit()
     
     def save_cache(self):
-        """Save cache to disk"""
-        cache_file = Path("data/ai_cache.pkl")
-        with open(cache_file, 'wb') as f:
-            pickle.dump(self.cache, f)
-        print(f"💾 AI cache saved ({len(self.cache)} responses)")
+        """Flush disk store (mỗi set() đã append sẵn, chỉ cần compact)"""
+        self.compact()
+        print(f"💾 AI cache saved ({len(self.cache)} responses in RAM)")
     
     def get_stats(self):
         """Get cache statistics"""
         total = self.hits + self.misses
         hit_rate = (self.hits / total * 100) if total > 0 else 0
+        avg_lookup_ms = (self._lookup_time / self._lookups * 1000) if self._lookups else 0
         return {
             "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "disk_hits": self.disk_hits,
             "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
             "hit_rate": f"{hit_rate:.1f}%",
+            "avg_lookup_ms": round(avg_lookup_ms, 3),
             "cached_responses": len(self.cache),
-            "size_mb": self.current_size_mb
+            "size_mb": round(self.current_size_mb, 3)
         }
 
 
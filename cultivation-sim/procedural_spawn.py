@@ -28,15 +28,18 @@ class ProceduralSpawner:
     Tạo spawn patterns tự nhiên với clustering
     """
     
-    def __init__(self, world_db, seed: int = None):
+    def __init__(self, world_db, seed: int = None, spawn_tables: Optional[Dict[str, Dict]] = None):
         self.world_db = world_db
         self.seed = seed or 42
         self.rng = random.Random(self.seed)
         self._spawn_tables_cache: Dict[str, Dict] = {}
         self._noise_cache: Dict[Tuple[int, int], float] = {}
         
-        # Load spawn tables
-        self._load_spawn_tables()
+        # Load spawn tables (dùng bản shared read-only nếu được truyền vào)
+        if spawn_tables is not None:
+            self._spawn_tables_cache = spawn_tables
+        else:
+            self._load_spawn_tables()
     
     def _load_spawn_tables(self):
         """Load spawn tables from JSON"""
@@ -0,0 +1,357 @@
+"""
+Prompt Templates - Precompiled prompt cho CultivationAgent
+- Static blocks (ví dụ, JSON format, instructions) compile 1 lần lúc import
+- STABLE_TURN_GUIDE: phần hướng dẫn cố định, dùng làm prefix cho context caching
+- Context fragments theo entity (location + culture, sect, race, talent, physique,
+  attributes) memoize theo id, gắn với WorldRegistry (reload registry = cache mới)
+"""
+
+import json
+import string
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from attributes import AttributesComponent
+
+
+class PromptTemplate:
+    """
+    Template dạng str.format ("{field}", "{{" / "}}" cho ngoặc nhọn),
+    parse 1 lần thành list (literal, field); render chỉ còn join
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(source)
+        ]
+        self.fields = {field for _, field in self._parts if field}
+
+    def render(self, **values: Any) -> str:
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+# --- STATIC BLOCKS (compile 1 lần) ---
+
+TURN_CONTEXT_TEMPLATE = PromptTemplate("""
+=== CHARACTER DATA ===
+Tuổi: {age}
+Giới tính: {gender}
+Thiên phú: {talent_line}
+Chủng tộc: {race}
+Bối cảnh: {background}
+Câu chuyện: {story}
+
+=== CULTIVATION ===
+Cảnh giới: {realm} (Level {realm_level})
+Tu vi: {spiritual_power}/{max_spiritual_power}
+Tiến độ đột phá: {breakthrough_progress}%
+
+=== ATTRIBUTES ===
+{ai_context}
+
+=== PHYSIQUE (THỂ CHẤT) ===
+{physique_context}
+
+=== LOCATION ===
+{location_context}
+
+=== SECT ===
+{sect_context}
+
+=== RACE ===
+{race_context}
+
+=== MEMORY ===
+{memory_context}
+
+=== WORKING MEMORY ===
+{working_memory}
+
+=== CURRENT ACTION ===
+""")
+
+SELECTED_CHOICE_HEADER_TEMPLATE = PromptTemplate("""
+=== NGƯỜI CHƠI ĐÃ CHỌN ===
+Lựa chọn số {choice_number}: "{choice_text}"
+""")
+
+CHOICE_GUIDE_TEMPLATE = PromptTemplate("""
+⚠️⚠️⚠️ QUAN TRỌNG NHẤT ⚠️⚠️⚠️
+Narrative PHẢI mô tả CỤ THỂ những gì xảy ra khi người chơi thực hiện lựa chọn "{choice_text}".
+
+VÍ DỤ CỤ THỂ:
+- Nếu chọn "Tiếp tục tu luyện" → Mô tả: "Bạn ngồi xuống, nhắm mắt, bắt đầu điều khiển linh khí trong cơ thể. Dòng linh khí chảy qua các kinh mạch, bạn cảm nhận được sự tăng trưởng từng chút một. Sau nhiều tháng tu luyện, tu vi của bạn đã tăng lên..."
+
+- Nếu chọn "Đi khám phá" → Mô tả: "Bạn quyết định rời khỏi nơi ở, bước chân ra ngoài khám phá. Bạn đi qua những con đường nhỏ, leo lên đồi, xuống thung lũng. Trong một hang động, bạn phát hiện..."
+
+- Nếu chọn "Tìm kiếm tông môn" → Mô tả: "Bạn bắt đầu hành trình tìm kiếm tông môn. Bạn hỏi thăm người dân, đi theo những con đường lớn. Sau nhiều ngày, bạn đến được cổng một tông môn..."
+
+- Nếu chọn "Nghỉ ngơi" → Mô tả: "Bạn quyết định nghỉ ngơi, không tu luyện. Bạn ngồi dưới gốc cây, nhìn ngắm cảnh vật xung quanh. Trong lúc nghỉ ngơi, bạn suy ngẫm về..."
+
+KHÔNG ĐƯỢC viết chung chung như "tiếp tục tu luyện" mà PHẢI mô tả CỤ THỂ từng hành động, từng bước đi, từng sự kiện xảy ra.
+""")
+
+WAITING_FOR_CHOICE = "Người chơi đang chờ lựa chọn.\n"
+
+INSTRUCTIONS_TEMPLATE = PromptTemplate("""
+=== INSTRUCTIONS ===
+QUAN TRỌNG: Tạo narrative CỤ THỂ và ĐA DẠNG cho năm thứ {next_age}. KHÔNG được lặp lại "năm X trôi qua một cách bình thường".
+
+1. NARRATIVE PHẢI:
+   - DỰA VÀO LỰA CHỌN "{choice_label}" để tạo narrative phù hợp
+   - Mô tả TỪNG BƯỚC, TỪNG HÀNH ĐỘNG cụ thể (bước đi, ngồi xuống, nhắm mắt, leo lên, xuống, gặp gỡ, nói chuyện...)
+   - Mô tả CẢNH VẬT, ĐỊA ĐIỂM cụ thể (hang động, rừng cây, con đường, ngôi làng...)
+   - Mô tả NGƯỜI GẶP, CUỘC TRÒ CHUYỆN nếu có
+   - Mô tả KẾT QUẢ, THAY ĐỔI cụ thể (tìm được gì, học được gì, tu vi tăng bao nhiêu...)
+   - Mỗi lựa chọn PHẢI dẫn đến narrative HOÀN TOÀN KHÁC NHAU
+   - Dài ít nhất 5-7 câu, mô tả chi tiết từng bước
+
+2. CHOICES:
+   - Đưa ra 4-6 lựa chọn ĐA DẠNG cho năm tiếp theo
+   - Mỗi lựa chọn phải dẫn đến narrative KHÁC NHAU
+   - Không được lặp lại các lựa chọn giống nhau
+
+3. STATE_UPDATES (BẮT BUỘC):
+   - PHẢI cập nhật cultivation (spiritual_power tăng, breakthrough_progress thay đổi)
+   - PHẢI cập nhật resources (spirit_stones, pills, materials thay đổi)
+   - PHẢI cập nhật attributes nếu có thay đổi
+   - Mỗi năm phải có thay đổi về stats
+
+VÍ DỤ NARRATIVE TỐT CHO "ĐI KHÁM PHÁ":
+"Năm thứ 2, bạn quyết định rời khỏi làng để khám phá thế giới xung quanh. Bạn bước đi trên con đường đất nhỏ, đi qua những cánh đồng lúa xanh mướt. Sau vài giờ đi bộ, bạn đến một khu rừng rậm. Trong rừng, bạn nghe thấy tiếng nước chảy. Bạn đi theo tiếng nước và phát hiện ra một thác nước nhỏ. Phía sau thác nước, bạn nhìn thấy một hang động ẩn khuất. Bạn cẩn thận bước vào, trong hang động tối tăm, bạn tìm thấy một viên đan dược cổ xưa còn sót lại trên một tảng đá. Sau khi sử dụng, tu vi của bạn tăng lên đáng kể."
+
+VÍ DỤ NARRATIVE TỐT CHO "TIẾP TỤC TU LUYỆN":
+"Năm thứ 2, bạn quyết định dành toàn bộ thời gian để tu luyện. Mỗi sáng, bạn ngồi xuống trên tảng đá phẳng, nhắm mắt, bắt đầu điều khiển linh khí trong cơ thể. Bạn cảm nhận dòng linh khí chảy qua các kinh mạch, từ đan điền lên đỉnh đầu rồi quay trở lại. Sau nhiều tháng tu luyện không ngừng nghỉ, bạn đã có thể điều khiển linh khí một cách thuần thục hơn. Tu vi của bạn tăng lên đáng kể, đạt được Luyện Khí Kỳ cấp 2. Bạn cảm thấy sức mạnh trong cơ thể tăng lên rõ rệt."
+
+VÍ DỤ NARRATIVE TỆ (KHÔNG ĐƯỢC):
+"Năm 2 trôi qua một cách bình thường."
+"Người Tu Tiên tiếp tục tu luyện tại Làng Thanh Thủy. Với thiên phú Thiên Linh Căn, bạn đã có những tiến bộ trong việc cảm nhận và điều khiển linh khí. Mỗi ngày trôi qua đều mang lại những hiểu biết mới về thế giới tu tiên."
+
+Format JSON:
+{{
+    "narrative": "Mô tả CỤ THỂ và ĐA DẠNG về những gì xảy ra trong năm...",
+    "choices": ["Lựa chọn 1", "Lựa chọn 2", "Lựa chọn 3", "Lựa chọn 4"],
+    "action_intent": "YEAR_PROGRESS",
+    "state_updates": {{
+        "age": {next_age},
+        "cultivation": {{
+            "spiritual_power": <tăng lên>,
+            "breakthrough_progress": <thay đổi>,
+            "realm_level": <có thể tăng>
+        }},
+        "resources": {{
+            "spirit_stones": <thay đổi>,
+            "pills": {{"<tên đan>": <số lượng>}},
+            "materials": {{"<tên vật liệu>": <số lượng>}}
+        }},
+        "attributes": {{
+            <cập nhật nếu có>
+        }}
+    }}
+}}
+""")
+
+
+# --- STABLE PREFIX (context caching) ---
+# Khi prefix được cache phía provider: hướng dẫn + ví dụ + JSON format gửi 1 lần,
+# mỗi lượt chỉ còn context + lựa chọn + TURN_DIRECTIVE_TEMPLATE
+
+STABLE_TURN_GUIDE = (
+    "=== HƯỚNG DẪN LƯỢT CHƠI (áp dụng cho mọi lượt) ===\n"
+    + CHOICE_GUIDE_TEMPLATE.render(choice_text="<lựa chọn của người chơi>")
+    + INSTRUCTIONS_TEMPLATE.render(next_age="<tuổi mới>", choice_label="<lựa chọn của người chơi>")
+)
+
+TURN_DIRECTIVE_TEMPLATE = PromptTemplate("""
+=== INSTRUCTIONS ===
+Làm đúng theo HƯỚNG DẪN LƯỢT CHƠI ở trên.
+Năm cần tạo narrative: năm thứ {next_age} (state_updates.age = {next_age}).
+Lựa chọn của người chơi: "{choice_label}".
+Trả về đúng Format JSON đã mô tả.
+""")
+
+
+# --- CONTEXT FRAGMENTS (memoize theo entity id) ---
+
+class PromptFragments:
+    """
+    Cache các đoạn context theo entity id
+
+    World data read-only nên fragment chỉ phụ thuộc id; cache sống cùng
+    WorldRegistry (reset_world_registry() -> registry mới -> cache mới),
+    hoặc gọi clear() nếu sửa world data tại chỗ.
+    """
+
+    # Attributes đổi dần theo lượt chơi -> LRU có giới hạn, không giữ mãi như entity fragments
+    MAX_ATTRIBUTE_ENTRIES = 1024
+
+    def __init__(self, world):
+        self.world = world
+        self._cache: Dict[Hashable, str] = {}
+        self._attribute_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._attribute_cache.clear()
+
+    def _memo(self, key: Hashable, builder: Callable[[], str]) -> str:
+        fragment = self._cache.get(key)
+        if fragment is not None:
+            self.hits += 1
+            return fragment
+        self.misses += 1
+        fragment = builder()
+        with self._lock:
+            self._cache[key] = fragment
+        return fragment
+
+    def location(self, location_id: Optional[str]) -> str:
+        """Location + regional culture"""
+        if not location_id:
+            return ""
+        return self._memo(("location", location_id), lambda: self._build_location(location_id))
+
+    def sect(self, sect_id: Optional[str]) -> str:
+        if not sect_id:
+            return ""
+        return self._memo(("sect", sect_id), lambda: self._build_sect(sect_id))
+
+    def race(self, race_id: Optional[str]) -> str:
+        if not race_id:
+            return ""
+        return self._memo(("race", race_id), lambda: self._build_race(race_id))
+
+    def talent(self, talent: str) -> str:
+        """Dòng thiên phú (kèm AI effect nếu có)"""
+        return self._memo(("talent", talent), lambda: self._build_talent(talent))
+
+    def physique(self, physique_id: Optional[str]) -> str:
+        if not physique_id:
+            return "Không có thể chất đặc biệt"
+        return self._memo(("physique", physique_id), lambda: self._build_physique(physique_id))
+
+    def attributes(self, attributes: Dict[str, Any]) -> str:
+        """AI context string của attributes (key = giá trị attributes, đổi ít giữa các lượt)"""
+        if not attributes:
+            return "Attributes not available"
+        try:
+            key = tuple(sorted(attributes.items()))
+            hash(key)
+        except TypeError:
+            return AttributesComponent(**attributes).get_ai_context_string()
+
+        with self._lock:
+            fragment = self._attribute_cache.get(key)
+            if fragment is not None:
+                self._attribute_cache.move_to_end(key)
+                self.hits += 1
+                return fragment
+
+        self.misses += 1
+        fragment = AttributesComponent(**attributes).get_ai_context_string()
+        with self._lock:
+            self._attribute_cache[key] = fragment
+            while len(self._attribute_cache) > self.MAX_ATTRIBUTE_ENTRIES:
+                self._attribute_cache.popitem(last=False)
+        return fragment
+
+    # --- BUILDERS ---
+
+    def _build_location(self, location_id: str) -> str:
+        world_db = self.world.world_db
+        location = world_db.get_location(location_id)
+        if not location:
+            return ""
+
+        culture = world_db.get_culture_by_location(location_id)
+        culture_info = ""
+        if culture:
+            culture_info = f"""
+Văn hóa vùng: {culture.get('name', 'Unknown')} - {culture.get('vibe', 'Unknown')}
+Quy tắc xã hội: {json.dumps(culture.get('social_rules', {}), ensure_ascii=False)}
+Đặc điểm văn hóa: {', '.join([t.get('effect', '') for t in culture.get('cultural_traits', [])[:3]])}
+"""
+
+        connected = []
+        for lid in location.get('connected_to', []):
+            neighbor = world_db.get_location(lid)
+            if neighbor:
+                connected.append(neighbor.get('name', lid))
+
+        return f"""
+Địa điểm: {location['name']} ({location.get('region', 'Unknown')})
+Loại: {location.get('type', 'Unknown')}
+Mật độ linh khí: {location.get('qi_density', 1.0)}x
+Dịch vụ: {', '.join(location.get('services', []))}
+Nguy hiểm: {location.get('danger_level', 'Unknown')}
+Kết nối: {', '.join(connected)}
+{culture_info}
+"""
+
+    def _build_sect(self, sect_id: str) -> str:
+        sect = self.world.world_db.get_sect(sect_id)
+        if not sect:
+            return ""
+        return f"""
+Tông môn: {sect['name']} ({sect.get('type', 'Unknown')})
+Triết lý: {sect.get('description', '')}
+Kỹ thuật độc quyền: {', '.join(sect.get('exclusive_techniques', []))}
+Yêu cầu: {json.dumps(sect.get('requirements', {}), ensure_ascii=False)}
+"""
+
+    def _build_race(self, race_id: str) -> str:
+        race = self.world.world_db.get_race(race_id)
+        if not race:
+            return ""
+        return f"""
+Chủng tộc: {race.get('name', race_id)}
+Mô tả: {race.get('description', '')}
+Đặc điểm: {', '.join(race.get('traits', []))}
+"""
+
+    def _build_talent(self, talent: str) -> str:
+        talent_info = self.world.talents.get(talent)
+        ai_effect = talent_info.get('ai_effect', '') if talent_info else ''
+        return f"{talent} ({ai_effect})" if ai_effect else str(talent)
+
+    def _build_physique(self, physique_id: str) -> str:
+        physique_system = self.world.physique_system
+        physique_data = physique_system.get_physique(physique_id)
+        if not physique_data:
+            return "Không có thể chất đặc biệt"
+
+        fragment = f"""
+Thể Chất: {physique_data.get('name', '')}
+Mô tả: {physique_data.get('description', '')}
+
+⚠️ QUAN TRỌNG - PROMPT CHO THỂ CHẤT:
+{physique_system.get_ai_prompt(physique_id)}
+"""
+        forbidden_words = physique_system.get_forbidden_words(physique_id)
+        if forbidden_words:
+            fragment += f"\n❌ KHÔNG ĐƯỢC dùng các từ: {', '.join(forbidden_words)}"
+        return fragment
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fragments": len(self._cache),
+            "attribute_fragments": len(self._attribute_cache),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def get_prompt_fragments(world) -> PromptFragments:
+    """Fragment cache dùng chung của WorldRegistry"""
+    return world.shared("prompt_fragments", lambda: PromptFragments(world))
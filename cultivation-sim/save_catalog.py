@@ -0,0 +1,206 @@
+"""
+Save Catalog - Metadata của mọi save trong 1 bảng SQLite (data/save_catalog.db)
+/saves/list đọc 1 trang từ catalog (ORDER BY updated_at trên index) thay vì
+mở từng file data/saves/*.db mỗi request.
+
+- Cập nhật khi save được ghi (StateWriter flush -> record) và khi xoá save
+- Catalog thiếu / rỗng: rebuild bằng cách quét thư mục saves song song (thread pool)
+- Rebuild thủ công: python save_catalog.py --rebuild
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SAVE_CATALOG_PATH = os.getenv("SAVE_CATALOG_PATH", "data/save_catalog.db")
+SAVE_CATALOG_WORKERS = int(os.getenv("SAVE_CATALOG_WORKERS", "8"))
+
+# Column của game_state được giữ trong catalog
+CATALOG_COLUMNS = ("name", "age", "gender", "talent", "updated_at")
+
+
+class SaveCatalog:
+    """
+    Bảng saves(save_id, name, age, gender, talent, updated_at) + index (updated_at, save_id)
+
+    Connection riêng (không dùng get_db: catalog dùng chung mọi session / worker).
+    """
+
+    def __init__(self, path: str = SAVE_CATALOG_PATH, saves_dir: str = "data/saves"):
+        self.path = Path(path)
+        self.saves_dir = Path(saves_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS saves (
+                save_id TEXT PRIMARY KEY,
+                name TEXT,
+                age INTEGER DEFAULT 0,
+                gender TEXT,
+                talent TEXT,
+                updated_at TEXT DEFAULT ''
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_saves_updated ON saves(updated_at, save_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+        self.rebuilds = 0
+
+    # --- WRITE ---
+
+    def record(self, save_id: str, columns: Dict[str, Any]):
+        """Upsert metadata của 1 save (chỉ các column có trong CATALOG_COLUMNS)"""
+        values = {column: columns[column] for column in CATALOG_COLUMNS if column in columns}
+        if not values:
+            return
+        names = list(values)
+        with self._lock:
+            self.conn.execute(f"""
+                INSERT INTO saves (save_id, {", ".join(names)})
+                VALUES (?, {", ".join("?" * len(names))})
+                ON CONFLICT(save_id) DO UPDATE SET
+                    {", ".join(f"{name} = excluded.{name}" for name in names)}
+            """, [save_id] + list(values.values()))
+            self.conn.commit()
+
+    def remove(self, save_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM saves WHERE save_id = ?", (save_id,))
+            self.conn.commit()
+
+    # --- READ ---
+
+    def list(self, limit: int = 50, offset: int = 0, descending: bool = True) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        1 trang saves theo updated_at (mới nhất trước nếu descending)
+
+        Returns:
+            (saves, total)
+        """
+        order = "DESC" if descending else "ASC"
+        with self._lock:
+            rows = self.conn.execute(f"""
+                SELECT save_id, name, age, gender, talent, updated_at
+                FROM saves
+                ORDER BY updated_at {order}, save_id {order}
+                LIMIT ? OFFSET ?
+            """, (limit, offset)).fetchall()
+            total = self.conn.execute("SELECT COUNT(*) FROM saves").fetchone()[0]
+        return [
+            {
+                "save_id": save_id,
+                "age": age or 0,
+                "gender": gender or "Unknown",
+                "talent": talent or "Unknown",
+                "character_name": name or "Unknown",
+                "updated_at": updated_at or "",
+                "file_path": str(self.saves_dir / f"{save_id}.db"),
+            }
+            for save_id, name, age, gender, talent, updated_at in rows
+        ], total
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM saves").fetchone()[0]
+
+    # --- REBUILD ---
+
+    def is_built(self) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM catalog_meta WHERE key = 'built_at'").fetchone()
+        return row is not None
+
+    def ensure(self, workers: int = SAVE_CATALOG_WORKERS) -> bool:
+        """Rebuild nếu catalog chưa từng được build (file mới / bị xoá); True nếu đã rebuild"""
+        if self.is_built():
+            return False
+        self.rebuild(workers)
+        return True
+
+    def rebuild(self, workers: int = SAVE_CATALOG_WORKERS) -> int:
+        """Quét data/saves/*.db song song, thay toàn bộ catalog; trả số save"""
+        files = sorted(self.saves_dir.glob("*.db")) if self.saves_dir.exists() else []
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="save-catalog") as executor:
+            entries = [entry for entry in executor.map(_read_save, files) if entry is not None]
+
+        with self._lock:
+            self.conn.execute("DELETE FROM saves")
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO saves (save_id, name, age, gender, talent, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, entries)
+            self.conn.execute("""
+                INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('built_at', datetime('now'))
+            """)
+            self.conn.commit()
+        self.rebuilds += 1
+        logger.info(f"Save catalog rebuilt: {len(entries)} saves from {len(files)} files")
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"saves": len(self), "rebuilds": self.rebuilds, "path": str(self.path)}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def _read_save(db_file: Path) -> Optional[Tuple]:
+    """Row catalog của 1 file save (read-only); None nếu chưa có game_state"""
+    save_id = db_file.stem
+    try:
+        conn = sqlite3.connect(f"{db_file.resolve().as_uri()}?mode=ro", uri=True, timeout=5.0)
+        try:
+            row = conn.execute("""
+                SELECT name, age, gender, talent, updated_at
+                FROM game_state
+                WHERE save_id = ?
+            """, (save_id,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Error reading save {save_id}: {e}")
+        # Vẫn liệt kê, với thông tin tối thiểu
+        return (save_id, None, 0, None, None, "")
+    if row is None:
+        return None
+    return (save_id,) + tuple(row)
+
+
+# Global catalog (1 connection / process)
+_save_catalog: Optional[SaveCatalog] = None
+_save_catalog_lock = threading.Lock()
+
+
+def get_save_catalog() -> SaveCatalog:
+    """Get or create the process-wide save catalog"""
+    global _save_catalog
+    with _save_catalog_lock:
+        if _save_catalog is None:
+            _save_catalog = SaveCatalog()
+        return _save_catalog
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Save catalog maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="Quét lại data/saves và thay toàn bộ catalog")
+    parser.add_argument("--workers", type=int, default=SAVE_CATALOG_WORKERS)
+    args = parser.parse_args()
+
+    catalog = get_save_catalog()
+    if args.rebuild:
+        print(f"✅ Rebuilt save catalog: {catalog.rebuild(args.workers)} saves")
+    else:
+        print(catalog.stats())
@@ -5,10 +5,12 @@ Exposes the Game as a REST API for the React Frontend
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import os
 import sys
+import asyncio
 import traceback
 from pathlib import Path
 from datetime import datetime
@@ -34,6 +36,14 @@ load_dotenv()
 
 # Import game
 from game import CultivationSimulator
+from session_manager import SessionManager
+from world_registry import get_world_registry
+from streaming import format_sse
+from database import close_db
+from summary_worker import get_summary_worker
+from engine.memory.compaction_worker import get_compaction_scheduler
+from state_store import get_state_flusher
+from save_catalog import get_save_catalog
 
 app = FastAPI(title="Cultivation Simulator API")
 
@@ -46,8 +56,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global game instance
-_game_instance: Optional[CultivationSimulator] = None
+# Live game sessions (LRU keyed by save_id, lazy rehydration from data/saves)
+session_manager = SessionManager(CultivationSimulator)
+SESSION_REAPER_INTERVAL = 60  # seconds
 
 # Request models
 class CharacterData(BaseModel):
@@ -63,6 +74,7 @@ class NewGameRequest(BaseModel):
 
 class ActionRequest(BaseModel):
     user_input: str  # Choice index (1-6) or text
+    save_id: Optional[str] = None  # Session; defaults to the last created/loaded game
 
 class ActionResponse(BaseModel):
     narrative: str
@@ -132,12 +144,76 @@ def _normalize_game_state(game_state: Dict[str, Any], save_id: str, character_na
     
     return game_state
 
+async def _get_game(save_id: Optional[str] = None) -> CultivationSimulator:
+    """
+    Resolve game session by save_id (rehydrate from save DB on cache miss)
+    
+    Client cũ không gửi save_id → dùng game tạo/load gần nhất
+    """
+    save_id = save_id or session_manager.last_save_id
+    if not save_id:
+        raise HTTPException(status_code=400, detail="No active game. Please start a new game first.")
+    
+    if save_id in session_manager:
+        return session_manager.get(save_id)
+    
+    try:
+        return await asyncio.to_thread(session_manager.get, save_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Save {save_id} not found")
+
+
+async def _session_reaper():
+    """Evict idle sessions periodically (flushes their state)"""
+    while True:
+        await asyncio.sleep(SESSION_REAPER_INTERVAL)
+        try:
+            await asyncio.to_thread(session_manager.evict_idle)
+        except Exception as e:
+            logger.error(f"Session reaper error: {e}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Load shared world data, start background workers"""
+    await asyncio.to_thread(get_world_registry)
+    # Catalog mới / bị xoá: quét data/saves song song 1 lần
+    await asyncio.to_thread(get_save_catalog().ensure)
+    asyncio.create_task(_session_reaper())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush all live sessions + AI cache store"""
+    logger.info(f"Shutdown: flushing {len(session_manager)} live sessions")
+    await asyncio.to_thread(get_compaction_scheduler().shutdown)
+    await asyncio.to_thread(session_manager.flush_all)
+    await asyncio.to_thread(get_state_flusher().shutdown)
+    await asyncio.to_thread(get_summary_worker().shutdown)
+    
+    optimizations = get_world_registry().optimizations
+    if optimizations:
+        await asyncio.to_thread(optimizations.ai_cache.save_cache)
+
+
 @app.get("/health")
 async def health():
     """Health check"""
     logger.info("Request: GET /health")
     try:
-        result = {"status": "healthy", "service": "cultivation-simulator", "log_file": str(LOG_FILE)}
+        result = {
+            "status": "healthy",
+            "service": "cultivation-simulator",
+            "log_file": str(LOG_FILE),
+            "sessions": session_manager.stats(),
+            "rolling_summary": get_summary_worker().stats(),
+            "memory_compaction": get_compaction_scheduler().stats(),
+            "state_flush": get_state_flusher().stats(),
+            "save_catalog": get_save_catalog().stats()
+        }
+        optimizations = get_world_registry().optimizations
+        if optimizations:
+            result["ai_cache"] = optimizations.ai_cache.get_stats()
         logger.info(f"Response: GET /health - Status: 200 - Time: 0.001s")
         return result
     except Exception as e:
@@ -147,8 +223,6 @@ async def health():
 @app.post("/game/new", response_model=Dict[str, Any])
 async def new_game(request: NewGameRequest):
     """Start new game"""
-    global _game_instance
-    
     logger.info(f"New game request: player_name={request.player_name}, character_data={request.character_data}")
     
     try:
@@ -160,7 +234,7 @@ async def new_game(request: NewGameRequest):
         # Create game instance and initialize with character data
         try:
             logger.info(f"Creating game instance with save_id: {save_id}")
-            _game_instance = CultivationSimulator(save_id)
+            game = await asyncio.to_thread(session_manager.create, save_id)
             logger.info("Game instance created successfully")
         except Exception as e:
             error_msg = f"Failed to create game instance: {str(e)}\n{traceback.format_exc()}"
@@ -173,7 +247,8 @@ async def new_game(request: NewGameRequest):
         # Initialize game
         try:
             logger.info(f"Initializing game with: gender={character_data.get('gender')}, talent={character_data.get('talent')}, race={character_data.get('race')}, background={character_data.get('background')}, physique_id={character_data.get('physique_id')}")
-            _game_instance._new_game(
+            await asyncio.to_thread(
+                game._new_game,
                 player_name=request.player_name,
                 gender=character_data.get('gender', 'Nam'),
                 talent=character_data.get('talent', 'Bình thường'),
@@ -198,7 +273,7 @@ async def new_game(request: NewGameRequest):
         
         # Get initial state
         try:
-            game_state = _game_instance.get_game_state()
+            game_state = game.get_game_state()
             logger.info("Game state retrieved successfully")
         except Exception as e:
             error_msg = f"Failed to get game state: {str(e)}\n{traceback.format_exc()}"
@@ -229,72 +304,79 @@ async def new_game(request: NewGameRequest):
         )
 
 
+def _parse_choice_index(game: CultivationSimulator, user_input: str) -> int:
+    """Parse user input ("1", "2", ... or choice text) to 0-based choice index"""
+    current_choices = game.current_choices
+    choice_index = None
+    try:
+        choice_index = int(user_input) - 1  # Convert to 0-based index
+    except ValueError:
+        # If not a number, treat as text and find matching choice
+        for i, choice in enumerate(current_choices):
+            if user_input.lower() in choice.lower():
+                choice_index = i
+                break
+    
+    if choice_index is None:
+        raise HTTPException(status_code=400, detail=f"Invalid choice: {user_input}")
+    
+    logger.info(f"Processing choice index: {choice_index}")
+    logger.info(f"Processing choice {choice_index + 1}: '{current_choices[choice_index] if 0 <= choice_index < len(current_choices) else 'Invalid'}'")
+    return choice_index
+
+
+def _build_action_response(game: CultivationSimulator, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build ActionResponse dict (game state + debug info) after a turn"""
+    # Get updated state
+    game_state = game.get_game_state()
+    
+    # Get debug info if available
+    debug_info = None
+    if hasattr(game, 'agent') and game.agent:
+        debug_info = {
+            'prompt': getattr(game.agent, '_last_prompt', None),
+            'ai_raw_response': getattr(game.agent, '_last_ai_response', None),
+            'parsed_result': getattr(game.agent, '_last_parsed_result', None),
+            'error': getattr(game.agent, '_last_error', None),
+            'token_usage': getattr(game.agent, '_last_token_usage', None)
+        }
+    
+    # Normalize for React
+    normalized_state = _normalize_game_state(
+        game_state,
+        game.save_id,
+        game_state.get('name', game_state.get('character_name', 'Unknown'))
+    )
+    
+    logger.info(f"Action processed successfully. Narrative length: {len(result.get('narrative', ''))}")
+    logger.info(f"Narrative preview: {result.get('narrative', '')[:100]}...")
+    logger.info(f"Choices count: {len(result.get('choices', []))}")
+    
+    response = ActionResponse(
+        narrative=result.get('narrative', ''),
+        choices=result.get('choices', []),
+        game_state=normalized_state,
+        debug_info=debug_info
+    )
+    
+    # Convert to dict for response (Pydantic v2 compatible)
+    return safe_to_dict(response)
+
+
 @app.post("/game/action", response_model=ActionResponse)
 async def process_action(request: ActionRequest):
     """Process player action (select choice)"""
-    global _game_instance
+    logger.info(f"Action request: save_id={request.save_id}, user_input={request.user_input}")
     
-    logger.info(f"Action request: user_input={request.user_input}")
-    
-    if not _game_instance:
-        logger.warning("Action requested but no active game instance")
-        raise HTTPException(status_code=400, detail="No active game. Please start a new game first.")
+    game = await _get_game(request.save_id)
     
     try:
-        # Parse user input (could be "1", "2", etc. or text)
-        choice_index = None
-        try:
-            choice_index = int(request.user_input) - 1  # Convert to 0-based index
-        except ValueError:
-            # If not a number, treat as text and find matching choice
-            current_choices = _game_instance.current_choices
-            for i, choice in enumerate(current_choices):
-                if request.user_input.lower() in choice.lower():
-                    choice_index = i
-                    break
-        
-        if choice_index is None:
-            raise HTTPException(status_code=400, detail=f"Invalid choice: {request.user_input}")
-        
-        logger.info(f"Processing choice index: {choice_index}")
-        logger.info(f"Processing choice {choice_index + 1}: '{current_choices[choice_index] if choice_index < len(current_choices) else 'Invalid'}'")
-        
-        # Process turn
-        result = _game_instance.process_year_turn(choice_index)
+        choice_index = _parse_choice_index(game, request.user_input)
         
-        # Get updated state
-        game_state = _game_instance.get_game_state()
+        # Process turn (async: SQLite in DB executor, non-blocking AI call)
+        result = await game.process_year_turn_async(choice_index)
         
-        # Get debug info if available
-        debug_info = None
-        if hasattr(_game_instance, 'agent') and _game_instance.agent:
-            debug_info = {
-                'prompt': getattr(_game_instance.agent, '_last_prompt', None),
-                'ai_raw_response': getattr(_game_instance.agent, '_last_ai_response', None),
-                'parsed_result': getattr(_game_instance.agent, '_last_parsed_result', None),
-                'error': getattr(_game_instance.agent, '_last_error', None)
-            }
-        
-        # Normalize for React
-        normalized_state = _normalize_game_state(
-            game_state,
-            _game_instance.save_id,
-            game_state.get('name', game_state.get('character_name', 'Unknown'))
-        )
-        
-        logger.info(f"Action processed successfully. Narrative length: {len(result.get('narrative', ''))}")
-        logger.info(f"Narrative preview: {result.get('narrative', '')[:100]}...")
-        logger.info(f"Choices count: {len(result.get('choices', []))}")
-        
-        response = ActionResponse(
-            narrative=result.get('narrative', ''),
-            choices=result.get('choices', []),
-            game_state=normalized_state,
-            debug_info=debug_info
-        )
-        
-        # Convert to dict for response (Pydantic v2 compatible)
-        result_dict = safe_to_dict(response)
+        result_dict = _build_action_response(game, result)
         
         logger.info(f"Response: POST /game/action - Status: 200 - Time: 0.001s")
         return result_dict
@@ -310,21 +392,55 @@ async def process_action(request: ActionRequest):
         )
 
 
+@app.post("/game/action/stream")
+async def process_action_stream(request: ActionRequest):
+    """
+    Process player action, streaming narrative via Server-Sent Events
+    
+    Events:
+        narrative: {"delta": str} - đoạn narrative mới, nối vào text đang hiển thị
+        done: ActionResponse - narrative đầy đủ (authoritative), choices, game_state
+        error: {"detail": str}
+    """
+    logger.info(f"Streaming action request: save_id={request.save_id}, user_input={request.user_input}")
+    
+    game = await _get_game(request.save_id)
+    choice_index = _parse_choice_index(game, request.user_input)
+    
+    async def event_stream():
+        try:
+            async for event in game.process_year_turn_stream(choice_index):
+                if event["type"] == "narrative":
+                    yield format_sse("narrative", {"delta": event["delta"]})
+                else:
+                    yield format_sse("done", _build_action_response(game, event["result"]))
+            logger.info(f"Response: POST /game/action/stream - Status: 200")
+        except Exception as e:
+            error_msg = f"Failed to process streamed action: {str(e)}\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            yield format_sse("error", {"detail": f"Failed to process action: {str(e)}. See log: {LOG_FILE}"})
+    
+    # Async generator chỉ relay event: turn chạy trong task dưới _turn_lock của save
+    # (như /game/action), client ngắt giữa chừng thì turn vẫn hoàn tất
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/game/state")
-async def get_state():
+async def get_state(save_id: Optional[str] = None):
     """Get current game state"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game. Please start a new game first.")
+    game = await _get_game(save_id)
     
     try:
-        game_state = _game_instance.get_game_state()
+        game_state = game.get_game_state()
         
         # Normalize for React
         normalized_state = _normalize_game_state(
             game_state,
-            _game_instance.save_id,
+            game.save_id,
             game_state.get('name', game_state.get('character_name', 'Unknown'))
         )
         
@@ -339,15 +455,14 @@ async def get_state():
 
 
 @app.get("/memory/count")
-async def get_memory_count():
+async def get_memory_count(save_id: Optional[str] = None):
     """Get memory count"""
-    global _game_instance
-    
     try:
-        if not _game_instance or not hasattr(_game_instance, 'memory'):
+        game = await _get_game(save_id)
+        if not hasattr(game, 'memory'):
             return {"count": 0}
         
-        count = _game_instance.memory.get_total_memory_count()
+        count = game.memory.get_total_memory_count()
         return {"count": count}
     except Exception as e:
         logger.warning(f"Error getting memory count: {e}")
@@ -356,63 +471,18 @@ async def get_memory_count():
 
 # Save Management Endpoints
 @app.get("/saves/list")
-async def list_saves():
-    """List all available save games"""
-    from pathlib import Path
-    import sqlite3
-    
-    saves_dir = Path("data/saves")
-    saves = []
-    
-    if saves_dir.exists():
-        for db_file in saves_dir.glob("*.db"):
-            save_id = db_file.stem
-            try:
-                # Try to load basic info from database
-                conn = sqlite3.connect(str(db_file))
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT age, gender, talent, name, updated_at
-                    FROM game_state
-                    WHERE save_id = ?
-                """, (save_id,))
-                row = cursor.fetchone()
-                conn.close()
-                
-                if row:
-                    saves.append({
-                        "save_id": save_id,
-                        "age": row[0] or 0,
-                        "gender": row[1] or "Unknown",
-                        "talent": row[2] or "Unknown",
-                        "character_name": row[3] or "Unknown",
-                        "updated_at": row[4] or "",
-                        "file_path": str(db_file)
-                    })
-            except Exception as e:
-                logger.warning(f"Error reading save {save_id}: {e}")
-                # Still add it but with minimal info
-                saves.append({
-                    "save_id": save_id,
-                    "age": 0,
-                    "gender": "Unknown",
-                    "talent": "Unknown",
-                    "character_name": "Unknown",
-                    "updated_at": "",
-                    "file_path": str(db_file)
-                })
-    
-    # Sort by updated_at descending (most recent first)
-    saves.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-    
-    return {"saves": saves}
+async def list_saves(limit: int = 50, offset: int = 0, order: str = "desc"):
+    """List save games (1 trang từ save catalog, mới cập nhật nhất trước)"""
+    limit = max(1, min(limit, 500))
+    saves, total = await asyncio.to_thread(
+        get_save_catalog().list, limit, max(0, offset), order.lower() != "asc"
+    )
+    return {"saves": saves, "total": total, "limit": limit, "offset": offset}
 
 
 @app.post("/saves/load")
 async def load_save(request: dict):
     """Load a saved game"""
-    global _game_instance
-    
     save_id = request.get("save_id")
     if not save_id:
         raise HTTPException(status_code=400, detail="save_id is required")
@@ -420,13 +490,12 @@ async def load_save(request: dict):
     try:
         # Create game instance with existing save_id
         logger.info(f"Loading save: {save_id}")
-        _game_instance = CultivationSimulator(save_id)
-        
-        # Load state
-        _game_instance._load_state()
+        # Reuse live session if cached, else rehydrate from save DB
+        game = await _get_game(save_id)
+        session_manager.last_save_id = save_id
         
         # Get game state
-        game_state = _game_instance.get_game_state()
+        game_state = game.get_game_state()
         
         # Normalize for React
         normalized_state = _normalize_game_state(
@@ -443,6 +512,8 @@ async def load_save(request: dict):
             "character_name": game_state.get('name', game_state.get('character_name', 'Unknown')),
             "game_state": normalized_state
         }
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Failed to load save: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
@@ -464,13 +535,17 @@ async def delete_save(save_id: str):
         raise HTTPException(status_code=404, detail=f"Save {save_id} not found")
     
     try:
-        # Close connection if this save is currently loaded
-        global _game_instance
-        if _game_instance and _game_instance.save_id == save_id:
-            _game_instance = None
+        # Drop live session without flushing (file is being deleted)
+        session_manager.remove(save_id, flush=False)
         
-        # Delete file
+        # Close pooled connection, delete file (+ WAL sidecars)
+        close_db(str(save_file))
         os.remove(save_file)
+        get_save_catalog().remove(save_id)
+        for suffix in ("-wal", "-shm", ".state-wal"):
+            sidecar = Path(f"{save_file}{suffix}")
+            if sidecar.exists():
+                os.remove(sidecar)
         logger.info(f"Deleted save: {save_id}")
         
         return {"message": f"Save {save_id} deleted successfully"}
@@ -485,31 +560,28 @@ async def delete_save(save_id: str):
 
 # Advanced Systems Endpoints (Shop, Skills, Quests, Combat)
 @app.get("/shop/items")
-async def get_shop_items(location_id: Optional[str] = None):
+async def get_shop_items(location_id: Optional[str] = None, save_id: Optional[str] = None):
     """Get shop items (Database-First approach)"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(save_id)
     
     try:
         # Get items from world database
         items = []
         if location_id:
-            location = _game_instance.world_db.get_location(location_id)
+            location = game.world_db.get_location(location_id)
             if location:
                 shop_items = location.get('shop_items', [])
                 for item_id in shop_items:
-                    item = _game_instance.world_db.get_item(item_id)
+                    item = game.world_db.get_item(item_id)
                     if item:
                         items.append(item)
         else:
             # Get all items
-            all_items = _game_instance.world_db.get_all_items()
+            all_items = game.world_db.get_all_items()
             items = list(all_items.values())[:20]  # Limit to 20 for performance
         
         # Get player money
-        player_money = _game_instance.resources.spirit_stones if _game_instance.resources else 0
+        player_money = game.resources.spirit_stones if game.resources else 0
         
         # Format items
         formatted_items = []
@@ -538,10 +610,7 @@ async def get_shop_items(location_id: Optional[str] = None):
 @app.post("/shop/buy")
 async def buy_item(request: dict):
     """Buy item from shop (Database-First approach)"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(request.get("save_id"))
     
     item_id = request.get("item_id")
     if not item_id:
@@ -549,32 +618,33 @@ async def buy_item(request: dict):
     
     try:
         # Get item from database
-        item = _game_instance.world_db.get_item(item_id)
+        item = game.world_db.get_item(item_id)
         if not item:
             raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
         
         # Check if player can afford
         price = item.get('price', 0)
-        player_money = _game_instance.resources.spirit_stones if _game_instance.resources else 0
+        player_money = game.resources.spirit_stones if game.resources else 0
         
         if player_money < price:
             raise HTTPException(status_code=400, detail="Not enough money")
         
         # Deduct money
-        _game_instance.resources.spirit_stones -= price
+        game.resources.spirit_stones -= price
         
         # Add item to inventory (simplified - just add to resources)
-        if 'materials' not in _game_instance.resources.dict():
-            _game_instance.resources.materials = {}
+        if 'materials' not in game.resources.dict():
+            game.resources.materials = {}
         
-        materials = _game_instance.resources.materials
+        materials = game.resources.materials
         if item_id in materials:
             materials[item_id] += 1
         else:
             materials[item_id] = 1
+        game.resources.mark_dirty()  # Sửa dict tại chỗ: setattr không bắt được
         
         # Save state
-        _game_instance._save_state()
+        game._save_state()
         
         return {
             "success": True,
@@ -584,7 +654,7 @@ async def buy_item(request: dict):
                 "name": item.get('name', ''),
                 "type": item.get('type', '')
             },
-            "remaining_money": _game_instance.resources.spirit_stones
+            "remaining_money": game.resources.spirit_stones
         }
     except HTTPException:
         raise
@@ -594,15 +664,12 @@ async def buy_item(request: dict):
 
 
 @app.get("/skills/available")
-async def get_available_skills():
+async def get_available_skills(save_id: Optional[str] = None):
     """Get available skills"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(save_id)
     
     try:
-        skills = _game_instance._get_available_skills()
+        skills = game._get_available_skills()
         return {"skills": skills}
     except Exception as e:
         logger.error(f"Error getting skills: {e}")
@@ -612,10 +679,7 @@ async def get_available_skills():
 @app.post("/skills/learn")
 async def learn_skill(request: dict):
     """Learn a skill"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(request.get("save_id"))
     
     skill_id = request.get("skill_id")
     if not skill_id:
@@ -635,15 +699,12 @@ async def learn_skill(request: dict):
 
 
 @app.get("/quests/available")
-async def get_available_quests():
+async def get_available_quests(save_id: Optional[str] = None):
     """Get available quests"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(save_id)
     
     try:
-        quests_info = _game_instance._get_quests_info()
+        quests_info = game._get_quests_info()
         return quests_info
     except Exception as e:
         logger.error(f"Error getting quests: {e}")
@@ -653,10 +714,7 @@ async def get_available_quests():
 @app.post("/combat/start")
 async def start_combat(request: dict):
     """Start combat"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(request.get("save_id"))
     
     enemy_id = request.get("enemy_id")
     if not enemy_id:
@@ -681,10 +739,7 @@ async def start_combat(request: dict):
 @app.post("/combat/action")
 async def combat_action(request: dict):
     """Perform combat action"""
-    global _game_instance
-    
-    if not _game_instance:
-        raise HTTPException(status_code=400, detail="No active game")
+    game = await _get_game(request.get("save_id"))
     
     try:
         # Simplified combat action
@@ -0,0 +1,290 @@
+"""
+Session Manager - Nhiều game session trong một worker
+LRU các CultivationSimulator đang live, keyed by save_id
+
+- Cache miss: lazy rehydrate từ data/saves/{save_id}.db (miss đồng thời cùng save_id
+  chờ chung 1 lần load)
+- Eviction (LRU / idle / memory budget): flush state (flush_state) trước khi bỏ;
+  vượt memory budget chỉ evict tối đa SESSION_MEMORY_EVICT_BATCH session / lần register
+- Không evict session đang xử lý turn (_turn_lock đang giữ)
+"""
+
+import gc
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_LIVE_SESSIONS = int(os.getenv("MAX_LIVE_SESSIONS", "32"))
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "0"))  # 0 = không giới hạn
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))  # seconds
+# RSS hiếm khi giảm ngay sau gc.collect(): không evict tới khi RSS < budget, chỉ vài session / lần
+SESSION_MEMORY_EVICT_BATCH = int(os.getenv("SESSION_MEMORY_EVICT_BATCH", "2"))
+
+
+def get_process_rss_mb() -> Optional[float]:
+    """Current process RSS in MB (psutil nếu có, fallback /proc), None nếu không đo được"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _SessionEntry:
+    """Live session + thời điểm dùng gần nhất"""
+
+    __slots__ = ("game", "last_used")
+
+    def __init__(self, game: Any):
+        self.game = game
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    """
+    LRU registry của các game session (CultivationSimulator) theo save_id
+
+    Thread-safe: dict ops được bảo vệ bởi lock; việc dựng/rehydrate simulator
+    (nặng: load world data, init DB) chạy ngoài lock.
+    """
+
+    def __init__(
+        self,
+        factory: Optional[Callable[[str], Any]] = None,
+        saves_dir: str = "data/saves",
+        max_sessions: int = MAX_LIVE_SESSIONS,
+        memory_budget_mb: float = SESSION_MEMORY_BUDGET_MB,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT,
+        memory_evict_batch: int = SESSION_MEMORY_EVICT_BATCH
+    ):
+        if factory is None:
+            from game import CultivationSimulator
+            factory = CultivationSimulator
+
+        self.factory = factory
+        self.saves_dir = Path(saves_dir)
+        self.max_sessions = max(1, max_sessions)
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout = idle_timeout
+        self.memory_evict_batch = max(1, memory_evict_batch)
+
+        self._sessions: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        # save_id -> Future của lần rehydrate đang chạy (miss đồng thời chỉ dựng 1 simulator)
+        self._loading: Dict[str, Future] = {}
+
+        # Session tạo/load gần nhất (cho client cũ không gửi save_id)
+        self.last_save_id: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- LOOKUP ---
+
+    def get(self, save_id: str) -> Any:
+        """
+        Get live session, rehydrate từ save DB nếu chưa có trong cache
+
+        Raises:
+            KeyError: save_id không có trong cache và không có file save
+        """
+        with self._lock:
+            entry = self._sessions.get(save_id)
+            if entry:
+                self._sessions.move_to_end(save_id)
+                entry.last_used = time.monotonic()
+                self.hits += 1
+                return entry.game
+            loading = self._loading.get(save_id)
+            if loading is None:
+                loading = self._loading[save_id] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # Request khác đang rehydrate save này: dùng chung kết quả
+            return loading.result()
+
+        try:
+            if not self.save_exists(save_id):
+                raise KeyError(save_id)
+            self.misses += 1
+            logger.info(f"Session cache miss, rehydrating: {save_id}")
+            game = self._register(save_id, self.factory(save_id))
+        except BaseException as e:
+            loading.set_exception(e)
+            raise
+        else:
+            loading.set_result(game)
+            return game
+        finally:
+            with self._lock:
+                self._loading.pop(save_id, None)
+
+    def peek(self, save_id: str) -> Optional[Any]:
+        """Get live session nếu có, không rehydrate, không đổi LRU order"""
+        with self._lock:
+            entry = self._sessions.get(save_id)
+            return entry.game if entry else None
+
+    def create(self, save_id: str) -> Any:
+        """Tạo session mới (new game)"""
+        game = self.factory(save_id)
+        return self._register(save_id, game)
+
+    def save_exists(self, save_id: str) -> bool:
+        """Check save DB file exists"""
+        return (self.saves_dir / f"{save_id}.db").exists()
+
+    def __contains__(self, save_id: str) -> bool:
+        with self._lock:
+            return save_id in self._sessions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    # --- EVICTION ---
+
+    def remove(self, save_id: str, flush: bool = True) -> bool:
+        """Bỏ session khỏi cache (flush state trước nếu flush=True)"""
+        with self._lock:
+            entry = self._sessions.pop(save_id, None)
+            if self.last_save_id == save_id:
+                self.last_save_id = None
+        if not entry:
+            return False
+        if flush:
+            self._flush(save_id, entry.game)
+        elif hasattr(entry.game, "discard_state"):
+            entry.game.discard_state()
+        return True
+
+    def evict_idle(self) -> List[str]:
+        """Evict sessions không dùng quá idle_timeout (gọi định kỳ)"""
+        if self.idle_timeout <= 0:
+            return []
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [
+                sid for sid, entry in self._sessions.items()
+                if entry.last_used < cutoff and not self._is_busy(entry.game)
+            ]
+        evicted = [sid for sid in idle if self._evict(sid)]
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle sessions: {evicted}")
+            gc.collect()
+        return evicted
+
+    def flush_all(self):
+        """Flush state của mọi session (shutdown)"""
+        with self._lock:
+            items = list(self._sessions.items())
+        for save_id, entry in items:
+            self._flush(save_id, entry.game)
+
+    def stats(self) -> Dict[str, Any]:
+        """Session cache statistics"""
+        total = self.hits + self.misses
+        with self._lock:
+            live = list(self._sessions.keys())
+        return {
+            "live_sessions": len(live),
+            "max_sessions": self.max_sessions,
+            "memory_budget_mb": self.memory_budget_mb,
+            "rss_mb": get_process_rss_mb(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / total * 100) if total else 0:.1f}%",
+            "evictions": self.evictions,
+            "save_ids": live
+        }
+
+    # --- INTERNAL ---
+
+    def _register(self, save_id: str, game: Any) -> Any:
+        with self._lock:
+            existing = self._sessions.get(save_id)
+            if existing and existing.game is not game and self._is_busy(existing.game):
+                # Một request khác đã rehydrate và đang chạy turn - dùng instance đó
+                self._sessions.move_to_end(save_id)
+                return existing.game
+            self._sessions[save_id] = _SessionEntry(game)
+            self._sessions.move_to_end(save_id)
+            self.last_save_id = save_id
+
+        self._enforce_limits(keep=save_id)
+        return game
+
+    def _enforce_limits(self, keep: str):
+        """Evict LRU sessions khi vượt max_sessions hoặc memory budget"""
+        evicted = False
+        while True:
+            with self._lock:
+                over_count = len(self._sessions) > self.max_sessions
+                candidates = [
+                    sid for sid, entry in self._sessions.items()
+                    if sid != keep and not self._is_busy(entry.game)
+                ]
+            if not over_count or not candidates:
+                break
+            # candidates giữ LRU order: phần tử đầu là ít dùng nhất
+            evicted |= self._evict(candidates[0])
+
+        if self.memory_budget_mb > 0:
+            # RSS đọc 1 lần: allocator hiếm khi trả RAM cho OS ngay, đọc lại sau mỗi
+            # evict sẽ thấy vẫn vượt và bỏ hết session idle
+            rss = get_process_rss_mb()
+            if rss is not None and rss > self.memory_budget_mb:
+                with self._lock:
+                    candidates = [
+                        sid for sid, entry in self._sessions.items()
+                        if sid != keep and not self._is_busy(entry.game)
+                    ]
+                for sid in candidates[:self.memory_evict_batch]:
+                    evicted |= self._evict(sid)
+                logger.info(f"RSS {rss:.0f}MB > budget {self.memory_budget_mb:.0f}MB, "
+                            f"evicted up to {self.memory_evict_batch} LRU sessions")
+
+        if evicted:
+            gc.collect()
+
+    def _evict(self, save_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.get(save_id)
+            if not entry or self._is_busy(entry.game):
+                return False
+            del self._sessions[save_id]
+            if self.last_save_id == save_id:
+                self.last_save_id = None
+            self.evictions += 1
+        logger.info(f"Evicting session: {save_id}")
+        self._flush(save_id, entry.game)
+        return True
+
+    @staticmethod
+    def _is_busy(game: Any) -> bool:
+        lock = getattr(game, "_turn_lock", None)
+        return bool(lock and lock.locked())
+
+    @staticmethod
+    def _flush(save_id: str, game: Any):
+        try:
+            game.flush_state()
+        except Exception as e:
+            logger.error(f"Failed to flush session {save_id}: {e}")
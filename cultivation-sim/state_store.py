@@ -0,0 +1,251 @@
+"""
+Write-behind Game State - _save_state không ghi SQLite trong turn
+Simulator chỉ stage các column đã đổi (component tự đánh dấu dirty); nhiều lần
+_save_state trong 1 turn / nhiều turn gộp thành 1 UPSERT + 1 commit, do
+StateFlushWorker chạy nền theo interval, khi evict session và khi shutdown.
+
+Crash-safe: mỗi lần stage append 1 dòng JSON vào journal <save>.db.state-wal
+(write + flush, không fsync: sống sót khi process crash). Load save đọc DB rồi
+replay journal (nếu còn) và flush ngay; journal bị xoá sau mỗi commit thành công.
+"""
+
+import os
+import json
+import threading
+import logging
+import weakref
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "2.0"))  # giây
+STATE_JOURNAL = os.getenv("STATE_JOURNAL", "1") != "0"
+
+
+class StateJournal:
+    """Append-only journal (JSON lines) của column đã stage nhưng chưa commit"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = None
+
+    def append(self, columns: Dict[str, Any]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(columns, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def replay(self) -> Dict[str, Any]:
+        """Gộp các dòng theo thứ tự (dòng cuối bị cắt dở khi crash: bỏ qua)"""
+        columns: Dict[str, Any] = {}
+        if not self.path.exists():
+            return columns
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    columns.update(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return columns
+
+    def reset(self, columns: Optional[Dict[str, Any]] = None):
+        """Xoá journal (giữ lại columns còn pending nếu có)"""
+        self.close()
+        if columns:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(columns, ensure_ascii=False) + "\n")
+        elif self.path.exists():
+            self.path.unlink()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StateWriter:
+    """
+    Dirty columns của 1 row game_state (coalesce: column stage sau ghi đè stage trước)
+
+    transaction: context manager bao quanh UPSERT và commit khi thoát
+    (Memory3Tier.batch - cùng lock với connection dùng chung).
+    on_flush: gọi sau mỗi commit với các column vừa ghi (VD: cập nhật save catalog).
+    """
+
+    def __init__(
+        self,
+        conn: Any,
+        save_id: str,
+        transaction: Optional[Callable[[], ContextManager]] = None,
+        journal_path: Optional[str] = None,
+        on_flush: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.conn = conn
+        self.save_id = save_id
+        self._transaction = transaction
+        self._on_flush = on_flush
+        self._journal = StateJournal(journal_path) if journal_path and STATE_JOURNAL else None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+
+        self.staged = 0
+        self.flushes = 0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def stage(self, columns: Dict[str, Any]):
+        """Ghi nhận column đã đổi (không chạm SQLite)"""
+        if not columns:
+            return
+        with self._lock:
+            self._pending.update(columns)
+            self.staged += 1
+            if self._journal is not None:
+                self._journal.append(columns)
+
+    def recover(self) -> Dict[str, Any]:
+        """Column còn trong journal (process trước crash trước khi flush)"""
+        return self._journal.replay() if self._journal is not None else {}
+
+    def flush(self) -> int:
+        """
+        UPSERT các column dirty + commit
+
+        Returns:
+            Số column đã ghi (0 nếu không có gì dirty)
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        columns = list(pending) + ["updated_at"]
+        values = list(pending.values()) + [datetime.now().isoformat()]
+        try:
+            with self._transaction() if self._transaction else nullcontext():
+                self.conn.execute(f"""
+                    INSERT INTO game_state (save_id, {", ".join(columns)})
+                    VALUES (?, {", ".join("?" * len(columns))})
+                    ON CONFLICT(save_id) DO UPDATE SET
+                        {", ".join(f"{column} = excluded.{column}" for column in columns)}
+                """, [self.save_id] + values)
+                if not self._transaction:
+                    self.conn.commit()
+        except Exception:
+            # Giữ lại để lần flush sau ghi (column stage trong lúc đó mới hơn)
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            raise
+
+        with self._lock:
+            if self._journal is not None:
+                self._journal.reset(self._pending)
+        self.flushes += 1
+
+        if self._on_flush is not None:
+            try:
+                self._on_flush(dict(zip(columns, values)))
+            except Exception as e:
+                logger.warning(f"State flush hook failed for {self.save_id}: {e}")
+        return len(pending)
+
+    def discard(self):
+        """Bỏ column chưa ghi + journal (save đang bị xoá)"""
+        with self._lock:
+            self._pending = {}
+            if self._journal is not None:
+                self._journal.reset()
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+
+
+class StateFlushWorker:
+    """
+    Background thread flush StateWriter của mọi session theo interval
+
+    Chỉ ghi column đã stage (không đọc field của simulator từ thread này).
+    Giữ weakref nên session bị evict (đã flush đồng bộ) tự rời lịch.
+    """
+
+    def __init__(self, interval: float = STATE_FLUSH_INTERVAL):
+        self.interval = interval
+        self._targets: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def register(self, target: Any):
+        with self._lock:
+            self._targets.add(target)
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._loop, name="cultivation-state-flush", daemon=True)
+                self._thread.start()
+
+    def unregister(self, target: Any):
+        with self._lock:
+            self._targets.discard(target)
+
+    def flush_all(self) -> int:
+        """Flush mọi writer đang dirty; trả số writer đã ghi"""
+        with self._lock:
+            targets = list(self._targets)
+        flushed = 0
+        for target in targets:
+            if not target.dirty:
+                continue
+            try:
+                if target.flush():
+                    flushed += 1
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"State flush failed for {getattr(target, 'save_id', target)}: {e}")
+        self.runs += 1
+        self.flushes += flushed
+        return flushed
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush_all()
+
+    def shutdown(self):
+        """Dừng thread và flush lần cuối"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            targets = len(self._targets)
+        return {
+            "sessions": targets,
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
+
+
+# Global worker (1 thread / process)
+_state_flusher: Optional[StateFlushWorker] = None
+_state_flusher_lock = threading.Lock()
+
+
+def get_state_flusher() -> StateFlushWorker:
+    """Get or create the process-wide state flush worker"""
+    global _state_flusher
+    with _state_flusher_lock:
+        if _state_flusher is None:
+            _state_flusher = StateFlushWorker()
+        return _state_flusher
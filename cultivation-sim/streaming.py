@@ -0,0 +1,122 @@
+"""
+Streaming helpers cho Cultivation Simulator
+Parse "narrative" từ JSON đang được sinh dở (partial JSON) để đẩy token ra client sớm
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+_NARRATIVE_KEY = re.compile(r'"narrative"\s*:\s*"')
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class NarrativeStreamParser:
+    """
+    Incremental parser cho field "narrative" trong JSON response của AI
+
+    AI trả về JSON dạng {"narrative": "...", "choices": [...], ...} theo từng chunk.
+    Parser giữ toàn bộ text đã nhận (để parse đầy đủ ở cuối) và decode dần
+    giá trị string của "narrative" ngay khi token tới, kể cả khi escape sequence
+    bị cắt ngang giữa 2 chunk.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.narrative = ""
+        self.done = False
+        self._pos: Optional[int] = None  # Vị trí đang decode trong buffer
+        self._pending_surrogate: Optional[int] = None
+
+    @property
+    def started(self) -> bool:
+        """True khi đã tìm thấy field narrative"""
+        return self._pos is not None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Thêm chunk mới, trả về phần narrative mới decode được (có thể rỗng)
+        """
+        self.buffer += chunk
+
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = _NARRATIVE_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        delta = self._decode_available()
+        self.narrative += delta
+        return delta
+
+    def _decode_available(self) -> str:
+        """Decode các ký tự hoàn chỉnh từ _pos; dừng lại nếu escape chưa đủ"""
+        buf = self.buffer
+        pos = self._pos
+        out = []
+
+        while pos < len(buf):
+            char = buf[pos]
+
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+
+            if char != '\\':
+                out.append(char)
+                pos += 1
+                continue
+
+            # Escape sequence - cần ít nhất 1 ký tự sau dấu \
+            if pos + 1 >= len(buf):
+                break
+
+            esc = buf[pos + 1]
+            if esc == 'u':
+                if pos + 6 > len(buf):
+                    break
+                try:
+                    code = int(buf[pos + 2:pos + 6], 16)
+                except ValueError:
+                    code = 0xFFFD
+                pos += 6
+                out.append(self._decode_codepoint(code))
+                continue
+
+            out.append(_SIMPLE_ESCAPES.get(esc, esc))
+            pos += 2
+
+        self._pos = pos
+        return "".join(out)
+
+    def _decode_codepoint(self, code: int) -> str:
+        """Ghép surrogate pair (\\ud83d\\ude00) thành 1 ký tự"""
+        if 0xD800 <= code <= 0xDBFF:
+            self._pending_surrogate = code
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._pending_surrogate is not None:
+            high = self._pending_surrogate
+            self._pending_surrogate = None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        self._pending_surrogate = None
+        return chr(code)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format 1 Server-Sent Event"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,143 @@
+"""
+Rolling Summary Worker - Tóm tắt short-term overflow ngoài request path
+Memory3Tier xếp hàng entry bị rollover; worker gom batch, gọi summarizer
+(AI hoặc extractive) và ghi rolling_summary. get_full_context luôn dùng
+summary hoàn tất gần nhất, nên lượt chơi không bao giờ chờ LLM tóm tắt.
+
+Summary là "rolling": mỗi lần tóm tắt = summary trước + batch mới, nên
+context của nhân vật 100+ năm vẫn bị chặn ở 1 đoạn ngắn.
+"""
+
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "10"))  # entries / lần tóm tắt
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "1"))
+ROLLING_SUMMARY_AI = os.getenv("ROLLING_SUMMARY_AI", "1") != "0"
+SUMMARY_MAX_CHARS = 1500  # Extractive summary: giữ phần mới nhất
+
+
+def simple_summary(previous: Optional[str], conversations: List[str], max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Extractive summary (không AI): summary trước + mỗi entry 1 dòng ngắn, cắt phần cũ"""
+    lines = [previous] if previous else []
+    for conversation in conversations:
+        conversation = " ".join(conversation.split())
+        lines.append(f"- {conversation[:120]}{'...' if len(conversation) > 120 else ''}")
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        text = text[-max_chars:]
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    return text
+
+
+class RollingSummaryWorker:
+    """
+    Thread pool tóm tắt rolling summary cho mọi session
+
+    Coalescing: mỗi Memory3Tier tối đa 1 job đang chạy; entry đến trong lúc
+    job chạy được job đó lấy tiếp (loop) thay vì tạo job mới.
+    """
+
+    def __init__(self, max_workers: int = SUMMARY_WORKERS, batch_size: int = SUMMARY_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="cultivation-summary"
+        )
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, Future] = {}
+
+        self.summaries = 0
+        self.failures = 0
+
+    def submit(self, memory: Any, summarizer: Any = None, force: bool = False) -> bool:
+        """
+        Lên lịch tóm tắt nếu memory đủ batch (hoặc force)
+
+        Returns:
+            True nếu tạo job mới, False nếu chưa đủ batch / đã có job đang chạy
+        """
+        if not force and memory.pending_summary_count() < self.batch_size:
+            return False
+        with self._lock:
+            if id(memory) in self._in_flight:
+                return False
+            future = self._executor.submit(self._run, memory, summarizer, force)
+            self._in_flight[id(memory)] = future
+        return True
+
+    def _run(self, memory: Any, summarizer: Any, force: bool):
+        try:
+            while True:
+                batch = memory.take_summary_batch()
+                if not batch:
+                    break
+                try:
+                    self._summarize(memory, summarizer, batch)
+                    self.summaries += 1
+                except Exception as e:
+                    self.failures += 1
+                    memory.requeue_summary_batch(batch)
+                    logger.warning(f"Rolling summary failed for {memory.save_id}: {e}")
+                    break
+                if not force and memory.pending_summary_count() < self.batch_size:
+                    break
+        finally:
+            with self._lock:
+                self._in_flight.pop(id(memory), None)
+
+    @staticmethod
+    def _summarize(memory: Any, summarizer: Any, batch: List[Dict[str, Any]]):
+        conversations = [f"{e.get('speaker', 'unknown')}: {e.get('content', '')}" for e in batch]
+        latest = memory.get_latest_summary()
+        previous = latest["summary_text"] if latest else None
+
+        if summarizer is not None:
+            summary = summarizer.create_summary(conversations, previous_summary=previous)
+        else:
+            summary = simple_summary(previous, conversations)
+
+        period_start = datetime.fromisoformat(latest["period_start"]) if latest else \
+            datetime.fromisoformat(batch[0]["timestamp"])
+        period_end = datetime.fromisoformat(batch[-1]["timestamp"])
+        memory.create_rolling_summary(period_start, period_end, summary)
+
+    def drain(self, timeout: Optional[float] = None):
+        """Chờ các job đang chạy xong (shutdown / benchmark)"""
+        with self._lock:
+            futures = list(self._in_flight.values())
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "in_flight": in_flight,
+            "batch_size": self.batch_size,
+        }
+
+
+# Global worker (1 pool / process)
+_summary_worker: Optional[RollingSummaryWorker] = None
+_summary_worker_lock = threading.Lock()
+
+
+def get_summary_worker() -> RollingSummaryWorker:
+    """Get or create the process-wide rolling summary worker"""
+    global _summary_worker
+    with _summary_worker_lock:
+        if _summary_worker is None:
+            _summary_worker = RollingSummaryWorker()
+        return _summary_worker
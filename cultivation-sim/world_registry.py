@@ -0,0 +1,122 @@
+"""
+World Registry - Dữ liệu thế giới read-only, load 1 lần / process
+Share by reference giữa mọi CultivationSimulator / CultivationAgent
+
+Chỉ chứa dữ liệu KHÔNG đổi trong lúc chơi (World Bible, World Database, skills,
+naming grammar, physiques, spawn tables, giá item, prompt). State mutable
+(rng, stock/auctions, combat, social graph...) vẫn nằm trong từng session.
+"""
+
+import json
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from world_bible import WorldBible
+from world_database import WorldDatabase
+from skill_system import SkillSystem
+from naming_system import NamingSystem
+from physique_system_v2 import PhysiqueSystemV2 as PhysiqueSystem
+
+# RAM Optimization (optional) - shared cache, cũng chỉ cần 1 instance / process
+try:
+    from optimizations import OptimizedCultivationGame
+    HAS_OPTIMIZATIONS = True
+except ImportError:
+    HAS_OPTIMIZATIONS = False
+    OptimizedCultivationGame = None
+
+logger = logging.getLogger(__name__)
+
+
+class WorldRegistry:
+    """
+    Process-wide world data (read-only sau khi load)
+
+    Các session chỉ đọc; muốn sửa dữ liệu thế giới thì sửa JSON và gọi
+    reset_world_registry() (hoặc restart server).
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = Path(data_dir)
+        self._shared: Dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+
+        self.optimizations = self._init_optimizations()
+
+        # World Bible (tạo file mặc định nếu chưa có)
+        bible_path = self.data_dir / "world_bible.json"
+        self.world_bible = WorldBible.load_from_file(str(bible_path))
+        if not bible_path.exists():
+            self.world_bible.save_to_file(str(bible_path))
+
+        self.world_db = WorldDatabase(str(self.data_dir), self.optimizations)
+        self.skill_system = SkillSystem(str(self.data_dir / "skills"))
+        self.naming_system = NamingSystem(str(self.data_dir))
+        self.physique_system = PhysiqueSystem()
+        self.item_price_data: List[Dict] = self._load_json("item_prices.json", [])
+        self.spawn_tables: Dict[str, Dict] = self._load_json("spawn_tables.json", {}).get("spawn_tables", {})
+        self.talents: Dict[str, Dict] = {
+            t.get("name"): t for t in self._load_json("talents_ai_friendly.json", [])
+        }
+
+        prompt_path = self.data_dir / "prompts" / "master.md"
+        self.master_prompt: Optional[str] = (
+            prompt_path.read_text(encoding="utf-8") if prompt_path.exists() else None
+        )
+
+    def _init_optimizations(self):
+        if not HAS_OPTIMIZATIONS:
+            return None
+        try:
+            logger.info("Initializing RAM optimizations...")
+            return OptimizedCultivationGame()
+        except Exception as e:
+            logger.warning(f"Could not initialize optimizations: {e}. Using standard mode.")
+            return None
+
+    def _load_json(self, filename: str, default: Any) -> Any:
+        path = self.data_dir / filename
+        if not path.exists():
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Error loading {filename}: {e}")
+            return default
+
+    def shared(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Get-or-create object dùng chung (VD: Gemini model đã build system instruction)
+
+        factory chỉ được gọi 1 lần cho mỗi key; exception không được cache.
+        """
+        with self._lock:
+            if key not in self._shared:
+                self._shared[key] = factory()
+            return self._shared[key]
+
+
+# Global registry (1 instance / process / data_dir)
+_registries: Dict[str, WorldRegistry] = {}
+_registry_lock = threading.Lock()
+
+
+def get_world_registry(data_dir: str = "data") -> WorldRegistry:
+    """Get or create WorldRegistry (load world data lần đầu gọi)"""
+    key = str(Path(data_dir).resolve())
+    with _registry_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            logger.info(f"Loading world registry from {data_dir}")
+            registry = WorldRegistry(data_dir)
+            _registries[key] = registry
+        return registry
+
+
+def reset_world_registry():
+    """Bỏ registry hiện tại (reload JSON ở lần get tiếp theo)"""
+    with _registry_lock:
+        _registries.clear()
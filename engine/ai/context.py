@@ -43,13 +43,11 @@ class ContextBuilder:
     def _get_visible_entities(self, room_id: str, player_id: int) -> List[Dict[str, Any]]:
         """Get list of visible entities in the room"""
         entities = []
-        entity_ids = self.em.find_at_location(room_id)
+        entity_ids = [eid for eid in self.em.find_at_location(room_id) if eid != player_id]
+        identities = self.em.get_many(entity_ids, IdentityComponent)
         
         for eid in entity_ids:
-            if eid == player_id:
-                continue
-                
-            identity = self.em.get(eid, IdentityComponent)
+            identity = identities.get(eid)
             if identity:
                 entities.append({
                     'id': eid,
@@ -62,8 +60,9 @@ class ContextBuilder:
     def _get_inventory_items(self, item_ids: List[int]) -> List[Dict[str, Any]]:
         """Get details of items in inventory"""
         items = []
+        identities = self.em.get_many(item_ids, IdentityComponent)
         for iid in item_ids:
-            identity = self.em.get(iid, IdentityComponent)
+            identity = identities.get(iid)
             if identity:
                 items.append({
                     'id': iid,
@@ -4,6 +4,7 @@ Core ECS components
 
 from .components import *
 from .database import Database, get_db
+from .columnar import ColumnarStore, ArchetypeView, HAS_NUMPY
 from .events import GameEvent, EventBus, get_event_bus
 from .entity import EntityManager, get_entity_manager
 
@@ -12,6 +13,11 @@ __all__ = [
     'Database',
     'get_db',
     
+    # Columnar store (numpy)
+    'ColumnarStore',
+    'ArchetypeView',
+    'HAS_NUMPY',
+    
     # Events
     'GameEvent',
     'EventBus',
@@ -0,0 +1,281 @@
+"""
+Component Codecs - định dạng cột data của bảng components
+
+- json:    pydantic JSON text (mặc định, như cũ)
+- struct:  nhị phân theo schema suy từ field của model: field cố định (int / float / bool)
+           pack 1 lần bằng struct, field thay đổi độ dài (str, datetime, list[int], JSON) nối sau
+- msgpack: model_dump(mode="json") qua msgpack (cần pip install msgpack)
+
+Blob nhị phân: 1 byte format + uint16 schema version + payload. Mỗi save giữ bảng
+component_schemas (component_type, version, fields): đổi field của model -> version mới,
+blob cũ vẫn đọc được theo layout của version cũ (field thiếu lấy default của model).
+
+Codec chỉ quyết định định dạng GHI; đọc nhận mọi định dạng (TEXT = JSON, BLOB theo
+byte đầu), nên save trộn JSON / nhị phân vẫn chạy và migrate được từng phần.
+Đọc lazy: to_dict(wanted=...) / field() chỉ giải mã field cần (index vị trí, tags, ColumnarStore).
+
+Migrate 1 save: python -m engine.core.codecs data/world.db --format struct
+"""
+
+import json
+import os
+import sqlite3
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import pydantic_core
+from pydantic import BaseModel
+
+from .components import COMPONENT_REGISTRY
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    msgpack = None
+    HAS_MSGPACK = False
+
+COMPONENT_CODEC = os.getenv("COMPONENT_CODEC", "json")  # json | struct | msgpack
+
+FORMATS = ("json", "struct", "msgpack")
+_FORMAT_IDS = {"struct": 1, "msgpack": 2}
+_FORMAT_NAMES = {v: k for k, v in _FORMAT_IDS.items()}
+_HEADER = struct.Struct("<BH")
+_LENGTH = struct.Struct("<I")
+
+# Loại field trong layout: cố định (struct) hoặc thay đổi độ dài (độ dài + bytes)
+_FIXED = {int: "q", float: "d", bool: "?"}
+_DATETIME = "T"  # int64 micro giây từ epoch (datetime naive)
+_STR, _INTS, _JSON = "s", "I", "j"
+_FIXED_KINDS = {"q": "q", "d": "d", "?": "?", _DATETIME: "q"}
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_LONG = 0xFF  # độ dài >= 255: byte 0xFF + uint32
+
+Data = Union[str, bytes]
+
+
+def _field_kind(annotation) -> str:
+    if annotation in _FIXED:
+        return _FIXED[annotation]
+    if annotation is datetime:
+        return _DATETIME
+    if annotation is str:
+        return _STR
+    if annotation == List[int]:
+        return _INTS
+    args = getattr(annotation, "__args__", ())
+    if getattr(annotation, "__origin__", None) is not None and args and all(isinstance(a, str) for a in args):
+        return _STR  # Literal["a", "b"]
+    return _JSON
+
+
+class Layout:
+    """Layout nhị phân của 1 version schema: field cố định trước, field thay đổi độ dài sau"""
+
+    def __init__(self, fields: List[Tuple[str, str]]):
+        self.fields = fields
+        self.fixed = [(name, kind) for name, kind in fields if kind in _FIXED_KINDS]
+        self.variable = [(name, kind) for name, kind in fields if kind not in _FIXED_KINDS]
+        self.struct = struct.Struct("<" + "".join(_FIXED_KINDS[kind] for _, kind in self.fixed))
+        self.fixed_names = [name for name, _ in self.fixed]
+        self.datetimes = [name for name, kind in self.fixed if kind == _DATETIME]
+
+    @classmethod
+    def of(cls, component_class: Type[BaseModel]) -> "Layout":
+        return cls([(name, _field_kind(field.annotation)) for name, field in component_class.model_fields.items()])
+
+    def to_json(self) -> str:
+        return json.dumps(self.fields)
+
+    def encode(self, values: Dict[str, Any]) -> bytes:
+        """values: giá trị field (object Python hoặc dạng JSON)"""
+        fixed = [values[name] for name in self.fixed_names]
+        for name in self.datetimes:
+            i = self.fixed_names.index(name)
+            value = fixed[i] if isinstance(fixed[i], datetime) else datetime.fromisoformat(fixed[i])
+            if value.tzinfo is not None:
+                raise ValueError(f"{name}: codec struct chỉ lưu datetime naive")
+            fixed[i] = (value - _EPOCH) // _MICROSECOND
+        parts = [self.struct.pack(*fixed)]
+        for name, kind in self.variable:
+            value = values[name]
+            if kind == _STR:
+                raw = value.encode("utf-8")
+            elif kind == _INTS:
+                raw = struct.pack(f"<{len(value)}q", *value)
+            else:
+                raw = pydantic_core.to_json(value)
+            parts.append(bytes((len(raw),)) if len(raw) < _LONG else bytes((_LONG,)) + _LENGTH.pack(len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+    def decode(self, payload: bytes, offset: int = 0, wanted: Optional[Iterable[str]] = None,
+               native: bool = False) -> Dict[str, Any]:
+        """
+        payload[offset:] -> dict field (wanted: chỉ giải mã các field này)
+        native=False: dạng JSON (datetime -> chuỗi ISO) như json.loads của codec json
+        """
+        wanted = set(wanted) if wanted is not None else None
+        values = dict(zip(self.fixed_names, self.struct.unpack_from(payload, offset)))
+        for name in self.datetimes:
+            value = _EPOCH + values[name] * _MICROSECOND
+            values[name] = value if native else value.isoformat()
+        if wanted is not None:
+            values = {name: value for name, value in values.items() if name in wanted}
+        offset += self.struct.size
+        for name, kind in self.variable:
+            if wanted is not None and not wanted - values.keys():
+                break
+            length = payload[offset]
+            offset += 1
+            if length == _LONG:
+                (length,) = _LENGTH.unpack_from(payload, offset)
+                offset += _LENGTH.size
+            if wanted is None or name in wanted:
+                raw = payload[offset:offset + length]
+                if kind == _STR:
+                    values[name] = raw.decode("utf-8")
+                elif kind == _INTS:
+                    values[name] = list(struct.unpack(f"<{length // 8}q", raw))
+                else:
+                    values[name] = pydantic_core.from_json(raw)
+            offset += length
+        return values
+
+
+class ComponentCodec:
+    """Encode / decode cột data (1 instance / Database: giữ schema version của save đó)"""
+
+    def __init__(self, format: str = COMPONENT_CODEC):
+        if format not in FORMATS:
+            raise ValueError(f"Component codec không hỗ trợ: {format} (chọn {', '.join(FORMATS)})")
+        if format == "msgpack" and not HAS_MSGPACK:
+            raise RuntimeError("COMPONENT_CODEC=msgpack cần pip install msgpack")
+        self.format = format
+        self._conn: Optional[sqlite3.Connection] = None
+        self._layouts: Dict[Tuple[str, int], Layout] = {}
+        self._current: Dict[str, Tuple[int, Layout]] = {}
+
+    def attach(self, conn: sqlite3.Connection):
+        """Tạo / đọc bảng component_schemas của save (gọi trong _init_database)"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS component_schemas (
+                component_type TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                fields TEXT NOT NULL,
+                PRIMARY KEY (component_type, version)
+            )
+        """)
+        self._conn = conn
+        self._layouts = {
+            (row[0], row[1]): Layout([tuple(field) for field in json.loads(row[2])])
+            for row in conn.execute("SELECT component_type, version, fields FROM component_schemas")
+        }
+        self._current = {}
+
+    def _layout(self, component_type: str) -> Tuple[int, Layout]:
+        """Version hiện tại của loại component (thêm version mới nếu model đổi field)"""
+        current = self._current.get(component_type)
+        if current is None:
+            layout = Layout.of(COMPONENT_REGISTRY[component_type])
+            versions = [v for (t, v) in self._layouts if t == component_type]
+            version = next((v for v in versions if self._layouts[(component_type, v)].fields == layout.fields), None)
+            if version is None:
+                version = max(versions, default=0) + 1
+                self._conn.execute(
+                    "INSERT INTO component_schemas (component_type, version, fields) VALUES (?, ?, ?)",
+                    (component_type, version, layout.to_json())
+                )
+                self._layouts[(component_type, version)] = layout
+            current = self._current[component_type] = (version, self._layouts[(component_type, version)])
+        return current
+
+    # --- Ghi ---
+
+    def encode(self, component_type: str, component: BaseModel) -> Data:
+        if self.format == "json" or component_type not in COMPONENT_REGISTRY:
+            return component.model_dump_json()
+        if self.format == "msgpack":
+            return _HEADER.pack(_FORMAT_IDS["msgpack"], 0) + msgpack.packb(component.model_dump(mode="json"))
+        version, layout = self._layout(component_type)
+        return _HEADER.pack(_FORMAT_IDS["struct"], version) + layout.encode(component.__dict__)
+
+    def encode_values(self, component_type: str, values: Dict[str, Any]) -> Data:
+        """dict field dạng JSON (dump_all / ColumnarStore) -> data"""
+        component_class = COMPONENT_REGISTRY.get(component_type)
+        if component_class is None:
+            return json.dumps(values, ensure_ascii=False)
+        if self.format == "json":
+            return json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+        return self.encode(component_type, component_class.model_validate(values))
+
+    # --- Đọc (mọi định dạng) ---
+
+    @staticmethod
+    def format_of(data: Data) -> str:
+        return "json" if isinstance(data, str) else _FORMAT_NAMES[data[0]]
+
+    def _layout_of(self, component_type: str, version: int) -> Layout:
+        layout = self._layouts.get((component_type, version))
+        if layout is None and self._conn is not None:
+            # Version do process khác ghi sau khi attach
+            row = self._conn.execute(
+                "SELECT fields FROM component_schemas WHERE component_type = ? AND version = ?",
+                (component_type, version)
+            ).fetchone()
+            if row is not None:
+                layout = self._layouts[(component_type, version)] = Layout([tuple(f) for f in json.loads(row[0])])
+        if layout is None:
+            raise ValueError(f"Không có schema {component_type} v{version} trong component_schemas")
+        return layout
+
+    def to_dict(self, component_type: str, data: Data, wanted: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """data -> dict dạng JSON (wanted: chỉ các field này - nhị phân không giải mã phần còn lại)"""
+        if isinstance(data, str):
+            values = json.loads(data)
+            return values if wanted is None else {name: values[name] for name in wanted if name in values}
+        format_id, version = _HEADER.unpack_from(data, 0)
+        if format_id == _FORMAT_IDS["msgpack"]:
+            values = msgpack.unpackb(data[_HEADER.size:])
+            return values if wanted is None else {name: values[name] for name in wanted if name in values}
+        return self._layout_of(component_type, version).decode(data, _HEADER.size, wanted)
+
+    def decode(self, component_class: Type[BaseModel], data: Data) -> BaseModel:
+        if isinstance(data, str):
+            return component_class.model_validate_json(data)
+        component_type = component_class.__name__.replace('Component', '').lower()
+        format_id, version = _HEADER.unpack_from(data, 0)
+        if format_id == _FORMAT_IDS["struct"]:
+            # datetime giải mã sẵn thành object (không parse lại chuỗi ISO)
+            return component_class.model_validate(
+                self._layout_of(component_type, version).decode(data, _HEADER.size, native=True)
+            )
+        return component_class.model_validate(self.to_dict(component_type, data))
+
+    def field(self, component_type: str, data: Data, name: str, default: Any = None) -> Any:
+        return self.to_dict(component_type, data, (name,)).get(name, default)
+
+
+def migrate(db_path: str, format: str, chunk: int = 2000, vacuum: bool = False) -> Dict[str, Any]:
+    """Chuyển mọi dòng components của 1 save sang format (xem Database.convert_components)"""
+    from .database import Database
+
+    db = Database(db_path, codec=format)
+    try:
+        return db.convert_components(chunk=chunk, vacuum=vacuum)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chuyển bảng components của save sang codec khác")
+    parser.add_argument("db_path", nargs="?", default="data/world.db")
+    parser.add_argument("--format", default="struct", choices=FORMATS)
+    parser.add_argument("--chunk", type=int, default=2000)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM sau khi chuyển (thu nhỏ file)")
+    args = parser.parse_args()
+    print(migrate(args.db_path, args.format, args.chunk, args.vacuum))
@@ -0,0 +1,501 @@
+"""
+Columnar Store - lưu component số (Stats / Location / State) dạng cột NumPy theo archetype
+
+Archetype = tập loại component mà 1 entity có (trong các loại được theo dõi);
+mỗi archetype giữ 1 mảng NumPy / field + mảng entity_id, nên system chạy mỗi tick
+(hồi máu, AI di chuyển, ...) xử lý cả nghìn NPC bằng 1 phép vector:
+
+    store = em.columnar()
+    for view in store.query(StatsComponent, StateComponent):
+        hp, alive = view["stats.hp"], ~view["state.is_dead"]
+        hp[alive] = np.minimum(hp[alive] + 1, view["stats.max_hp"][alive])
+    store.sync()  # ghi các dòng đổi về bảng components (theo codec của Database)
+
+- Field str (room_id, zone_id) lưu mã int32, so sánh bằng store.code(...)
+- em.add / em.remove / em.delete cập nhật cột ngay (Database gọi on_write / on_delete)
+- Sửa cột chỉ tới SQLite + identity map khi sync(); view hết hiệu lực khi entity
+  đổi archetype (thêm / bỏ component)
+- sync() từ chối cả lượt nếu có dòng phạm ràng buộc Field (VD: hp < 0), không ghi
+  dữ liệu mà get_component không đọc lại được
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from .components import LocationComponent, StateComponent, StatsComponent
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+DEFAULT_COLUMNAR_COMPONENTS = (StatsComponent, LocationComponent, StateComponent)
+_INITIAL_CAPACITY = 64
+
+if HAS_NUMPY:
+    _DTYPES = {int: np.int64, float: np.float64, bool: np.bool_, str: np.int32}
+_JSON_FORMATS = {int: "%d", float: "%r", bool: "%s", str: "%s"}
+_BOUNDS = ("ge", "gt", "le", "lt")
+_JSON_BOOL = ("false", "true")
+
+
+def _component_type(component_class: Type[BaseModel]) -> str:
+    return component_class.__name__.replace('Component', '').lower()
+
+
+class _Schema:
+    """Field -> dtype của 1 loại component (+ bảng mã cho field str)"""
+
+    def __init__(self, component_class: Type[BaseModel]):
+        self.component_class = component_class
+        self.component_type = _component_type(component_class)
+        self.fields: List[str] = []
+        self.dtypes: Dict[str, Any] = {}
+        self.defaults: Dict[str, Any] = {}
+        self.strings: Dict[str, List[str]] = {}
+        self._codes: Dict[str, Dict[str, int]] = {}
+        self._encoded: Dict[str, List[str]] = {}  # chuỗi đã JSON-encode theo mã
+        self._bools: List[str] = []
+        self._floats: List[str] = []
+        # Ràng buộc Field(ge= / gt= / le= / lt=) để sync kiểm bằng phép vector
+        self.bounds: Dict[str, List[Tuple[str, Any]]] = {}
+        # Ràng buộc khác (validator, pattern ...) -> sync phải model_validate từng dòng
+        self.needs_model_validate = bool(component_class.__pydantic_decorators__.field_validators
+                                         or component_class.__pydantic_decorators__.model_validators)
+        formats = []
+        for name, field in component_class.model_fields.items():
+            if field.annotation not in _DTYPES:
+                raise TypeError(f"{component_class.__name__}.{name}: {field.annotation} không lưu dạng cột được")
+            self.fields.append(name)
+            self.dtypes[name] = _DTYPES[field.annotation]
+            self.defaults[name] = None if field.is_required() else field.get_default(call_default_factory=True)
+            if field.annotation is str:
+                self.strings[name] = []
+                self._codes[name] = {}
+                self._encoded[name] = []
+            elif field.annotation is bool:
+                self._bools.append(name)
+            elif field.annotation is float:
+                self._floats.append(name)
+            for constraint in field.metadata:
+                bounds = [(op, getattr(constraint, op)) for op in _BOUNDS if hasattr(constraint, op)]
+                if bounds:
+                    self.bounds.setdefault(name, []).extend(bounds)
+                else:
+                    self.needs_model_validate = True
+            formats.append(f"{json.dumps(name)}:{_JSON_FORMATS[field.annotation]}")
+        # Cùng dạng model_dump_json (compact, không escape unicode)
+        self._template = "{" + ",".join(formats) + "}"
+
+    def code(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.strings[name])
+            self.strings[name].append(value)
+            self._encoded[name].append(json.dumps(value, ensure_ascii=False))
+        return code
+
+    def encode(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """dict field (JSON / model) -> giá trị cột"""
+        row = {}
+        for name in self.fields:
+            value = values.get(name, self.defaults[name])
+            row[name] = self.code(name, value) if name in self._codes else value
+        return row
+
+    def non_finite(self, archetype: "Archetype", rows: "np.ndarray") -> List[str]:
+        """Field float là NaN / ±inf: "%r" ra nan / inf, không phải JSON hợp lệ -> không ghi được"""
+        errors = []
+        for name in self._floats:
+            values = archetype.columns[f"{self.component_type}.{name}"][rows]
+            for i in np.flatnonzero(~np.isfinite(values))[:5]:
+                errors.append(f"entity {archetype.entity_ids[rows[i]]}: {self.component_type}.{name}="
+                              f"{values[i].item()} (cần số hữu hạn)")
+        return errors
+
+    def violations(self, archetype: "Archetype", rows: "np.ndarray") -> List[str]:
+        """Các dòng (trong rows) phạm ràng buộc của model -> mô tả lỗi (rỗng = hợp lệ)"""
+        errors = self.non_finite(archetype, rows)
+        for name, bounds in self.bounds.items():
+            values = archetype.columns[f"{self.component_type}.{name}"][rows]
+            for op, limit in bounds:
+                bad = {"ge": values < limit, "gt": values <= limit, "le": values > limit, "lt": values >= limit}[op]
+                for i in np.flatnonzero(bad)[:5]:
+                    errors.append(f"entity {archetype.entity_ids[rows[i]]}: {self.component_type}.{name}="
+                                  f"{values[i].item()} (cần {op} {limit})")
+        return errors
+
+    def decode(self, raw: Dict[str, List[Any]], i: int) -> Dict[str, Any]:
+        """Dòng i của các cột (mã str) -> dict field của model"""
+        return {
+            name: self.strings[name][raw[name][i]] if name in self._codes else raw[name][i]
+            for name in self.fields
+        }
+
+    def dumps(self, raw: Dict[str, List[Any]]) -> List[str]:
+        """Các cột (mã str) -> JSON từng dòng"""
+        columns = []
+        for name in self.fields:
+            values = raw[name]
+            if name in self._codes:
+                encoded = self._encoded[name]
+                values = [encoded[code] for code in values]
+            elif name in self._bools:
+                values = [_JSON_BOOL[value] for value in values]
+            columns.append(values)
+        template = self._template
+        return [template % row for row in zip(*columns)]
+
+
+class Archetype:
+    """Các entity có cùng tập component: 1 mảng / (component_type, field)"""
+
+    def __init__(self, key: Tuple[str, ...], schemas: Dict[str, _Schema]):
+        self.key = key
+        self.schemas = [schemas[component_type] for component_type in key]
+        self.count = 0
+        self.rows: Dict[int, int] = {}
+        self.entity_ids = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self.columns: Dict[str, np.ndarray] = {}
+        # Giá trị đã có trên đĩa (sync so sánh để chỉ ghi dòng đổi)
+        self.synced: Dict[str, np.ndarray] = {}
+        for schema in self.schemas:
+            for name in schema.fields:
+                column = f"{schema.component_type}.{name}"
+                self.columns[column] = np.empty(_INITIAL_CAPACITY, dtype=schema.dtypes[name])
+                self.synced[column] = np.empty(_INITIAL_CAPACITY, dtype=schema.dtypes[name])
+
+    def _reserve(self, size: int):
+        capacity = len(self.entity_ids)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self.entity_ids = np.resize(self.entity_ids, capacity)
+        for column in self.columns:
+            self.columns[column] = np.resize(self.columns[column], capacity)
+            self.synced[column] = np.resize(self.synced[column], capacity)
+
+    def extend(self, entity_ids: Sequence[int], rows: Dict[str, Sequence[Any]], synced: bool = True):
+        """Thêm nhiều entity (rows: column -> giá trị theo thứ tự entity_ids)"""
+        start, end = self.count, self.count + len(entity_ids)
+        self._reserve(end)
+        self.entity_ids[start:end] = entity_ids
+        for column, values in rows.items():
+            self.columns[column][start:end] = values
+            if synced:
+                self.synced[column][start:end] = values
+        for offset, entity_id in enumerate(entity_ids):
+            self.rows[entity_id] = start + offset
+        self.count = end
+
+    def take(self, entity_id: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Bỏ entity (dời dòng cuối vào chỗ trống), trả (giá trị hiện tại, giá trị đã sync)"""
+        row = self.rows.pop(entity_id)
+        last = self.count - 1
+        current = {column: values[row].item() for column, values in self.columns.items()}
+        synced = {column: values[row].item() for column, values in self.synced.items()}
+        if row != last:
+            moved = int(self.entity_ids[last])
+            self.entity_ids[row] = moved
+            for column in self.columns:
+                self.columns[column][row] = self.columns[column][last]
+                self.synced[column][row] = self.synced[column][last]
+            self.rows[moved] = row
+        self.count = last
+        return current, synced
+
+
+class ArchetypeView:
+    """Cột của 1 archetype (slice NumPy - sửa tại chỗ, rồi store.sync())"""
+
+    def __init__(self, store: "ColumnarStore", archetype: Archetype):
+        self._store = store
+        self._archetype = archetype
+        self.key = archetype.key
+        self.entity_ids = archetype.entity_ids[:archetype.count]
+
+    def __len__(self) -> int:
+        return len(self.entity_ids)
+
+    def __getitem__(self, column: str) -> "np.ndarray":
+        """view["stats.hp"]"""
+        return self._archetype.columns[column][:self._archetype.count]
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._archetype.columns
+
+    def decode(self, column: str) -> "np.ndarray":
+        """Cột str -> mảng chuỗi"""
+        component_type, name = column.split(".", 1)
+        strings = self._store.schemas[component_type].strings[name]
+        return np.asarray(strings, dtype=object)[self[column]]
+
+
+class ColumnarStore:
+    """Component số của mọi entity trong 1 Database, nhóm theo archetype"""
+
+    def __init__(self, db, component_classes: Iterable[Type[BaseModel]] = DEFAULT_COLUMNAR_COMPONENTS):
+        if not HAS_NUMPY:
+            raise RuntimeError("ColumnarStore cần numpy (pip install numpy)")
+        self.db = db
+        self.schemas: Dict[str, _Schema] = {}
+        for component_class in component_classes:
+            schema = _Schema(component_class)
+            self.schemas[schema.component_type] = schema
+        self.archetypes: Dict[Tuple[str, ...], Archetype] = {}
+        self._where: Dict[int, Archetype] = {}
+        self.syncs = 0
+        self.synced_rows = 0
+
+    def tracks(self, component_type: str) -> bool:
+        return component_type in self.schemas
+
+    def _archetype(self, key: Tuple[str, ...]) -> Archetype:
+        archetype = self.archetypes.get(key)
+        if archetype is None:
+            archetype = self.archetypes[key] = Archetype(key, self.schemas)
+        return archetype
+
+    def load(self) -> "ColumnarStore":
+        """Đọc lại toàn bộ từ bảng components"""
+        with self.db._lock:
+            self.db._write_pending()
+            self.archetypes = {}
+            self._where = {}
+            # Dòng JSON: json_extract trong SQLite, không parse JSON từng dòng bằng Python
+            cursor = self.db.connection.cursor()
+            cursor.row_factory = None
+            values: Dict[str, Dict[int, tuple]] = {}
+            for component_type, schema in self.schemas.items():
+                select = ", ".join(f"json_extract(data, '$.{name}')" for name in schema.fields)
+                values[component_type] = {
+                    row[0]: row[1:] for row in cursor.execute(f"""
+                        SELECT entity_id, {select} FROM components
+                        WHERE component_type = ? AND typeof(data) = 'text'
+                    """, (component_type,))
+                }
+                # Dòng nhị phân (codec struct / msgpack): chỉ giải mã các field của schema
+                for entity_id, data in cursor.execute("""
+                    SELECT entity_id, data FROM components
+                    WHERE component_type = ? AND typeof(data) = 'blob'
+                """, (component_type,)):
+                    decoded = self.db.codec.to_dict(component_type, data, schema.fields)
+                    values[component_type][entity_id] = tuple(decoded.get(name) for name in schema.fields)
+
+            types = sorted(self.schemas)
+            groups: Dict[Tuple[str, ...], List[int]] = {}
+            for entity_id in sorted(set().union(*values.values())):
+                key = tuple(component_type for component_type in types if entity_id in values[component_type])
+                groups.setdefault(key, []).append(entity_id)
+            for key, entity_ids in groups.items():
+                columns: Dict[str, List[Any]] = {}
+                for component_type in key:
+                    schema = self.schemas[component_type]
+                    rows = values[component_type]
+                    for i, name in enumerate(schema.fields):
+                        column = [rows[entity_id][i] for entity_id in entity_ids]
+                        if None in column:
+                            default = schema.defaults[name]
+                            column = [default if value is None else value for value in column]
+                        if name in schema.strings:
+                            column = [schema.code(name, value) for value in column]
+                        columns[f"{component_type}.{name}"] = column
+                archetype = self._archetype(key)
+                archetype.extend(entity_ids, columns)
+                for entity_id in entity_ids:
+                    self._where[entity_id] = archetype
+        return self
+
+    # --- Database hooks (gọi trong lock của Database) ---
+
+    def on_write(self, entity_id: int, component_type: str, component: Optional[BaseModel]):
+        """em.add / em.remove: ghi dòng đã có trên đĩa (hoặc sắp flush)"""
+        schema = self.schemas[component_type]
+        old = self._where.get(entity_id)
+        current: Dict[str, Any] = {}
+        synced: Dict[str, Any] = {}
+        if old is not None:
+            if component is not None and component_type in old.key:
+                row = old.rows[entity_id]
+                for name, value in schema.encode(component.__dict__).items():
+                    column = f"{component_type}.{name}"
+                    old.columns[column][row] = value
+                    old.synced[column][row] = value
+                return
+            current, synced = old.take(entity_id)
+            del self._where[entity_id]
+
+        prefix = f"{component_type}."
+        current = {column: value for column, value in current.items() if not column.startswith(prefix)}
+        synced = {column: value for column, value in synced.items() if not column.startswith(prefix)}
+        key = set(old.key) if old is not None else set()
+        key.discard(component_type)
+        if component is not None:
+            key.add(component_type)
+            for name, value in schema.encode(component.__dict__).items():
+                current[prefix + name] = synced[prefix + name] = value
+        if not key:
+            return
+        archetype = self._archetype(tuple(sorted(key)))
+        archetype.extend([entity_id], {column: [value] for column, value in current.items()}, synced=False)
+        row = archetype.rows[entity_id]
+        for column, value in synced.items():
+            archetype.synced[column][row] = value
+        self._where[entity_id] = archetype
+
+    def on_delete(self, entity_id: int):
+        archetype = self._where.pop(entity_id, None)
+        if archetype is not None:
+            archetype.take(entity_id)
+
+    # --- Query ---
+
+    def code(self, component_class: Type[BaseModel], field: str, value: str) -> int:
+        """Mã của 1 giá trị str (so sánh / gán vào cột str)"""
+        return self.schemas[_component_type(component_class)].code(field, value)
+
+    def query(self, *component_classes: Type[BaseModel]) -> List[ArchetypeView]:
+        """View của mọi archetype có đủ các component (rỗng bị bỏ qua)"""
+        wanted = {_component_type(component_class) for component_class in component_classes}
+        unknown = wanted - set(self.schemas)
+        if unknown:
+            raise KeyError(f"Component không lưu dạng cột: {sorted(unknown)}")
+        return [
+            ArchetypeView(self, archetype) for key, archetype in self.archetypes.items()
+            if archetype.count and wanted.issubset(key)
+        ]
+
+    def entities(self, *component_classes: Type[BaseModel]) -> "np.ndarray":
+        """entity_id có đủ các component"""
+        views = self.query(*component_classes)
+        if not views:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([view.entity_ids for view in views])
+
+    def iterate(self, *component_classes: Type[BaseModel]) -> Iterator[Tuple[int, Tuple[BaseModel, ...]]]:
+        """(entity_id, (component, ...)) từ giá trị cột hiện tại - bản sao, không phải identity map"""
+        schemas = [self.schemas[_component_type(component_class)] for component_class in component_classes]
+        for view in self.query(*component_classes):
+            columns = [self._decoded(view, schema) for schema in schemas]
+            for i, entity_id in enumerate(view.entity_ids.tolist()):
+                yield entity_id, tuple(
+                    schema.component_class.model_construct(**{name: values[i] for name, values in fields.items()})
+                    for schema, fields in zip(schemas, columns)
+                )
+
+    def get(self, entity_id: int, component_class: Type[BaseModel]) -> Optional[BaseModel]:
+        schema = self.schemas[_component_type(component_class)]
+        archetype = self._where.get(entity_id)
+        if archetype is None or schema.component_type not in archetype.key:
+            return None
+        row = archetype.rows[entity_id]
+        values = {}
+        for name in schema.fields:
+            value = archetype.columns[f"{schema.component_type}.{name}"][row].item()
+            values[name] = schema.strings[name][value] if name in schema.strings else value
+        return component_class.model_construct(**values)
+
+    @staticmethod
+    def _decoded(view: ArchetypeView, schema: _Schema) -> Dict[str, List[Any]]:
+        fields = {}
+        for name in schema.fields:
+            values = view[f"{schema.component_type}.{name}"].tolist()
+            if name in schema.strings:
+                strings = schema.strings[name]
+                values = [strings[code] for code in values]
+            fields[name] = values
+        return fields
+
+    # --- Sync ---
+
+    def sync(self, validate: bool = True) -> int:
+        """
+        Ghi các component có cột đổi từ lần sync trước về bảng components
+        (+ cập nhật object trong identity map và EntityIndex). Trả số component đã ghi.
+
+        validate=True (mặc định): dòng đổi phải qua ràng buộc của model (ge / gt / le / lt
+        kiểm bằng phép vector); có dòng sai -> ValueError, không ghi gì (cột giữ nguyên
+        để sửa rồi sync lại). validate=False chỉ dành cho dữ liệu đã tin cậy (benchmark);
+        field float NaN / ±inf thì luôn bị từ chối.
+        """
+        db = self.db
+        with db._lock:
+            db._write_pending()
+            changes = []
+            for archetype in self.archetypes.values():
+                n = archetype.count
+                if not n:
+                    continue
+                for schema in archetype.schemas:
+                    columns = [f"{schema.component_type}.{name}" for name in schema.fields]
+                    changed = np.zeros(n, dtype=bool)
+                    for column in columns:
+                        changed |= archetype.columns[column][:n] != archetype.synced[column][:n]
+                    rows = np.flatnonzero(changed)
+                    if len(rows):
+                        changes.append((archetype, schema, columns, rows))
+            # NaN / inf luôn bị chặn (validate=False cũng vậy): ghi vào sẽ hỏng dòng component
+            errors = []
+            for archetype, schema, _, rows in changes:
+                errors.extend(schema.violations(archetype, rows) if validate else schema.non_finite(archetype, rows))
+            if errors:
+                raise ValueError("ColumnarStore.sync: có dòng phạm ràng buộc, không ghi: "
+                                 + "; ".join(errors[:10]))
+            changes = [
+                (archetype, schema, columns, rows,
+                 {name: archetype.columns[column][rows].tolist() for name, column in zip(schema.fields, columns)})
+                for archetype, schema, columns, rows in changes
+            ]
+            if validate:
+                for _, schema, _, rows, raw in changes:
+                    if schema.needs_model_validate:
+                        for i in range(len(rows)):
+                            schema.component_class.model_validate(schema.decode(raw, i))
+
+            updates = []
+            for archetype, schema, columns, rows, raw in changes:
+                entity_ids = archetype.entity_ids[rows].tolist()
+                if db.codec.format == "json":
+                    data = schema.dumps(raw)
+                else:
+                    data = [db.codec.encode_values(schema.component_type, schema.decode(raw, i))
+                            for i in range(len(entity_ids))]
+                updates.extend(zip(data, entity_ids, [schema.component_type] * len(entity_ids)))
+                by_entity = db._components.get(schema.component_type, {})
+                is_location = schema.component_type == "location"
+                for i, entity_id in enumerate(entity_ids):
+                    cached = by_entity.get(entity_id)
+                    if cached is None and not is_location:
+                        continue
+                    values = schema.decode(raw, i)
+                    if cached is not None:
+                        cached.__dict__.update(values)
+                    if is_location:
+                        db._reindex(entity_id, "location", cached or schema.component_class.model_construct(**values))
+                for column in columns:
+                    archetype.synced[column][rows] = archetype.columns[column][rows]
+            if updates:
+                # Dòng luôn có sẵn (load / on_write + _write_pending): UPDATE không đụng các index khác
+                db.connection.executemany("""
+                    UPDATE components SET data = ?
+                    WHERE entity_id = ? AND component_type = ?
+                """, updates)
+                if not db._batch_depth:
+                    db.connection.commit()
+            self.syncs += 1
+            self.synced_rows += len(updates)
+            return len(updates)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entities": len(self._where),
+            "archetypes": {"+".join(key): archetype.count for key, archetype in self.archetypes.items()},
+            "syncs": self.syncs,
+            "synced_rows": self.synced_rows,
+        }
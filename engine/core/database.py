@@ -1,39 +1,260 @@
 """
 Database Layer - SQLite wrapper for component storage
+
+Component store trong RAM (identity map): mỗi loại component 1 dict entity_id -> object,
+cùng entity trả về cùng object; miss mới đọc SQLite (1 connection dùng chung).
+Vượt COMPONENT_CACHE_MAX: bỏ entry sạch ít dùng nhất (LRU), entry đang chờ ghi giữ nguyên.
+Ghi: write-through ngay, hoặc gom trong batch() (1 transaction / turn).
+
+Query theo phòng / ô (room_id, x, y) / tag dùng EntityIndex trong RAM (dựng 1 lần
+từ đĩa: generated column room_id/pos_x/pos_y có index + bảng entity_tags).
+
+Tick hàng loạt (Stats / Location / State của nhiều NPC): columnar_store() - cột NumPy
+theo archetype, sync() ghi ngược về bảng components (xem columnar.py).
+
+Cột data: JSON text hoặc nhị phân (struct / msgpack) theo COMPONENT_CODEC - xem codecs.py.
 """
 
+import os
 import sqlite3
-import json
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Type
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Tuple, Type
 from contextlib import contextmanager
 
+from .codecs import ComponentCodec, COMPONENT_CODEC
 from .components import COMPONENT_REGISTRY, get_component_class
+from .indexes import EntityIndex
 from pydantic import BaseModel
 
+# Tổng số component giữ trong RAM mỗi Database (vượt -> bỏ entry sạch ít dùng nhất)
+COMPONENT_CACHE_MAX = int(os.getenv("COMPONENT_CACHE_MAX", "100000"))
+# SQLite giới hạn số tham số / statement
+_IN_CHUNK = 500
+
 
 class Database:
     """SQLite database manager for ECS"""
     
-    def __init__(self, db_path: str = "data/world.db"):
+    def __init__(self, db_path: str = "data/world.db", codec: Optional[str] = None):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.connection = None
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row  # Enable column access by name
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        self.codec = ComponentCodec(codec or COMPONENT_CODEC)
+        
+        # Identity map: component_type -> {entity_id: component | None (biết là không có)}
+        self._components: Dict[str, Dict[int, Optional[BaseModel]]] = {}
+        # Thứ tự dùng (cũ -> mới) của mọi entry trong identity map: (component_type, entity_id)
+        self._lru: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+        self._cached = 0
+        # Ghi chờ flush trong batch: (entity_id, component_type) -> component | None (xoá)
+        self._pending: Dict[Tuple[int, str], Optional[BaseModel]] = {}
+        # Đã ghi vào transaction đang mở nhưng chưa commit (rollback -> quay về _pending)
+        self._written: Dict[Tuple[int, str], Optional[BaseModel]] = {}
+        self._batch_depth = 0
+        # Secondary index (lazy: dựng ở query vị trí / tag đầu tiên)
+        self._index: Optional[EntityIndex] = None
+        # ColumnarStore (lazy, cần numpy): nhận mọi ghi component nó theo dõi
+        self._columnar = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
         self._init_database()
     
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        """Connection dùng chung (commit khi thoát, trừ khi đang trong batch)"""
+        with self._lock:
+            try:
+                yield self.connection
+                if not self._batch_depth:
+                    self.connection.commit()
+                    self._written = {}
+            except Exception as e:
+                self._rollback()
+                raise e
+    
+    @contextmanager
+    def batch(self):
+        """Gom mọi ghi component trong khối thành 1 transaction (VD: 1 turn)"""
+        with self._lock:
+            self._batch_depth += 1
         try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
+            yield self
         finally:
-            conn.close()
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.flush()
+    
+    def flush(self):
+        """Ghi các component đang chờ + commit"""
+        with self._lock:
+            self._write_pending()
+            self.connection.commit()
+            self._written = {}
+            if self._cached > COMPONENT_CACHE_MAX:
+                self._evict_clean()  # Entry vừa ghi xong thành sạch
+    
+    def _write_pending(self):
+        """Ghi các component đang chờ vào transaction hiện tại (query sau đó thấy được)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if pending:
+                try:
+                    upserts = [
+                        (entity_id, component_type, self.codec.encode(component_type, component))
+                        for (entity_id, component_type), component in pending.items()
+                        if component is not None
+                    ]
+                    deletes = [key for key, component in pending.items() if component is None]
+                    self.connection.executemany("""
+                        INSERT OR REPLACE INTO components (entity_id, component_type, data)
+                        VALUES (?, ?, ?)
+                    """, upserts)
+                    self.connection.executemany("""
+                        DELETE FROM components
+                        WHERE entity_id = ? AND component_type = ?
+                    """, deletes)
+                    identities = [
+                        (entity_id, component) for (entity_id, component_type), component in pending.items()
+                        if component_type == "identity"
+                    ]
+                    if identities:
+                        self.connection.executemany(
+                            "DELETE FROM entity_tags WHERE entity_id = ?",
+                            [(entity_id,) for entity_id, _ in identities]
+                        )
+                        self.connection.executemany(
+                            "INSERT OR IGNORE INTO entity_tags (tag, entity_id) VALUES (?, ?)",
+                            [(tag, entity_id) for entity_id, component in identities
+                             if component is not None for tag in component.tags]
+                        )
+                except Exception:
+                    self._rollback(pending)
+                    raise
+                self._written.update(pending)
+                self.flushes += 1
+    
+    def _rollback(self, failed: Optional[Dict[Tuple[int, str], Optional[BaseModel]]] = None):
+        """
+        Rollback transaction đang mở: cả ghi đã flush trước đó trong transaction (VD: trong
+        batch ngoài) cũng mất -> đưa lại vào _pending (dirty) để lần flush sau ghi lại,
+        identity map không giữ chúng như bản sạch trong khi DB đã quay về bản cũ
+        """
+        self.connection.rollback()
+        restored = {**self._written, **(failed or {})}
+        self._written = {}
+        self._pending = {**restored, **self._pending}
+        for (entity_id, component_type), component in restored.items():
+            self._cache(component_type, entity_id, component)
+    
+    def close(self):
+        with self._lock:
+            self.flush()
+            self.connection.close()
+    
+    # --- Identity map ---
+    
+    def _cache(self, component_type: str, entity_id: int, component: Optional[BaseModel]):
+        self._components.setdefault(component_type, {})[entity_id] = component
+        key = (component_type, entity_id)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return
+        self._lru[key] = None
+        self._cached += 1
+        if self._cached > COMPONENT_CACHE_MAX:
+            self._evict_clean()
+    
+    def _touch(self, component_type: str, entity_id: int):
+        """Hit: entry thành dùng gần nhất"""
+        self._lru.move_to_end((component_type, entity_id))
+    
+    def _evict_clean(self):
+        """Bỏ entry sạch ít dùng nhất tới khi <= COMPONENT_CACHE_MAX (entry đang chờ ghi giữ lại)"""
+        for _ in range(len(self._lru)):
+            if self._cached <= COMPONENT_CACHE_MAX:
+                break
+            key, _ = self._lru.popitem(last=False)
+            if key[::-1] in self._pending:
+                self._lru[key] = None  # Chưa ghi xuống SQLite: không bỏ được
+                continue
+            del self._components[key[0]][key[1]]
+            self._cached -= 1
+    
+    def _write(self, entity_id: int, component_type: str, component: Optional[BaseModel]):
+        """Ghi qua identity map: ngay (write-through) hoặc chờ tới cuối batch"""
+        with self._lock:
+            self._pending[(entity_id, component_type)] = component
+            self._cache(component_type, entity_id, component)
+            self._reindex(entity_id, component_type, component)
+            if self._columnar is not None and self._columnar.tracks(component_type):
+                self._columnar.on_write(entity_id, component_type, component)
+            if not self._batch_depth:
+                self.flush()
+    
+    # --- Secondary indexes ---
+    
+    def _reindex(self, entity_id: int, component_type: str, component: Optional[BaseModel]):
+        if self._index is None:
+            return
+        if component_type == "location":
+            self._index.set_position(
+                entity_id, (component.room_id, component.x, component.y) if component is not None else None
+            )
+        elif component_type == "identity":
+            self._index.set_tags(entity_id, component.tags if component is not None else ())
+    
+    def _entity_index(self) -> EntityIndex:
+        """Dựng index từ đĩa 1 lần (đọc qua index của generated column / entity_tags)"""
+        if self._index is None:
+            self._write_pending()
+            index = EntityIndex()
+            for row in self.connection.execute("""
+                SELECT entity_id, room_id, pos_x, pos_y FROM components
+                WHERE room_id IS NOT NULL
+            """):
+                index.set_position(row['entity_id'], (row['room_id'], row['pos_x'] or 0, row['pos_y'] or 0))
+            # Dòng nhị phân: generated column là NULL, chỉ giải mã room_id / x / y
+            for row in self.connection.execute("""
+                SELECT entity_id, data FROM components
+                WHERE component_type = 'location' AND typeof(data) = 'blob'
+            """):
+                values = self.codec.to_dict("location", row['data'], ("room_id", "x", "y"))
+                index.set_position(row['entity_id'], (values['room_id'], values.get('x', 0), values.get('y', 0)))
+            tags: Dict[int, List[str]] = {}
+            for row in self.connection.execute("SELECT entity_id, tag FROM entity_tags"):
+                tags.setdefault(row['entity_id'], []).append(row['tag'])
+            for entity_id, entity_tags in tags.items():
+                index.set_tags(entity_id, entity_tags)
+            self._index = index
+        return self._index
+    
+    def columnar_store(self, component_classes: Optional[Iterable[Type[BaseModel]]] = None):
+        """ColumnarStore của database này (tạo + load lần đầu; cần numpy)"""
+        from .columnar import ColumnarStore, DEFAULT_COLUMNAR_COMPONENTS
+        
+        with self._lock:
+            if self._columnar is None:
+                self._columnar = ColumnarStore(self, component_classes or DEFAULT_COLUMNAR_COMPONENTS).load()
+            return self._columnar
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached": self._cached,
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "flushes": self.flushes,
+            }
     
     def _init_database(self):
         """Create tables if they don't exist"""
@@ -60,6 +281,9 @@ class Database:
                 )
             """)
             
+            # Schema version của các component lưu nhị phân
+            self.codec.attach(conn)
+            
             # Create indexes for common queries
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_components_entity 
@@ -70,6 +294,56 @@ class Database:
                 CREATE INDEX IF NOT EXISTS idx_components_type 
                 ON components(component_type)
             """)
+            
+            # Vị trí: generated column (VIRTUAL - không tốn chỗ trong row) + index
+            # Chỉ dòng JSON text (json_extract trên BLOB lỗi)
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_xinfo(components)")}
+            for column, path in (("room_id", "$.room_id"), ("pos_x", "$.x"), ("pos_y", "$.y")):
+                if column not in columns:
+                    cursor.execute(f"""
+                        ALTER TABLE components ADD COLUMN {column} GENERATED ALWAYS AS (
+                            CASE WHEN component_type = 'location' AND typeof(data) = 'text'
+                            THEN json_extract(data, '{path}') END
+                        ) VIRTUAL
+                    """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_components_position
+                ON components(room_id, pos_x, pos_y) WHERE room_id IS NOT NULL
+            """)
+            
+            # Tag -> entity (tags là mảng JSON, không index được bằng generated column)
+            has_tags = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entity_tags'"
+            ).fetchone()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS entity_tags (
+                    tag TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    PRIMARY KEY (tag, entity_id)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_entity_tags_entity ON entity_tags(entity_id)")
+            if not has_tags:
+                self._backfill_tags(cursor)
+    
+    def _backfill_tags(self, cursor: sqlite3.Cursor):
+        """entity_tags từ mọi IdentityComponent (save cũ / sau restore_all)"""
+        cursor.execute("DELETE FROM entity_tags")
+        cursor.execute("""
+            INSERT OR IGNORE INTO entity_tags (tag, entity_id)
+            SELECT tags.value, c.entity_id
+            FROM components c, json_each(c.data, '$.tags') tags
+            WHERE c.component_type = 'identity' AND typeof(c.data) = 'text'
+        """)
+        blobs = cursor.execute("""
+            SELECT entity_id, data FROM components
+            WHERE component_type = 'identity' AND typeof(data) = 'blob'
+        """).fetchall()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO entity_tags (tag, entity_id) VALUES (?, ?)",
+            [(tag, row['entity_id']) for row in blobs
+             for tag in self.codec.field("identity", row['data'], "tags", ())]
+        )
     
     def create_entity(self, label: str = "") -> int:
         """Create a new entity and return its ID"""
@@ -78,54 +352,147 @@ class Database:
             cursor.execute("INSERT INTO entities (label) VALUES (?)", (label,))
             return cursor.lastrowid
     
+    def create_entities(self, labels: Sequence[str]) -> List[int]:
+        """Cấp 1 khối ID liên tiếp cho nhiều entity (1 executemany, trong batch thì chưa commit)"""
+        with self.get_connection() as conn:
+            # AUTOINCREMENT: không dùng lại ID đã xoá (sqlite_sequence giữ ID lớn nhất từng cấp)
+            start = conn.execute("""
+                SELECT MAX(
+                    COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'entities'), 0),
+                    COALESCE((SELECT MAX(id) FROM entities), 0)
+                ) + 1
+            """).fetchone()[0]
+            entity_ids = list(range(start, start + len(labels)))
+            conn.executemany("INSERT INTO entities (id, label) VALUES (?, ?)", zip(entity_ids, labels))
+            return entity_ids
+    
+    def convert_components(self, chunk: int = 2000, vacuum: bool = False) -> Dict[str, Any]:
+        """Ghi lại mọi component chưa ở định dạng của codec (migrate save cũ), commit theo chunk"""
+        with self._lock:
+            self.flush()
+            conn = self.connection
+            size_sql = "SELECT COALESCE(SUM(LENGTH(CAST(data AS BLOB))), 0) FROM components"
+            before = conn.execute(size_sql).fetchone()[0]
+            converted = 0
+            last_rowid = 0
+            while True:
+                rows = conn.execute("""
+                    SELECT rowid, component_type, data FROM components
+                    WHERE rowid > ? ORDER BY rowid LIMIT ?
+                """, (last_rowid, chunk)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1]['rowid']
+                updates = []
+                for row in rows:
+                    comp_class = get_component_class(row['component_type'])
+                    if comp_class is None or self.codec.format_of(row['data']) == self.codec.format:
+                        continue
+                    component = self.codec.decode(comp_class, row['data'])
+                    updates.append((self.codec.encode(row['component_type'], component), row['rowid']))
+                conn.executemany("UPDATE components SET data = ? WHERE rowid = ?", updates)
+                conn.commit()
+                converted += len(updates)
+            after = conn.execute(size_sql).fetchone()[0]
+            if vacuum:
+                conn.execute("VACUUM")
+            return {
+                "format": self.codec.format,
+                "converted": converted,
+                "data_bytes_before": before,
+                "data_bytes_after": after,
+            }
+    
     def delete_entity(self, entity_id: int):
         """Delete an entity and all its components"""
         with self.get_connection() as conn:
+            self._write_pending()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM entities WHERE id = ?", (entity_id,))
+            cursor.execute("DELETE FROM components WHERE entity_id = ?", (entity_id,))
+            cursor.execute("DELETE FROM entity_tags WHERE entity_id = ?", (entity_id,))
+            if self._index is not None:
+                self._index.remove(entity_id)
+            if self._columnar is not None:
+                self._columnar.on_delete(entity_id)
+            for component_type, by_entity in self._components.items():
+                if by_entity.pop(entity_id, False) is not False:
+                    del self._lru[(component_type, entity_id)]
+                    self._cached -= 1
     
     def add_component(self, entity_id: int, component: BaseModel):
         """Add or update a component for an entity"""
-        component_type = self._get_component_type(component)
-        data_json = component.model_dump_json()
-        
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO components (entity_id, component_type, data)
-                VALUES (?, ?, ?)
-            """, (entity_id, component_type, data_json))
+        self._write(entity_id, self._get_component_type(component), component)
+    
+    def add_components(self, items: Iterable[Tuple[int, BaseModel]]):
+        """Add/update nhiều component (entity_id, component) trong 1 transaction"""
+        with self.batch():
+            for entity_id, component in items:
+                self._write(entity_id, self._get_component_type(component), component)
     
     def get_component(self, entity_id: int, component_class: Type[BaseModel]) -> Optional[BaseModel]:
-        """Get a specific component from an entity"""
+        """Get a specific component from an entity (cùng object cho tới khi bị thay)"""
         component_type = self._class_to_type(component_class)
         
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        with self._lock:
+            by_entity = self._components.get(component_type)
+            if by_entity is not None and entity_id in by_entity:
+                self.hits += 1
+                self._touch(component_type, entity_id)
+                return by_entity[entity_id]
+            
+            self.misses += 1
+            row = self.connection.execute("""
                 SELECT data FROM components
                 WHERE entity_id = ? AND component_type = ?
-            """, (entity_id, component_type))
+            """, (entity_id, component_type)).fetchone()
+            component = self.codec.decode(component_class, row['data']) if row else None
+            self._cache(component_type, entity_id, component)
+            return component
+    
+    def get_components(self, entity_ids: Iterable[int], component_class: Type[BaseModel]) -> Dict[int, BaseModel]:
+        """Component của nhiều entity; các miss được đọc trong 1 query (theo chunk)"""
+        component_type = self._class_to_type(component_class)
+        result: Dict[int, BaseModel] = {}
+        
+        with self._lock:
+            by_entity = self._components.get(component_type, {})
+            missing = []
+            lru = self._lru
+            for entity_id in entity_ids:
+                if entity_id in by_entity:
+                    lru.move_to_end((component_type, entity_id))
+                    component = by_entity[entity_id]
+                    if component is not None:
+                        result[entity_id] = component
+                else:
+                    missing.append(entity_id)
+            self.hits += len(result)
+            self.misses += len(missing)
             
-            row = cursor.fetchone()
-            if row:
-                return component_class.model_validate_json(row['data'])
-            return None
+            for i in range(0, len(missing), _IN_CHUNK):
+                chunk = missing[i:i + _IN_CHUNK]
+                rows = self.connection.execute(f"""
+                    SELECT entity_id, data FROM components
+                    WHERE component_type = ? AND entity_id IN ({",".join("?" * len(chunk))})
+                """, [component_type] + chunk).fetchall()
+                found = {row['entity_id']: row['data'] for row in rows}
+                for entity_id in chunk:
+                    data = found.get(entity_id)
+                    component = self.codec.decode(component_class, data) if data is not None else None
+                    self._cache(component_type, entity_id, component)
+                    if component is not None:
+                        result[entity_id] = component
+        return result
     
     def remove_component(self, entity_id: int, component_class: Type[BaseModel]):
         """Remove a component from an entity"""
-        component_type = self._class_to_type(component_class)
-        
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM components
-                WHERE entity_id = ? AND component_type = ?
-            """, (entity_id, component_type))
+        self._write(entity_id, self._class_to_type(component_class), None)
     
     def get_all_components(self, entity_id: int) -> Dict[str, BaseModel]:
         """Get all components for an entity"""
         with self.get_connection() as conn:
+            self._write_pending()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT component_type, data FROM components
@@ -135,9 +502,15 @@ class Database:
             components = {}
             for row in cursor.fetchall():
                 comp_type = row['component_type']
+                by_entity = self._components.get(comp_type, {})
+                if by_entity.get(entity_id) is not None:
+                    components[comp_type] = by_entity[entity_id]
+                    self._touch(comp_type, entity_id)
+                    continue
                 comp_class = get_component_class(comp_type)
                 if comp_class:
-                    components[comp_type] = comp_class.model_validate_json(row['data'])
+                    components[comp_type] = self.codec.decode(comp_class, row['data'])
+                    self._cache(comp_type, entity_id, components[comp_type])
             
             return components
     
@@ -146,6 +519,7 @@ class Database:
         component_type = self._class_to_type(component_class)
         
         with self.get_connection() as conn:
+            self._write_pending()
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT DISTINCT entity_id FROM components
@@ -156,15 +530,22 @@ class Database:
     
     def find_entities_at_location(self, room_id: str) -> List[int]:
         """Find all entities in a specific room"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT entity_id FROM components
-                WHERE component_type = 'location'
-                AND json_extract(data, '$.room_id') = ?
-            """, (room_id,))
-            
-            return [row['entity_id'] for row in cursor.fetchall()]
+        with self._lock:
+            return sorted(self._entity_index().in_room(room_id))
+    
+    def find_entities_at(self, room_id: str, x: int, y: int) -> List[int]:
+        """Find all entities at (x, y) in a room"""
+        with self._lock:
+            return sorted(self._entity_index().at(room_id, x, y))
+    
+    def find_entities_with_tag(self, tag: str) -> List[int]:
+        """Find all entities whose IdentityComponent has a tag"""
+        with self._lock:
+            return sorted(self._entity_index().with_tag(tag))
+    
+    def index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._index.stats() if self._index is not None else {"built": False}
     
     def entity_exists(self, entity_id: int) -> bool:
         """Check if an entity exists"""
@@ -187,6 +568,7 @@ class Database:
     def dump_all(self) -> Dict[str, Any]:
         """Dump entire database for save/backup"""
         with self.get_connection() as conn:
+            self._write_pending()
             cursor = conn.cursor()
             
             # Get all entities
@@ -200,7 +582,7 @@ class Database:
                 entity_id = row['entity_id']
                 if entity_id not in components:
                     components[entity_id] = {}
-                components[entity_id][row['component_type']] = json.loads(row['data'])
+                components[entity_id][row['component_type']] = self.codec.to_dict(row['component_type'], row['data'])
             
             return {
                 "entities": entities,
@@ -210,6 +592,12 @@ class Database:
     def restore_all(self, data: Dict[str, Any]):
         """Restore database from dump"""
         with self.get_connection() as conn:
+            self._pending = {}
+            self._written = {}
+            self._components = {}
+            self._lru = OrderedDict()
+            self._cached = 0
+            self._index = None
             cursor = conn.cursor()
             
             # Clear existing data
@@ -228,7 +616,11 @@ class Database:
                     cursor.execute("""
                         INSERT INTO components (entity_id, component_type, data)
                         VALUES (?, ?, ?)
-                    """, (entity_id, comp_type, json.dumps(comp_data)))
+                    """, (entity_id, comp_type, self.codec.encode_values(comp_type, comp_data)))
+            
+            self._backfill_tags(cursor)
+            if self._columnar is not None:
+                self._columnar.load()
 
 
 # Global database instance
@@ -2,7 +2,8 @@
 Entity Manager - High-level interface for ECS operations
 """
 
-from typing import Optional, List, Type, Dict, Any
+from datetime import datetime
+from typing import Optional, List, Type, Dict, Any, Iterable, Tuple, Union
 from pydantic import BaseModel
 
 from .database import Database, get_db
@@ -12,6 +13,9 @@ from .components import (
     TimestampComponent
 )
 
+# (label, components): components là dict như create(**components) hoặc list component
+EntitySpec = Tuple[str, Union[Dict[str, BaseModel], Iterable[BaseModel]]]
+
 
 class EntityManager:
     """Manages entities and their components"""
@@ -30,17 +34,32 @@ class EntityManager:
                 stats=StatsComponent(hp=100, strength=15)
             )
         """
-        entity_id = self.db.create_entity(label)
-        
-        # Add timestamp
-        self.db.add_component(entity_id, TimestampComponent())
+        return self.create_many([(label, components)])[0]
+    
+    def create_many(self, specs: Iterable[EntitySpec]) -> List[int]:
+        """
+        Tạo nhiều entity trong 1 transaction: ID cấp theo khối, component ghi bằng executemany
         
-        # Add provided components
-        for comp_name, component in components.items():
-            if isinstance(component, BaseModel):
-                self.db.add_component(entity_id, component)
+        Example:
+            ids = em.create_many(
+                em.npc_spec(f"Bandit {i}", f"camp_{i % 10}", "aggressive") for i in range(1000)
+            )
+        """
+        specs = [(label, list(components.values()) if isinstance(components, dict) else list(components))
+                 for label, components in specs]
+        if not specs:
+            return []
         
-        return entity_id
+        with self.db.batch():
+            entity_ids = self.db.create_entities([label for label, _ in specs])
+            now = datetime.now()
+            self.db.add_components(
+                (entity_id, component)
+                for entity_id, (_, components) in zip(entity_ids, specs)
+                for component in [TimestampComponent(created_at=now, updated_at=now), *components]
+                if isinstance(component, BaseModel)
+            )
+        return entity_ids
     
     def delete(self, entity_id: int):
         """Delete an entity and all its components"""
@@ -54,6 +73,18 @@ class EntityManager:
         """Get a component from an entity"""
         return self.db.get_component(entity_id, component_class)
     
+    def get_many(self, entity_ids: List[int], component_class: Type[BaseModel]) -> Dict[int, BaseModel]:
+        """Get a component from many entities (entity không có component bị bỏ qua)"""
+        return self.db.get_components(entity_ids, component_class)
+    
+    def batch(self):
+        """Gom mọi thay đổi component thành 1 transaction: with em.batch(): ..."""
+        return self.db.batch()
+    
+    def columnar(self):
+        """Component số dạng cột NumPy cho system chạy mỗi tick (xem engine/core/columnar.py)"""
+        return self.db.columnar_store()
+    
     def remove(self, entity_id: int, component_class: Type[BaseModel]):
         """Remove a component from an entity"""
         self.db.remove_component(entity_id, component_class)
@@ -78,23 +109,25 @@ class EntityManager:
         """Find all entities in a room"""
         return self.db.find_entities_at_location(room_id)
     
+    def find_at_position(self, room_id: str, x: int, y: int) -> List[int]:
+        """Find all entities at (x, y) in a room"""
+        return self.db.find_entities_at(room_id, x, y)
+    
+    def find_with_tag(self, tag: str) -> List[int]:
+        """Find all entities tagged with tag (IdentityComponent.tags)"""
+        return self.db.find_entities_with_tag(tag)
+    
     def find_player(self) -> Optional[int]:
         """Find the player entity ID"""
-        # Strategy 1: Look for entity with 'player' tag
-        # This requires querying all identities, which is slow but reliable for small DBs
-        # Optimization: We could add a specific index for tags later.
-        
-        # For now, iterate all entities with IdentityComponent
-        identities = self.find_with(IdentityComponent)
-        for eid in identities:
-            identity = self.get(eid, IdentityComponent)
-            if identity and "player" in identity.tags:
-                return eid
+        # Strategy 1: entity có tag 'player' (tag index)
+        players = self.find_with_tag("player")
+        if players:
+            return players[0]
         
         # Strategy 2: Fallback to name "Hero"
-        for eid in identities:
-            identity = self.get(eid, IdentityComponent)
-            if identity and identity.name == "Hero":
+        identities = self.find_with(IdentityComponent)
+        for eid, identity in self.get_many(identities, IdentityComponent).items():
+            if identity.name == "Hero":
                 return eid
                 
         return None
@@ -110,111 +143,126 @@ class EntityManager:
         return identity.description if identity else "An unknown entity."
     
     # Helper factories for common entities
+    # X_spec() trả (label, components) để spawn hàng loạt: em.create_many([...])
     
-    def create_player(self, name: str = "Player") -> int:
-        """Create a player entity"""
-        return self.create(
-            "player",
-            identity=IdentityComponent(
+    def player_spec(self, name: str = "Player") -> EntitySpec:
+        """Spec (label, components) của player entity"""
+        return "player", {
+            "identity": IdentityComponent(
                 name=name,
                 description="A brave adventurer",
                 tags=["player"]
             ),
-            location=LocationComponent(
+            "location": LocationComponent(
                 zone_id="start",
                 room_id="entrance"
             ),
-            stats=StatsComponent(
+            "stats": StatsComponent(
                 hp=100,
                 max_hp=100,
                 strength=10,
                 intelligence=10,
                 dexterity=10
             ),
-            inventory=InventoryComponent(
+            "inventory": InventoryComponent(
                 items=[],
                 capacity=20
             )
-        )
+        }
     
-    def create_npc(self, name: str, room_id: str, behavior: str = "passive") -> int:
-        """Create an NPC entity"""
-        return self.create(
-            f"npc_{name.lower().replace(' ', '_')}",
-            identity=IdentityComponent(
+    def create_player(self, name: str = "Player") -> int:
+        """Create a player entity"""
+        return self.create_many([self.player_spec(name)])[0]
+    
+    def npc_spec(self, name: str, room_id: str, behavior: str = "passive") -> EntitySpec:
+        """Spec (label, components) của NPC entity"""
+        return f"npc_{name.lower().replace(' ', '_')}", {
+            "identity": IdentityComponent(
                 name=name,
                 description=f"A {behavior} character",
                 tags=["npc", behavior]
             ),
-            location=LocationComponent(
+            "location": LocationComponent(
                 zone_id="start",
                 room_id=room_id
             ),
-            stats=StatsComponent(
+            "stats": StatsComponent(
                 hp=50,
                 strength=8
             ),
-            dialogue=DialogueComponent(
+            "dialogue": DialogueComponent(
                 greeting=f"Hello, I am {name}.",
                 farewell="Goodbye."
             ),
-            ai=AIComponent(
+            "ai": AIComponent(
                 behavior_type=behavior
             )
-        )
+        }
     
-    def create_item(self, name: str, description: str, room_id: str) -> int:
-        """Create a basic item"""
-        return self.create(
-            f"item_{name.lower().replace(' ', '_')}",
-            identity=IdentityComponent(
+    def create_npc(self, name: str, room_id: str, behavior: str = "passive") -> int:
+        """Create an NPC entity"""
+        return self.create_many([self.npc_spec(name, room_id, behavior)])[0]
+    
+    def item_spec(self, name: str, description: str, room_id: str) -> EntitySpec:
+        """Spec (label, components) của basic item"""
+        return f"item_{name.lower().replace(' ', '_')}", {
+            "identity": IdentityComponent(
                 name=name,
                 description=description,
                 tags=["item"]
             ),
-            location=LocationComponent(
+            "location": LocationComponent(
                 zone_id="start",
                 room_id=room_id
             )
-        )
+        }
     
-    def create_weapon(self, name: str, damage: int, room_id: str) -> int:
-        """Create a weapon"""
-        entity_id = self.create(
-            f"weapon_{name.lower().replace(' ', '_')}",
-            identity=IdentityComponent(
+    def create_item(self, name: str, description: str, room_id: str) -> int:
+        """Create a basic item"""
+        return self.create_many([self.item_spec(name, description, room_id)])[0]
+    
+    def weapon_spec(self, name: str, damage: int, room_id: str) -> EntitySpec:
+        """Spec (label, components) của weapon"""
+        return f"weapon_{name.lower().replace(' ', '_')}", {
+            "identity": IdentityComponent(
                 name=name,
                 description=f"A weapon that deals {damage} damage",
                 tags=["item", "weapon"]
             ),
-            location=LocationComponent(
+            "location": LocationComponent(
                 zone_id="start",
                 room_id=room_id
             ),
-            weapon=WeaponComponent(
+            "weapon": WeaponComponent(
                 damage=damage
             )
-        )
-        return entity_id
+        }
     
-    def create_door(self, name: str, room_id: str, is_locked: bool = False) -> int:
-        """Create a door"""
-        return self.create(
-            f"door_{name.lower().replace(' ', '_')}",
-            identity=IdentityComponent(
+    def create_weapon(self, name: str, damage: int, room_id: str) -> int:
+        """Create a weapon"""
+        return self.create_many([self.weapon_spec(name, damage, room_id)])[0]
+    
+    def door_spec(self, name: str, room_id: str, is_locked: bool = False) -> EntitySpec:
+        """Spec (label, components) của door"""
+        return f"door_{name.lower().replace(' ', '_')}", {
+            "identity": IdentityComponent(
                 name=name,
                 description="A sturdy door",
                 tags=["door", "obstacle"]
             ),
-            location=LocationComponent(
+            "location": LocationComponent(
                 zone_id="start",
                 room_id=room_id
             ),
-            state=StateComponent(
+            "state": StateComponent(
                 is_locked=is_locked,
                 is_open=False
             )
-        )
+        }
+    
+    def create_door(self, name: str, room_id: str, is_locked: bool = False) -> int:
+        """Create a door"""
+        return self.create_many([self.door_spec(name, room_id, is_locked)])[0]
 
 
 # Global entity manager
@@ -0,0 +1,73 @@
+"""
+Entity Indexes - secondary index trong RAM cho các query theo vị trí / tag
+- room_id -> {entity_id}
+- (room_id, x, y) -> {entity_id}
+- tag -> {entity_id}
+
+Database cập nhật index mỗi lần ghi LocationComponent / IdentityComponent
+(giữ vị trí / tags cũ của từng entity để gỡ khỏi bucket cũ).
+Trên đĩa: generated column room_id/pos_x/pos_y + bảng entity_tags (xem database.py).
+"""
+
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+Position = Tuple[str, int, int]
+
+
+class EntityIndex:
+    """Index room / grid / tag (không tự khoá: Database gọi trong lock của nó)"""
+
+    def __init__(self):
+        self.by_room: Dict[str, Set[int]] = {}
+        self.by_cell: Dict[Position, Set[int]] = {}
+        self.by_tag: Dict[str, Set[int]] = {}
+        self._positions: Dict[int, Position] = {}
+        self._tags: Dict[int, Tuple[str, ...]] = {}
+
+    @staticmethod
+    def _discard(buckets: Dict, key, entity_id: int):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.discard(entity_id)
+            if not bucket:
+                del buckets[key]
+
+    def set_position(self, entity_id: int, position: Optional[Position]):
+        old = self._positions.pop(entity_id, None)
+        if old is not None:
+            self._discard(self.by_room, old[0], entity_id)
+            self._discard(self.by_cell, old, entity_id)
+        if position is not None:
+            self._positions[entity_id] = position
+            self.by_room.setdefault(position[0], set()).add(entity_id)
+            self.by_cell.setdefault(position, set()).add(entity_id)
+
+    def set_tags(self, entity_id: int, tags: Iterable[str]):
+        for tag in self._tags.pop(entity_id, ()):
+            self._discard(self.by_tag, tag, entity_id)
+        tags = tuple(dict.fromkeys(tags))
+        if tags:
+            self._tags[entity_id] = tags
+            for tag in tags:
+                self.by_tag.setdefault(tag, set()).add(entity_id)
+
+    def remove(self, entity_id: int):
+        self.set_position(entity_id, None)
+        self.set_tags(entity_id, ())
+
+    def in_room(self, room_id: str) -> Set[int]:
+        return self.by_room.get(room_id, set())
+
+    def at(self, room_id: str, x: int, y: int) -> Set[int]:
+        return self.by_cell.get((room_id, x, y), set())
+
+    def with_tag(self, tag: str) -> Set[int]:
+        return self.by_tag.get(tag, set())
+
+    def stats(self):
+        return {
+            "rooms": len(self.by_room),
+            "cells": len(self.by_cell),
+            "tags": len(self.by_tag),
+            "positioned": len(self._positions),
+        }
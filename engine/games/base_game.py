@@ -71,9 +71,10 @@ class BaseGame(ABC):
         # 2. AI Processing (Parse + Validate + Narrate)
         response = self.ai.process_turn(user_input, context, save_id=self.save_id)
         
-        # 3. Apply State Updates
+        # 3. Apply State Updates (1 transaction cho mọi component đổi trong turn)
         updates = response.get('state_updates', {})
-        self.apply_updates(updates)
+        with self.em.batch():
+            self.apply_updates(updates)
         
         # 4. Save to memory
         if 'narrative' in response:
@@ -110,7 +111,8 @@ class BaseGame(ABC):
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
         self.init_engine(db_path, self.save_id)
-        self.setup_world(**kwargs)
+        with self.em.batch():
+            self.setup_world(**kwargs)
         
         return self.save_id
     
@@ -18,28 +18,26 @@ class LastVoyageGame(BaseGame):
         super().__init__(game_mode="last_voyage")
     
     def setup_world(self, **kwargs):
-        """Create initial game world"""
-        # Player
-        self.player_id = self.em.create_player("Hero")
-        
+        """Create initial game world (1 lần create_many: ID cấp theo khối, 1 transaction)"""
         # NPCs
-        guard_id = self.em.create_npc("Old Guard", "entrance", "passive")
-        guard_dialogue = self.em.get(guard_id, DialogueComponent)
-        guard_dialogue.greeting = "Welcome, traveler. Beware the dungeon ahead."
-        self.em.add(guard_id, guard_dialogue)
-        
-        goblin_id = self.em.create_npc("Goblin", "entrance", "aggressive")
-        goblin_stats = self.em.get(goblin_id, StatsComponent)
-        goblin_stats.hp = 15
-        goblin_stats.max_hp = 15
-        self.em.add(goblin_id, goblin_stats)
+        guard = self.em.npc_spec("Old Guard", "entrance", "passive")
+        guard[1]["dialogue"].greeting = "Welcome, traveler. Beware the dungeon ahead."
         
-        # Items
-        self.em.create_weapon("Iron Sword", damage=12, room_id="entrance")
-        self.em.create_item("Torch", "A flickering torch", room_id="entrance")
+        goblin = self.em.npc_spec("Goblin", "entrance", "aggressive")
+        goblin[1]["stats"].hp = 15
+        goblin[1]["stats"].max_hp = 15
         
-        # Door
-        self.em.create_door("Heavy Door", "entrance", is_locked=False)
+        self.player_id, *_ = self.em.create_many([
+            # Player
+            self.em.player_spec("Hero"),
+            guard,
+            goblin,
+            # Items
+            self.em.weapon_spec("Iron Sword", damage=12, room_id="entrance"),
+            self.em.item_spec("Torch", "A flickering torch", room_id="entrance"),
+            # Door
+            self.em.door_spec("Heavy Door", "entrance", is_locked=False),
+        ])
     
     def get_game_state(self) -> Dict[str, Any]:
         """Get current game state"""
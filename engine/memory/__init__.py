@@ -5,6 +5,8 @@ Tuân thủ single-database architecture
 from .simple_memory import SimpleMemory, MemoryType, get_simple_memory
 from .memory_manager_simple import SimpleMemoryManager, get_memory_manager
 from .compression import CompressionRules
+from .local_vectors import LocalVectorIndex, HashingEmbedder, reciprocal_rank_fusion
+from .compaction_worker import MemoryCompactor, CompactionScheduler, get_compaction_scheduler
 
 # Legacy imports (for backward compatibility, deprecated)
 # VectorMemory requires ChromaDB which is not installed by default
@@ -22,6 +24,14 @@ __all__ = [
     'SimpleMemoryManager',
     'get_memory_manager',
     'CompressionRules',
+    # Local vector index (hybrid search, optional numpy)
+    'LocalVectorIndex',
+    'HashingEmbedder',
+    'reciprocal_rank_fusion',
+    # Incremental compaction (batched eviction + MinHash merge)
+    'MemoryCompactor',
+    'CompactionScheduler',
+    'get_compaction_scheduler',
     # Legacy (deprecated)
     'VectorMemory',
     'get_vector_memory'
@@ -1,93 +1,529 @@
 """
 Memory Compaction Worker
 Keeps memory count under limit by removing low-importance memories
+and merging near-duplicate memories (MinHash + LSH)
+
+Incremental: mỗi MemoryCompactor.step() làm tối đa max_rows việc trong 1 transaction
+- Evict: victim chọn bằng 1 query trên index (save_id, importance, last_accessed),
+  xoá set-based (temp table + DELETE ... IN) ở mọi bảng liên quan
+- Merge: memory mới (rowid > watermark) được ký MinHash; LSH bands lưu trong
+  bảng <prefix>_lsh nên chỉ so với candidate cùng bucket (không O(n²)),
+  candidate được kiểm lại bằng Jaccard chính xác trước khi merge
+CompactionScheduler chạy step() định kỳ cho các save đang mở.
 """
 
 import sqlite3
+import operator
+import random
+import threading
+import time
+import weakref
+import zlib
+from array import array
 from pathlib import Path
-from typing import List, Tuple
-import json
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .vietnamese_tokenizer import fold_syllables
+
+# Optional: numpy tính mọi permutation 1 lần (~30x nhanh hơn vòng lặp Python, cùng kết quả)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
 
 MAX_MEMORIES_PER_SAVE = 1000
-SIMILARITY_THRESHOLD = 0.8  # For merging similar memories (future)
+SIMILARITY_THRESHOLD = 0.8  # Jaccard (trigram âm tiết) để merge 2 memory
+MINHASH_CANDIDATE_SLACK = 0.1  # Candidate có Jaccard ước lượng >= threshold - slack mới đọc text để kiểm
+COMPACTION_BATCH_SIZE = 500  # Số row tối đa mỗi step (merge scan + delete)
+COMPACTION_INTERVAL = 30.0  # Giây giữa 2 lượt của scheduler
+
+# 16 bands x 8 rows: Jaccard 0.9 -> ~100% thành candidate, 0.8 -> ~95%, 0.6 -> ~24%, 0.5 -> ~6%
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Permutation (h ^ a) * b mod 2^32 (b lẻ -> song ánh), seed cố định để signature ổn định giữa các lần chạy
+_seed_rng = random.Random(0x5EED)
+_MINHASH_SEEDS = [(_seed_rng.getrandbits(32), _seed_rng.getrandbits(32) | 1) for _ in range(MINHASH_PERMUTATIONS)]
+if HAS_NUMPY:
+    _SEED_XOR = np.array([a for a, _ in _MINHASH_SEEDS], dtype=np.uint64)
+    _SEED_MUL = np.array([b for _, b in _MINHASH_SEEDS], dtype=np.uint64)
+
+
+class CompactionTables(NamedTuple):
+    """Bảng của 1 memory store (mọi bảng khoá theo memory_id)"""
+    metadata: str  # save_id, memory_type, importance, last_accessed, access_count
+    fts: str
+    text_table: str  # Bảng chứa text, rowid tăng theo thứ tự insert (watermark của merge)
+    text_column: str = "content"
+    content: Optional[str] = None  # Bảng content riêng (save của cultivation-sim)
+    extra: Tuple[str, ...] = ()  # Bảng khác cần xoá theo (VD: vector index)
+    prefix: str = "memory"  # Tên bảng phụ: <prefix>_minhash, <prefix>_lsh
+
+
+# Save DB của cultivation-sim (database.init_database)
+CULTIVATION_TABLES = CompactionTables(
+    metadata="memory_metadata", fts="memory_fts", text_table="memory_content", content="memory_content"
+)
+# SimpleMemory: content chỉ nằm trong FTS
+SIMPLE_MEMORY_TABLES = CompactionTables(
+    metadata="memory_metadata", fts="memory_fts", text_table="memory_fts"
+)
+
+
+def shingles(text: str) -> set:
+    """
+    Trigram âm tiết đã bỏ dấu (memory < 3 âm tiết: cả câu)
+
+    Trigram tách rõ hơn bigram giữa "thêm 1 từ" và "khác 1 âm tiết trong tên NPC"
+    (VD: Lý Đại Hổ / Lý Đại Long - 2 memory khác nhau, không được merge)
+    """
+    syllables = fold_syllables(text)
+    if len(syllables) < 3:
+        return {" ".join(syllables)} if syllables else set()
+    return {" ".join(syllables[i:i + 3]) for i in range(len(syllables) - 2)}
+
+
+def minhash_signature(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash MINHASH_PERMUTATIONS giá trị (None nếu text không có âm tiết)"""
+    return _signature(shingles(text))
+
+
+def _signature(shingle_set: set) -> Optional[Tuple[int, ...]]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    if not hashes:
+        return None
+    if HAS_NUMPY:
+        permuted = (np.array(hashes, dtype=np.uint64)[:, None] ^ _SEED_XOR) * _SEED_MUL & np.uint64(0xFFFFFFFF)
+        return tuple(permuted.min(axis=0).tolist())
+    return tuple(min([((h ^ a) * b) & 0xFFFFFFFF for h in hashes]) for a, b in _MINHASH_SEEDS)
+
+
+def estimate_jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+def _lsh_buckets(signature: Sequence[int], save_id: str) -> List[int]:
+    """
+    1 key / band: band << 32 | crc32(rows của band) - 1 cột INTEGER để lookup
+    `bucket IN (...)` đi thẳng vào primary key; hash gồm cả save_id (nhiều save chung 1 DB)
+    """
+    salt = zlib.crc32(save_id.encode("utf-8"))
+    return [
+        band << 32 | zlib.crc32(array("I", signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]).tobytes(), salt)
+        for band in range(LSH_BANDS)
+    ]
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def delete_memories(cursor, tables: Sequence[str], memory_ids: Sequence[str]) -> int:
+    """
+    Xoá set-based: memory_id vào temp table, mỗi bảng 1 DELETE ... IN
+    (FTS5 memory_id UNINDEXED: 1 scan / batch thay vì 1 scan / row)
+    """
+    if not memory_ids:
+        return 0
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS compaction_victims (memory_id TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.compaction_victims")
+    cursor.executemany(
+        "INSERT OR IGNORE INTO temp.compaction_victims (memory_id) VALUES (?)",
+        [(memory_id,) for memory_id in memory_ids]
+    )
+    for table in dict.fromkeys(tables):
+        cursor.execute(f"""
+            DELETE FROM {table}
+            WHERE memory_id IN (SELECT memory_id FROM temp.compaction_victims)
+        """)
+    return len(set(memory_ids))
+
+
+class MemoryCompactor:
+    """
+    Compaction incremental cho 1 save trong 1 memory store
+
+    step(max_rows): merge tối đa max_rows memory mới + evict tối đa max_rows
+    memory vượt max_memories, 1 transaction, trả stats (throughput).
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        tables: CompactionTables,
+        save_id: str,
+        max_memories: Optional[int] = MAX_MEMORIES_PER_SAVE,
+        merge: bool = True,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        lock: Optional[Any] = None
+    ):
+        self.conn = conn
+        self.tables = tables
+        self.save_id = save_id
+        self.max_memories = max_memories
+        self.merge = merge
+        self.similarity_threshold = similarity_threshold
+        self._lock = lock or threading.RLock()
+        self._scope = f"{tables.prefix}:{save_id}"
+
+        self.totals = {"steps": 0, "scanned": 0, "merged": 0, "evicted": 0, "elapsed_s": 0.0}
+        with self._lock:
+            self._init_tables()
+
+    def _init_tables(self):
+        t = self.tables
+        cursor = self.conn.cursor()
+        # Victim query: ORDER BY importance, last_accessed đọc thẳng từ index, không sort
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{t.metadata}_compaction
+            ON {t.metadata}(save_id, importance, last_accessed)
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {t.prefix}_minhash (
+                memory_id TEXT PRIMARY KEY,
+                text_rowid INTEGER NOT NULL,
+                signature BLOB NOT NULL
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {t.prefix}_lsh (
+                bucket INTEGER NOT NULL,
+                memory_id TEXT NOT NULL,
+                PRIMARY KEY (bucket, memory_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{t.prefix}_lsh_memory ON {t.prefix}_lsh(memory_id)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS memory_compaction_state (
+                scope TEXT PRIMARY KEY,
+                last_rowid INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def step(self, max_rows: int = COMPACTION_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        1 lượt compaction có giới hạn
+
+        Returns:
+            {"scanned", "merged", "evicted", "deleted", "elapsed_ms", "rows_per_s", "done"}
+        """
+        start = time.perf_counter()
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                scanned, duplicates, merge_done = self._merge_new(cursor, max_rows) if self.merge else (0, [], True)
+                victims = self._select_victims(cursor, max_rows, duplicates)
+                self._delete(cursor, duplicates + victims)
+                evict_done = self._within_limit(cursor)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        elapsed = time.perf_counter() - start
+
+        deleted = len(duplicates) + len(victims)
+        self.totals["steps"] += 1
+        self.totals["scanned"] += scanned
+        self.totals["merged"] += len(duplicates)
+        self.totals["evicted"] += len(victims)
+        self.totals["elapsed_s"] += elapsed
+        return {
+            "scanned": scanned,
+            "merged": len(duplicates),
+            "evicted": len(victims),
+            "deleted": deleted,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "rows_per_s": round((scanned + deleted) / elapsed) if elapsed > 0 else 0,
+            "done": merge_done and evict_done,
+        }
+
+    # Scheduler target
+    compact_step = step
+
+    def run_until_done(self, max_rows: int = COMPACTION_BATCH_SIZE, max_steps: int = 1000) -> Dict[str, Any]:
+        """Chạy step() tới khi hết việc (tool / test); trả tổng stats"""
+        total = {"scanned": 0, "merged": 0, "evicted": 0, "deleted": 0, "steps": 0}
+        start = time.perf_counter()
+        for _ in range(max_steps):
+            stats = self.step(max_rows)
+            total["steps"] += 1
+            for key in ("scanned", "merged", "evicted", "deleted"):
+                total[key] += stats[key]
+            if stats["done"]:
+                break
+        elapsed = time.perf_counter() - start
+        total["elapsed_ms"] = round(elapsed * 1000, 2)
+        total["rows_per_s"] = round((total["scanned"] + total["deleted"]) / elapsed) if elapsed > 0 else 0
+        return total
+
+    # --- EVICT ---
 
+    def _select_victims(self, cursor, max_rows: int, duplicates: List[str]) -> List[str]:
+        """Memory vượt max_memories: importance thấp nhất, lâu không truy cập nhất"""
+        if not self.max_memories:
+            return []
+        t = self.tables
+        cursor.execute(f"SELECT COUNT(*) FROM {t.metadata} WHERE save_id = ?", (self.save_id,))
+        overflow = cursor.fetchone()[0] - len(duplicates) - self.max_memories
+        if overflow <= 0:
+            return []
+        limit = min(overflow, max_rows)
+        cursor.execute(f"""
+            SELECT memory_id FROM {t.metadata}
+            WHERE save_id = ?
+            ORDER BY importance ASC, last_accessed ASC
+            LIMIT ?
+        """, (self.save_id, limit + len(duplicates)))
+        # Duplicate vừa merge có thể nằm trong top: bỏ qua (đã bị xoá cùng lượt)
+        merged = set(duplicates)
+        return [row[0] for row in cursor.fetchall() if row[0] not in merged][:limit]
 
-def compaction_worker_for_save(save_id: str) -> int:
+    def _within_limit(self, cursor) -> bool:
+        """Sau khi xoá: số memory của save đã <= max_memories chưa"""
+        if not self.max_memories:
+            return True
+        cursor.execute(f"SELECT COUNT(*) FROM {self.tables.metadata} WHERE save_id = ?", (self.save_id,))
+        return cursor.fetchone()[0] <= self.max_memories
+
+    def _delete(self, cursor, memory_ids: List[str]):
+        t = self.tables
+        # metadata trước content (memory_metadata REFERENCES memory_content)
+        tables = [t.fts, t.metadata, t.content, *t.extra, f"{t.prefix}_minhash", f"{t.prefix}_lsh"]
+        delete_memories(cursor, [table for table in tables if table], memory_ids)
+
+    # --- MERGE ---
+
+    def _merge_new(self, cursor, max_rows: int) -> Tuple[int, List[str], bool]:
+        """
+        Ký MinHash cho memory mới (rowid > watermark), merge vào memory cũ gần giống
+
+        Memory giữ lại: bản cũ hơn (đã có trong FTS / context); nhận importance
+        cao nhất, cộng access_count, last_accessed mới nhất.
+        """
+        t = self.tables
+        cursor.execute("SELECT last_rowid FROM memory_compaction_state WHERE scope = ?", (self._scope,))
+        row = cursor.fetchone()
+        last_rowid = row[0] if row else 0
+
+        cursor.execute(f"""
+            SELECT rowid, memory_id, {t.text_column} FROM {t.text_table}
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, max_rows))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0, [], True
+
+        placeholders = ",".join("?" * len(rows))
+        cursor.execute(f"""
+            SELECT memory_id, memory_type, importance, access_count, last_accessed
+            FROM {t.metadata}
+            WHERE save_id = ? AND memory_id IN ({placeholders})
+        """, [self.save_id] + [row[1] for row in rows])
+        meta = {r[0]: r[1:] for r in cursor.fetchall()}
+
+        duplicates: List[str] = []
+        for text_rowid, memory_id, text in rows:
+            if memory_id not in meta:
+                continue  # Save khác / row mồ côi
+            current = shingles(text or "")
+            signature = _signature(current)
+            if signature is None:
+                continue
+            memory_type = meta[memory_id][0]
+            buckets = _lsh_buckets(signature, self.save_id)
+
+            keeper = self._best_match(cursor, current, signature, buckets, memory_type, memory_id)
+            if keeper is not None:
+                _, importance, access_count, last_accessed = meta[memory_id]
+                cursor.execute(f"""
+                    UPDATE {t.metadata}
+                    SET importance = MAX(importance, ?),
+                        access_count = access_count + ?,
+                        last_accessed = MAX(COALESCE(last_accessed, ''), COALESCE(?, ''))
+                    WHERE memory_id = ?
+                """, (importance, access_count or 0, last_accessed, keeper))
+                duplicates.append(memory_id)
+                continue
+
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {t.prefix}_minhash (memory_id, text_rowid, signature) VALUES (?, ?, ?)",
+                (memory_id, text_rowid, array("I", signature).tobytes())
+            )
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {t.prefix}_lsh (bucket, memory_id) VALUES (?, ?)",
+                [(bucket, memory_id) for bucket in buckets]
+            )
+
+        cursor.execute("""
+            INSERT INTO memory_compaction_state (scope, last_rowid) VALUES (?, ?)
+            ON CONFLICT(scope) DO UPDATE SET last_rowid = excluded.last_rowid
+        """, (self._scope, rows[-1][0]))
+        return len(rows), duplicates, len(rows) < max_rows
+
+    def _best_match(self, cursor, current: set, signature, buckets, memory_type: str, memory_id: str) -> Optional[str]:
+        """
+        Candidate cùng bucket LSH (cùng save + memory_type), lọc bằng Jaccard ước lượng,
+        rồi kiểm Jaccard chính xác trên text (đọc theo rowid) - trả memory giống nhất >= threshold
+        """
+        t = self.tables
+        # CROSS JOIN: giữ thứ tự lsh -> minhash -> metadata (planner tự chọn sẽ quét metadata theo save_id)
+        cursor.execute(f"""
+            SELECT DISTINCT h.memory_id, h.text_rowid, h.signature
+            FROM {t.prefix}_lsh l
+            CROSS JOIN {t.prefix}_minhash h ON h.memory_id = l.memory_id
+            CROSS JOIN {t.metadata} m ON m.memory_id = h.memory_id
+            WHERE l.bucket IN ({",".join("?" * len(buckets))})
+              AND m.save_id = ? AND m.memory_type = ? AND h.memory_id != ?
+        """, buckets + [self.save_id, memory_type, memory_id])
+
+        floor = self.similarity_threshold - MINHASH_CANDIDATE_SLACK
+        best, best_score = None, self.similarity_threshold
+        for candidate_id, text_rowid, blob in cursor.fetchall():
+            if estimate_jaccard(signature, array("I", blob)) < floor:
+                continue
+            row = cursor.execute(
+                f"SELECT {t.text_column} FROM {t.text_table} WHERE rowid = ?", (text_rowid,)
+            ).fetchone()
+            score = _jaccard(current, shingles(row[0] or "")) if row else 0.0
+            if score >= best_score:
+                best, best_score = candidate_id, score
+        return best
+
+
+class CompactionScheduler:
     """
-    Compact memories for a specific save
-    Returns number of memories deleted
+    Background thread chạy compaction định kỳ
+
+    Target: object có compact_step(max_rows) -> stats (MemoryCompactor, Memory3Tier).
+    Giữ weakref nên session bị evict / đóng tự rời lịch.
+    """
+
+    def __init__(self, interval: float = COMPACTION_INTERVAL, batch_size: int = COMPACTION_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._targets: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.totals = {"scanned": 0, "merged": 0, "evicted": 0, "deleted": 0, "elapsed_s": 0.0}
+
+    def register(self, target: Any):
+        with self._lock:
+            self._targets.add(target)
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._loop, name="memory-compaction", daemon=True)
+                self._thread.start()
+
+    def unregister(self, target: Any):
+        with self._lock:
+            self._targets.discard(target)
+
+    def run_once(self) -> int:
+        """1 lượt qua mọi target (mỗi target tối đa batch_size row); trả số row đã xoá"""
+        with self._lock:
+            targets = list(self._targets)
+        deleted = 0
+        for target in targets:
+            try:
+                stats = target.compact_step(self.batch_size)
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️  Compaction error: {e}")
+                continue
+            for key in ("scanned", "merged", "evicted", "deleted"):
+                self.totals[key] += stats[key]
+            self.totals["elapsed_s"] += stats["elapsed_ms"] / 1000
+            deleted += stats["deleted"]
+        self.runs += 1
+        return deleted
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            targets = len(self._targets)
+        elapsed = self.totals["elapsed_s"]
+        return {
+            "targets": targets,
+            "runs": self.runs,
+            "failures": self.failures,
+            "scanned": self.totals["scanned"],
+            "merged": self.totals["merged"],
+            "evicted": self.totals["evicted"],
+            "rows_per_s": round((self.totals["scanned"] + self.totals["deleted"]) / elapsed) if elapsed else 0,
+        }
+
+
+# Global scheduler (1 thread / process)
+_compaction_scheduler: Optional[CompactionScheduler] = None
+_compaction_scheduler_lock = threading.Lock()
+
+
+def get_compaction_scheduler() -> CompactionScheduler:
+    """Get or create the process-wide compaction scheduler"""
+    global _compaction_scheduler
+    with _compaction_scheduler_lock:
+        if _compaction_scheduler is None:
+            _compaction_scheduler = CompactionScheduler()
+        return _compaction_scheduler
+
+
+def compaction_worker_for_save(save_id: str, max_rows: int = COMPACTION_BATCH_SIZE) -> int:
+    """
+    Compact memories for a specific save (1 step có giới hạn)
+    Returns number of memories deleted (merged + evicted)
     """
     db_path = Path(f"data/saves/{save_id}.db")
     if not db_path.exists():
         return 0
-    
+
     conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
     try:
-        cur = conn.cursor()
-        
-        # Get all memories ordered by importance and last_accessed
-        cur.execute("""
-            SELECT 
-                m.memory_id,
-                c.content,
-                m.importance,
-                m.last_accessed,
-                m.access_count
-            FROM memory_metadata m
-            JOIN memory_content c ON m.memory_id = c.memory_id
-            ORDER BY m.importance DESC, m.last_accessed DESC
-        """)
-        
-        rows = cur.fetchall()
-        total_memories = len(rows)
-        
-        if total_memories <= MAX_MEMORIES_PER_SAVE:
-            return 0  # No compaction needed
-        
-        # Keep top N by importance
-        keep = rows[:MAX_MEMORIES_PER_SAVE]
-        drop = rows[MAX_MEMORIES_PER_SAVE:]
-        
-        # Delete low-importance memories
-        drop_ids = [row['memory_id'] for row in drop]
-        deleted_count = 0
-        
-        for mem_id in drop_ids:
-            try:
-                # Delete from FTS5 (will cascade)
-                cur.execute("DELETE FROM memory_fts WHERE memory_id = ?", (mem_id,))
-                # Delete from content
-                cur.execute("DELETE FROM memory_content WHERE memory_id = ?", (mem_id,))
-                # Delete from metadata
-                cur.execute("DELETE FROM memory_metadata WHERE memory_id = ?", (mem_id,))
-                deleted_count += 1
-            except Exception as e:
-                print(f"⚠️  Error deleting memory {mem_id}: {e}")
-        
-        conn.commit()
-        return deleted_count
-        
+        return MemoryCompactor(conn, CULTIVATION_TABLES, save_id).step(max_rows)["deleted"]
     except Exception as e:
-        conn.rollback()
         print(f"⚠️  Compaction error for {save_id}: {e}")
         return 0
     finally:
         conn.close()
 
 
-def merge_similar_memories(save_id: str, similarity_threshold: float = SIMILARITY_THRESHOLD):
+def merge_similar_memories(save_id: str, similarity_threshold: float = SIMILARITY_THRESHOLD) -> int:
     """
-    Future: Merge similar memories using fuzzy matching
-    For now, just a placeholder
+    Merge near-duplicate memories (MinHash + LSH, không evict)
+    Returns number of memories merged
     """
-    # TODO: Implement similarity-based merging
-    # Options:
-    # 1. Use difflib.SequenceMatcher for text similarity
-    # 2. Use sentence-transformers for semantic similarity
-    # 3. Use OpenAI embeddings for clustering
-    pass
+    db_path = Path(f"data/saves/{save_id}.db")
+    if not db_path.exists():
+        return 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        compactor = MemoryCompactor(
+            conn, CULTIVATION_TABLES, save_id,
+            max_memories=None, similarity_threshold=similarity_threshold
+        )
+        return compactor.run_until_done()["merged"]
+    except Exception as e:
+        print(f"⚠️  Merge error for {save_id}: {e}")
+        return 0
+    finally:
+        conn.close()
 
 
 def get_memory_stats(save_id: str) -> dict:
@@ -95,13 +531,13 @@ def get_memory_stats(save_id: str) -> dict:
     db_path = Path(f"data/saves/{save_id}.db")
     if not db_path.exists():
         return {"total": 0, "over_limit": False}
-    
+
     conn = sqlite3.connect(db_path)
     try:
         cur = conn.cursor()
         cur.execute("SELECT COUNT(*) FROM memory_metadata")
         total = cur.fetchone()[0]
-        
+
         return {
             "total": total,
             "over_limit": total > MAX_MEMORIES_PER_SAVE,
@@ -111,4 +547,3 @@ def get_memory_stats(save_id: str) -> dict:
         return {"total": 0, "over_limit": False}
     finally:
         conn.close()
-
@@ -3,9 +3,9 @@ Rule-Based Memory Compression
 Simple, predictable compression without LLM
 """
 
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
-from .simple_memory import SimpleMemory, parse_sqlite_timestamp
+from typing import Dict, Any
+from .simple_memory import SimpleMemory
+from .compaction_worker import delete_memories
 
 
 class CompressionRules:
@@ -65,62 +65,31 @@ class CompressionRules:
         if current_count <= max_memories:
             return 0
         
-        # Get all memories sorted by age and importance
-        import sqlite3
-        
+        # Rules trong WHERE (age_days > N <=> đủ N+1 ngày tròn), victim lấy thẳng
+        # bằng ORDER BY ... LIMIT thay vì scan + parse timestamp từng row trong Python
         with memory_system._get_connection() as conn:
             cursor = conn.cursor()
-            
             cursor.execute("""
-                SELECT memory_id, importance, created_at, memory_type
+                SELECT memory_id
                 FROM memory_metadata
                 WHERE save_id = ?
+                  AND memory_type != 'lore'
+                  AND importance < 0.7
+                  AND (
+                      (importance < 0.3 AND julianday('now') - julianday(created_at) >= 31)
+                      OR (importance < 0.5 AND julianday('now') - julianday(created_at) >= 91)
+                      OR julianday('now') - julianday(created_at) >= 181
+                  )
                 ORDER BY importance ASC, created_at ASC
-            """, (save_id,))
+                LIMIT ?
+            """, (save_id, current_count - max_memories))
+            to_delete = [row['memory_id'] for row in cursor.fetchall()]
             
-            memories = cursor.fetchall()
+            # Xoá batch trong 1 transaction (metadata + FTS5)
+            deleted = delete_memories(cursor, ["memory_metadata", "memory_fts"], to_delete)
             
-            # Apply compression rules
-            to_delete = []
-            for mem in memories:
-                # Robust timestamp parsing
-                created_at = parse_sqlite_timestamp(mem['created_at'])
-                age_days = (datetime.now() - created_at).days
-                
-                mem_dict = {
-                    'importance': mem['importance'],
-                    'memory_type': mem['memory_type']
-                }
-                
-                if CompressionRules.should_compress(mem_dict, age_days):
-                    to_delete.append(mem['memory_id'])
-                
-                # Stop when we have enough to delete
-                if len(to_delete) >= (current_count - max_memories):
-                    break
+            if deleted > 0:
+                memory_system._fts_inserts += deleted  # doc count / df cache của query planner
+                print(f"🗜️  Compressed {deleted} memories using rules")
             
-            # Delete memories (with transaction integrity)
-            if to_delete:
-                placeholders = ','.join(['?'] * len(to_delete))
-                
-                # Delete from metadata
-                cursor.execute(f"""
-                    DELETE FROM memory_metadata
-                    WHERE memory_id IN ({placeholders})
-                """, to_delete)
-                
-                # Delete from FTS5 explicitly (maintain integrity)
-                cursor.execute(f"""
-                    DELETE FROM memory_fts
-                    WHERE memory_id IN ({placeholders})
-                """, to_delete)
-                
-                deleted = len(to_delete)  # Use count instead of rowcount
-                
-                if deleted > 0:
-                    print(f"🗜️  Compressed {deleted} memories using rules")
-                
-                return deleted
-        
-        return 0
-
+            return deleted
@@ -0,0 +1,344 @@
+"""
+Local Vector Index - Embedding retrieval chạy offline, lưu trong SQLite của save
+Thay thế VectorMemory (ChromaDB, deprecated) cho hybrid search:
+- Embedder pluggable (mặc định: hashing trên âm tiết đã bỏ dấu + bigram + char trigram)
+- Vector float16 BLOB trong bảng SQLite, matrix float32 trong RAM (BLAS matmul;
+  convert float16 mỗi query chậm hơn ~8x)
+- Brute-force top-k; vượt IVF_MIN_VECTORS thì dùng IVF (k-means, probe vài cluster)
+- reciprocal_rank_fusion() để gộp với BM25 (FTS5)
+"""
+
+import zlib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+from .vietnamese_tokenizer import fold_syllables, VIETNAMESE_STOPWORDS
+
+EMBEDDING_DIM = 384  # 128/256 collide quá nhiều với tên NPC (recall@5 giảm ~0.1-0.3)
+IVF_MIN_VECTORS = 200000  # Dưới ngưỡng: brute force (~10ms / 100k vectors)
+IVF_PROBE_RATIO = 0.2  # Tỉ lệ cluster quét mỗi query (hashing vector ít cấu trúc cluster)
+IVF_REBUILD_GROWTH = 1.1  # Vector mới nằm ở tail (brute force) tới khi index tăng 10%
+RRF_K = 60
+
+
+class HashingEmbedder:
+    """
+    Feature hashing embedder (không model, không network)
+
+    Features (bỏ stopword): âm tiết đã bỏ dấu, bigram âm tiết (weight 1.0) và
+    char trigram trên cả chuỗi (weight 0.5, chịu được gõ sai / thiếu ký tự;
+    trigram nối 2 âm tiết giữ lại thứ tự tên riêng). Signed hashing, L2-normalized.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[Tuple[str, float]]:
+        syllables = [s for s in fold_syllables(text) if s not in VIETNAMESE_STOPWORDS]
+        for syllable in syllables:
+            yield syllable, 1.0
+        joined = "#" + " ".join(syllables) + "#"
+        for i in range(len(joined) - 2):
+            yield "c:" + joined[i:i + 3], 0.5
+        for a, b in zip(syllables, syllables[1:]):
+            yield f"{a}_{b}", 1.0
+
+    def embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Sequence[str]):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed(text) for text in texts])
+
+
+# Registry: embedder local khác (TF-IDF, model ONNX...) đăng ký thêm theo tên
+_EMBEDDERS: Dict[str, Callable[[], object]] = {"hashing": HashingEmbedder}
+
+
+def register_embedder(name: str, factory: Callable[[], object]):
+    """Đăng ký embedder (factory trả object có dim, embed(text), embed_many(texts))"""
+    _EMBEDDERS[name] = factory
+
+
+def get_embedder(name: str = "hashing"):
+    return _EMBEDDERS[name]()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Gộp nhiều ranking (list id, tốt nhất trước) bằng RRF: score = sum 1 / (k + rank)
+
+    Không cần chuẩn hoá score giữa BM25 và cosine, chỉ dùng thứ hạng.
+    Returns [(id, score)] score giảm dần.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class LocalVectorIndex:
+    """
+    Vector index trong SQLite (table: memory_id TEXT PRIMARY KEY, vector BLOB float16)
+
+    Matrix load lười lần search đầu, sau đó add() cập nhật RAM (id đã có: thay
+    vector, không thêm dòng). Caller quản lý commit (dùng chung connection /
+    transaction với memory): id ghi trong transaction được kiểm lại ở SQLite lần
+    search đầu sau khi transaction kết thúc; bị rollback -> bỏ matrix, load lại.
+    """
+
+    def __init__(self, conn, table: str, embedder=None):
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for LocalVectorIndex")
+        self.conn = conn
+        self.table = table
+        self.embedder = embedder or get_embedder()
+        self.dim = self.embedder.dim
+        self._lock = threading.RLock()
+
+        self._ids: List[Optional[str]] = []  # None: dòng đã bị thay (vector mới ở tail)
+        self._rows: Dict[str, int] = {}  # memory_id -> dòng trong matrix
+        self._matrix = None  # float32 (capacity, dim), self._count rows dùng
+        self._count = 0
+        self._dead = 0
+        self._unverified: Set[str] = set()  # id ghi trong transaction chưa kết thúc
+
+        # IVF (khi >= IVF_MIN_VECTORS): matrix xếp liền theo cluster,
+        # cluster c = rows [bounds[c], bounds[c + 1]); rows >= _ivf_size là tail chưa gán
+        self._centroids = None
+        self._bounds = None
+        self._ivf_size = 0
+
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                memory_id TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        """)
+
+    # --- WRITE ---
+
+    def add(self, items: Sequence[Tuple[str, str]]):
+        """Embed + lưu [(memory_id, text)] (không commit)"""
+        items = list(dict(items).items())  # memory_id lặp trong 1 lô: giữ text sau cùng
+        if not items:
+            return
+        ids = [memory_id for memory_id, _ in items]
+        vectors = self.embedder.embed_many([text for _, text in items]).astype(np.float16)
+        with self._lock:
+            try:
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (memory_id, vector) VALUES (?, ?)",
+                    [(memory_id, vector.tobytes()) for memory_id, vector in zip(ids, vectors)]
+                )
+            except Exception:
+                self.invalidate()
+                raise
+            if self.conn.in_transaction:
+                self._unverified.update(ids)
+            if self._matrix is None:
+                return
+            new_ids, new_rows = [], []
+            for i, memory_id in enumerate(ids):
+                row = self._rows.get(memory_id)
+                if row is None:
+                    new_ids.append(memory_id)
+                    new_rows.append(i)
+                elif row >= self._ivf_size:
+                    self._matrix[row] = vectors[i]  # Brute force / tail: thay tại chỗ
+                else:
+                    # Dòng đã xếp theo cluster IVF: vector mới có thể thuộc cluster khác
+                    self._ids[row] = None
+                    self._matrix[row] = 0
+                    self._dead += 1
+                    new_ids.append(memory_id)
+                    new_rows.append(i)
+            if new_ids:
+                self._append(new_ids, vectors[new_rows])
+
+    def backfill(self, rows: Iterable[Tuple[str, str]], batch_size: int = 1000) -> int:
+        """Embed các memory chưa có vector (save cũ / vừa bật index)"""
+        batch: List[Tuple[str, str]] = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.add(batch)
+                total += len(batch)
+                batch = []
+        self.add(batch)
+        return total + len(batch)
+
+    def invalidate(self):
+        """Bỏ matrix / IVF trong RAM (sau khi xoá vector ở SQLite), load lại lần search sau"""
+        with self._lock:
+            self._ids = []
+            self._rows = {}
+            self._matrix = None
+            self._count = 0
+            self._dead = 0
+            self._unverified = set()
+            self._centroids = None
+            self._bounds = None
+            self._ivf_size = 0
+
+    # --- SEARCH ---
+
+    def search(self, text: str, k: int = 20) -> List[Tuple[str, float]]:
+        """Top-k theo cosine: [(memory_id, score)]"""
+        query = self.embedder.embed(text)
+        if not query.any():
+            return []
+        with self._lock:
+            self._verify_committed()
+            self._ensure_loaded()
+            if self._count == 0:
+                return []
+            if self._count >= IVF_MIN_VECTORS:
+                self._ensure_ivf()
+                ranges = self._ivf_ranges(query)
+            else:
+                ranges = [(0, self._count)]
+            return self._top_k(query, ranges, k)
+
+    def _top_k(self, query, ranges: List[Tuple[int, int]], k: int) -> List[Tuple[str, float]]:
+        # Quét theo slice liền (view, không copy như fancy indexing)
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges:
+            return []
+        scores = np.concatenate([self._matrix[start:end] @ query for start, end in ranges])
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+
+        # Dòng đã bị thay (score 0) có thể lọt top-k: lấy dư rồi bỏ
+        wanted = k
+        k = min(k + self._dead, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = [(self._ids[rows[i]], float(scores[i])) for i in top]
+        return [result for result in results if result[0] is not None][:wanted]
+
+    # --- RAM MATRIX ---
+
+    def _verify_committed(self):
+        """
+        Transaction chứa add() đã kết thúc: so các id đó với SQLite; rollback
+        (id mất / vector về bản cũ) -> bỏ matrix, load lại lần sau
+        """
+        if not self._unverified or self.conn.in_transaction:
+            return
+        ids, self._unverified = list(self._unverified), set()
+        if self._matrix is None:
+            return
+        stored = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            stored.update(self.conn.execute(
+                f"SELECT memory_id, vector FROM {self.table} WHERE memory_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        for memory_id in ids:
+            row = self._rows.get(memory_id)
+            vector = stored.get(memory_id)
+            if row is None or vector is None or not np.array_equal(
+                np.frombuffer(vector, dtype=np.float16), self._matrix[row]
+            ):
+                self.invalidate()
+                return
+
+    def _ensure_loaded(self):
+        if self._matrix is not None:
+            return
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._count = 0
+        cursor = self.conn.execute(f"SELECT memory_id, vector FROM {self.table}")
+        while True:
+            rows = cursor.fetchmany(50000)
+            if not rows:
+                break
+            vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float16)
+            self._append([row[0] for row in rows], vectors.reshape(-1, self.dim))
+
+    def _append(self, ids: List[str], vectors):
+        needed = self._count + len(ids)
+        if needed > len(self._matrix):
+            grown = np.zeros((max(needed, len(self._matrix) * 2, 1024), self.dim), dtype=np.float32)
+            grown[:self._count] = self._matrix[:self._count]
+            self._matrix = grown
+        self._matrix[self._count:needed] = vectors
+        for offset, memory_id in enumerate(ids):
+            self._rows[memory_id] = self._count + offset
+        self._ids.extend(ids)
+        self._count = needed
+
+    def _compact(self):
+        """Bỏ các dòng đã bị thay (trước khi xếp lại theo IVF)"""
+        if not self._dead:
+            return
+        keep = [row for row, memory_id in enumerate(self._ids) if memory_id is not None]
+        self._matrix[:len(keep)] = self._matrix[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._count = len(keep)
+        self._dead = 0
+
+    # --- IVF ---
+
+    def _ensure_ivf(self, iterations: int = 8, sample_size: int = 20000):
+        """k-means trên sample (nlist ~ sqrt(n)) rồi xếp lại matrix theo cluster"""
+        if self._centroids is not None and self._count < self._ivf_size * IVF_REBUILD_GROWTH:
+            return
+        self._compact()
+        n = self._count
+        nlist = max(16, int(n ** 0.5))
+        rng = np.random.default_rng(0)
+        sample = self._matrix[rng.choice(n, size=min(sample_size, n), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assign == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assign = np.empty(n, dtype=np.int64)
+        chunk = 65536
+        for start in range(0, n, chunk):
+            end = min(start + chunk, n)
+            assign[start:end] = np.argmax(self._matrix[start:end] @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+
+        self._matrix[:n] = self._matrix[order]
+        self._ids = [self._ids[i] for i in order]
+        self._rows = {memory_id: row for row, memory_id in enumerate(self._ids)}
+        self._centroids = centroids
+        self._bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._ivf_size = n
+
+    def _ivf_ranges(self, query) -> List[Tuple[int, int]]:
+        nlist = len(self._centroids)
+        probes = max(1, min(nlist, int(nlist * IVF_PROBE_RATIO)))
+        nearest = np.sort(np.argpartition(-(self._centroids @ query), probes - 1)[:probes])
+        ranges = [(int(self._bounds[c]), int(self._bounds[c + 1])) for c in nearest]
+        ranges.append((self._ivf_size, self._count))
+        return ranges
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._verify_committed()
+            self._ensure_loaded()
+            return self._count - self._dead
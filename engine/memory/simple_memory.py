@@ -7,12 +7,19 @@ import sqlite3
 import json
 import uuid
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 from enum import Enum
 from contextlib import contextmanager
 
+from .vietnamese_tokenizer import (
+    FTS5_COLUMNS, BM25_WEIGHTS, query_terms, plan_fts_query, create_vietnamese_fts, fts_row
+)
+
+# Số hit BM25 tốt nhất được chấm combined score (BM25 + importance + recency)
+SEARCH_CANDIDATES = 50
+
 
 class MemoryType(Enum):
     """Types of memory in hierarchical system"""
@@ -87,6 +94,12 @@ class SimpleMemory:
         """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Document frequency cache cho query planner (ước lượng, reset khi index tăng ~10%)
+        self._term_df: Dict[Tuple[str, str], int] = {}
+        self._df_doc_count = 0
+        self._fts_inserts = 0
+        
         self._init_tables()
         print("✅ SimpleMemory initialized (SQLite FTS5)")
     
@@ -136,14 +149,22 @@ class SimpleMemory:
                 )
             """)
             
-            # FTS5 virtual table for full-text search
+            # FTS5 virtual table for full-text search (Vietnamese-aware: folded terms + bigrams)
+            # Content chỉ nằm trong FTS: đọc bảng cũ (porter) trước khi tạo lại
+            cursor.execute("PRAGMA table_info(memory_fts)")
+            old_columns = tuple(row[1] for row in cursor.fetchall())
+            old_rows = []
+            if old_columns and old_columns != FTS5_COLUMNS:
+                cursor.execute("SELECT memory_id, content, memory_type FROM memory_fts")
+                old_rows = cursor.fetchall()
+            if create_vietnamese_fts(cursor, "memory_fts") and old_rows:
+                cursor.executemany("""
+                    INSERT INTO memory_fts (memory_id, content, memory_type, terms, bigrams)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [fts_row(*row) for row in old_rows])
             cursor.execute("""
-                CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
-                    memory_id UNINDEXED,
-                    content,
-                    memory_type,
-                    tokenize='porter'
-                )
+                CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts_vocab
+                USING fts5vocab(memory_fts, 'col')
             """)
             
             # Indexes for fast filtering
@@ -204,9 +225,10 @@ class SimpleMemory:
                 
                 # Insert into FTS5 first (for full-text search)
                 cursor.execute("""
-                    INSERT INTO memory_fts (memory_id, content, memory_type)
-                    VALUES (?, ?, ?)
-                """, (memory_id, content, memory_type))
+                    INSERT INTO memory_fts (memory_id, content, memory_type, terms, bigrams)
+                    VALUES (?, ?, ?, ?, ?)
+                """, fts_row(memory_id, content, memory_type))
+                self._fts_inserts += 1
                 
                 # Insert into metadata table (for filtering and stats)
                 metadata_json = None
@@ -254,6 +276,11 @@ class SimpleMemory:
         """
         Search memories using FTS5 with BM25 ranking
         
+        Combined score (BM25 chuẩn hoá + importance + recency) tính trong SQL
+        trên SEARCH_CANDIDATES hit BM25 tốt nhất; chỉ top n_results được trả về
+        Python và decode metadata JSON. Index lớn: plan_fts_query chỉ match doc
+        có term hiếm nên bm25 không phải chấm nửa index.
+        
         Args:
             query: Search query
             save_id: Save slot to search in
@@ -269,13 +296,14 @@ class SimpleMemory:
         if memory_types is None:
             memory_types = ["episodic", "semantic", "procedural", "lore"]
         
-        # Sanitize query for FTS5
-        sanitized_query = sanitize_fts_query(query)
-        if not sanitized_query:
+        # Free text -> OR của bigram/unigram đã bỏ dấu (không có FTS5 operator thô)
+        terms = query_terms(sanitize_fts_query(query))
+        if not terms:
             return []
         
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            sanitized_query = plan_fts_query(terms, self._doc_count(cursor), lambda t: self._doc_freq(cursor, t))
             
             # Build WHERE clause for metadata filtering
             where_parts = ["m.save_id = ?"]
@@ -300,30 +328,62 @@ class SimpleMemory:
             
             where_clause = " AND ".join(where_parts)
             
-            # FTS5 search with BM25 ranking
-            # BM25 returns negative values (lower = better), so ORDER BY ASC
+            # Candidate pool cố định (không phụ thuộc n_results): min-max BM25 chuẩn hoá
+            # trên cùng 1 tập nên top-5 luôn là prefix của top-10
+            # BM25 âm (lower = better): norm = 1 - (score - min) / (max - min), 1.0 nếu bằng nhau
+            # Recency: 90-day decay theo số ngày tròn (created_at UTC như CURRENT_TIMESTAMP)
             sql = f"""
+                WITH candidates AS (
+                    SELECT 
+                        m.memory_id,
+                        f.content,
+                        m.memory_type,
+                        m.importance,
+                        m.created_at,
+                        m.metadata_json,
+                        bm25(memory_fts, {BM25_WEIGHTS}) as fts_score
+                    FROM memory_fts f
+                    JOIN memory_metadata m ON f.memory_id = m.memory_id
+                    WHERE memory_fts MATCH ? AND {where_clause}
+                    ORDER BY 
+                        fts_score ASC,  -- Lower BM25 = better match
+                        m.importance DESC,
+                        m.created_at DESC
+                    LIMIT ?
+                ),
+                normalized AS (
+                    SELECT 
+                        *,
+                        1.0 - COALESCE(
+                            (fts_score - MIN(fts_score) OVER ())
+                            / NULLIF(MAX(fts_score) OVER () - MIN(fts_score) OVER (), 0),
+                            0.0
+                        ) as fts_norm,
+                        COALESCE(
+                            MAX(0.0, 1.0 - CAST(julianday('now') - julianday(created_at) AS INTEGER) / 90.0),
+                            1.0
+                        ) as recency
+                    FROM candidates
+                )
                 SELECT 
-                    m.memory_id,
-                    f.content,
-                    m.memory_type,
-                    m.importance,
-                    m.created_at,
-                    m.entity_id,
-                    m.location_id,
-                    m.metadata_json,
-                    bm25(memory_fts) as fts_score
-                FROM memory_fts f
-                JOIN memory_metadata m ON f.memory_id = m.memory_id
-                WHERE f.content MATCH ? AND {where_clause}
+                    memory_id,
+                    content,
+                    memory_type,
+                    importance,
+                    metadata_json,
+                    fts_norm,
+                    recency,
+                    0.5 * fts_norm + 0.3 * importance + 0.2 * recency as score
+                FROM normalized
                 ORDER BY 
-                    bm25(memory_fts) ASC,  -- Lower BM25 = better match
-                    m.importance DESC,
-                    m.created_at DESC
+                    score DESC,
+                    fts_score ASC,
+                    importance DESC,
+                    created_at DESC
                 LIMIT ?
             """
             
-            params = [sanitized_query] + params + [n_results]
+            params = [sanitized_query] + params + [max(SEARCH_CANDIDATES, n_results), n_results]
             
             try:
                 cursor.execute(sql, params)
@@ -332,50 +392,9 @@ class SimpleMemory:
                 print(f"⚠️  FTS5 search error: {e}")
                 return []
             
-            # Format results
+            # Format results (chỉ top n_results: decode metadata ở đây)
             formatted_results = []
-            fts_scores = []  # For normalization
-            
             for row in results:
-                fts_scores.append(row['fts_score'])
-            
-            # Normalize BM25 scores (min-max normalization if we have scores)
-            if fts_scores:
-                min_score = min(fts_scores)
-                max_score = max(fts_scores)
-                score_range = max_score - min_score if max_score != min_score else 1.0
-            else:
-                min_score = 0
-                score_range = 1.0
-            
-            for row in results:
-                # Normalize BM25 score to 0-1 range
-                # BM25 is negative (lower = better), so invert
-                raw_score = row['fts_score']
-                if score_range > 0:
-                    normalized_fts = 1.0 - ((raw_score - min_score) / score_range)
-                else:
-                    normalized_fts = 1.0
-                
-                # Clamp to [0, 1]
-                normalized_fts = max(0.0, min(1.0, normalized_fts))
-                
-                # Combined score: FTS5 + importance + recency
-                importance_score = float(row['importance'])
-                
-                # Recency score (simple: newer = higher)
-                created_at = parse_sqlite_timestamp(row['created_at'])
-                age_days = (datetime.now() - created_at).days
-                recency_score = max(0.0, 1.0 - (age_days / 90.0))  # 90-day decay
-                
-                # Combined score
-                combined_score = (
-                    0.5 * normalized_fts +      # FTS5 relevance
-                    0.3 * importance_score +     # Importance
-                    0.2 * recency_score          # Recency
-                )
-                
-                # Parse metadata JSON with error handling
                 metadata = {}
                 if row['metadata_json']:
                     try:
@@ -388,17 +407,31 @@ class SimpleMemory:
                     'id': row['memory_id'],
                     'text': row['content'],
                     'memory_type': row['memory_type'],
-                    'score': combined_score,
-                    'fts_score': normalized_fts,
-                    'importance': importance_score,
-                    'recency': recency_score,
+                    'score': row['score'],
+                    'fts_score': row['fts_norm'],
+                    'importance': float(row['importance']),
+                    'recency': row['recency'],
                     'metadata': metadata
                 })
             
-            # Sort by combined score (already sorted by SQL, but ensure)
-            formatted_results.sort(key=lambda x: x['score'], reverse=True)
-            
-            return formatted_results[:n_results]
+            return formatted_results
+    
+    def _doc_count(self, cursor) -> int:
+        if not self._df_doc_count or self._fts_inserts > max(1000, self._df_doc_count // 10):
+            self._term_df.clear()
+            self._fts_inserts = 0
+            cursor.execute("SELECT COUNT(*) FROM memory_metadata")
+            self._df_doc_count = cursor.fetchone()[0]
+        return self._df_doc_count
+    
+    def _doc_freq(self, cursor, term: Tuple[str, str]) -> int:
+        df = self._term_df.get(term)
+        if df is None:
+            column, value = term
+            cursor.execute("SELECT doc FROM memory_fts_vocab WHERE term = ? AND col = ?", (value, column))
+            row = cursor.fetchone()
+            df = self._term_df[term] = row[0] if row else 0
+        return df
     
     def get_context(
         self,
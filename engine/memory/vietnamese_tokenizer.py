@@ -1,10 +1,19 @@
 """
 Vietnamese Tokenizer for FTS5
 Uses underthesea or simple Vietnamese word segmentation
+
+Indexing path cho FTS5 (thay tokenize='porter' - stemmer tiếng Anh):
+- content: text gốc, unicode61 remove_diacritics
+- terms: shadow column đã bỏ dấu (normalize_vietnamese, gồm cả đ -> d)
+- bigrams: cặp âm tiết liền kề ("tu_luyen") - tiếng Việt là ngôn ngữ đơn âm tiết,
+  từ ghép 2 âm tiết mang nghĩa nên match bigram chính xác hơn nhiều so với unigram
+Query: build_fts_query() biến free text thành OR của bigram (weight cao) + unigram;
+plan_fts_query() thêm điều kiện term hiếm khi index lớn.
 """
 
 import re
-from typing import List
+import unicodedata
+from typing import Callable, List, Tuple
 
 try:
     from underthesea import word_tokenize
@@ -68,3 +77,142 @@ def normalize_vietnamese(text: str) -> str:
     
     return ''.join(result)
 
+
+
+# FTS5 tokenizer cho các bảng memory (giữ '_' trong token bigram)
+FTS5_TOKENIZE = "unicode61 remove_diacritics 2 tokenchars '_'"
+
+# memory_id UNINDEXED, content, memory_type, terms, bigrams
+FTS5_COLUMNS = ("memory_id", "content", "memory_type", "terms", "bigrams")
+
+# bm25() weights theo thứ tự FTS5_COLUMNS: bigram match nặng gấp đôi unigram
+BM25_WEIGHTS = "0.0, 0.0, 0.0, 1.0, 2.0"
+
+# plan_fts_query: index từ FTS_PRUNE_MIN_DOCS doc trở lên thì chỉ lấy candidate
+# từ term hiếm (<= FTS_RARE_TERM_RATIO số doc)
+FTS_PRUNE_MIN_DOCS = 5000
+FTS_RARE_TERM_RATIO = 0.02
+
+# Hư từ phổ biến (đã bỏ dấu) - không dùng làm unigram query
+VIETNAMESE_STOPWORDS = frozenset({
+    "va", "cua", "la", "cac", "nhung", "mot", "cho", "voi", "trong", "thi",
+    "ma", "nay", "da", "se", "dang", "khi", "nhu", "cung", "ve", "roi",
+    "duoc", "bi", "co", "de", "o", "tai", "den", "di", "ra", "vao", "len",
+})
+
+_SYLLABLE_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_syllables(text: str) -> List[str]:
+    """Tách âm tiết, lowercase + bỏ dấu (NFC trước để dấu tổ hợp cũng được map)"""
+    if not text:
+        return []
+    return _SYLLABLE_RE.findall(normalize_vietnamese(unicodedata.normalize("NFC", text)))
+
+
+def index_terms(text: str) -> Tuple[str, str]:
+    """
+    Giá trị cho shadow columns (terms, bigrams) của 1 memory
+
+    Returns:
+        ("tiep tuc tu luyen", "tiep_tuc tuc_tu tu_luyen")
+    """
+    syllables = fold_syllables(text)
+    bigrams = [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+    return " ".join(syllables), " ".join(bigrams)
+
+
+def query_terms(text: str, max_terms: int = 16) -> List[Tuple[str, str]]:
+    """
+    Free text -> [(column, term)]: bigram trước (cột bigrams), rồi unigram trừ hư từ (cột terms)
+    """
+    syllables = fold_syllables(text)
+    bigrams = [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+    unigrams = [s for s in syllables if s not in VIETNAMESE_STOPWORDS]
+
+    terms: List[Tuple[str, str]] = []
+    for column, values in (("bigrams", bigrams), ("terms", unigrams)):
+        for value in values:
+            if (column, value) not in terms:
+                terms.append((column, value))
+    return terms[:max_terms]
+
+
+def join_fts_terms(terms: List[Tuple[str, str]]) -> str:
+    """[(column, term)] -> 'column:"term" OR ...'"""
+    return " OR ".join(f'{column}:"{term}"' for column, term in terms)
+
+
+def plan_fts_query(
+    terms: List[Tuple[str, str]],
+    doc_count: int,
+    doc_freq: Callable[[Tuple[str, str]], int]
+) -> str:
+    """
+    Query planner: OR của mọi term; index lớn thì AND thêm điều kiện term hiếm
+
+    Term phổ biến (VD: "tu_luyen" trong 10% ký ức) làm OR match nửa index và
+    bm25 phải chấm hết. Candidate giới hạn ở doc có term hiếm (<= 2% docs),
+    rank vẫn theo full query.
+
+    Args:
+        doc_count: Số doc trong index
+        doc_freq: (column, term) -> số doc chứa term (fts5vocab 'col')
+    """
+    if not terms:
+        return ""
+    full = join_fts_terms(terms)
+    if doc_count < FTS_PRUNE_MIN_DOCS:
+        return full
+
+    rare = [t for t in terms if 0 < doc_freq(t) <= doc_count * FTS_RARE_TERM_RATIO]
+    if not rare or len(rare) == len(terms):
+        return full
+    return f"({join_fts_terms(rare)}) AND ({full})"
+
+
+def build_fts_query(text: str, max_terms: int = 16) -> str:
+    """
+    Free text -> FTS5 MATCH expression (OR của các term đã bỏ dấu)
+
+    Bigram match cột bigrams (weight 2.0 qua BM25_WEIGHTS), unigram (trừ hư từ)
+    match cột terms. Rỗng nếu text không có term nào.
+
+    VD: "Tiếp tục tu luyện" ->
+        'bigrams:"tiep_tuc" OR bigrams:"tuc_tu" OR bigrams:"tu_luyen" OR terms:"tiep" OR ...'
+    """
+    return join_fts_terms(query_terms(text, max_terms))
+
+
+def create_vietnamese_fts(cursor, table: str) -> bool:
+    """
+    Tạo bảng FTS5 Vietnamese-aware (FTS5_COLUMNS); bảng cũ (porter) bị drop
+
+    Returns:
+        True nếu bảng vừa được (re)tạo - caller cần index lại từ bảng gốc
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = tuple(row[1] for row in cursor.fetchall())
+    if columns == FTS5_COLUMNS:
+        return False
+    if columns:
+        cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE {table} USING fts5(
+            memory_id UNINDEXED,
+            content,
+            memory_type,
+            terms,
+            bigrams,
+            tokenize="{FTS5_TOKENIZE}"
+        )
+    """)
+    # ORDER BY rank dùng weights này (top-k trong FTS, không join trước khi sort)
+    cursor.execute(f"INSERT INTO {table}({table}, rank) VALUES ('rank', 'bm25({BM25_WEIGHTS})')")
+    return True
+
+
+def fts_row(memory_id: str, content: str, memory_type: str) -> Tuple[str, str, str, str, str]:
+    """Row cho INSERT INTO <fts>(memory_id, content, memory_type, terms, bigrams)"""
+    terms, bigrams = index_terms(content)
+    return memory_id, content, memory_type, terms, bigrams
@@ -1,20 +1,29 @@
 """
-State Management - Redis-backed session state with SQLite snapshots
+State Management - pluggable session state (Redis / SQLite / in-process) with SQLite snapshots
 """
 
+from .backends import (
+    StateBackend, LocalStateBackend, SQLiteStateBackend, RedisStateBackend,
+    get_state_backend, set_state_backend, create_state_backend
+)
 from .redis_state import (
     acquire_lock, release_lock,
     save_state, load_state,
-    snapshot_save, snapshot_to_sqlite_blocking,
+    snapshot_save, snapshot_to_sqlite_blocking, snapshot_dirty,
+    restore_snapshot_blocking,
     periodic_snapshot_worker,
     get_redis_client
 )
+from .snapshots import SnapshotStore, get_snapshot_store, make_patch, apply_patch
 
 __all__ = [
+    'StateBackend', 'LocalStateBackend', 'SQLiteStateBackend', 'RedisStateBackend',
+    'get_state_backend', 'set_state_backend', 'create_state_backend',
     'acquire_lock', 'release_lock',
     'save_state', 'load_state',
-    'snapshot_save', 'snapshot_to_sqlite_blocking',
+    'snapshot_save', 'snapshot_to_sqlite_blocking', 'snapshot_dirty',
+    'restore_snapshot_blocking',
     'periodic_snapshot_worker',
-    'get_redis_client'
+    'get_redis_client',
+    'SnapshotStore', 'get_snapshot_store', 'make_patch', 'apply_patch'
 ]
-
@@ -0,0 +1,446 @@
+"""
+Session State Backends - nơi giữ state tạm của session (turn_count, narrative_log, ...)
+- LocalStateBackend:  LRU trong process (1 worker, không cần dịch vụ ngoài)
+- SQLiteStateBackend: 1 file SQLite dùng chung (nhiều worker trên 1 máy)
+- RedisStateBackend:  Redis (nhiều worker / nhiều máy)
+
+Mọi backend giữ danh sách save đang dirty: snapshot worker chỉ ghi save đã đổi
+kể từ lần snapshot trước. Payload lớn hơn STATE_COMPRESS_MIN_BYTES được nén zlib.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "auto")  # auto | memory | sqlite | redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "data/session_state.db")
+STATE_LOCAL_MAX_ENTRIES = int(os.getenv("STATE_LOCAL_MAX_ENTRIES", "1024"))
+STATE_COMPRESS_MIN_BYTES = int(os.getenv("STATE_COMPRESS_MIN_BYTES", "1024"))
+STATE_DEFAULT_TTL = 3600 * 24  # 24 giờ
+
+# Payload nén bắt đầu bằng marker này; JSON thuần (dữ liệu cũ) bắt đầu bằng "{"
+_COMPRESSED = b"z"
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """JSON (+ zlib nếu đủ lớn)"""
+    raw = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= STATE_COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(raw)
+    return raw
+
+
+def decode_state(payload: Optional[Any]) -> Dict[str, Any]:
+    if not payload:
+        return {}
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if payload[:1] == _COMPRESSED:
+        payload = zlib.decompress(payload[1:])
+    return json.loads(payload)
+
+
+class StateBackend(ABC):
+    """Interface chung; mọi method là async (gọi từ FastAPI handler / snapshot worker)"""
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, save_id: str) -> Dict[str, Any]:
+        """State của save ({} nếu không có / đã hết hạn)"""
+
+    @abstractmethod
+    async def set(self, save_id: str, state: Dict[str, Any], expire: int = STATE_DEFAULT_TTL):
+        """Ghi state + đánh dấu dirty"""
+
+    @abstractmethod
+    async def delete(self, save_id: str):
+        pass
+
+    @abstractmethod
+    async def acquire_lock(self, save_id: str, ttl: int = 10) -> bool:
+        """Lock hợp tác (SET NX + TTL); False nếu đang bị giữ"""
+
+    @abstractmethod
+    async def release_lock(self, save_id: str):
+        pass
+
+    @abstractmethod
+    async def take_dirty(self, limit: int = 500) -> List[Tuple[str, Dict[str, Any]]]:
+        """Lấy tối đa limit save dirty (kèm state) và xoá cờ dirty"""
+
+    @abstractmethod
+    async def mark_dirty(self, save_id: str):
+        """Đánh dấu lại dirty (snapshot lỗi -> thử lại lần sau)"""
+
+    @abstractmethod
+    async def active_saves(self) -> List[str]:
+        pass
+
+    async def reconcile(self):
+        """Đồng bộ bookkeeping với dữ liệu sẵn có (gọi 1 lần khi worker start)"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class LocalStateBackend(StateBackend):
+    """
+    LRU trong process (OrderedDict, payload đã encode)
+
+    Save dirty bị đẩy khỏi LRU được giữ lại tới lần take_dirty kế tiếp
+    (không mất state chưa snapshot).
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = STATE_LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._locks: Dict[str, float] = {}
+        self._dirty: set = set()
+        self._evicted: Dict[str, bytes] = {}
+        self._taken_evicted: Dict[str, bytes] = {}  # Cho mark_dirty khi snapshot lỗi
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+
+    def _live(self, save_id: str) -> Optional[bytes]:
+        entry = self._entries.get(save_id)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        if expires_at < time.time():
+            del self._entries[save_id]
+            self._dirty.discard(save_id)
+            return None
+        self._entries.move_to_end(save_id)
+        return payload
+
+    async def get(self, save_id: str) -> Dict[str, Any]:
+        with self._lock:
+            payload = self._live(save_id) or self._evicted.get(save_id)
+        return decode_state(payload)
+
+    async def set(self, save_id: str, state: Dict[str, Any], expire: int = STATE_DEFAULT_TTL):
+        payload = encode_state(state)
+        with self._lock:
+            self._entries[save_id] = (payload, time.time() + expire)
+            self._entries.move_to_end(save_id)
+            self._dirty.add(save_id)
+            self._evicted.pop(save_id, None)
+            while len(self._entries) > self.max_entries:
+                evicted_id, (evicted, _) = self._entries.popitem(last=False)
+                if evicted_id in self._dirty:
+                    self._dirty.discard(evicted_id)
+                    self._evicted[evicted_id] = evicted
+                self.evictions += 1
+
+    async def delete(self, save_id: str):
+        with self._lock:
+            self._entries.pop(save_id, None)
+            self._dirty.discard(save_id)
+            self._evicted.pop(save_id, None)
+
+    async def acquire_lock(self, save_id: str, ttl: int = 10) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._locks.get(save_id, 0) > now:
+                return False
+            self._locks[save_id] = now + ttl
+            return True
+
+    async def release_lock(self, save_id: str):
+        with self._lock:
+            self._locks.pop(save_id, None)
+
+    async def take_dirty(self, limit: int = 500) -> List[Tuple[str, Dict[str, Any]]]:
+        taken: List[Tuple[str, bytes]] = []
+        with self._lock:
+            self._taken_evicted = {}
+            while self._evicted and len(taken) < limit:
+                save_id, payload = self._evicted.popitem()
+                self._taken_evicted[save_id] = payload
+                taken.append((save_id, payload))
+            while self._dirty and len(taken) < limit:
+                save_id = self._dirty.pop()
+                payload = self._live(save_id)
+                if payload is not None:
+                    taken.append((save_id, payload))
+        return [(save_id, decode_state(payload)) for save_id, payload in taken]
+
+    async def mark_dirty(self, save_id: str):
+        with self._lock:
+            if save_id in self._entries:
+                self._dirty.add(save_id)
+            elif save_id in self._taken_evicted:
+                self._evicted[save_id] = self._taken_evicted.pop(save_id)
+
+    async def active_saves(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "dirty": len(self._dirty) + len(self._evicted),
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Bảng session_state(save_id, payload, expires_at, version, dirty) + session_locks
+
+    Chạy query trong asyncio.to_thread; lock dùng UPSERT có điều kiện hết hạn
+    (an toàn giữa nhiều worker process dùng chung file).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = STATE_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_state (
+                save_id TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                dirty INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_dirty ON session_state(dirty) WHERE dirty = 1")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS session_locks (save_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+        self.conn.commit()
+
+    def _run(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            self.conn.commit()
+            return cursor
+
+    async def get(self, save_id: str) -> Dict[str, Any]:
+        row = await asyncio.to_thread(lambda: self._run(
+            "SELECT payload FROM session_state WHERE save_id = ? AND expires_at >= ?", (save_id, time.time())
+        ).fetchone())
+        return decode_state(row[0]) if row else {}
+
+    async def set(self, save_id: str, state: Dict[str, Any], expire: int = STATE_DEFAULT_TTL):
+        payload = encode_state(state)
+        await asyncio.to_thread(self._run, """
+            INSERT INTO session_state (save_id, payload, expires_at, version, dirty)
+            VALUES (?, ?, ?, 0, 1)
+            ON CONFLICT(save_id) DO UPDATE SET
+                payload = excluded.payload,
+                expires_at = excluded.expires_at,
+                version = session_state.version + 1,
+                dirty = 1
+        """, (save_id, payload, time.time() + expire))
+
+    async def delete(self, save_id: str):
+        await asyncio.to_thread(self._run, "DELETE FROM session_state WHERE save_id = ?", (save_id,))
+
+    async def acquire_lock(self, save_id: str, ttl: int = 10) -> bool:
+        now = time.time()
+        cursor = await asyncio.to_thread(self._run, """
+            INSERT INTO session_locks (save_id, expires_at) VALUES (?, ?)
+            ON CONFLICT(save_id) DO UPDATE SET expires_at = excluded.expires_at
+            WHERE session_locks.expires_at < ?
+        """, (save_id, now + ttl, now))
+        return cursor.rowcount == 1
+
+    async def release_lock(self, save_id: str):
+        await asyncio.to_thread(self._run, "DELETE FROM session_locks WHERE save_id = ?", (save_id,))
+
+    def _take_dirty(self, limit: int) -> List[Tuple[str, bytes]]:
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT save_id, payload, version FROM session_state
+                WHERE dirty = 1 AND expires_at >= ?
+                LIMIT ?
+            """, (time.time(), limit)).fetchall()
+            # Chỉ xoá cờ nếu chưa bị ghi đè trong lúc đọc (version không đổi)
+            self.conn.executemany(
+                "UPDATE session_state SET dirty = 0 WHERE save_id = ? AND version = ?",
+                [(save_id, version) for save_id, _, version in rows]
+            )
+            self.conn.execute("DELETE FROM session_state WHERE expires_at < ?", (time.time(),))
+            self.conn.commit()
+        return [(save_id, payload) for save_id, payload, _ in rows]
+
+    async def take_dirty(self, limit: int = 500) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = await asyncio.to_thread(self._take_dirty, limit)
+        return [(save_id, decode_state(payload)) for save_id, payload in rows]
+
+    async def mark_dirty(self, save_id: str):
+        await asyncio.to_thread(self._run, "UPDATE session_state SET dirty = 1 WHERE save_id = ?", (save_id,))
+
+    async def active_saves(self) -> List[str]:
+        rows = await asyncio.to_thread(lambda: self._run(
+            "SELECT save_id FROM session_state WHERE expires_at >= ?", (time.time(),)
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, dirty = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(dirty), 0) FROM session_state"
+            ).fetchone()
+        return {"backend": self.name, "entries": entries, "dirty": dirty, "path": str(self.path)}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Redis: game:state:{save_id} (payload bytes, TTL) + set game:saves:active / game:saves:dirty
+
+    Không dùng KEYS: snapshot đọc set dirty (SPOP theo lô) rồi GET trong 1 pipeline;
+    SCAN chỉ dùng trong reconcile() để nhận các key có từ trước khi có set active.
+    client: inject client async tương thích redis-py (VD: fakeredis) - phải trả bytes.
+    """
+
+    name = "redis"
+    ACTIVE_KEY = "game:saves:active"
+    DIRTY_KEY = "game:saves:dirty"
+
+    def __init__(self, client: Optional[Any] = None, url: str = REDIS_URL):
+        if client is None:
+            if not HAS_REDIS:
+                raise RuntimeError("Redis backend requires: pip install redis>=4.6.0")
+            client = aioredis.from_url(url)  # bytes: payload có thể đã nén
+        self.client = client
+
+    @staticmethod
+    def state_key(save_id: str) -> str:
+        return f"game:state:{save_id}"
+
+    @staticmethod
+    def lock_key(save_id: str) -> str:
+        return f"lock:game:{save_id}"
+
+    async def get(self, save_id: str) -> Dict[str, Any]:
+        return decode_state(await self.client.get(self.state_key(save_id)))
+
+    async def set(self, save_id: str, state: Dict[str, Any], expire: int = STATE_DEFAULT_TTL):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.state_key(save_id), encode_state(state), ex=expire)
+            pipe.sadd(self.ACTIVE_KEY, save_id)
+            pipe.sadd(self.DIRTY_KEY, save_id)
+            await pipe.execute()
+
+    async def delete(self, save_id: str):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.state_key(save_id))
+            pipe.srem(self.ACTIVE_KEY, save_id)
+            pipe.srem(self.DIRTY_KEY, save_id)
+            await pipe.execute()
+
+    async def acquire_lock(self, save_id: str, ttl: int = 10) -> bool:
+        return bool(await self.client.set(self.lock_key(save_id), "1", nx=True, ex=ttl))
+
+    async def release_lock(self, save_id: str):
+        await self.client.delete(self.lock_key(save_id))
+
+    async def take_dirty(self, limit: int = 500) -> List[Tuple[str, Dict[str, Any]]]:
+        save_ids = [_text(member) for member in await self.client.spop(self.DIRTY_KEY, limit) or []]
+        if not save_ids:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for save_id in save_ids:
+                pipe.get(self.state_key(save_id))
+            payloads = await pipe.execute()
+
+        taken, expired = [], []
+        for save_id, payload in zip(save_ids, payloads):
+            if payload is None:
+                expired.append(save_id)
+            else:
+                taken.append((save_id, decode_state(payload)))
+        if expired:
+            await self.client.srem(self.ACTIVE_KEY, *expired)
+        return taken
+
+    async def mark_dirty(self, save_id: str):
+        await self.client.sadd(self.DIRTY_KEY, save_id)
+
+    async def active_saves(self) -> List[str]:
+        return [_text(member) async for member in self.client.sscan_iter(self.ACTIVE_KEY, count=500)]
+
+    async def reconcile(self):
+        """SCAN game:state:* (không chặn server như KEYS) -> thêm vào set active"""
+        prefix = len(self.state_key(""))
+        batch = []
+        async for key in self.client.scan_iter(match=self.state_key("*"), count=500):
+            batch.append(_text(key)[prefix:])
+            if len(batch) >= 500:
+                await self.client.sadd(self.ACTIVE_KEY, *batch)
+                batch = []
+        if batch:
+            await self.client.sadd(self.ACTIVE_KEY, *batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+# Global backend (lazy init theo STATE_BACKEND)
+_state_backend: Optional[StateBackend] = None
+_state_backend_lock = threading.Lock()
+
+
+def create_state_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    """auto: Redis nếu đã cài redis-py, không thì SQLite (không còn "mất state" khi thiếu Redis)"""
+    if kind == "auto":
+        kind = "redis" if HAS_REDIS else "sqlite"
+    if kind == "redis":
+        return RedisStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend()
+    if kind == "memory":
+        return LocalStateBackend()
+    raise ValueError(f"Unknown STATE_BACKEND: {kind}")
+
+
+def get_state_backend() -> StateBackend:
+    """Get or create the process-wide state backend"""
+    global _state_backend
+    with _state_backend_lock:
+        if _state_backend is None:
+            _state_backend = create_state_backend()
+            print(f"🗄️  Session state backend: {_state_backend.name}")
+        return _state_backend
+
+
+def set_state_backend(backend: StateBackend):
+    """Thay backend (VD: LocalStateBackend / fakeredis khi chạy thử)"""
+    global _state_backend
+    with _state_backend_lock:
+        _state_backend = backend
@@ -1,34 +1,33 @@
 """
-Redis-backed Session State Management
-All ephemeral game state in Redis, periodic snapshots to SQLite
-Supports multi-worker uvicorn safely
+Session State Management
+Ephemeral game state trong StateBackend (Redis / SQLite / in-process LRU, xem backends.py),
+periodic snapshots to SQLite chỉ cho các save đã đổi.
+Supports multi-worker uvicorn safely (Redis / SQLite backend)
 """
 
 import asyncio
-import json
-import time
-from typing import Any, Dict, Optional
-import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 import os
 
-try:
+from .backends import HAS_REDIS, REDIS_URL, STATE_DEFAULT_TTL, get_state_backend
+from .snapshots import get_snapshot_store
+
+if HAS_REDIS:
     import redis.asyncio as aioredis
-    HAS_REDIS = True
-except ImportError:
-    HAS_REDIS = False
+else:
     print("⚠️  Redis not installed. Install with: pip install redis>=4.6.0")
+    print("   Session state uses the SQLite backend (data/session_state.db)")
 
-# Redis configuration
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 SNAPSHOT_DIR = Path("data/snapshots")
 SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "500"))
 
-# Global Redis client (lazy init)
-_redis_client: Optional[aioredis.Redis] = None
+# Global Redis client (lazy init) - billing / cost control (decode_responses=True)
+_redis_client: Optional["aioredis.Redis"] = None
 
 
-def get_redis_client() -> Optional[aioredis.Redis]:
+def get_redis_client() -> Optional["aioredis.Redis"]:
     """Get or create Redis client"""
     global _redis_client
     if not HAS_REDIS:
@@ -38,137 +37,102 @@ def get_redis_client() -> Optional[aioredis.Redis]:
             _redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
         except Exception as e:
             print(f"⚠️  Failed to connect to Redis: {e}")
-            print("   Falling back to in-memory state (single-worker only)")
             return None
     return _redis_client
 
 
-# Redis key patterns
-def state_key(save_id: str) -> str:
-    return f"game:state:{save_id}"
-
-
-def lock_key(save_id: str) -> str:
-    return f"lock:game:{save_id}"
-
-
 async def acquire_lock(save_id: str, ttl: int = 10) -> bool:
     """
-    Acquire Redis lock (cooperative locking)
+    Acquire lock (cooperative locking)
     Returns True if lock acquired, False if already locked
     """
-    redis = get_redis_client()
-    if not redis:
-        # No Redis - assume single worker, always succeed
-        return True
-    
-    k = lock_key(save_id)
-    # SET NX PX - set if not exists, with expiration
-    return await redis.set(name=k, value="1", nx=True, ex=ttl)
+    return await get_state_backend().acquire_lock(save_id, ttl)
 
 
 async def release_lock(save_id: str):
-    """Release Redis lock"""
-    redis = get_redis_client()
-    if not redis:
-        return
-    
-    await redis.delete(lock_key(save_id))
+    """Release lock"""
+    await get_state_backend().release_lock(save_id)
 
 
-async def save_state(save_id: str, state: Dict[str, Any], expire: int = 3600 * 24):
+async def save_state(save_id: str, state: Dict[str, Any], expire: int = STATE_DEFAULT_TTL):
     """
-    Save ephemeral state to Redis
+    Save ephemeral state (đánh dấu dirty cho snapshot worker)
     expire: TTL in seconds (default 24 hours)
     """
-    redis = get_redis_client()
-    if not redis:
-        # No Redis - state is only in-memory (single worker)
-        return
-    
-    await redis.set(state_key(save_id), json.dumps(state, ensure_ascii=False), ex=expire)
+    await get_state_backend().set(save_id, state, expire)
 
 
 async def load_state(save_id: str) -> Dict[str, Any]:
-    """Load state from Redis"""
-    redis = get_redis_client()
-    if not redis:
-        return {}
-    
-    raw = await redis.get(state_key(save_id))
-    return json.loads(raw) if raw else {}
+    """Load state (backend trống / hết hạn -> restore từ snapshot SQLite)"""
+    state = await get_state_backend().get(save_id)
+    if not state and Path(f"data/saves/{save_id}.db").exists():
+        state = await asyncio.to_thread(restore_snapshot_blocking, save_id)
+    return state
 
 
-def snapshot_to_sqlite_blocking(save_id: str, state: Dict[str, Any]):
+def snapshot_to_sqlite_blocking(save_id: str, state: Dict[str, Any]) -> str:
     """
     Blocking function - call inside asyncio.to_thread
     Stores snapshot to data/saves/{save_id}.db in table snapshots
+    (keyframe hoặc JSON Patch so với snapshot trước, xem snapshots.py)
     """
-    db_path = Path(f"data/saves/{save_id}.db")
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
-    try:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS snapshots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            created_at INTEGER NOT NULL,
-            state_json TEXT NOT NULL
-        )""")
-        
-        # Use transaction
-        cur = conn.cursor()
-        cur.execute("BEGIN IMMEDIATE")
-        cur.execute(
-            "INSERT INTO snapshots (created_at, state_json) VALUES (?, ?)",
-            (int(time.time()), json.dumps(state, ensure_ascii=False))
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    return get_snapshot_store().write(save_id, state)
+
+
+def restore_snapshot_blocking(save_id: str, snapshot_id: Optional[int] = None) -> Dict[str, Any]:
+    """Blocking - state từ keyframe gần nhất + replay delta ({} nếu chưa có snapshot)"""
+    return get_snapshot_store().load(save_id, snapshot_id)
+
+
+def snapshot_many_blocking(states: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """Snapshot nhiều save trong 1 lần to_thread; trả save_id bị lỗi"""
+    failed = []
+    for save_id, state in states:
+        try:
+            snapshot_to_sqlite_blocking(save_id, state)
+        except Exception as e:
+            print(f"⚠️  Snapshot failed for {save_id}: {e}")
+            failed.append(save_id)
+    return failed
 
 
 async def snapshot_save(save_id: str):
-    """Async helper to snapshot current Redis state to SQLite"""
+    """Async helper to snapshot current state to SQLite"""
     st = await load_state(save_id)
     if st:
         await asyncio.to_thread(snapshot_to_sqlite_blocking, save_id, st)
 
 
+async def snapshot_dirty() -> int:
+    """Snapshot mọi save đã đổi từ lần trước; trả số save đã ghi"""
+    backend = get_state_backend()
+    written = 0
+    while True:
+        states = await backend.take_dirty(SNAPSHOT_BATCH_SIZE)
+        if not states:
+            return written
+        failed = await asyncio.to_thread(snapshot_many_blocking, states)
+        for save_id in failed:
+            await backend.mark_dirty(save_id)
+        written += len(states) - len(failed)
+        if failed or len(states) < SNAPSHOT_BATCH_SIZE:
+            return written
+
+
 async def periodic_snapshot_worker(interval_seconds: int = 60):
     """
-    Background worker that snapshots Redis states to SQLite periodically
-    In production, use a set of active save_ids instead of KEYS scan
+    Background worker that snapshots changed states to SQLite periodically
+    Save không đổi giữa 2 lần không bị serialize / ghi lại
     """
-    redis = get_redis_client()
-    if not redis:
-        return  # No Redis, nothing to snapshot
-    
+    backend = get_state_backend()
+    try:
+        await backend.reconcile()
+    except Exception as e:
+        print(f"⚠️  State backend reconcile failed: {e}")
+
     while True:
+        await asyncio.sleep(interval_seconds)
         try:
-            # Scan for all game state keys
-            keys = await redis.keys("game:state:*")
-            for k in keys:
-                save_id = k.split(":", 2)[2]
-                state = await redis.get(k)
-                if state:
-                    await asyncio.to_thread(
-                        snapshot_to_sqlite_blocking,
-                        save_id,
-                        json.loads(state)
-                    )
+            await snapshot_dirty()
         except Exception as e:
             print(f"⚠️  Snapshot worker error: {e}")
-        
-        await asyncio.sleep(interval_seconds)
-
-
-async def cleanup_expired_states():
-    """Clean up expired Redis states (optional maintenance)"""
-    redis = get_redis_client()
-    if not redis:
-        return
-    
-    # Redis will auto-expire based on TTL, but we can also manually clean
-    # This is optional - Redis handles expiration automatically
-
@@ -0,0 +1,306 @@
+"""
+Delta Snapshots - bảng snapshots trong data/saves/{save_id}.db
+Thay vì ghi nguyên state_json mỗi lần, ghi 1 keyframe (full state) mỗi
+SNAPSHOT_KEYFRAME_INTERVAL lần và JSON Patch (RFC 6902: add/remove/replace)
+giữa các keyframe. Restore = keyframe gần nhất + replay delta của nó.
+
+- Retention: chỉ giữ SNAPSHOT_KEEP_KEYFRAMES keyframe gần nhất (+ delta của chúng)
+- Row cũ (trước khi có cột kind) được coi là keyframe
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SNAPSHOT_KEYFRAME_INTERVAL = int(os.getenv("SNAPSHOT_KEYFRAME_INTERVAL", "50"))
+SNAPSHOT_KEEP_KEYFRAMES = int(os.getenv("SNAPSHOT_KEEP_KEYFRAMES", "3"))
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "256"))
+# Delta lớn hơn tỉ lệ này của full state -> ghi keyframe luôn
+SNAPSHOT_DELTA_MAX_RATIO = 0.5
+
+
+# --- JSON Patch ---
+
+def _pointer(path: str, key: Any) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _diff_list(old: List[Any], new: List[Any], path: str, ops: List[Dict[str, Any]]):
+    # Cửa sổ trượt (narrative_log[-50:]): bỏ k phần tử đầu, append ở cuối
+    for shift in range(len(old) + 1):
+        overlap = len(old) - shift
+        if overlap <= len(new) and (overlap or not old) and old[shift:] == new[:overlap]:
+            ops.extend({"op": "remove", "path": f"{path}/0"} for _ in range(shift))
+            ops.extend({"op": "add", "path": f"{path}/-", "value": value} for value in new[overlap:])
+            return
+        if overlap < len(old) // 2:
+            break
+    if len(old) == len(new):
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                make_patch(a, b, _pointer(path, i), ops)
+        return
+    ops.append({"op": "replace", "path": path, "value": new})
+
+
+def make_patch(old: Any, new: Any, path: str = "", ops: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """JSON Patch biến old thành new"""
+    if ops is None:
+        ops = []
+    if old == new:
+        return ops
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                make_patch(old[key], value, _pointer(path, key), ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, ops)
+    else:
+        ops.append({"op": "replace", "path": path, "value": new})
+    return ops
+
+
+def _parent(doc: Any, path: str) -> Tuple[Any, str]:
+    parts = path.split("/")[1:]
+    if "~" in path:
+        parts = [part.replace("~1", "/").replace("~0", "~") for part in parts]
+    for part in parts[:-1]:
+        doc = doc[int(part)] if isinstance(doc, list) else doc[part]
+    return doc, parts[-1]
+
+
+def apply_patch(doc: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Áp JSON Patch tại chỗ (doc phải là bản riêng của caller); trả doc"""
+    i = 0
+    while i < len(ops):
+        op = ops[i]
+        i += 1
+        if op["path"] == "":
+            doc = op["value"]
+            continue
+        parent, key = _parent(doc, op["path"])
+        if isinstance(parent, list):
+            if op["op"] == "add":
+                if key == "-":
+                    parent.append(op["value"])
+                else:
+                    parent.insert(int(key), op["value"])
+            elif op["op"] == "remove":
+                # Chuỗi remove cùng path (cửa sổ trượt): xoá 1 lần
+                end = i
+                while end < len(ops) and ops[end]["op"] == "remove" and ops[end]["path"] == op["path"]:
+                    end += 1
+                del parent[int(key):int(key) + 1 + end - i]
+                i = end
+            else:
+                parent[int(key)] = op["value"]
+        elif op["op"] == "remove":
+            del parent[key]
+        else:
+            parent[key] = op["value"]
+    return doc
+
+
+# --- Snapshot store ---
+
+# File save đã có schema snapshots mới (bỏ qua CREATE / PRAGMA mỗi lần ghi)
+_schema_ready: set = set()
+
+
+def _connect(save_id: str) -> sqlite3.Connection:
+    db_path = Path(f"data/saves/{save_id}.db")
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    ready = str(db_path) in _schema_ready and db_path.exists()
+    conn = sqlite3.connect(db_path)
+    if ready:
+        return conn
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at INTEGER NOT NULL,
+        state_json TEXT NOT NULL
+    )""")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(snapshots)")}
+    if "kind" not in columns:
+        # NULL = row full-state kiểu cũ
+        conn.execute("ALTER TABLE snapshots ADD COLUMN kind TEXT")
+        conn.execute("ALTER TABLE snapshots ADD COLUMN keyframe_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_keyframe ON snapshots(keyframe_id, id)")
+    conn.commit()
+    _schema_ready.add(str(db_path))
+    return conn
+
+
+def _latest_keyframe(conn: sqlite3.Connection, before: Optional[int] = None) -> Optional[Tuple[int, str]]:
+    return conn.execute("""
+        SELECT id, state_json FROM snapshots
+        WHERE (kind IS NULL OR kind = 'full') AND id <= ?
+        ORDER BY id DESC LIMIT 1
+    """, (before if before is not None else 2 ** 62,)).fetchone()
+
+
+def _last_id(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM snapshots").fetchone()[0]
+
+
+def _restore(conn: sqlite3.Connection, upto: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """(state, keyframe_id, số delta đã replay) tại snapshot upto (None = mới nhất)"""
+    keyframe = _latest_keyframe(conn, upto)
+    if keyframe is None:
+        return None
+    keyframe_id, state_json = keyframe
+    state = json.loads(state_json)
+    deltas = conn.execute("""
+        SELECT state_json FROM snapshots
+        WHERE keyframe_id = ? AND id <= ?
+        ORDER BY id
+    """, (keyframe_id, upto if upto is not None else 2 ** 62)).fetchall()
+    for (patch_json,) in deltas:
+        state = apply_patch(state, json.loads(patch_json))
+    return state, keyframe_id, len(deltas)
+
+
+class SnapshotStore:
+    """
+    Ghi / đọc snapshot theo keyframe + delta
+
+    Giữ state snapshot gần nhất mỗi save trong LRU (để diff không phải đọc lại DB);
+    cache chỉ được dùng nếu row cuối trong DB vẫn là row do store này ghi
+    (worker khác đã snapshot save này -> restore lại từ DB).
+    """
+
+    def __init__(
+        self,
+        keyframe_interval: int = SNAPSHOT_KEYFRAME_INTERVAL,
+        keep_keyframes: int = SNAPSHOT_KEEP_KEYFRAMES,
+        cache_size: int = SNAPSHOT_CACHE_SIZE
+    ):
+        self.keyframe_interval = keyframe_interval
+        self.keep_keyframes = keep_keyframes
+        self.cache_size = cache_size
+        # save_id -> (state JSON đã ghi, keyframe_id, số delta từ keyframe, id row cuối)
+        self._last: "OrderedDict[str, Tuple[str, int, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.keyframes = 0
+        self.deltas = 0
+        self.skipped = 0
+        self.pruned = 0
+
+    def write(self, save_id: str, state: Dict[str, Any]) -> str:
+        """
+        Blocking - call inside asyncio.to_thread
+
+        Returns:
+            "full" | "delta" | "skip" (state không đổi so với snapshot trước)
+        """
+        state_json = json.dumps(state, ensure_ascii=False)
+        conn = _connect(save_id)
+        try:
+            with self._lock:
+                last = self._last.get(save_id)
+            last_id = _last_id(conn)
+            if last is None or last[3] != last_id:
+                restored = _restore(conn)
+                last = None
+                if restored is not None:
+                    previous, keyframe_id, count = restored
+                    last = (json.dumps(previous, ensure_ascii=False), keyframe_id, count, last_id)
+
+            kind, payload = "full", state_json
+            if last is not None:
+                previous_json, keyframe_id, count, _ = last
+                if previous_json == state_json:
+                    self.skipped += 1
+                    return "skip"
+                if count + 1 < self.keyframe_interval:
+                    patch_json = json.dumps(make_patch(json.loads(previous_json), state), ensure_ascii=False)
+                    if len(patch_json) <= len(state_json) * SNAPSHOT_DELTA_MAX_RATIO:
+                        kind, payload = "delta", patch_json
+
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "INSERT INTO snapshots (created_at, state_json, kind, keyframe_id) VALUES (?, ?, ?, ?)",
+                (int(time.time()), payload, kind, last[1] if kind == "delta" else None)
+            )
+            last_id = cur.lastrowid
+            if kind == "full":
+                keyframe_id, count = last_id, 0
+                self.pruned += self._prune(cur)
+                self.keyframes += 1
+            else:
+                count += 1
+                self.deltas += 1
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._last[save_id] = (state_json, keyframe_id, count, last_id)
+            self._last.move_to_end(save_id)
+            while len(self._last) > self.cache_size:
+                self._last.popitem(last=False)
+        return kind
+
+    def _prune(self, cur: sqlite3.Cursor) -> int:
+        """Xoá mọi row cũ hơn keyframe thứ keep_keyframes (tính từ mới nhất)"""
+        row = cur.execute("""
+            SELECT id FROM snapshots
+            WHERE kind IS NULL OR kind = 'full'
+            ORDER BY id DESC LIMIT 1 OFFSET ?
+        """, (self.keep_keyframes - 1,)).fetchone()
+        if row is None:
+            return 0
+        cur.execute("DELETE FROM snapshots WHERE id < ?", (row[0],))
+        return cur.rowcount
+
+    def load(self, save_id: str, snapshot_id: Optional[int] = None) -> Dict[str, Any]:
+        """State tại snapshot_id (None = mới nhất); {} nếu chưa có snapshot"""
+        if not Path(f"data/saves/{save_id}.db").exists():
+            return {}
+        conn = _connect(save_id)
+        try:
+            restored = _restore(conn, snapshot_id)
+        finally:
+            conn.close()
+        return restored[0] if restored else {}
+
+    def forget(self, save_id: str):
+        """Bỏ state đã cache (save bị xoá / file bị thay)"""
+        with self._lock:
+            self._last.pop(save_id, None)
+        _schema_ready.discard(str(Path(f"data/saves/{save_id}.db")))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "skipped": self.skipped,
+            "pruned": self.pruned,
+            "cached_saves": len(self._last),
+        }
+
+
+# Global store (1 / process)
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Get or create the process-wide snapshot store"""
+    global _snapshot_store
+    with _snapshot_store_lock:
+        if _snapshot_store is None:
+            _snapshot_store = SnapshotStore()
+        return _snapshot_store
@@ -0,0 +1,309 @@
+"""
+Test các session state backend: LocalStateBackend + RedisStateBackend trên fake client
+(fakeredis nếu đã cài, không thì _FakeRedis bên dưới) + SQLiteStateBackend
+
+- Dirty tracking: set -> take_dirty 1 lần, mark_dirty khi snapshot lỗi
+- Lock: SET NX + TTL, người thứ 2 bị từ chối tới khi release / hết hạn
+- LRU (Local): save dirty bị đẩy khỏi LRU không mất trước lần take_dirty
+- reconcile (Redis): key có từ trước set active được nhận lại bằng SCAN
+
+Chạy: python -m pytest engine/state/test_backends.py -q
+  hoặc python -m engine.state.test_backends
+"""
+
+import asyncio
+import fnmatch
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from engine.state.backends import LocalStateBackend, RedisStateBackend, SQLiteStateBackend
+
+try:
+    from fakeredis import FakeAsyncRedis
+    HAS_FAKEREDIS = True
+except ImportError:
+    HAS_FAKEREDIS = False
+
+
+class _FakePipeline:
+    """Gom lệnh, execute() chạy tuần tự (đủ cho backend: không có client khác xen vào)"""
+
+    def __init__(self, client: "_FakeRedis"):
+        self._client = client
+        self._commands: List[Any] = []
+
+    async def __aenter__(self) -> "_FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc):
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        return [await getattr(self._client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class _FakeRedis:
+    """Tập con lệnh redis.asyncio mà RedisStateBackend dùng; trả bytes như client thật"""
+
+    def __init__(self):
+        self._values: Dict[bytes, Any] = {}
+        self._expires: Dict[bytes, float] = {}
+
+    @staticmethod
+    def _key(key: Any) -> bytes:
+        return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+    def _live(self, key: bytes) -> Optional[Any]:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return self._values.get(key)
+
+    def pipeline(self, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    async def get(self, key) -> Optional[bytes]:
+        return self._live(self._key(key))
+
+    async def set(self, key, value, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        key = self._key(key)
+        if nx and self._live(key) is not None:
+            return None
+        self._values[key] = self._key(value)
+        if ex is not None:
+            self._expires[key] = time.time() + ex
+        else:
+            self._expires.pop(key, None)
+        return True
+
+    async def delete(self, *keys) -> int:
+        deleted = 0
+        for key in map(self._key, keys):
+            deleted += self._values.pop(key, None) is not None
+            self._expires.pop(key, None)
+        return deleted
+
+    async def sadd(self, key, *members) -> int:
+        members_set = self._values.setdefault(self._key(key), set())
+        before = len(members_set)
+        members_set.update(map(self._key, members))
+        return len(members_set) - before
+
+    async def srem(self, key, *members) -> int:
+        members_set = self._values.get(self._key(key), set())
+        before = len(members_set)
+        members_set.difference_update(map(self._key, members))
+        return before - len(members_set)
+
+    async def spop(self, key, count: Optional[int] = None) -> List[bytes]:
+        members_set = self._values.get(self._key(key), set())
+        return [members_set.pop() for _ in range(min(count or 1, len(members_set)))]
+
+    async def sscan_iter(self, key, count: Optional[int] = None):
+        for member in list(self._values.get(self._key(key), set())):
+            yield member
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        for key in list(self._values):
+            if self._live(key) is not None and (match is None or fnmatch.fnmatchcase(key.decode("utf-8"), match)):
+                yield key
+
+
+def _redis_backend() -> RedisStateBackend:
+    return RedisStateBackend(client=FakeAsyncRedis() if HAS_FAKEREDIS else _FakeRedis())
+
+
+def _backends() -> List[Any]:
+    tmp = tempfile.mkdtemp(prefix="state_backends_")
+    return [LocalStateBackend(), _redis_backend(), SQLiteStateBackend(str(Path(tmp) / "session_state.db"))]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _dirty_ids(taken) -> set:
+    return {save_id for save_id, _ in taken}
+
+
+# --- Dirty tracking ---
+
+def test_dirty_tracking():
+    async def check(backend):
+        await backend.set("a", {"turn_count": 1})
+        await backend.set("b", {"turn_count": 2})
+        taken = await backend.take_dirty()
+        assert dict(taken) == {"a": {"turn_count": 1}, "b": {"turn_count": 2}}, backend.name
+        assert await backend.take_dirty() == [], backend.name
+
+        await backend.set("a", {"turn_count": 3})
+        assert await backend.take_dirty() == [("a", {"turn_count": 3})], backend.name
+
+        # Snapshot lỗi -> mark_dirty -> lần sau lấy lại
+        await backend.mark_dirty("a")
+        assert _dirty_ids(await backend.take_dirty()) == {"a"}, backend.name
+
+        await backend.delete("b")
+        assert await backend.get("b") == {}, backend.name
+        assert await backend.take_dirty() == [], backend.name
+
+    for backend in _backends():
+        _run(check(backend))
+
+
+def test_take_dirty_limit():
+    async def check(backend):
+        for i in range(5):
+            await backend.set(f"s{i}", {"i": i})
+        first = await backend.take_dirty(limit=3)
+        rest = await backend.take_dirty(limit=3)
+        assert len(first) == 3 and len(rest) == 2, backend.name
+        assert _dirty_ids(first) | _dirty_ids(rest) == {f"s{i}" for i in range(5)}, backend.name
+
+    for backend in _backends():
+        _run(check(backend))
+
+
+def test_large_state_roundtrip():
+    """Payload >= STATE_COMPRESS_MIN_BYTES được nén, đọc lại như cũ"""
+    state = {"narrative_log": ["Năm thứ %d: tu luyện trong động phủ" % i for i in range(200)]}
+
+    async def check(backend):
+        await backend.set("big", state)
+        assert await backend.get("big") == state, backend.name
+        assert await backend.take_dirty() == [("big", state)], backend.name
+
+    for backend in _backends():
+        _run(check(backend))
+
+
+# --- Lock ---
+
+def test_lock_contention():
+    async def check(backend):
+        assert await backend.acquire_lock("a", ttl=10), backend.name
+        assert not await backend.acquire_lock("a", ttl=10), backend.name
+        assert await backend.acquire_lock("b", ttl=10), backend.name  # lock theo save
+        await backend.release_lock("a")
+        assert await backend.acquire_lock("a", ttl=10), backend.name
+
+        # Holder chết không release: lock tự hết hạn theo TTL
+        assert await backend.acquire_lock("c", ttl=1), backend.name
+        assert not await backend.acquire_lock("c", ttl=1), backend.name
+        await asyncio.sleep(1.1)
+        assert await backend.acquire_lock("c", ttl=1), backend.name
+
+    for backend in _backends():
+        _run(check(backend))
+
+
+def test_lock_concurrent_acquire():
+    """Nhiều task tranh cùng lock: đúng 1 task thắng"""
+    async def check(backend):
+        results = await asyncio.gather(*(backend.acquire_lock("hot", ttl=10) for _ in range(20)))
+        assert sum(results) == 1, backend.name
+
+    for backend in _backends():
+        _run(check(backend))
+
+
+# --- LRU (LocalStateBackend) ---
+
+def test_local_lru_keeps_evicted_dirty():
+    async def check():
+        backend = LocalStateBackend(max_entries=2)
+        await backend.set("a", {"v": 1})
+        await backend.set("b", {"v": 2})
+        await backend.set("c", {"v": 3})  # đẩy "a" (đang dirty) khỏi LRU
+        assert backend.evictions == 1
+        assert await backend.active_saves() == ["b", "c"]
+        # Chưa snapshot: vẫn đọc được và vẫn nằm trong lô dirty
+        assert await backend.get("a") == {"v": 1}
+        assert backend.stats()["dirty"] == 3
+
+        taken = await backend.take_dirty()
+        assert dict(taken) == {"a": {"v": 1}, "b": {"v": 2}, "c": {"v": 3}}
+        assert await backend.get("a") == {}  # đã snapshot -> bỏ hẳn
+
+        # Snapshot lỗi cho save đã bị đẩy: mark_dirty giữ lại payload tới lần sau
+        await backend.mark_dirty("a")
+        assert await backend.take_dirty() == [("a", {"v": 1})]
+        assert await backend.take_dirty() == []
+
+    _run(check())
+
+
+def test_local_lru_clean_eviction_and_touch():
+    async def check():
+        backend = LocalStateBackend(max_entries=2)
+        await backend.set("a", {"v": 1})
+        await backend.set("b", {"v": 2})
+        await backend.take_dirty()  # a, b sạch
+        await backend.get("a")  # a thành dùng gần nhất
+        await backend.set("c", {"v": 3})  # đẩy "b" (sạch) -> bỏ hẳn
+        assert await backend.active_saves() == ["a", "c"]
+        assert await backend.get("b") == {}
+        assert await backend.take_dirty() == [("c", {"v": 3})]
+
+    _run(check())
+
+
+def test_local_expired_entry():
+    async def check():
+        backend = LocalStateBackend()
+        await backend.set("a", {"v": 1}, expire=-1)
+        assert await backend.get("a") == {}
+        assert await backend.take_dirty() == []
+
+    _run(check())
+
+
+# --- reconcile (Redis) ---
+
+def test_redis_reconcile():
+    async def check():
+        backend = _redis_backend()
+        await backend.set("live", {"v": 1})
+        # Key ghi bởi phiên bản cũ (trước khi có set active / dirty)
+        await backend.client.set(backend.state_key("legacy_1"), b'{"v":2}')
+        await backend.client.set(backend.state_key("legacy_2"), b'{"v":3}')
+        await backend.client.set("lock:game:live", "1")  # key khác prefix: bỏ qua
+        assert set(await backend.active_saves()) == {"live"}
+
+        await backend.reconcile()
+        assert set(await backend.active_saves()) == {"live", "legacy_1", "legacy_2"}
+        assert await backend.get("legacy_1") == {"v": 2}
+        await backend.reconcile()  # idempotent
+        assert set(await backend.active_saves()) == {"live", "legacy_1", "legacy_2"}
+
+    _run(check())
+
+
+def test_redis_take_dirty_drops_expired():
+    async def check():
+        backend = _redis_backend()
+        await backend.set("gone", {"v": 1}, expire=1)
+        await backend.set("kept", {"v": 2})
+        await asyncio.sleep(1.1)
+        assert await backend.take_dirty() == [("kept", {"v": 2})]
+        assert set(await backend.active_saves()) == {"kept"}
+
+    _run(check())
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"✅ {name}")
+    print(f"{len(tests)} tests passed (redis client: {'fakeredis' if HAS_FAKEREDIS else '_FakeRedis'})")
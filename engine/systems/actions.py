@@ -250,6 +250,26 @@ class ActionExecutor:
             success=True,
             action="TALK",
             message=f"{target_name} says: \"{response}\"",
+            actor_id=actor_id,
+            target_id=target_id,
+            changes={"topic": topic}
+        )
+    
+    def _execute_examine(self, proposal: ActionProposal, actor_id: int) -> ActionResult:
+        """Execute examining"""
+        target_id = proposal.target_id
+        target_name = self.em.get_name(target_id)
+        
+        return ActionResult(
+            success=True,
+            action="EXAMINE",
+            message=f"{target_name}: {self.em.get_description(target_id)}",
+            actor_id=actor_id,
+            target_id=target_id
+        )
+    
+    def _execute_equip(self, proposal: ActionProposal, actor_id: int) -> ActionResult:
+        """Execute equipping"""
         target_id = proposal.target_id
         target_name = self.em.get_name(target_id)
         
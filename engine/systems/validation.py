@@ -318,6 +318,28 @@ class PreconditionSystem:
             target_name = self.em.get_name(target_id)
             return False, ValidationError(
                 code="ERR_NOT_EQUIPPABLE",
+                message=f"You can't equip {target_name}"
+            )
+        
+        return True, None
+    
+    def _validate_drop(self, proposal: ActionProposal, actor_id: int) -> Tuple[bool, Optional[ValidationError]]:
+        """Validate dropping an item"""
+        target_id = proposal.target_id
+        
+        actor_inv = self.em.get(actor_id, InventoryComponent)
+        if not actor_inv or target_id not in actor_inv.items:
+            return False, ValidationError(
+                code="ERR_NOT_IN_INVENTORY",
+                message="You don't have that item",
+                suggested_actions=["check inventory"]
+            )
+        
+        return True, None
+    
+    def _validate_close(self, proposal: ActionProposal, actor_id: int) -> Tuple[bool, Optional[ValidationError]]:
+        """Validate closing something"""
+        target_id = proposal.target_id
         
         if not target_id or not self.em.exists(target_id):
             return False, ValidationError(
@@ -390,16 +412,8 @@ class PreconditionSystem:
         return False
     
     def _find_entities_at(self, room_id: str, x: int, y: int) -> list:
-        """Find entities at specific coordinates"""
-        entities_in_room = self.em.find_at_location(room_id)
-        result = []
-        
-        for entity_id in entities_in_room:
-            loc = self.em.get(entity_id, LocationComponent)
-            if loc and loc.x == x and loc.y == y:
-                result.append(entity_id)
-        
-        return result
+        """Find entities at specific coordinates (grid index)"""
+        return self.em.find_at_position(room_id, x, y)
 
 
 # Global instance
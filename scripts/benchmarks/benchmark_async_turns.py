@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: N concurrent simulated players against a stubbed LLM
+Compares blocking turns (process_year_turn on the event loop, old /game/action)
+with the async pipeline (process_year_turn_async). Reports p50/p99 turn latency.
+
+Usage:
+    python scripts/benchmarks/benchmark_async_turns.py --players 32 --turns 5 --llm_latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+from sim_harness import sim_sandbox, quiet, make_simulator, percentile
+
+
+# Closed-loop players: each turn is issued as soon as the previous one returns,
+# so latency = time since the request was issued (includes queueing behind a
+# blocked event loop), not just the time spent inside the turn.
+
+async def _player_blocking(sim, turns: int, latencies: List[float]):
+    issued = time.perf_counter()
+    for _ in range(turns):
+        sim.process_year_turn(0)  # Blocks the loop, like the old async def endpoint
+        done = time.perf_counter()
+        latencies.append(done - issued)
+        issued = done
+        await asyncio.sleep(0)
+
+
+async def _player_async(sim, turns: int, latencies: List[float]):
+    issued = time.perf_counter()
+    for _ in range(turns):
+        await sim.process_year_turn_async(0)
+        done = time.perf_counter()
+        latencies.append(done - issued)
+        issued = done
+
+
+async def _run(mode: str, sims, turns: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    player = _player_async if mode == "async" else _player_blocking
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player(sim, turns, latencies) for sim in sims))
+    wall = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "players": len(sims),
+        "turns": len(latencies),
+        "wall_s": round(wall, 3),
+        "turns_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def run_benchmark(players: int, turns: int, llm_latency: float, modes: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        for mode in modes:
+            with quiet():
+                sims = [make_simulator(f"bench_{mode}_{i}", llm_latency) for i in range(players)]
+                result = asyncio.run(_run(mode, sims, turns))
+            results.append(result)
+            print(f"{mode:>8}: {result['players']} players x {turns} turns | "
+                  f"p50 {result['p50_ms']:.0f}ms | p99 {result['p99_ms']:.0f}ms | "
+                  f"{result['turns_per_s']:.1f} turns/s | wall {result['wall_s']:.1f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent turn latency benchmark (stubbed LLM)")
+    parser.add_argument("--players", type=int, default=32, help="Concurrent simulated players")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per player")
+    parser.add_argument("--llm_latency", type=float, default=0.5, help="Stub LLM latency (seconds)")
+    parser.add_argument("--modes", default="blocking,async", help="Comma-separated: blocking,async")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Async turn benchmark: {args.players} players, {args.turns} turns, LLM {args.llm_latency}s")
+    print(f"{'='*60}")
+
+    results = run_benchmark(args.players, args.turns, args.llm_latency, args.modes.split(","))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
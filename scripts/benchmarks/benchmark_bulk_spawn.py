@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Sinh 1 vùng procedural (--entities entity: NPC / vật phẩm / vũ khí / cửa) vào save mới
+- before: em.create từng entity ngoài batch (create_entity + Timestamp + 1 add_component
+          / component, mỗi cái 1 commit)
+- batch:  như before nhưng trong em.batch() (1 commit, vẫn 1 INSERT entities / entity)
+- after:  em.create_many(specs): ID cấp theo khối, entities + components bằng executemany
+          trong 1 transaction
+
+Usage:
+    python scripts/benchmarks/benchmark_bulk_spawn.py --entities 1000,5000
+"""
+
+import argparse
+import json
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox
+
+ROOMS = 40
+
+
+def _specs(em, entities: int) -> List[Any]:
+    specs = []
+    for i in range(entities):
+        room = f"region_{i % ROOMS}"
+        kind = i % 4
+        if kind == 0:
+            specs.append(em.npc_spec(f"Bandit {i}", room, "aggressive"))
+        elif kind == 1:
+            specs.append(em.item_spec(f"Thảo dược {i}", "Cây thuốc mọc hoang", room))
+        elif kind == 2:
+            specs.append(em.weapon_spec(f"Kiếm gỉ {i}", damage=5 + i % 7, room_id=room))
+        else:
+            specs.append(em.door_spec(f"Cổng đá {i}", room, is_locked=i % 8 == 3))
+    return specs
+
+
+def _create_before(em, label: str, components: Dict[str, Any]) -> int:
+    """EntityManager.create trước create_many"""
+    from engine.core import TimestampComponent
+
+    entity_id = em.db.create_entity(label)
+    em.db.add_component(entity_id, TimestampComponent())
+    for component in components.values():
+        em.db.add_component(entity_id, component)
+    return entity_id
+
+
+def run_benchmark(mode: str, entities: int) -> Dict[str, Any]:
+    with sim_sandbox():
+        from engine.core import Database, EntityManager
+
+        db_path = f"data/saves/bench_spawn_{mode}.db"
+        db = Database(db_path)
+        em = EntityManager(db)
+        specs = _specs(em, entities)
+
+        start = time.perf_counter()
+        if mode == "after":
+            entity_ids = em.create_many(specs)
+        else:
+            with em.batch() if mode == "batch" else nullcontext():
+                entity_ids = [_create_before(em, label, components) for label, components in specs]
+        elapsed = time.perf_counter() - start
+
+        rooms = len(em.find_at_location("region_0"))
+        db.close()
+
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT COUNT(*) FROM components").fetchone()[0]
+        conn.close()
+
+    return {
+        "mode": mode,
+        "entities": entities,
+        "spawn_ms": round(elapsed * 1000, 1),
+        "per_entity_us": round(elapsed / entities * 1e6, 1),
+        "components": rows,
+        "in_region_0": rooms,
+        "ids_contiguous": entity_ids == list(range(entity_ids[0], entity_ids[0] + entities)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk entity spawn benchmark")
+    parser.add_argument("--entities", default="1000,5000", help="Comma-separated entity counts")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Bulk spawn: procedural region over {ROOMS} rooms")
+    print(f"{'='*60}")
+
+    results = []
+    for entities in (int(n) for n in args.entities.split(",")):
+        for mode in ("before", "batch", "after"):
+            result = run_benchmark(mode, entities)
+            results.append(result)
+            print(f"{entities:>7} entities | {mode:>6}: {result['spawn_ms']}ms ({result['per_entity_us']}µs/entity) | "
+                  f"{result['components']} components | region_0 {result['in_region_0']} | "
+                  f"contiguous ids {result['ids_contiguous']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Codec cột data của bảng components (engine.core) trên 1 world --entities entity
+- json:    pydantic JSON text (như cũ)
+- struct:  nhị phân theo schema suy từ field của model (codecs.py)
+- msgpack: nếu đã pip install msgpack
+
+Mỗi codec: migrate save JSON sang codec đó (convert_components + VACUUM), rồi đo
+kích thước DB, ghi lại mọi component trong 1 batch, đọc cold mọi component qua
+get_many (Database mới mở), và dựng EntityIndex (vị trí + tags) lần đầu.
+
+Usage:
+    python scripts/benchmarks/benchmark_component_codec.py --entities 20000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet
+
+ROOMS = 40
+
+
+def _populate(db_path: str, entities: int):
+    from engine.core import Database, EntityManager, InventoryComponent
+
+    db = Database(db_path, codec="json")
+    em = EntityManager(db)
+    specs = []
+    for i in range(entities):
+        room = f"room_{i % ROOMS}"
+        kind = i % 4
+        if kind == 0:
+            specs.append(em.npc_spec(f"Lính canh {i}", room, "guard"))
+        elif kind == 1:
+            specs.append(em.item_spec(f"Thảo dược {i}", "Cây thuốc mọc hoang ven suối", room))
+        elif kind == 2:
+            specs.append(em.weapon_spec(f"Kiếm gỉ {i}", damage=5 + i % 7, room_id=room))
+        else:
+            specs.append(em.player_spec(f"Lữ khách {i}"))
+    ids = em.create_many(specs)
+    with em.batch():
+        for eid in ids[3::4]:
+            em.add(eid, InventoryComponent(items=list(range(eid, eid + 8)), capacity=30))
+    db.close()
+
+
+def _read_all(db) -> int:
+    from engine.core import COMPONENT_REGISTRY
+
+    entity_ids = [row[0] for row in db.connection.execute("SELECT id FROM entities")]
+    return sum(len(db.get_components(entity_ids, component_class)) for component_class in COMPONENT_REGISTRY.values())
+
+
+def run_benchmark(codec: str, source: str) -> Dict[str, Any]:
+    from engine.core import Database
+    from engine.core.codecs import migrate
+
+    db_path = f"data/saves/bench_codec_{codec}.db"
+    shutil.copy(source, db_path)
+
+    start = time.perf_counter()
+    converted = migrate(db_path, codec, vacuum=True)
+    migrate_ms = (time.perf_counter() - start) * 1000
+    file_bytes = os.path.getsize(db_path)
+
+    # Đọc cold: Database mới mở, identity map rỗng
+    db = Database(db_path, codec=codec)
+    start = time.perf_counter()
+    components = _read_all(db)
+    read_s = time.perf_counter() - start
+
+    # Ghi: mọi component (đã nằm trong identity map) ghi lại trong 1 batch
+    start = time.perf_counter()
+    db.add_components([
+        (entity_id, component)
+        for by_entity in list(db._components.values())
+        for entity_id, component in by_entity.items() if component is not None
+    ])
+    write_s = time.perf_counter() - start
+    dump = db.dump_all()
+    db.close()
+
+    db = Database(db_path, codec=codec)
+    start = time.perf_counter()
+    db.find_entities_at_location("room_0")
+    db.find_entities_with_tag("player")
+    index_ms = (time.perf_counter() - start) * 1000
+    db.close()
+
+    return {
+        "codec": codec,
+        "components": components,
+        "data_bytes": converted["data_bytes_after"],
+        "file_bytes": file_bytes,
+        "migrate_ms": round(migrate_ms, 1),
+        "read_per_s": round(components / read_s),
+        "write_per_s": round(components / write_s),
+        "index_build_ms": round(index_ms, 1),
+        "_dump": dump,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Component codec benchmark (JSON vs binary)")
+    parser.add_argument("--entities", type=int, default=20000)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Component codec: {args.entities} entities")
+    print(f"{'='*60}")
+
+    results: List[Dict[str, Any]] = []
+    with sim_sandbox():
+        from engine.core.codecs import FORMATS, HAS_MSGPACK
+
+        source = "data/saves/bench_codec_source.db"
+        with quiet():
+            _populate(source, args.entities)
+        for codec in FORMATS:
+            if codec == "msgpack" and not HAS_MSGPACK:
+                print(f"{codec:>8}: skipped (pip install msgpack)")
+                continue
+            result = run_benchmark(codec, source)
+            results.append(result)
+            print(f"{codec:>8}: {result['components']} components | data {result['data_bytes'] / 1024:.0f} KB, "
+                  f"file {result['file_bytes'] / 1024:.0f} KB | read {result['read_per_s']}/s | "
+                  f"write {result['write_per_s']}/s | index build {result['index_build_ms']}ms | "
+                  f"migrate {result['migrate_ms']}ms")
+
+    dumps = [result.pop("_dump") for result in results]
+    same = all(dump == dumps[0] for dump in dumps[1:])
+    print(f"dump_all identical across codecs: {same}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"results": results, "same_result": same}, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
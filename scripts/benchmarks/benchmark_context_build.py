@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+ContextBuilder.build trong 1 phòng đông entity (engine.core, Last Voyage)
+- before: Database cũ (connect SQLite + model_validate_json mỗi get_component,
+          mỗi add_component 1 connect + commit), ContextBuilder gọi em.get từng entity
+- after:  identity map + connection dùng chung, get_many gom miss thành 1 query,
+          ghi trong em.batch() = 1 transaction
+
+Đo: build cold (save vừa mở) / warm, và 1 turn ghi --writes component.
+
+Usage:
+    python scripts/benchmarks/benchmark_context_build.py --entities 1000 --builds 200
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+
+
+def _legacy_database_class():
+    from engine.core.database import Database
+
+    class LegacyDatabase(Database):
+        """engine.core.Database trước identity map (đếm số connect)"""
+
+        connects = 0
+
+        @contextmanager
+        def get_connection(self):
+            LegacyDatabase.connects += 1
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            finally:
+                conn.close()
+
+        def add_component(self, entity_id, component):
+            with self.get_connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO components (entity_id, component_type, data) VALUES (?, ?, ?)",
+                             (entity_id, self._get_component_type(component), component.model_dump_json()))
+
+        def get_component(self, entity_id, component_class):
+            with self.get_connection() as conn:
+                row = conn.execute("SELECT data FROM components WHERE entity_id = ? AND component_type = ?",
+                                   (entity_id, self._class_to_type(component_class))).fetchone()
+                return component_class.model_validate_json(row['data']) if row else None
+
+        def find_entities_at_location(self, room_id):
+            with self.get_connection() as conn:
+                return [row['entity_id'] for row in conn.execute("""
+                    SELECT entity_id FROM components
+                    WHERE component_type = 'location' AND json_extract(data, '$.room_id') = ?
+                """, (room_id,))]
+
+        def batch(self):
+            return nullcontext(self)
+
+    return LegacyDatabase
+
+
+def _build_before(builder, player_id: int):
+    """ContextBuilder.build trước get_many (em.get từng entity)"""
+    from engine.core import IdentityComponent, InventoryComponent, LocationComponent, StatsComponent
+
+    em = builder.em
+    em.get(player_id, StatsComponent)
+    location = em.get(player_id, LocationComponent)
+    inventory = em.get(player_id, InventoryComponent)
+    em.get(player_id, IdentityComponent)
+    visible = [em.get(eid, IdentityComponent) for eid in em.find_at_location(location.room_id) if eid != player_id]
+    items = [em.get(iid, IdentityComponent) for iid in inventory.items]
+    return visible, items
+
+
+def _populate(db_path: str, entities: int, inventory: int):
+    from engine.core import EntityManager, Database, InventoryComponent
+
+    db = Database(db_path)
+    em = EntityManager(db)
+    with em.batch():
+        player_id = em.create_player("Hero")
+        for i in range(entities):
+            if i % 3 == 0:
+                em.create_npc(f"Lính canh {i}", "entrance", "guard")
+            else:
+                em.create_item(f"Rương gỗ {i}", "Một chiếc rương cũ", "entrance")
+        items = [em.create_item(f"Bùa hộ mệnh {i}", "Bùa giấy", "backpack") for i in range(inventory)]
+        em.add(player_id, InventoryComponent(items=items, capacity=max(20, inventory)))
+    db.close()
+    return player_id
+
+
+def run_benchmark(mode: str, entities: int, builds: int, writes: int, inventory: int) -> Dict[str, Any]:
+    with sim_sandbox():
+        from engine.core import EntityManager, Database, StatsComponent
+        from engine.ai.context import ContextBuilder
+
+        db_path = "data/saves/bench_context.db"
+        player_id = _populate(db_path, entities, inventory)
+
+        db_class = _legacy_database_class() if mode == "before" else Database
+        db = db_class(db_path)
+        em = EntityManager(db)
+        builder = ContextBuilder(em)
+        build = (lambda: _build_before(builder, player_id)) if mode == "before" else (lambda: builder.build(player_id))
+
+        start = time.perf_counter()
+        build()
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        connects_before = getattr(db_class, "connects", 0)
+        latencies: List[float] = []
+        for _ in range(builds):
+            start = time.perf_counter()
+            build()
+            latencies.append(time.perf_counter() - start)
+        connects = (getattr(db_class, "connects", 0) - connects_before) / builds
+
+        npc_ids = em.find_with(StatsComponent)[:writes]
+        start = time.perf_counter()
+        with em.batch():
+            for eid in npc_ids:
+                stats = em.get(eid, StatsComponent)
+                stats.hp = max(0, stats.hp - 1)
+                em.add(eid, stats)
+        write_ms = (time.perf_counter() - start) * 1000
+
+        check = sqlite3.connect(db_path)
+        persisted = all(
+            json.loads(row[0])["hp"] == em.get(eid, StatsComponent).hp
+            for eid in npc_ids
+            for row in check.execute("SELECT data FROM components WHERE entity_id = ? AND component_type = 'stats'", (eid,))
+        )
+        check.close()
+
+    return {
+        "mode": mode,
+        "entities": entities,
+        "cold_build_ms": round(cold_ms, 2),
+        "build_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "build_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "connects_per_build": round(connects, 1),
+        "turn_writes": len(npc_ids),
+        "turn_write_ms": round(write_ms, 2),
+        "persisted": persisted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ContextBuilder.build / component store benchmark")
+    parser.add_argument("--entities", type=int, default=1000, help="Entity trong phòng của player")
+    parser.add_argument("--inventory", type=int, default=20)
+    parser.add_argument("--builds", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=50, help="Component ghi trong 1 turn")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 ContextBuilder.build: {args.entities} entities in room, {args.inventory} inventory items")
+    print(f"{'='*60}")
+
+    results = []
+    for mode in ("before", "after"):
+        with quiet():
+            result = run_benchmark(mode, args.entities, args.builds, args.writes, args.inventory)
+        results.append(result)
+        print(f"{mode:>6}: cold {result['cold_build_ms']}ms | warm p50 {result['build_p50_ms']}ms, "
+              f"p99 {result['build_p99_ms']}ms | {result['connects_per_build']} connects/build | "
+              f"turn {result['turn_writes']} writes {result['turn_write_ms']}ms | persisted {result['persisted']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
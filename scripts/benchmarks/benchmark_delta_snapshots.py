@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Session snapshots over 1 session dài (snapshot mỗi turn - trường hợp xấu nhất)
+- before: snapshot_to_sqlite_blocking cũ (INSERT nguyên state_json mỗi lần, không bao giờ xoá)
+- after:  SnapshotStore (keyframe mỗi SNAPSHOT_KEYFRAME_INTERVAL + JSON Patch, giữ
+          SNAPSHOT_KEEP_KEYFRAMES keyframe)
+
+State giống server.py: game_mode, turn_count, narrative_log[-50:], game_state
+(HP, phòng, inventory, entity nhìn thấy, narrative_log[-20:]).
+
+Usage:
+    python scripts/benchmarks/benchmark_delta_snapshots.py --turns 1000
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, percentile
+
+ROOMS = ["Cảng đổ nát", "Hầm tàu", "Boong trước", "Kho lương", "Buồng lái"]
+
+
+def _states(turns: int):
+    """State sau mỗi turn"""
+    narrative_log: List[str] = ["🌍 A new adventure begins..."]
+    inventory = ["Dao găm", "Bình nước"]
+    for turn in range(1, turns + 1):
+        narrative_log.append(f"🎮 Lượt {turn}: khám phá {ROOMS[turn % len(ROOMS)]}")
+        narrative_log.append(f"📖 Năm thứ {turn}, gió biển thổi qua những cánh buồm rách, "
+                             f"bạn tìm thấy dấu vết của thủy thủ đoàn cũ ở {ROOMS[turn % len(ROOMS)]}.")
+        if turn % 25 == 0:
+            inventory.append(f"Vật phẩm {turn}")
+        yield {
+            "game_mode": "last_voyage",
+            "turn_count": turn,
+            "narrative_log": narrative_log[-50:],
+            "game_state": {
+                "player_hp": 100 - turn % 37,
+                "player_max_hp": 100,
+                "player_name": "Hero",
+                "current_room": ROOMS[turn % len(ROOMS)],
+                "room_description": f"Căn phòng tối, mùi gỗ mục ({ROOMS[turn % len(ROOMS)]}).",
+                "inventory": list(inventory),
+                "visible_entities": [f"Chuột #{turn % 7}", "Thùng gỗ"],
+                "narrative_log": narrative_log[-20:],
+            },
+        }
+
+
+def _snapshot_before(save_id: str, state: Dict[str, Any]):
+    """snapshot_to_sqlite_blocking trước delta snapshots"""
+    conn = sqlite3.connect(f"data/saves/{save_id}.db")
+    try:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at INTEGER NOT NULL,
+            state_json TEXT NOT NULL
+        )""")
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("INSERT INTO snapshots (created_at, state_json) VALUES (?, ?)",
+                    (int(time.time()), json.dumps(state, ensure_ascii=False)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _restore_before(save_id: str) -> Dict[str, Any]:
+    conn = sqlite3.connect(f"data/saves/{save_id}.db")
+    try:
+        row = conn.execute("SELECT state_json FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0])
+
+
+def _storage(save_id: str) -> Dict[str, int]:
+    conn = sqlite3.connect(f"data/saves/{save_id}.db")
+    try:
+        rows, payload = conn.execute("SELECT COUNT(*), SUM(LENGTH(CAST(state_json AS BLOB))) FROM snapshots").fetchone()
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+    return {"rows": rows, "payload_bytes": payload, "file_bytes": pages}
+
+
+def run_benchmark(mode: str, turns: int, restores: int) -> Dict[str, Any]:
+    with sim_sandbox():
+        from engine.state.snapshots import SnapshotStore
+
+        store = SnapshotStore()
+        save_id = f"bench_{mode}"
+        write = _snapshot_before if mode == "before" else store.write
+
+        writes: List[float] = []
+        growth = []
+        final = None
+        for turn, state in enumerate(_states(turns), 1):
+            start = time.perf_counter()
+            write(save_id, state)
+            writes.append(time.perf_counter() - start)
+            final = state
+            if turn % max(1, turns // 4) == 0:
+                growth.append(_storage(save_id)["payload_bytes"])
+
+        restore = _restore_before if mode == "before" else store.load
+        store.forget(save_id)
+        restore_times = []
+        for _ in range(restores):
+            start = time.perf_counter()
+            restored = restore(save_id)
+            restore_times.append(time.perf_counter() - start)
+
+        storage = _storage(save_id)
+
+    return {
+        "mode": mode,
+        "turns": turns,
+        **storage,
+        "payload_growth": growth,
+        "write_p50_ms": round(percentile(writes, 50) * 1000, 3),
+        "write_p99_ms": round(percentile(writes, 99) * 1000, 3),
+        "restore_p50_ms": round(percentile(restore_times, 50) * 1000, 3),
+        "restore_p99_ms": round(percentile(restore_times, 99) * 1000, 3),
+        "restore_matches": restored == final,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta snapshot benchmark")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--restores", type=int, default=50)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Snapshot benchmark: {args.turns} turns, 1 snapshot / turn")
+    print(f"{'='*60}")
+
+    results = []
+    for mode in ("before", "after"):
+        result = run_benchmark(mode, args.turns, args.restores)
+        results.append(result)
+        print(f"{mode:>6}: {result['rows']} rows | payload {result['payload_bytes'] / 1024:.0f} KB "
+              f"(growth {[round(b / 1024) for b in result['payload_growth']]} KB) | file {result['file_bytes'] / 1024:.0f} KB")
+        print(f"{'':>6}  write p50 {result['write_p50_ms']}ms, p99 {result['write_p99_ms']}ms | "
+              f"restore p50 {result['restore_p50_ms']}ms, p99 {result['restore_p99_ms']}ms | "
+              f"restore matches {result['restore_matches']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+1 tick system (hồi máu + AI đi lang thang + chết) trên --npcs NPC (engine.core)
+- before: em.get_many Stats / State / Location rồi sửa từng object + em.add trong em.batch()
+- after:  ColumnarStore (cột NumPy theo archetype), tick = vài phép vector, sync() ghi
+          các dòng đổi về bảng components sau mỗi tick
+- after_batched: như after nhưng chỉ sync 1 lần sau --ticks tick (VD: khi save / hết turn)
+
+Tick (giống nhau ở mọi mode):
+- NPC còn sống: hp = min(hp + REGEN, max_hp), xp += 1
+- NPC còn sống, (entity_id + tick) % WANDER_EVERY == 0: x = (x + 1) % GRID
+- NPC bị đánh (entity_id % 97 == tick % 97): hp = 0, is_dead = True
+
+Cuối mỗi mode so nội dung bảng components (JSON đã parse) giữa các mode.
+
+Usage:
+    python scripts/benchmarks/benchmark_ecs_tick.py --npcs 100000 --ticks 10
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, percentile
+
+ROOMS = 50
+GRID = 10
+REGEN = 2
+WANDER_EVERY = 5
+
+
+def _populate(db_path: str, npcs: int):
+    """NPC ghi thẳng vào SQLite (dựng world không phải thứ đang đo)"""
+    import sqlite3
+
+    from engine.core import Database
+
+    Database(db_path).close()  # schema
+    conn = sqlite3.connect(db_path)
+    ids = range(1, npcs + 1)
+    conn.executemany("INSERT INTO entities (id, label) VALUES (?, ?)", ((i, f"npc_{i}") for i in ids))
+    rows = []
+    for i in ids:
+        rows.append((i, "stats", json.dumps({"hp": (i * 7) % 101, "max_hp": 100, "strength": 8, "intelligence": 10,
+                                             "dexterity": 10, "level": 1, "xp": 0})))
+        rows.append((i, "location", json.dumps({"zone_id": "start", "room_id": f"room_{i % ROOMS}",
+                                                "x": i % GRID, "y": (i // GRID) % GRID})))
+        rows.append((i, "state", json.dumps({"is_locked": False, "is_open": False, "is_broken": False,
+                                             "is_lit": False, "is_hidden": False, "is_dead": i % 13 == 0})))
+    conn.executemany("INSERT INTO components (entity_id, component_type, data) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def _tick_before(em, npc_ids: List[int], tick: int):
+    from engine.core import LocationComponent, StateComponent, StatsComponent
+
+    with em.batch():
+        stats = em.get_many(npc_ids, StatsComponent)
+        states = em.get_many(npc_ids, StateComponent)
+        locations = em.get_many(npc_ids, LocationComponent)
+        for eid in npc_ids:
+            state = states[eid]
+            if state.is_dead:
+                continue
+            stat, location = stats[eid], locations[eid]
+            if eid % 97 == tick % 97:
+                stat.hp = 0
+                state.is_dead = True
+                em.add(eid, state)
+            else:
+                stat.hp = min(stat.hp + REGEN, stat.max_hp)
+                stat.xp += 1
+                if (eid + tick) % WANDER_EVERY == 0:
+                    location.x = (location.x + 1) % GRID
+                    em.add(eid, location)
+            em.add(eid, stat)
+
+
+def _tick_after(store, tick: int):
+    import numpy as np
+    from engine.core import LocationComponent, StateComponent, StatsComponent
+
+    for view in store.query(StatsComponent, StateComponent, LocationComponent):
+        ids = view.entity_ids
+        hp, dead = view["stats.hp"], view["state.is_dead"]
+        alive = ~dead
+        hit = alive & (ids % 97 == tick % 97)
+        alive &= ~hit
+        hp[hit] = 0
+        dead[hit] = True
+        hp[alive] = np.minimum(hp[alive] + REGEN, view["stats.max_hp"][alive])
+        view["stats.xp"][alive] += 1
+        x = view["location.x"]
+        wander = alive & ((ids + tick) % WANDER_EVERY == 0)
+        x[wander] = (x[wander] + 1) % GRID
+
+
+def _contents(db_path: str) -> Dict[Any, Any]:
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    try:
+        return {(row[0], row[1]): json.loads(row[2])
+                for row in conn.execute("SELECT entity_id, component_type, data FROM components")}
+    finally:
+        conn.close()
+
+
+def run_benchmark(mode: str, npcs: int, ticks: int) -> Dict[str, Any]:
+    with sim_sandbox():
+        from engine.core import Database, EntityManager, StatsComponent
+
+        db_path = f"data/saves/bench_tick_{mode}.db"
+        _populate(db_path, npcs)
+        db = Database(db_path)
+        em = EntityManager(db)
+        npc_ids = em.find_with(StatsComponent)
+
+        start = time.perf_counter()
+        store = em.columnar() if mode != "before" else None
+        load_ms = (time.perf_counter() - start) * 1000
+
+        tick_times: List[float] = []
+        sync_times: List[float] = []
+        for tick in range(ticks):
+            start = time.perf_counter()
+            if mode == "before":
+                _tick_before(em, npc_ids, tick)
+            else:
+                _tick_after(store, tick)
+                if mode == "after":
+                    sync_start = time.perf_counter()
+                    store.sync()
+                    sync_times.append(time.perf_counter() - sync_start)
+            tick_times.append(time.perf_counter() - start)
+        if mode == "after_batched":
+            sync_start = time.perf_counter()
+            store.sync()
+            sync_times.append(time.perf_counter() - sync_start)
+
+        # Vị trí sau tick phải thấy được qua EntityIndex (sync cập nhật index)
+        in_room = len(em.find_at_position("room_1", 1, 0))
+        db.close()
+        contents = _contents(db_path)
+
+    return {
+        "mode": mode,
+        "npcs": npcs,
+        "ticks": ticks,
+        "load_ms": round(load_ms, 1),
+        "tick_p50_ms": round(percentile(tick_times, 50) * 1000, 2),
+        "tick_max_ms": round(max(tick_times) * 1000, 2),
+        "sync_p50_ms": round(percentile(sync_times, 50) * 1000, 2) if sync_times else None,
+        "in_cell": in_room,
+        "_contents": contents,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar ECS tick benchmark")
+    parser.add_argument("--npcs", type=int, default=100000)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    # Identity map đủ chỗ cho mọi component (mode before không bị evict giữa tick)
+    os.environ.setdefault("COMPONENT_CACHE_MAX", str(args.npcs * 4))
+
+    print(f"\n{'='*60}")
+    print(f"🔬 ECS tick: {args.npcs} NPCs, {args.ticks} ticks (regen + wander + death)")
+    print(f"{'='*60}")
+
+    results = []
+    for mode in ("before", "after", "after_batched"):
+        result = run_benchmark(mode, args.npcs, args.ticks)
+        results.append(result)
+        sync = f" (sync p50 {result['sync_p50_ms']}ms)" if result["sync_p50_ms"] is not None else ""
+        print(f"{mode:>13}: tick p50 {result['tick_p50_ms']}ms{sync}, max {result['tick_max_ms']}ms | "
+              f"load {result['load_ms']}ms | entities at room_1 (1, 0): {result['in_cell']}")
+
+    contents = [result.pop("_contents") for result in results]
+    same = all(other == contents[0] for other in contents[1:])
+    print(f"same components table after {args.ticks} ticks: {same}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"results": results, "same_result": same}, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Query entity theo phòng / ô / tag (validation mỗi action) ở nhiều kích thước world
+- before: json_extract(data, '$.room_id') trên mọi LocationComponent, lọc x/y bằng
+          em.get từng entity trong phòng (PreconditionSystem._find_entities_at cũ),
+          find_player quét mọi IdentityComponent
+- after:  EntityIndex trong RAM (room / (room, x, y) / tag), dựng từ generated
+          column + index và bảng entity_tags
+
+Identity map đã warm ở cả 2 mode (chỉ so chi phí query).
+
+Usage:
+    python scripts/benchmarks/benchmark_entity_queries.py --sizes 1000,10000,50000 --queries 500
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+
+ROOMS = 20
+GRID = 10
+
+
+def _find_at_location_before(db, room_id: str) -> List[int]:
+    return [row['entity_id'] for row in db.connection.execute("""
+        SELECT entity_id FROM components
+        WHERE component_type = 'location' AND json_extract(data, '$.room_id') = ?
+    """, (room_id,))]
+
+
+def _find_at_before(em, room_id: str, x: int, y: int) -> List[int]:
+    """PreconditionSystem._find_entities_at trước grid index"""
+    from engine.core import LocationComponent
+
+    result = []
+    for entity_id in _find_at_location_before(em.db, room_id):
+        loc = em.get(entity_id, LocationComponent)
+        if loc and loc.x == x and loc.y == y:
+            result.append(entity_id)
+    return result
+
+
+def _find_player_before(em):
+    from engine.core import IdentityComponent
+
+    for eid in em.find_with(IdentityComponent):
+        identity = em.get(eid, IdentityComponent)
+        if identity and "player" in identity.tags:
+            return eid
+    return None
+
+
+def _populate(em, size: int):
+    from engine.core import LocationComponent
+
+    with em.batch():
+        for i in range(size):
+            eid = em.create_npc(f"NPC {i}", f"room_{i % ROOMS}") if i % 2 else \
+                em.create_item(f"Vật phẩm {i}", "Đồ cũ", f"room_{i % ROOMS}")
+            em.add(eid, LocationComponent(zone_id="start", room_id=f"room_{i % ROOMS}",
+                                          x=(i // ROOMS) % GRID, y=(i // (ROOMS * GRID)) % GRID))
+        player_id = em.create_player("Hero")  # Player tạo sau cùng: trường hợp xấu cho quét tuyến tính
+    return player_id
+
+
+def _time(fn, queries: int) -> List[float]:
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_benchmark(size: int, queries: int) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        from engine.core import Database, EntityManager, LocationComponent, IdentityComponent
+
+        db = Database("data/saves/bench_queries.db")
+        em = EntityManager(db)
+        with quiet():
+            player_id = _populate(em, size)
+        # Warm identity map cho cả 2 mode
+        all_ids = em.find_with(IdentityComponent)
+        em.get_many(all_ids, IdentityComponent)
+        em.get_many(all_ids, LocationComponent)
+
+        cases = {
+            "room": (lambda i: _find_at_location_before(db, f"room_{i % ROOMS}"),
+                     lambda i: em.find_at_location(f"room_{i % ROOMS}")),
+            "cell": (lambda i: _find_at_before(em, f"room_{i % ROOMS}", i % GRID, (i // GRID) % GRID),
+                     lambda i: em.find_at_position(f"room_{i % ROOMS}", i % GRID, (i // GRID) % GRID)),
+            "find_player": (lambda i: _find_player_before(em), lambda i: em.find_player()),
+        }
+        start = time.perf_counter()
+        em.find_at_location("room_0")
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for name, (before, after) in cases.items():
+            same = all(sorted(before(i) if name != "find_player" else [before(i)]) ==
+                       sorted(after(i) if name != "find_player" else [after(i)]) for i in range(20))
+            before_lat = _time(before, queries if name != "find_player" else max(1, queries // 10))
+            after_lat = _time(after, queries)
+            result = {
+                "entities": size,
+                "query": name,
+                "before_p50_ms": round(percentile(before_lat, 50) * 1000, 4),
+                "after_p50_ms": round(percentile(after_lat, 50) * 1000, 4),
+                "after_p99_ms": round(percentile(after_lat, 99) * 1000, 4),
+                "same_result": same,
+            }
+            results.append(result)
+            print(f"{size:>7} entities | {name:>11}: before p50 {result['before_p50_ms']}ms | "
+                  f"after p50 {result['after_p50_ms']}ms, p99 {result['after_p99_ms']}ms | same {same}")
+        print(f"{'':>7}          | index build (lần query đầu) {build_ms:.1f}ms | player {em.find_player() == player_id}")
+        db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity spatial / tag index benchmark")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated entity counts")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Entity query benchmark: {ROOMS} rooms, {GRID}x{GRID} grid")
+    print(f"{'='*60}")
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(run_benchmark(size, args.queries))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
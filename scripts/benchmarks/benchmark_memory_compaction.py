@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Memory compaction: throughput, per-step latency and near-duplicate merge quality
+- before: compaction_worker_for_save cũ (load mọi row, 3 DELETE mỗi victim,
+          mỗi DELETE trên memory_fts là 1 full scan vì memory_id UNINDEXED)
+- after:  MemoryCompactor.step (victim từ index, DELETE set-based theo batch,
+          tối đa --batch row / step)
+- merge:  MinHash + LSH trên memories có planted near-duplicates
+
+Merge quality: "relevant" = memory có Jaccard (trigram âm tiết, tính chính xác)
+>= SIMILARITY_THRESHOLD với 1 memory cũ hơn cùng NPC + event (planted copy: thêm
+1 từ / gõ không dấu / chèn 1 từ giữa câu). precision = merged đúng / merged,
+recall = merged đúng / relevant.
+
+Usage:
+    python scripts/benchmarks/benchmark_memory_compaction.py --sizes 5000,20000,100000 --keep 1000
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from sim_harness import sim_sandbox, quiet, percentile
+from benchmark_memory_search import _dataset
+
+EDITS = ["rồi", "lại", "cũng", "vừa", "đã", "mới"]
+
+
+def _plant_duplicates(memories, ratio: float, seed: int):
+    """Thêm near-duplicate: copy 1 memory cũ, thêm 1 từ cuối câu / gõ không dấu / thêm 1 từ giữa câu"""
+    from engine.memory.vietnamese_tokenizer import normalize_vietnamese
+
+    rng = random.Random(seed + 1)
+    planted = list(memories)
+    for _ in range(int(len(memories) * ratio)):
+        content, importance, key = memories[rng.randrange(len(memories))]
+        edit = rng.randrange(3)
+        if edit == 0:
+            content = f"{content} {rng.choice(EDITS)}"
+        elif edit == 1:
+            content = normalize_vietnamese(content)
+        else:  # Thường dưới threshold khi câu ngắn: đo precision
+            words = content.split()
+            words.insert(rng.randrange(len(words) // 2, len(words)), rng.choice(EDITS))
+            content = " ".join(words)
+        planted.insert(rng.randrange(len(planted) // 2, len(planted) + 1), (content, importance, key))
+    return planted
+
+
+def _relevant(memories, threshold: float) -> Set[str]:
+    """Memory có Jaccard chính xác >= threshold với memory cũ hơn cùng (NPC, event)"""
+    from engine.memory.compaction_worker import shingles
+
+    groups: Dict[Tuple[str, str], List[set]] = {}
+    relevant = set()
+    for i, (content, _, key) in enumerate(memories):
+        current = shingles(content)
+        earlier = groups.setdefault(key, [])
+        if any(len(current & other) / len(current | other) >= threshold for other in earlier):
+            relevant.add(f"bench_{i}")
+        earlier.append(current)
+    return relevant
+
+
+def _build(db_path: str, memories, seed: int):
+    from database import init_database, close_db
+    from engine.memory.vietnamese_tokenizer import fts_row
+
+    init_database(db_path)
+    close_db(db_path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO memory_content (memory_id, content) VALUES (?, ?)",
+                     ((f"bench_{i}", content) for i, (content, _, _) in enumerate(memories)))
+    conn.executemany("""
+        INSERT INTO memory_metadata (memory_id, save_id, memory_type, importance, last_accessed)
+        VALUES (?, 'bench', 'episodic', ?, ?)
+    """, ((f"bench_{i}", importance, f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} 12:00:00")
+          for i, (_, importance, _) in enumerate(memories)))
+    conn.executemany("INSERT INTO memory_fts (memory_id, content, memory_type, terms, bigrams) VALUES (?, ?, ?, ?, ?)",
+                     (fts_row(f"bench_{i}", content, "episodic") for i, (content, _, _) in enumerate(memories)))
+    conn.commit()
+    return conn
+
+
+def _compact_before(conn, save_id: str, keep: int) -> int:
+    """compaction_worker_for_save trước khi có MemoryCompactor"""
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT m.memory_id, m.importance, m.last_accessed
+        FROM memory_metadata m
+        WHERE m.save_id = ?
+        ORDER BY m.importance DESC, m.last_accessed DESC
+    """, (save_id,))
+    rows = cur.fetchall()
+    deleted = 0
+    for row in rows[keep:]:
+        mem_id = row['memory_id']
+        cur.execute("DELETE FROM memory_fts WHERE memory_id = ?", (mem_id,))
+        cur.execute("DELETE FROM memory_content WHERE memory_id = ?", (mem_id,))
+        cur.execute("DELETE FROM memory_metadata WHERE memory_id = ?", (mem_id,))
+        deleted += 1
+    conn.commit()
+    conn.row_factory = None
+    return deleted
+
+
+def _run_steps(compactor, batch: int) -> Tuple[Dict[str, Any], List[float]]:
+    steps: List[float] = []
+    total = {"scanned": 0, "merged": 0, "evicted": 0, "deleted": 0}
+    start = time.perf_counter()
+    while True:
+        stats = compactor.step(batch)
+        steps.append(stats["elapsed_ms"])
+        for key in total:
+            total[key] += stats[key]
+        if stats["done"]:
+            break
+    total["elapsed_s"] = time.perf_counter() - start
+    return total, steps
+
+
+def run_benchmark(size: int, keep: int, batch: int, dup_ratio: float, before_max: int, seed: int) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        from engine.memory.compaction_worker import CULTIVATION_TABLES, SIMILARITY_THRESHOLD, MemoryCompactor
+
+        base, _ = _dataset(size, 1, seed)
+        memories = _plant_duplicates(base, dup_ratio, seed)
+        relevant = _relevant(memories, SIMILARITY_THRESHOLD)
+
+        def surviving_ids(conn) -> Set[str]:
+            return {row[0] for row in conn.execute("SELECT memory_id FROM memory_metadata")}
+
+        # --- Evict only: before vs after (cùng victim set) ---
+        kept = {}
+        for mode in ("before", "after"):
+            if mode == "before" and size > before_max:
+                continue
+            with quiet():
+                conn = _build(f"data/saves/bench_{mode}.db", memories, seed)
+            if mode == "before":
+                start = time.perf_counter()
+                deleted = _compact_before(conn, "bench", keep)
+                elapsed = time.perf_counter() - start
+                steps = [elapsed * 1000]
+            else:
+                compactor = MemoryCompactor(conn, CULTIVATION_TABLES, "bench", max_memories=keep, merge=False)
+                total, steps = _run_steps(compactor, batch)
+                deleted, elapsed = total["deleted"], total["elapsed_s"]
+            # Thứ tự giữa các row cùng (importance, last_accessed) không xác định: so theo key
+            kept[mode] = conn.execute(
+                "SELECT importance, last_accessed FROM memory_metadata ORDER BY importance, last_accessed"
+            ).fetchall()
+            fts_left = conn.execute("SELECT COUNT(*) FROM memory_fts").fetchone()[0]
+            conn.close()
+            result = {
+                "mode": mode,
+                "memories": len(memories),
+                "deleted": deleted,
+                "fts_left": fts_left,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_s": round(deleted / elapsed) if elapsed else 0,
+                "steps": len(steps),
+                "step_p50_ms": round(percentile(steps, 50), 2),
+                "step_max_ms": round(max(steps), 2),
+            }
+            results.append(result)
+            print(f"{len(memories):>8} memories | {mode:>6}: deleted {deleted} in {elapsed:.2f}s "
+                  f"({result['rows_per_s']} rows/s) | {len(steps)} steps, p50 {result['step_p50_ms']}ms, "
+                  f"max {result['step_max_ms']}ms | FTS rows left {fts_left}")
+        if "before" in kept:
+            print(f"{'':>8}            same survivor (importance, last_accessed): {kept['before'] == kept['after']}")
+
+        # --- Merge only: MinHash + LSH quality và throughput ---
+        with quiet():
+            conn = _build("data/saves/bench_merge.db", memories, seed)
+        compactor = MemoryCompactor(conn, CULTIVATION_TABLES, "bench", max_memories=None)
+        total, steps = _run_steps(compactor, batch)
+        merged = {f"bench_{i}" for i in range(len(memories))} - surviving_ids(conn)
+        conn.close()
+        true_positive = len(merged & relevant)
+        result = {
+            "mode": "merge",
+            "memories": len(memories),
+            "relevant": len(relevant),
+            "merged": len(merged),
+            "precision": round(true_positive / len(merged), 3) if merged else 1.0,
+            "recall": round(true_positive / len(relevant), 3) if relevant else 1.0,
+            "elapsed_s": round(total["elapsed_s"], 3),
+            "rows_per_s": round(total["scanned"] / total["elapsed_s"]),
+            "steps": len(steps),
+            "step_p50_ms": round(percentile(steps, 50), 2),
+            "step_max_ms": round(max(steps), 2),
+        }
+        results.append(result)
+        print(f"{len(memories):>8} memories |  merge: {len(merged)} merged / {len(relevant)} relevant | "
+              f"precision {result['precision']:.3f} | recall {result['recall']:.3f} | "
+              f"{result['rows_per_s']} rows/s | step p50 {result['step_p50_ms']}ms, max {result['step_max_ms']}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory compaction benchmark")
+    parser.add_argument("--sizes", default="5000,20000", help="Comma-separated base memory counts")
+    parser.add_argument("--keep", type=int, default=1000, help="max_memories (evict xuống còn)")
+    parser.add_argument("--batch", type=int, default=500, help="Row tối đa mỗi step")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Tỉ lệ planted near-duplicates")
+    parser.add_argument("--before-max", type=int, default=20000, help="Bỏ qua mode before trên size lớn hơn (O(n²))")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Memory compaction benchmark: keep {args.keep}, batch {args.batch}")
+    print(f"{'='*60}")
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(run_benchmark(size, args.keep, args.batch, args.duplicates, args.before_max, args.seed))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
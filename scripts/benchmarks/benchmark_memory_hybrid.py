@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Long-term memory search: BM25 vs local vector index vs hybrid (RRF)
+- bm25:   Memory3Tier.search_long_term với vector index tắt (FTS5 tiếng Việt)
+- vector: LocalVectorIndex.search (hashing embedder, float16, brute force / IVF)
+- hybrid: search_long_term với MEMORY_VECTOR_INDEX (BM25 top + vector top, RRF)
+
+Dataset giống benchmark_memory_search.py; một nửa query bị gõ sai 1 âm tiết trong
+tên NPC (thiếu / lặp ký tự) - BM25 mất term đó, char trigram của embedder thì không.
+
+Usage:
+    python scripts/benchmarks/benchmark_memory_hybrid.py --sizes 10000,100000,1000000 --queries 200
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+from benchmark_memory_search import _dataset
+
+
+def _typo(text: str, npc: str, rng: random.Random) -> str:
+    """Gõ sai 1 âm tiết của tên NPC: thiếu hoặc lặp 1 ký tự"""
+    syllables = npc.split()
+    i = rng.randrange(len(syllables))
+    word = syllables[i]
+    if len(word) < 2:
+        return text
+    pos = rng.randrange(1, len(word))
+    word = word[:pos] + word[pos + 1:] if rng.random() < 0.5 else word[:pos] + word[pos] + word[pos:]
+    syllables[i] = word
+    return text.replace(npc, " ".join(syllables))
+
+
+def _noisy_queries(memories, query_set, seed: int):
+    rng = random.Random(seed + 1)
+    noisy = []
+    for q, (text, relevant) in enumerate(query_set):
+        if q % 2 == 1:
+            npc = memories[next(iter(relevant))][2][0]
+            text = _typo(text, npc, rng) if npc in text else text
+        noisy.append((text, relevant))
+    return noisy
+
+
+def _build(size: int, memories):
+    import memory_3tier
+    from memory_3tier import Memory3Tier
+
+    memory_3tier.MEMORY_VECTOR_INDEX = True
+    memory = Memory3Tier(f"data/saves/bench_hybrid_{size}.db", "bench")
+    index_of: Dict[str, int] = {}
+    chunk = 5000
+    with memory.batch():
+        for start in range(0, len(memories), chunk):
+            entries = [{"content": content, "importance": importance}
+                       for content, importance, _ in memories[start:start + chunk]]
+            for offset, memory_id in enumerate(memory._insert_long_term(entries)):
+                index_of[memory_id] = start + offset
+    return memory, index_of
+
+
+def _search(mode: str, memory, text: str, k: int) -> List[str]:
+    if mode == "vector":
+        return [memory_id for memory_id, _ in memory.vector_index.search(text, k=k)]
+    if mode == "bm25":
+        vector_index, memory.vector_index = memory.vector_index, None
+        try:
+            return [m["memory_id"] for m in memory.search_long_term(text, limit=k)]
+        finally:
+            memory.vector_index = vector_index
+    return [m["memory_id"] for m in memory.search_long_term(text, limit=k)]
+
+
+def _run(size: int, queries: int, k: int, modes: List[str], seed: int) -> List[Dict[str, Any]]:
+    memories, query_set = _dataset(size, queries, seed)
+    query_set = _noisy_queries(memories, query_set, seed)
+
+    start = time.perf_counter()
+    memory, index_of = _build(size, memories)
+    index_s = time.perf_counter() - start
+    # Load matrix (+ IVF nếu vượt ngưỡng) ngoài phần đo latency
+    start = time.perf_counter()
+    memory.vector_index.search(query_set[0][0], k=k)
+    warm_s = time.perf_counter() - start
+
+    results = []
+    for mode in modes:
+        recalls: List[float] = []
+        typo_recalls: List[float] = []
+        timings: List[float] = []
+        for q, (text, relevant) in enumerate(query_set):
+            start = time.perf_counter()
+            hits = [index_of[memory_id] for memory_id in _search(mode, memory, text, k)]
+            timings.append(time.perf_counter() - start)
+            recall = len(relevant.intersection(hits)) / min(k, len(relevant))
+            recalls.append(recall)
+            if q % 2 == 1:
+                typo_recalls.append(recall)
+        memory._pending_access.clear()
+
+        results.append({
+            "mode": mode,
+            "memories": size,
+            "queries": len(query_set),
+            "index_s": round(index_s, 1),
+            "warm_s": round(warm_s, 2),
+            f"recall_at_{k}": round(sum(recalls) / len(recalls), 3),
+            f"typo_recall_at_{k}": round(sum(typo_recalls) / max(1, len(typo_recalls)), 3),
+            "p50_ms": round(percentile(timings, 50) * 1000, 2),
+            "p99_ms": round(percentile(timings, 99) * 1000, 2),
+        })
+    return results
+
+
+def run_benchmark(sizes: List[int], queries: int, k: int, modes: List[str], seed: int) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        for size in sizes:
+            with quiet():
+                size_results = _run(size, queries, k, modes, seed)
+            for result in size_results:
+                results.append(result)
+                print(f"{size:>8} memories | {result['mode']:>6}: recall@{k} {result[f'recall_at_{k}']:.3f} | "
+                      f"typo {result[f'typo_recall_at_{k}']:.3f} | p50 {result['p50_ms']:.2f}ms | "
+                      f"p99 {result['p99_ms']:.2f}ms | index {result['index_s']:.0f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 vs vector vs hybrid long-term memory search benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated long-term memory counts")
+    parser.add_argument("--queries", type=int, default=200, help="Choice-style queries (half with a typo)")
+    parser.add_argument("--k", type=int, default=5, help="Top-k (search_long_term limit)")
+    parser.add_argument("--modes", default="bm25,vector,hybrid", help="Comma-separated: bm25,vector,hybrid")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Hybrid memory search benchmark: {args.queries} queries")
+    print(f"{'='*60}")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = run_benchmark(sizes, args.queries, args.k, args.modes.split(","), args.seed)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Long-term memory search: recall@k and latency over a synthetic save
+- before: tokenize='porter' FTS5, whole choice string as one quoted phrase
+- after:  Memory3Tier.search_long_term (folded terms + syllable bigrams,
+          free text rewritten to an OR of weighted terms)
+
+Memories: "<event> cùng <NPC> tại <place>, ..." with ~18k distinct NPC names.
+Queries read like player choices ("Tìm <NPC> để cùng <event>"), a third of them
+typed without diacritics. Relevant = memories with the same NPC and event.
+
+Usage:
+    python scripts/benchmarks/benchmark_memory_search.py --memories 100000 --queries 200
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from sim_harness import sim_sandbox, quiet, percentile
+
+SURNAMES = ["Lý", "Trần", "Nguyễn", "Hàn", "Tiêu", "Đường", "Mộ Dung", "Vương", "Lâm", "Diệp",
+            "Tô", "Bạch", "Hoàng", "Đoàn", "Phương", "Tần", "Lạc", "Cố", "Thẩm", "Đông Phương"]
+MIDDLE = ["Đại", "Tiểu", "Thiên", "Vân", "Huyền", "Minh", "Thanh", "Tử", "Kim", "Ngọc",
+          "Hạo", "Phong", "Linh", "Vũ", "Tuyết", "Hỏa", "Lôi", "Băng", "Nguyệt", "Tinh",
+          "Long", "Hổ", "Phượng", "Quy", "Hạc", "Lan", "Trúc", "Mai", "Tùng", "Liên"]
+GIVEN = ["Hổ", "Long", "Kiệt", "Hùng", "Dũng", "Nhi", "Yên", "Sương", "Hà", "Trí",
+         "Đức", "Nhân", "Nghĩa", "Lễ", "Tín", "Bảo", "Châu", "Ngân", "Thạch", "Sơn",
+         "Hải", "Giang", "Hồ", "Lâm", "Điền", "Viên", "Các", "Lầu", "Đài", "Đình"]
+EVENTS = ["tu luyện", "luyện đan", "giao đấu", "thám hiểm bí cảnh", "săn yêu thú",
+          "luyện khí", "đàm đạo", "hái linh thảo", "bế quan", "kết giao"]
+PLACES = ["Thanh Vân Tông", "Hắc Phong Sơn", "Vạn Bảo Lâu", "Linh Thú Cốc", "Thiên Kiếm Phong",
+          "Bích Thủy Hồ", "Lạc Nhật Sơn Mạch", "Huyết Sắc Cấm Địa"]
+TAILS = ["thu hoạch không nhỏ", "bị thương nhẹ", "tu vi tăng tiến", "kết thù với một tán tu",
+         "nhận được một viên linh thạch", "ngộ ra đạo lý mới"]
+CHOICE_TEMPLATES = ["Tìm {npc} để cùng {event}", "Rủ {npc} đi {event}", "{event} với {npc}",
+                    "Đến gặp {npc} nhờ chỉ điểm {event}"]
+
+
+def _fold(text: str) -> str:
+    from engine.memory.vietnamese_tokenizer import normalize_vietnamese
+    return normalize_vietnamese(text)
+
+
+def _dataset(size: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    memories: List[Tuple[str, float, Tuple[str, str]]] = []
+    for _ in range(size):
+        npc = f"{rng.choice(SURNAMES)} {rng.choice(MIDDLE)} {rng.choice(GIVEN)}"
+        event = rng.choice(EVENTS)
+        content = f"{event.capitalize()} cùng {npc} tại {rng.choice(PLACES)}, {rng.choice(TAILS)}"
+        memories.append((content, rng.randint(1, 9) / 10, (npc, event)))
+
+    relevant: Dict[Tuple[str, str], Set[int]] = {}
+    for i, (_, _, key) in enumerate(memories):
+        relevant.setdefault(key, set()).add(i)
+
+    query_set = []
+    for q in range(queries):
+        npc, event = memories[rng.randrange(size)][2]
+        text = rng.choice(CHOICE_TEMPLATES).format(npc=npc, event=event)
+        if q % 3 == 2:
+            text = _fold(text)  # Gõ không dấu
+        query_set.append((text, relevant[(npc, event)]))
+    return memories, query_set
+
+
+class _PorterBaseline:
+    """Schema + query của search_long_term trước khi có Vietnamese tokenizer"""
+
+    def __init__(self, db_path: str, memories):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("CREATE TABLE meta (memory_id TEXT PRIMARY KEY, save_id TEXT, content TEXT, importance REAL)")
+        self.conn.execute("CREATE VIRTUAL TABLE fts USING fts5(memory_id UNINDEXED, content, memory_type, tokenize='porter')")
+        self.conn.executemany("INSERT INTO meta VALUES (?, 'bench', ?, ?)",
+                              ((str(i), c, imp) for i, (c, imp, _) in enumerate(memories)))
+        self.conn.executemany("INSERT INTO fts VALUES (?, ?, 'episodic')",
+                              ((str(i), c) for i, (c, _, _) in enumerate(memories)))
+        self.conn.commit()
+
+    def search(self, query: str, limit: int) -> List[int]:
+        rows = self.conn.execute("""
+            SELECT meta.memory_id FROM fts JOIN meta ON fts.memory_id = meta.memory_id
+            WHERE fts MATCH ? AND meta.save_id = 'bench'
+            ORDER BY bm25(fts) ASC, meta.importance DESC LIMIT ?
+        """, (f'"{query}"', limit)).fetchall()
+        return [int(r[0]) for r in rows]
+
+
+class _Memory3TierSearch:
+    def __init__(self, db_path: str, memories):
+        from memory_3tier import Memory3Tier
+
+        self.memory = Memory3Tier(db_path, "bench")
+        self.index_of: Dict[str, int] = {}
+        with self.memory.batch():
+            for i, (content, importance, _) in enumerate(memories):
+                self.index_of[self.memory.add_long_term(content, importance=importance)] = i
+
+    def search(self, query: str, limit: int) -> List[int]:
+        return [self.index_of[m["memory_id"]] for m in self.memory.search_long_term(query, limit=limit)]
+
+
+def _run(mode: str, memories, query_set, k: int) -> Dict[str, Any]:
+    db_path = f"data/saves/bench_search_{mode}.db"
+    start = time.perf_counter()
+    engine = _PorterBaseline(db_path, memories) if mode == "before" else _Memory3TierSearch(db_path, memories)
+    index_s = time.perf_counter() - start
+
+    recalls: List[float] = []
+    timings: List[float] = []
+    for text, relevant in query_set:
+        start = time.perf_counter()
+        hits = engine.search(text, k)
+        timings.append(time.perf_counter() - start)
+        recalls.append(len(relevant.intersection(hits)) / min(k, len(relevant)))
+
+    return {
+        "mode": mode,
+        "memories": len(memories),
+        "queries": len(query_set),
+        "index_s": round(index_s, 2),
+        f"recall_at_{k}": round(sum(recalls) / len(recalls), 3),
+        "any_hit_rate": round(sum(1 for r in recalls if r > 0) / len(recalls), 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p99_ms": round(percentile(timings, 99) * 1000, 2),
+    }
+
+
+def run_benchmark(size: int, queries: int, k: int, modes: List[str], seed: int) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        memories, query_set = _dataset(size, queries, seed)
+        for mode in modes:
+            with quiet():
+                result = _run(mode, memories, query_set, k)
+            results.append(result)
+            print(f"{mode:>6}: recall@{k} {result[f'recall_at_{k}']:.3f} | any hit {result['any_hit_rate']:.3f} | "
+                  f"p50 {result['p50_ms']:.2f}ms | p99 {result['p99_ms']:.2f}ms | index {result['index_s']:.1f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-term memory search recall/latency benchmark")
+    parser.add_argument("--memories", type=int, default=100000, help="Synthetic long-term memories")
+    parser.add_argument("--queries", type=int, default=200, help="Choice-style queries")
+    parser.add_argument("--k", type=int, default=5, help="Top-k (search_long_term limit)")
+    parser.add_argument("--modes", default="before,after", help="Comma-separated: before,after")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Memory search benchmark: {args.memories} memories, {args.queries} queries")
+    print(f"{'='*60}")
+
+    results = run_benchmark(args.memories, args.queries, args.k, args.modes.split(","), args.seed)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
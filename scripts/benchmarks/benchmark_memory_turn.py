@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Memory3Tier per-turn overhead at 1k / 10k / 100k long-term memories
+- before: connect / commit / close around every Memory3Tier call (rollback journal)
+- after:  pooled database.get_db connection (WAL, synchronous=NORMAL, statement cache),
+          1 commit per turn phase via Memory3Tier.batch()
+
+A "turn" replays the memory calls of CultivationSimulator._prepare_year_turn /
+_complete_year_turn: add_short_term (with rollover), set_working_memory,
+get_full_context(query), get_working_memory_context, add_short_term,
+complete_working_memory.
+
+Usage:
+    python scripts/benchmarks/benchmark_memory_turn.py --sizes 1000,10000,100000 --turns 200
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile, STUB_CHOICES
+
+PLACES = ["Thanh Vân Tông", "Hắc Phong Sơn", "Vạn Bảo Lâu", "Linh Thú Cốc", "Thiên Kiếm Phong"]
+EVENTS = ["tu luyện", "đột phá cảnh giới", "giao đấu", "luyện đan", "thám hiểm bí cảnh"]
+
+
+class _PerCallConnection:
+    """Connection stand-in: mỗi cursor() mở connection mới, commit() commit + close (hành vi cũ)"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+        self.in_transaction = False
+
+    def cursor(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = sqlite3.connect(self.db_path)
+        return self._conn.cursor()
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+
+def _populate(memory, size: int):
+    with memory.batch():
+        for i in range(size):
+            memory.add_long_term(
+                content=f"Năm {i}: {EVENTS[i % len(EVENTS)]} tại {PLACES[i % len(PLACES)]}, ký ức số {i}",
+                memory_type="episodic",
+                importance=(i % 10) / 10
+            )
+
+
+def _turn(memory, i: int):
+    choice = STUB_CHOICES[i % len(STUB_CHOICES)]
+    memory.add_short_term(content=choice, speaker="player")
+    memory.set_working_memory("year_progress", {"choice": choice, "age": i}, priority=8)
+    memory.get_full_context(query=EVENTS[i % len(EVENTS)])
+    memory.get_working_memory_context()
+    memory.add_short_term(content=f"Năm {i}: bế quan tu luyện, linh khí tăng.", speaker="ai")
+    memory.complete_working_memory("year_progress")
+
+
+def _run(mode: str, size: int, turns: int) -> Dict[str, Any]:
+    from memory_3tier import Memory3Tier
+    from database import close_db
+
+    db_path = f"data/saves/bench_memory_{mode}_{size}.db"
+    memory = Memory3Tier(db_path, "bench")
+    _populate(memory, size)
+
+    if mode == "before":
+        close_db(db_path)
+        sqlite3.connect(db_path).execute("PRAGMA journal_mode=DELETE").close()
+        memory.conn = _PerCallConnection(db_path)
+
+    timings: List[float] = []
+    for i in range(turns):
+        start = time.perf_counter()
+        if mode == "after":
+            # Giống game: prepare + complete, mỗi phase 1 commit
+            with memory.batch():
+                _turn(memory, i)
+        else:
+            _turn(memory, i)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "memories": size,
+        "turns": turns,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+    }
+
+
+def run_benchmark(sizes: List[int], turns: int, modes: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        for size in sizes:
+            for mode in modes:
+                with quiet():
+                    result = _run(mode, size, turns)
+                results.append(result)
+                print(f"{size:>7} memories | {mode:>6}: mean {result['mean_ms']:.2f}ms | "
+                      f"p50 {result['p50_ms']:.2f}ms | p99 {result['p99_ms']:.2f}ms per turn")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory3Tier per-turn overhead benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated long-term memory counts")
+    parser.add_argument("--turns", type=int, default=200, help="Turns per size/mode")
+    parser.add_argument("--modes", default="before,after", help="Comma-separated: before,after")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Memory turn benchmark: {args.turns} turns")
+    print(f"{'='*60}")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = run_benchmark(sizes, args.turns, args.modes.split(","))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: CultivationAgent._build_prompt
+- cold: fragment cache cleared before every build (static blocks still precompiled)
+- warm: memoized location/sect/race/talent/physique/attributes fragments
+Reports per-build latency and peak transient allocation (tracemalloc).
+
+Usage:
+    python scripts/benchmarks/benchmark_prompt_build.py --iterations 2000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, make_stub_agent, percentile, STUB_CHOICES
+
+
+def _character_data(agent) -> Dict[str, Any]:
+    world = agent.world
+    location_id = next(iter(world.world_db.locations), None)
+    sect_id = next(iter(world.world_db.sects), None)
+    physique_id = next(iter(world.physique_system.physiques), None)
+    return {
+        "age": 17,
+        "gender": "Nam",
+        "talent": next(iter(world.talents), "Thiên Linh Căn"),
+        "race": "Nhân Tộc",
+        "background": "Gia Đình Tu Tiên",
+        "story": "Sinh ra trong một gia đình tu tiên sa sút.",
+        "name": "Bench",
+        "attributes": {"con": 12.0, "int": 15.5, "per": 11.0, "luk": 9.0, "cha": 10.0, "kar": 13.0,
+                       "physique_id": physique_id},
+        "cultivation": {"realm": "Luyện Khí", "realm_level": 3, "spiritual_power": 240,
+                        "max_spiritual_power": 400, "breakthrough_progress": 35.0},
+        "resources": {"spirit_stones": 120},
+        "choices": list(STUB_CHOICES),
+        "location_id": location_id,
+        "sect_id": sect_id,
+    }
+
+
+def _run(agent, mode: str, iterations: int, memory_context: str) -> Dict[str, Any]:
+    try:
+        from prompt_templates import get_prompt_fragments
+        fragments = get_prompt_fragments(agent.world)
+    except ImportError:
+        fragments = None  # Tree without the template engine: every build is "cold"
+
+    character_data = _character_data(agent)
+    timings: List[float] = []
+    peaks: List[int] = []
+
+    if mode == "warm":
+        agent._build_prompt(character_data, 0, memory_context, None)
+
+    for i in range(iterations):
+        if mode == "cold" and fragments is not None:
+            fragments.clear()
+        start = time.perf_counter()
+        agent._build_prompt(character_data, i % len(STUB_CHOICES), memory_context, None)
+        timings.append(time.perf_counter() - start)
+
+    # Allocation pass (tracemalloc slows builds down, so measured separately)
+    tracemalloc.start()
+    for i in range(min(iterations, 200)):
+        if mode == "cold" and fragments is not None:
+            fragments.clear()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        agent._build_prompt(character_data, i % len(STUB_CHOICES), memory_context, None)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "iterations": iterations,
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 1),
+        "p50_us": round(percentile(timings, 50) * 1e6, 1),
+        "p99_us": round(percentile(timings, 99) * 1e6, 1),
+        "peak_alloc_kb": round(sum(peaks) / len(peaks) / 1024, 1),
+    }
+
+
+def run_benchmark(iterations: int, modes: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    memory_context = "\n".join(f"- Năm {i}: ký ức số {i}" for i in range(40))
+    with sim_sandbox():
+        with quiet():
+            agent = make_stub_agent(0)
+        for mode in modes:
+            with quiet():
+                result = _run(agent, mode, iterations, memory_context)
+            results.append(result)
+            print(f"{mode:>5}: mean {result['mean_us']:.1f}µs | p50 {result['p50_us']:.1f}µs | "
+                  f"p99 {result['p99_us']:.1f}µs | peak alloc {result['peak_alloc_kb']:.1f}KB/build")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt build micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000, help="Prompt builds per mode")
+    parser.add_argument("--modes", default="cold,warm", help="Comma-separated: cold,warm")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Prompt build benchmark: {args.iterations} builds")
+    print(f"{'='*60}")
+
+    results = run_benchmark(args.iterations, args.modes.split(","))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
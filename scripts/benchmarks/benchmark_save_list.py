@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+/saves/list với nhiều save
+- before: glob data/saves/*.db, mở từng file + SELECT game_state mỗi request
+- after:  1 trang từ SaveCatalog (ORDER BY updated_at DESC trên index)
+- rebuild: quét thư mục khi catalog bị mất, 1 thread vs thread pool
+
+Save giả lập: copy 1 file save đã init_database (đủ schema) rồi đổi row game_state.
+
+Usage:
+    python scripts/benchmarks/benchmark_save_list.py --saves 1000,5000 --page 50
+"""
+
+import argparse
+import json
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+
+
+def _list_before() -> List[Dict[str, Any]]:
+    """list_saves trước khi có save catalog"""
+    saves = []
+    for db_file in Path("data/saves").glob("*.db"):
+        save_id = db_file.stem
+        conn = sqlite3.connect(str(db_file))
+        row = conn.execute("""
+            SELECT age, gender, talent, name, updated_at
+            FROM game_state
+            WHERE save_id = ?
+        """, (save_id,)).fetchone()
+        conn.close()
+        if row:
+            saves.append({"save_id": save_id, "age": row[0] or 0, "character_name": row[3] or "Unknown",
+                          "updated_at": row[4] or "", "file_path": str(db_file)})
+    return saves
+
+
+def _make_saves(count: int):
+    from database import init_database, close_db
+
+    template = Path("data/template.db")
+    init_database(str(template))
+    close_db(str(template))
+    for i in range(count):
+        path = Path(f"data/saves/bench_{i}.db")
+        shutil.copyfile(template, path)
+        conn = sqlite3.connect(str(path))
+        conn.execute("""
+            INSERT INTO game_state (save_id, age, gender, talent, name, updated_at)
+            VALUES (?, ?, 'Nam', 'Thiên Linh Căn', ?, ?)
+        """, (f"bench_{i}", 16 + i % 80, f"Đạo hữu {i}", f"2026-{1 + i % 9:02d}-{1 + i % 28:02d}T12:{i % 60:02d}:00"))
+        conn.commit()
+        conn.close()
+
+
+def _time(fn, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_benchmark(count: int, page: int, repeat: int, workers: int) -> List[Dict[str, Any]]:
+    with sim_sandbox():
+        from save_catalog import SaveCatalog
+
+        with quiet():
+            _make_saves(count)
+
+        results = []
+        before = _time(_list_before, repeat)
+        results.append({"mode": "before", "saves": count, "returned": count,
+                        "p50_ms": round(percentile(before, 50) * 1000, 2),
+                        "p99_ms": round(percentile(before, 99) * 1000, 2)})
+
+        rebuilds = {}
+        for threads in (1, workers):
+            catalog = SaveCatalog(f"data/catalog_{threads}.db")
+            start = time.perf_counter()
+            catalog.rebuild(threads)
+            rebuilds[threads] = time.perf_counter() - start
+            if threads != workers:
+                catalog.close()
+
+        first = _time(lambda: catalog.list(page, 0), repeat)
+        last = _time(lambda: catalog.list(page, max(0, count - page)), repeat)
+        saves, total = catalog.list(page, 0)
+        newest = max(_list_before(), key=lambda save: (save["updated_at"], save["save_id"]))
+        catalog.close()
+        results.append({"mode": "after", "saves": count, "returned": len(saves), "total": total,
+                        "p50_ms": round(percentile(first, 50) * 1000, 3),
+                        "p99_ms": round(percentile(first, 99) * 1000, 3),
+                        "last_page_p50_ms": round(percentile(last, 50) * 1000, 3),
+                        "newest_first": saves[0]["save_id"] == newest["save_id"]})
+        results.append({"mode": "rebuild", "saves": count,
+                        "single_thread_s": round(rebuilds[1], 3),
+                        f"{workers}_threads_s": round(rebuilds[workers], 3)})
+
+    before, after, rebuild = results
+    print(f"{count:>6} saves | before: p50 {before['p50_ms']}ms, p99 {before['p99_ms']}ms ({count} rows)")
+    print(f"{'':>6}       |  after: p50 {after['p50_ms']}ms, p99 {after['p99_ms']}ms ({page} rows / {after['total']}), "
+          f"last page p50 {after['last_page_p50_ms']}ms | newest first {after['newest_first']}")
+    print(f"{'':>6}       | rebuild: 1 thread {rebuild['single_thread_s']}s, "
+          f"{workers} threads {rebuild[f'{workers}_threads_s']}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save list / save catalog benchmark")
+    parser.add_argument("--saves", default="1000,5000", help="Comma-separated save counts")
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8, help="Thread pool size khi rebuild")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Save list benchmark: page {args.page}, {args.repeat} requests")
+    print(f"{'='*60}")
+
+    results = []
+    for count in (int(c) for c in args.saves.split(",")):
+        results.extend(run_benchmark(count, args.page, args.repeat, args.workers))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
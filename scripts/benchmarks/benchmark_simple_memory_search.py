@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+SimpleMemory.search: per-query CPU and ranking on 50-candidate result sets
+- before: SQL top-n by BM25, then Python per row (parse_sqlite_timestamp,
+          datetime.now(), json.loads metadata) and re-sort
+- after:  combined score (BM25 min-max + importance + recency) in SQL over a
+          fixed 50-candidate pool, metadata decoded only for the returned top-k
+
+"exact@k" = share of queries whose top-k equals the top-k of the combined score
+(computed in Python) over the mode's whole 50-candidate pool: the old code ranked
+only its n_results BM25 hits; the new query prunes candidates with plan_fts_query,
+so its pool is the top 50 of the pruned match. "recall@k" = relevant memories
+(same NPC + event) in the top-k.
+
+Usage:
+    python scripts/benchmarks/benchmark_simple_memory_search.py --memories 20000 --queries 300
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+from benchmark_memory_search import _dataset
+
+
+def _search_before(memory, query: str, save_id: str, n_results: int, planned: bool = False) -> List[Dict[str, Any]]:
+    """SimpleMemory.search trước khi tính score trong SQL (rút gọn filter)"""
+    from engine.memory.simple_memory import parse_sqlite_timestamp, sanitize_fts_query
+    from engine.memory.vietnamese_tokenizer import BM25_WEIGHTS, build_fts_query, plan_fts_query, query_terms
+
+    sanitized_query = build_fts_query(sanitize_fts_query(query))
+    with memory._get_connection() as conn:
+        if planned:
+            cursor = conn.cursor()
+            sanitized_query = plan_fts_query(query_terms(sanitize_fts_query(query)), memory._doc_count(cursor),
+                                             lambda t: memory._doc_freq(cursor, t))
+        rows = conn.execute(f"""
+            SELECT m.memory_id, f.content, m.memory_type, m.importance, m.created_at,
+                   m.entity_id, m.location_id, m.metadata_json,
+                   bm25(memory_fts, {BM25_WEIGHTS}) as fts_score
+            FROM memory_fts f
+            JOIN memory_metadata m ON f.memory_id = m.memory_id
+            WHERE memory_fts MATCH ? AND m.save_id = ?
+            ORDER BY fts_score ASC, m.importance DESC, m.created_at DESC
+            LIMIT ?
+        """, (sanitized_query, save_id, n_results)).fetchall()
+
+        fts_scores = [row['fts_score'] for row in rows]
+        min_score = min(fts_scores) if fts_scores else 0
+        score_range = (max(fts_scores) - min_score) if fts_scores and max(fts_scores) != min_score else 1.0
+        results = []
+        for row in rows:
+            normalized_fts = max(0.0, min(1.0, 1.0 - ((row['fts_score'] - min_score) / score_range)))
+            importance_score = float(row['importance'])
+            age_days = (datetime.now() - parse_sqlite_timestamp(row['created_at'])).days
+            recency_score = max(0.0, 1.0 - (age_days / 90.0))
+            metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
+            results.append({
+                'id': row['memory_id'],
+                'text': row['content'],
+                'memory_type': row['memory_type'],
+                'score': 0.5 * normalized_fts + 0.3 * importance_score + 0.2 * recency_score,
+                'fts_score': normalized_fts,
+                'importance': importance_score,
+                'recency': recency_score,
+                'metadata': metadata
+            })
+        results.sort(key=lambda x: x['score'], reverse=True)
+        return results[:n_results]
+
+
+def _populate(db_path: str, memories, seed: int):
+    from engine.memory.simple_memory import SimpleMemory
+    from engine.memory.vietnamese_tokenizer import fts_row
+
+    memory = SimpleMemory(db_path)
+    rng = random.Random(seed)
+    rows = []
+    for i, (content, importance, (npc, event)) in enumerate(memories):
+        memory_id = f"bench_{i}"
+        created_at = f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} 12:00:00"
+        metadata = json.dumps({"npc": npc, "event": event, "year": i}, ensure_ascii=False)
+        rows.append((memory_id, content, importance, created_at, metadata))
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+        INSERT INTO memory_metadata (memory_id, save_id, memory_type, importance, created_at, metadata_json)
+        VALUES (?, 'bench', 'episodic', ?, ?, ?)
+    """, [(r[0], r[2], r[3], r[4]) for r in rows])
+    conn.executemany("""
+        INSERT INTO memory_fts (memory_id, content, memory_type, terms, bigrams) VALUES (?, ?, ?, ?, ?)
+    """, [fts_row(r[0], r[1], "episodic") for r in rows])
+    conn.commit()
+    conn.close()
+    return memory
+
+
+def _measure(search, query_set, n_results: int):
+    cpu: List[float] = []
+    results = []
+    for text, _ in query_set:
+        start = time.process_time()
+        results.append([r['id'] for r in search(text, n_results)])
+        cpu.append(time.process_time() - start)
+    return cpu, results
+
+
+def run_benchmark(size: int, queries: int, k: int, seed: int) -> List[Dict[str, Any]]:
+    with sim_sandbox():
+        from engine.memory.simple_memory import SEARCH_CANDIDATES
+
+        memories, query_set = _dataset(size, queries, seed)
+        with quiet():
+            memory = _populate("data/saves/bench_simple_memory.db", memories, seed)
+
+        # Ground truth: combined score (Python) trên cả pool 50 candidate, cắt top-k
+        truth = {}
+        for planned in (False, True):
+            _, pool = _measure(lambda q, n: _search_before(memory, q, "bench", SEARCH_CANDIDATES, planned),
+                               query_set, k)
+            truth[planned] = [ids[:k] for ids in pool]
+
+        runs = {
+            "before": (False, lambda q, n: _search_before(memory, q, "bench", n)),
+            "before_pool": (False, lambda q, n: _search_before(memory, q, "bench", SEARCH_CANDIDATES)[:n]),
+            "after": (True, lambda q, n: memory.search(q, "bench", n_results=n)),
+        }
+        index_of = {f"bench_{i}": i for i in range(size)}
+        results = []
+        for mode, (planned, search) in runs.items():
+            _measure(search, query_set[:20], k)  # warm page cache
+            cpu, ranked = _measure(search, query_set, k)
+            exact = sum(1 for got, want in zip(ranked, truth[planned]) if got == want) / len(ranked)
+            recall = sum(len(relevant.intersection(index_of[i] for i in got)) / min(k, len(relevant))
+                         for got, (_, relevant) in zip(ranked, query_set)) / len(ranked)
+            result = {
+                "mode": mode,
+                "memories": size,
+                "queries": len(query_set),
+                "candidates": SEARCH_CANDIDATES,
+                f"exact_at_{k}": round(exact, 3),
+                f"recall_at_{k}": round(recall, 3),
+                "cpu_mean_ms": round(sum(cpu) / len(cpu) * 1000, 3),
+                "cpu_p50_ms": round(percentile(cpu, 50) * 1000, 3),
+            }
+            results.append(result)
+            print(f"{mode:>11}: exact@{k} {result[f'exact_at_{k}']:.3f} | recall@{k} {result[f'recall_at_{k}']:.3f} | "
+                  f"CPU mean {result['cpu_mean_ms']:.3f}ms | p50 {result['cpu_p50_ms']:.3f}ms per query")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleMemory.search per-query CPU benchmark")
+    parser.add_argument("--memories", type=int, default=20000, help="Synthetic memories")
+    parser.add_argument("--queries", type=int, default=300, help="Choice-style queries")
+    parser.add_argument("--k", type=int, default=5, help="n_results")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 SimpleMemory search benchmark: {args.memories} memories, {args.queries} queries")
+    print(f"{'='*60}")
+
+    results = run_benchmark(args.memories, args.queries, args.k, args.seed)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Game-state persistence on the turn path (CultivationSimulator._complete_year_turn)
+- before: _save_state = INSERT OR REPLACE cả row, 4 json.dumps, commit (3 lần / turn:
+          _apply_state_updates, cuối turn, + commit của memory batch)
+- after:  write-behind: _save_state chỉ stage column dirty (+ 1 dòng journal),
+          StateFlushWorker UPSERT + commit nền
+
+--synchronous FULL: commit fsync WAL mỗi lần (máy không tin cache ổ đĩa / tuỳ chọn
+an toàn); mặc định NORMAL như database.get_db.
+
+Usage:
+    python scripts/benchmarks/benchmark_state_save.py --turns 300 --synchronous FULL
+"""
+
+import argparse
+import json
+import time
+import types
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile, make_simulator, STUB_CHOICES
+
+
+def _save_state_before(self):
+    """_save_state trước write-behind"""
+    self.memory.flush_pending_writes()
+    cursor = self.db.cursor()
+    cursor.execute("""
+        INSERT OR REPLACE INTO game_state
+        (save_id, age, gender, talent, race, background, story, name, choices_json,
+         cultivation_json, resources_json, attributes_json, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        self.save_id, self.character_age, self.character_gender, self.character_talent,
+        self.character_race, self.character_background, self.character_story, self.character_name,
+        json.dumps(self.current_choices, ensure_ascii=False),
+        json.dumps(self.cultivation.dict(), ensure_ascii=False) if self.cultivation else None,
+        json.dumps(self.resources.dict(), ensure_ascii=False) if self.resources else None,
+        json.dumps(self.attributes.dict(), ensure_ascii=False) if self.attributes else None,
+        datetime.now().isoformat()
+    ))
+    self.db.commit()
+
+
+def _response(turn: int) -> Dict[str, Any]:
+    return {
+        "narrative": f"Năm thứ {turn}: bế quan tu luyện, linh khí trong kinh mạch dần tăng lên.",
+        "choices": STUB_CHOICES,
+        "state_updates": {
+            "age": 16 + turn,
+            "cultivation": {"spiritual_power": 10 + turn % 90},
+            "resources": {"spirit_stones": turn * 3} if turn % 4 == 0 else {},
+        },
+    }
+
+
+def run_benchmark(mode: str, turns: int, synchronous: str) -> Dict[str, Any]:
+    with sim_sandbox():
+        from state_store import get_state_flusher
+
+        with quiet():
+            sim = make_simulator(f"bench_state_{mode}")
+            sim.db.execute(f"PRAGMA synchronous={synchronous}")
+            if mode == "before":
+                sim._save_state = types.MethodType(_save_state_before, sim)
+            sim.flush_state()
+
+            commits = 0
+
+            def trace(statement: str):
+                nonlocal commits
+                if statement.strip().upper().startswith("COMMIT"):
+                    commits += 1
+            sim.db.set_trace_callback(trace)
+
+            latencies: List[float] = []
+            for turn in range(turns):
+                start = time.perf_counter()
+                sim._complete_year_turn(_response(turn))
+                latencies.append(time.perf_counter() - start)
+            turn_commits = commits
+
+            start = time.perf_counter()
+            get_state_flusher().flush_all()
+            flush_ms = (time.perf_counter() - start) * 1000
+            sim.db.set_trace_callback(None)
+
+            row = sim.db.execute("SELECT age, cultivation_json FROM game_state WHERE save_id = ?",
+                                 (sim.save_id,)).fetchone()
+            persisted = row[0] == sim.character_age and json.loads(row[1]) == sim.cultivation.dict()
+
+    return {
+        "mode": mode,
+        "synchronous": synchronous,
+        "turns": turns,
+        "commits_per_turn": round(turn_commits / turns, 2),
+        "turn_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "turn_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "final_flush_ms": round(flush_ms, 3),
+        "persisted": persisted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-behind game state benchmark")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--synchronous", default="NORMAL", choices=["NORMAL", "FULL"])
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Game state save benchmark: {args.turns} turns, synchronous={args.synchronous}")
+    print(f"{'='*60}")
+
+    results = []
+    for mode in ("before", "after"):
+        result = run_benchmark(mode, args.turns, args.synchronous)
+        results.append(result)
+        print(f"{mode:>6}: {result['commits_per_turn']} commits/turn | turn p50 {result['turn_p50_ms']:.3f}ms | "
+              f"p99 {result['turn_p99_ms']:.3f}ms | final flush {result['final_flush_ms']:.3f}ms | "
+              f"persisted {result['persisted']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Session init benchmark: per-session world data (before) vs shared WorldRegistry (after)
+Measures new-game / load-game construction latency and retained memory per live session.
+
+"before" rebuilds a private WorldRegistry for every session, i.e. what each
+CultivationSimulator used to load on its own (World Bible, 2x WorldDatabase,
+skills, naming, physiques, spawn tables, prompt, Gemini model).
+
+Usage:
+    python scripts/benchmarks/benchmark_world_registry.py --sessions 50
+"""
+
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sim_harness import sim_sandbox, quiet, percentile
+
+
+def _world_factory(mode: str):
+    from world_registry import WorldRegistry, get_world_registry
+
+    shared = get_world_registry()
+    if mode == "after":
+        return lambda: shared
+
+    class PerSessionWorld(WorldRegistry):
+        # RAM optimizations cache was already a process singleton before the registry
+        def _init_optimizations(self):
+            return shared.optimizations
+
+    return lambda: PerSessionWorld("data")
+
+
+def _run(mode: str, sessions: int) -> Dict[str, Any]:
+    from game import CultivationSimulator
+    from session_manager import get_process_rss_mb
+
+    make_world = _world_factory(mode)
+    new_latencies: List[float] = []
+    load_latencies: List[float] = []
+
+    # New game: construct + first save
+    gc.collect()
+    rss_before = get_process_rss_mb() or 0.0
+    tracemalloc.start()
+    live = []
+    for i in range(sessions):
+        start = time.perf_counter()
+        sim = CultivationSimulator(f"bench_{mode}_{i}", world=make_world())
+        sim.character_name = f"Bench {i}"
+        sim.flush_state()
+        new_latencies.append(time.perf_counter() - start)
+        live.append(sim)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = get_process_rss_mb() or 0.0
+
+    # Load game: rehydrate the same saves
+    for i in range(sessions):
+        start = time.perf_counter()
+        CultivationSimulator(f"bench_{mode}_{i}", world=make_world())
+        load_latencies.append(time.perf_counter() - start)
+
+    del live
+    gc.collect()
+
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "new_p50_ms": round(percentile(new_latencies, 50) * 1000, 2),
+        "new_p99_ms": round(percentile(new_latencies, 99) * 1000, 2),
+        "load_p50_ms": round(percentile(load_latencies, 50) * 1000, 2),
+        "load_p99_ms": round(percentile(load_latencies, 99) * 1000, 2),
+        "heap_per_session_kb": round(retained / sessions / 1024, 1),
+        "rss_per_session_kb": round((rss_after - rss_before) * 1024 / sessions, 1),
+    }
+
+
+def run_benchmark(sessions: int, modes: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    with sim_sandbox():
+        # Dummy key: CultivationAgent builds its Gemini model (no network call at construction)
+        os.environ["GEMINI_API_KEY"] = os.environ.get("GEMINI_API_KEY") or "benchmark-dummy-key"
+        with quiet():
+            from world_registry import get_world_registry
+            get_world_registry()  # Process startup cost, paid once in "after"
+        for mode in modes:
+            with quiet():
+                result = _run(mode, sessions)
+            results.append(result)
+            print(f"{mode:>7}: new p50 {result['new_p50_ms']:.1f}ms (p99 {result['new_p99_ms']:.1f}) | "
+                  f"load p50 {result['load_p50_ms']:.1f}ms (p99 {result['load_p99_ms']:.1f}) | "
+                  f"heap/session {result['heap_per_session_kb']:.0f}KB | "
+                  f"RSS/session {result['rss_per_session_kb']:.0f}KB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared world data benchmark (session init latency + memory)")
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions to create and load per mode")
+    parser.add_argument("--modes", default="before,after", help="Comma-separated: before,after")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"🔬 World registry benchmark: {args.sessions} sessions")
+    print(f"{'='*60}")
+
+    results = run_benchmark(args.sessions, args.modes.split(","))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Shared harness for cultivation-sim benchmarks
+- Sandbox: copy cultivation-sim/data to a temp dir and chdir there (saves stay out of the repo)
+- Stub LLM: deterministic Gemini stand-in with configurable latency (no network, no API key)
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SIM_DIR = REPO_ROOT / "cultivation-sim"
+
+STUB_CHOICES = [
+    "Tiếp tục tu luyện",
+    "Đi khám phá khu vực xung quanh",
+    "Tìm kiếm tông môn để gia nhập",
+    "Nghỉ ngơi và suy ngẫm",
+]
+
+
+@contextlib.contextmanager
+def sim_sandbox():
+    """Run inside a temp copy of cultivation-sim/data with cultivation-sim importable"""
+    old_cwd = os.getcwd()
+    tmp = tempfile.mkdtemp(prefix="cultivation_bench_")
+    shutil.copytree(SIM_DIR / "data", Path(tmp) / "data", ignore=shutil.ignore_patterns("saves", "*.db", "*.pkl"))
+    (Path(tmp) / "data" / "saves").mkdir(exist_ok=True)
+    for path in (REPO_ROOT, SIM_DIR):  # SIM_DIR first on sys.path, repo root for engine/
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+    os.environ.setdefault("GEMINI_API_KEY", "")
+    os.environ.setdefault("ROLLING_SUMMARY_AI", "0")  # Stub LLM trả turn JSON, không phải summary
+    logging.disable(logging.CRITICAL)
+    os.chdir(tmp)
+    try:
+        yield Path(tmp)
+    finally:
+        os.chdir(old_cwd)
+        logging.disable(logging.NOTSET)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the game's debug prints"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """Gemini GenerativeModel stand-in: fixed latency, valid turn JSON"""
+
+    def __init__(self, latency_s: float = 0.5):
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _payload(self) -> str:
+        self.calls += 1
+        return json.dumps({
+            "narrative": f"Năm nay bạn bế quan tu luyện, linh khí trong kinh mạch dần tăng lên (lượt {self.calls}).",
+            "choices": STUB_CHOICES,
+            "action_intent": "YEAR_PROGRESS",
+            "state_updates": {"cultivation": {"spiritual_power": 10 + self.calls}},
+        }, ensure_ascii=False)
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        time.sleep(self.latency_s)
+        text = self._payload()
+        if stream:
+            return [_StubResponse(text[i:i + 16]) for i in range(0, len(text), 16)]
+        return _StubResponse(text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency_s)
+        return _StubResponse(self._payload())
+
+
+def make_stub_agent(latency_s: float = 0.5):
+    """CultivationAgent wired to StubModel (skips genai.configure)"""
+    from agent import CultivationAgent
+    from world_registry import get_world_registry
+
+    agent = CultivationAgent.__new__(CultivationAgent)
+    agent.world = get_world_registry()
+    agent.world_bible = agent.world.world_bible
+    agent.world_db = agent.world.world_db
+    agent.model = StubModel(latency_s)
+    agent.turn_model = agent.model
+    agent._prefix_cached = False
+    agent._last_request_time = 0
+    return agent
+
+
+def make_simulator(save_id: str, latency_s: float = 0.5):
+    """CultivationSimulator with a stub agent and a playable character"""
+    from game import CultivationSimulator
+
+    sim = CultivationSimulator(save_id)
+    sim.agent = make_stub_agent(latency_s)
+    sim.character_gender = "Nam"
+    sim.character_talent = "Thiên Linh Căn"
+    sim.character_race = "Nhân Tộc"
+    sim.character_background = "Gia Đình Tu Tiên"
+    sim.character_name = f"Bench {save_id}"
+    sim.current_choices = list(STUB_CHOICES)
+    return sim
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
@@ -13,6 +13,7 @@ from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 import asyncio
+from collections import OrderedDict
 
 # Auth and rate limiting
 from engine.auth import require_api_key, setup_rate_limiter, create_rate_limit_decorator
@@ -22,7 +23,7 @@ from engine.auth.rate_limiter import rate_limit_key_func
 from engine.state import (
     acquire_lock, release_lock,
     save_state, load_state, snapshot_save,
-    periodic_snapshot_worker
+    periodic_snapshot_worker, get_state_backend
 )
 
 # Cost control
@@ -64,16 +65,64 @@ async def startup_event():
     # Start snapshot worker in background
     asyncio.create_task(periodic_snapshot_worker(interval_seconds=60))
 
-# Global game state
+# Live game sessions - LRU theo save_id (nhiều người chơi / worker)
+MAX_LIVE_SESSIONS = int(os.getenv("MAX_LIVE_SESSIONS", "32"))
+
 class GameSession:
-    def __init__(self):
-        self.game_mode: Optional[str] = None  # "last_voyage" or "cultivation_sim"
-        self.game_instance = None  # BaseGame instance
-        self.save_id: Optional[str] = None
+    def __init__(self, game_mode: Optional[str] = None, game_instance=None, save_id: Optional[str] = None):
+        self.game_mode: Optional[str] = game_mode  # "last_voyage" or "cultivation_sim"
+        self.game_instance = game_instance  # BaseGame instance
+        self.save_id: Optional[str] = save_id
         self.turn_count = 0
         self.narrative_log: List[str] = []
 
-game = GameSession()
+sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+last_save_id: Optional[str] = None  # Cho client cũ không gửi save_id
+
+def register_session(session: GameSession) -> GameSession:
+    """Đưa session vào LRU, evict session ít dùng nhất khi vượt MAX_LIVE_SESSIONS"""
+    global last_save_id
+    sessions[session.save_id] = session
+    sessions.move_to_end(session.save_id)
+    last_save_id = session.save_id
+    
+    while len(sessions) > MAX_LIVE_SESSIONS:
+        # Engine ghi thẳng vào SQLite mỗi lần em.add, Redis giữ narrative_log -> bỏ khỏi RAM là đủ
+        evicted_id, _ = sessions.popitem(last=False)
+        if last_save_id == evicted_id:
+            last_save_id = None
+        print(f"♻️  Evicted session: {evicted_id}")
+    return session
+
+def _load_game_instance(save_id: str):
+    """Rehydrate game instance từ data/saves/{save_id}.db (blocking)"""
+    game_instance = LastVoyageGame()
+    game_instance.load_game(save_id)
+    return game_instance
+
+async def get_session(save_id: Optional[str] = None) -> GameSession:
+    """Get live session theo save_id, lazy rehydrate từ save DB + Redis nếu đã bị evict"""
+    save_id = save_id or last_save_id
+    if not save_id:
+        raise HTTPException(status_code=400, detail="No active game")
+    
+    session = sessions.get(save_id)
+    if session:
+        sessions.move_to_end(save_id)
+        return session
+    
+    if not Path(f"data/saves/{save_id}.db").exists():
+        raise HTTPException(status_code=404, detail=f"Save not found: {save_id}")
+    
+    game_instance = await asyncio.to_thread(_load_game_instance, save_id)
+    session = GameSession("last_voyage", game_instance, save_id)
+    
+    cached = await load_state(save_id)
+    if cached:
+        session.turn_count = cached.get("turn_count", 0)
+        session.narrative_log = cached.get("narrative_log", [])
+    
+    return register_session(session)
 
 # Request/Response Models
 class NewGameRequest(BaseModel):
@@ -86,6 +135,7 @@ class LoadGameRequest(BaseModel):
 
 class ActionRequest(BaseModel):
     user_input: str
+    save_id: Optional[str] = None  # None = session tạo/load gần nhất
 
 class GameStateResponse(BaseModel):
     player_hp: int
@@ -105,7 +155,7 @@ class ActionResponse(BaseModel):
 
 # Helper Functions - Now using game instances
 
-def get_game_state() -> GameStateResponse:
+def get_game_state(game: GameSession) -> GameStateResponse:
     """Build current game state"""
     if not game.game_instance or not game.game_instance.player_id:
         raise HTTPException(status_code=400, detail="No active game")
@@ -148,9 +198,7 @@ async def new_game(
         game_instance = LastVoyageGame()
         save_id = game_instance.start_new_game(player_name=game_request.player_name)
     
-    game.game_mode = game_request.game_mode
-    game.game_instance = game_instance
-    game.save_id = save_id
+    game = register_session(GameSession(game_request.game_mode, game_instance, save_id))
     
     # Acquire lock for initial state
     await acquire_lock(save_id, ttl=30)
@@ -162,12 +210,12 @@ async def new_game(
         ]
         
         # Save initial state to Redis
-        game_state = get_game_state()
+        game_state = get_game_state(game)
         await save_state(save_id, {
             "game_mode": game.game_mode,
             "turn_count": game.turn_count,
             "narrative_log": game.narrative_log,
-            "game_state": game_state
+            "game_state": game_state.dict()
         })
         
         # Snapshot to SQLite immediately
@@ -196,17 +244,15 @@ async def load_game(request: LoadGameRequest):
         game_mode = "last_voyage"
     
     try:
-        game_instance.load_game(load_request.save_id)
-        game.game_mode = game_mode
-        game.game_instance = game_instance
-        game.save_id = request.save_id
+        await asyncio.to_thread(game_instance.load_game, request.save_id)
+        game = register_session(GameSession(game_mode, game_instance, request.save_id))
         game.narrative_log = ["📂 Game loaded successfully."]
         
         return {
             "message": "Game loaded",
-            "save_id": load_request.save_id,
+            "save_id": request.save_id,
             "game_mode": game_mode,
-            "game_state": get_game_state()
+            "game_state": get_game_state(game)
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to load game: {str(e)}")
@@ -228,6 +274,7 @@ async def process_action(
     api_key: str = Depends(require_api_key)
 ):
     """Process a player action with rate limiting and cost control"""
+    game = await get_session(action_request.save_id)
     if not game.game_instance or not game.game_instance.player_id:
         raise HTTPException(status_code=400, detail="No active game")
     
@@ -279,12 +326,12 @@ async def process_action(
         game.narrative_log.append(f"📖 {narrative}")
         
         # Save state to Redis
-        game_state = get_game_state()
+        game_state = get_game_state(game)
         await save_state(save_id, {
             "game_mode": game.game_mode,
             "turn_count": game.turn_count,
             "narrative_log": game.narrative_log[-50:],  # Last 50 entries
-            "game_state": game_state
+            "game_state": game_state.dict()
         })
         
         # Build response
@@ -301,19 +348,20 @@ async def process_action(
         await release_lock(save_id)
 
 @app.get("/game/state", response_model=GameStateResponse)
-async def get_state():
+async def get_state(save_id: Optional[str] = None):
     """Get current game state"""
-    return get_game_state()
+    return get_game_state(await get_session(save_id))
 
 @app.get("/memory/count")
-async def get_memory_count():
+async def get_memory_count(save_id: Optional[str] = None):
     """Get memory count for current save"""
-    if not game.save_id:
+    save_id = save_id or last_save_id
+    if not save_id:
         return {"count": 0}
     
     from engine.memory import get_memory_manager
     mm = get_memory_manager()
-    count = mm.memory.get_count(game.save_id)
+    count = mm.memory.get_count(save_id)
     return {"count": count}
 
 @app.get("/game/modes")
@@ -340,11 +388,11 @@ async def get_billing_usage(api_key: str = Depends(require_api_key)):
 @create_rate_limit_decorator("10/minute")
 async def save_game(
     request: Request,
+    save_id: Optional[str] = None,
     api_key: str = Depends(require_api_key)
 ):
     """Explicitly save game state to SQLite"""
-    if not game.save_id:
-        raise HTTPException(status_code=400, detail="No active game to save")
+    game = await get_session(save_id)
     
     request.state.api_key = api_key
     
@@ -371,7 +419,13 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint (alias)"""
-    return {"status": "healthy", "service": "game-engine"}
+    return {
+        "status": "healthy",
+        "service": "game-engine",
+        "live_sessions": len(sessions),
+        "max_sessions": MAX_LIVE_SESSIONS,
+        "session_state": get_state_backend().stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn